@@ -0,0 +1,16 @@
+import pytest
+
+pytest_plugins = ("pytest_jupyter.jupyter_server",)
+
+
+@pytest.fixture
+def jp_server_config(jp_server_config):
+    return {"ServerApp": {"jpserver_extensions": {"jupyterlab_niivue": True}}}
+
+
+@pytest.fixture(autouse=True)
+def niivue_cache_dir(tmp_path, monkeypatch):
+    """Keep decompressed volumes out of the user cache directory."""
+    path = tmp_path / "niivue-cache"
+    monkeypatch.setenv("NIIVUE_CACHE_DIR", str(path))
+    return path
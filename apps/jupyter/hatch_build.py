@@ -1,11 +1,81 @@
 """Custom hatch build hook to copy labextension files to share/jupyter."""
+import gzip
+import hashlib
+import json
 import os
+import re
 import shutil
 from pathlib import Path
 from typing import Any
 
 from hatchling.builders.hooks.plugin.interface import BuildHookInterface
 
+# Written next to the static assets; read by handlers.StaticFileHandler
+ASSET_MANIFEST = "asset-manifest.json"
+
+# Text-like assets worth precompressing; images and fonts already are
+COMPRESSIBLE_SUFFIXES = {".js", ".mjs", ".css", ".json", ".map", ".svg", ".html", ".txt", ".wasm"}
+
+MIN_COMPRESS_SIZE = 1024
+
+# A content hash in a file name: webpack's "[name].[contenthash].js"
+# (hex) or Vite's "[name]-[hash].js" (8 base64url characters)
+HASHED_NAME = re.compile(r"\.[0-9a-f]{16,}\.|-(?=[\w-]*[A-Z0-9])[\w-]{8}\.")
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        print("⚠️  brotli is not installed; skipping .br assets")
+        return None
+    return brotli
+
+
+def _is_sibling(item: Path) -> bool:
+    """True for a ``.br``/``.gz`` written by ``precompress_assets``."""
+    if item.suffix not in (".br", ".gz") or not item.is_file():
+        return False
+    original = item.with_suffix("")
+    return original.suffix in COMPRESSIBLE_SUFFIXES and original.is_file()
+
+
+def precompress_assets(static_dir: Path) -> dict:
+    """Write ``.br``/``.gz`` siblings and a content-hash manifest of the assets.
+
+    Siblings are only kept when smaller than the original. The manifest maps
+    each file's path (relative to ``static_dir``) to its SHA-256, size,
+    available encodings in order of preference and whether its name carries
+    a content hash, i.e. whether it can be cached as immutable.
+    """
+    brotli = _brotli()
+    # Drop siblings of a previous build, which may be stale
+    for item in static_dir.rglob("*"):
+        if _is_sibling(item):
+            item.unlink()
+    files = {}
+    for item in sorted(static_dir.rglob("*")):
+        if not item.is_file() or item.name == ASSET_MANIFEST:
+            continue
+        data = item.read_bytes()
+        encodings = []
+        if item.suffix in COMPRESSIBLE_SUFFIXES and len(data) >= MIN_COMPRESS_SIZE:
+            variants = [("gzip", ".gz", gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                variants.insert(0, ("br", ".br", brotli.compress(data, quality=11)))
+            for encoding, suffix, compressed in variants:
+                if len(compressed) < len(data):
+                    item.with_name(item.name + suffix).write_bytes(compressed)
+                    encodings.append(encoding)
+        files[item.relative_to(static_dir).as_posix()] = {
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "size": len(data),
+            "encodings": encodings,
+            "immutable": bool(HASHED_NAME.search(item.name)),
+        }
+    (static_dir / ASSET_MANIFEST).write_text(json.dumps({"files": files}, indent=1, sort_keys=True))
+    return files
+
 
 class CustomBuildHook(BuildHookInterface):
     """Custom build hook to copy labextension directory to share/jupyter."""
@@ -26,9 +96,22 @@ class CustomBuildHook(BuildHookInterface):
         # Get the shared-data mapping from build_data
         shared_data = build_data.setdefault("shared_data", {})
         
+        # Enable the server extension (volume endpoint) on install
+        server_config = Path(self.root) / "jupyter-config" / "server-config" / "jupyterlab_niivue.json"
+        if server_config.exists():
+            shared_data[str(server_config.relative_to(self.root))] = (
+                "etc/jupyter/jupyter_server_config.d/jupyterlab_niivue.json"
+            )
+
         # Only proceed if the source directory exists
         if not source_dir.exists():
             return
+
+        # Precompress static assets before mapping, so the siblings ship too
+        static_dir = source_dir / "static"
+        if static_dir.exists():
+            assets = precompress_assets(static_dir)
+            print(f"🗜️  Precompressed {sum(1 for a in assets.values() if a['encodings'])} of {len(assets)} static assets")
             
         # Walk through all files in the labextension directory
         for item in source_dir.rglob("*"):
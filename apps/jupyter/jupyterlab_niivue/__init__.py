@@ -7,6 +7,7 @@ except ImportError:
     import warnings
     warnings.warn("Importing 'jupyterlab_niivue' outside a proper installation.")
     __version__ = "dev"
+from .display import Viewer, show
 from .handlers import setup_handlers
 
 
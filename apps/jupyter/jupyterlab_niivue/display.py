@@ -0,0 +1,182 @@
+"""Show in-memory arrays from a notebook kernel in a NiiVue output.
+
+``show`` sends an ndarray to the frontend over a Jupyter comm as binary
+buffers: a 352-byte NIfTI-1 header built here, and the array's own memory.
+ipykernel hands buffers to ZeroMQ without copying, so an array stored
+x-fastest (Fortran order, as nibabel's ``get_fdata`` returns it) is sent
+without a single copy in the kernel; other layouts are copied once.
+Nothing is base64-encoded or written to disk. The browser joins header and
+voxels into one standalone NIfTI image for niivue.
+
+``show`` returns a ``Viewer``. Passing it back (``show(..., viewer=v)`` or
+``v.show(...)``) replaces the images of that output instead of adding a
+new one.
+
+Runs in the kernel and needs NumPy, IPython and the ``comm`` package
+(installed with ipykernel 6.18+; older ipykernels provide
+``ipykernel.comm``).
+"""
+import struct
+import sys
+
+from .slab import DATATYPES, HEADER_SIZE, VOX_OFFSET
+
+MIME_TYPE = "application/vnd.niivue.viewer+json"
+COMM_TARGET = "jupyterlab_niivue"
+
+DEFAULT_HEIGHT = 500
+
+# NumPy type string (without byte order) -> NIfTI-1 datatype code. niivue
+# cannot read 64-bit integers, so they are converted before sending.
+DATATYPE_CODES = {
+    name: code for code, name in DATATYPES.items() if name not in ("i8", "u8")
+}
+
+NIFTI_UNITS_MM = 2
+NIFTI_XFORM_ALIGNED_ANAT = 2
+
+
+def _create_comm(**kwargs):
+    try:
+        from comm import create_comm
+    except ImportError:
+        from ipykernel.comm import Comm as create_comm
+    return create_comm(**kwargs)
+
+
+def _displayable(array):
+    """``array`` in a dtype niivue reads; copies only when converting."""
+    import numpy as np
+
+    data = np.asarray(array)
+    if data.ndim not in (2, 3, 4):
+        raise ValueError(f"show expects a 2D, 3D or 4D array, got shape {data.shape}")
+    if data.dtype == np.bool_:
+        return data.view(np.uint8)
+    if data.dtype == np.float16:
+        return data.astype(np.float32)
+    if data.dtype.kind in "iu" and data.dtype.itemsize == 8:
+        info = np.iinfo(np.int32)
+        if data.size == 0 or (data.min() >= info.min and data.max() <= info.max):
+            return data.astype(np.int32)
+        return data.astype(np.float64)
+    if data.dtype.str[1:] not in DATATYPE_CODES:
+        raise ValueError(f"show does not support arrays of dtype {data.dtype}")
+    return data
+
+
+def nifti_header(shape, dtype, affine=None):
+    """NIfTI-1 header plus empty extension block (``VOX_OFFSET`` bytes).
+
+    Written in the byte order of ``dtype``, so big-endian arrays need no
+    swapping. ``affine`` (4×4, default identity) becomes the sform.
+    """
+    import numpy as np
+
+    native = dtype.byteorder == "=" and sys.byteorder == "big"
+    endian = ">" if dtype.byteorder == ">" or native else "<"
+    affine = np.eye(4) if affine is None else np.asarray(affine, dtype=np.float64)
+    if affine.shape != (4, 4):
+        raise ValueError(f"affine must be 4×4, got shape {affine.shape}")
+    shape = tuple(shape) + (1,) * (3 - len(shape))
+    raw = bytearray(VOX_OFFSET)
+    struct.pack_into(endian + "i", raw, 0, HEADER_SIZE)
+    struct.pack_into(endian + "8h", raw, 40, len(shape), *shape, *([1] * (7 - len(shape))))
+    code = DATATYPE_CODES[dtype.str[1:]]
+    struct.pack_into(endian + "2h", raw, 70, code, dtype.itemsize * 8)
+    zooms = np.sqrt((affine[:3, :3] ** 2).sum(axis=0))
+    struct.pack_into(endian + "8f", raw, 76, 1.0, *zooms, 1.0, 1.0, 1.0, 1.0)
+    struct.pack_into(endian + "3f", raw, 108, float(VOX_OFFSET), 1.0, 0.0)
+    raw[123] = NIFTI_UNITS_MM
+    struct.pack_into(endian + "2h", raw, 252, 0, NIFTI_XFORM_ALIGNED_ANAT)
+    struct.pack_into(endian + "12f", raw, 280, *affine[:3].ravel())
+    raw[344:348] = b"n+1\0"
+    return bytes(raw)
+
+
+def pack_volume(array, affine=None):
+    """``(header, voxels)`` buffers of one image; ``voxels`` views ``array`` when it can."""
+    data = _displayable(array)
+    # NIfTI stores x fastest: a Fortran-ordered array is sent as is
+    voxels = data.reshape(-1, order="F")
+    return nifti_header(data.shape, data.dtype, affine), memoryview(voxels)
+
+
+def _overlay_specs(overlays, affine):
+    specs = []
+    for i, overlay in enumerate(overlays or ()):
+        if not isinstance(overlay, dict):
+            overlay = {"data": overlay}
+        if "data" not in overlay:
+            raise ValueError(f"Overlay {i}: 'data' field is required")
+        specs.append({
+            "data": overlay["data"],
+            "affine": overlay.get("affine", affine),
+            "name": overlay.get("name", f"overlay{i}.nii"),
+            "colormap": overlay.get("colormap", "redyell"),
+            "opacity": overlay.get("opacity", 0.5),
+        })
+    return specs
+
+
+class Viewer:
+    """Handle of one NiiVue output in a notebook.
+
+    Created by ``show``. ``show`` on the handle sends new images to the
+    same output, replacing the previous ones; ``close`` releases the
+    browser's copy of the data.
+    """
+
+    def __init__(self, height=DEFAULT_HEIGHT):
+        self.height = height
+        self.comm = _create_comm(target_name=COMM_TARGET, data={"height": height})
+        self._displayed = False
+
+    def show(self, array, affine=None, overlays=None, name="array.nii"):
+        """Send ``array`` (x, y, z[, t]) and ``overlays`` to this output.
+
+        ``overlays`` is a list of arrays, or of dicts with ``data``,
+        ``affine`` (default: ``affine``), ``name``, ``colormap`` (default
+        'redyell') and ``opacity`` (default 0.5).
+        """
+        images = [{"data": array, "affine": affine, "name": name}] + _overlay_specs(overlays, affine)
+        volumes, buffers = [], []
+        for image in images:
+            header, voxels = pack_volume(image["data"], image["affine"])
+            buffers += [header, voxels]
+            volumes.append({
+                key: image[key] for key in ("name", "colormap", "opacity") if key in image
+            })
+        self.comm.send({"type": "show", "volumes": volumes}, buffers=buffers)
+        if not self._displayed:
+            from IPython.display import display
+
+            display(self)
+            self._displayed = True
+        return self
+
+    def close(self):
+        self.comm.close()
+
+    def _repr_mimebundle_(self, include=None, exclude=None):
+        if self._displayed:
+            # Already shown by ``show``: a bare ``show(...)`` as the last
+            # line of a cell must not add a second output.
+            return {"text/plain": "<NiiVue viewer>"}
+        return {
+            MIME_TYPE: {"comm_id": self.comm.comm_id, "height": self.height},
+            "text/plain": "<NiiVue viewer>",
+        }
+
+
+def show(array, affine=None, overlays=None, name="array.nii", viewer=None, height=DEFAULT_HEIGHT):
+    """Show an in-memory volume in a NiiVue output below the cell.
+
+    ``array`` is indexed (x, y, z[, t]) like nibabel's ``get_fdata()``;
+    ``affine`` is its 4×4 voxel-to-world matrix (default: identity).
+    ``overlays`` is as for ``Viewer.show``. Returns the ``Viewer``; pass it
+    as ``viewer`` to update that output in place.
+    """
+    if viewer is None:
+        viewer = Viewer(height=height)
+    return viewer.show(array, affine=affine, overlays=overlays, name=name)
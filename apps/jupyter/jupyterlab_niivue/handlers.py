@@ -1,24 +1,120 @@
+import gzip
+import hashlib
 import json
+import mimetypes
+import os
 import os.path as osp
+import posixpath
 from tornado import web
+from tornado.ioloop import IOLoop
 
-from jupyter_server.base.handlers import APIHandler
+from jupyter_core.paths import is_hidden
+from jupyter_server.auth.decorator import authorized
+from jupyter_server.base.handlers import APIHandler, AuthenticatedFileHandler
 from jupyter_server.utils import url_path_join
 import tornado
 
+from .paired import PairedError, data_candidates, envelope_prefix, names_data_file
+from .slab import DEFAULT_MAX_VOXELS, NiftiError, plan_slab, read_header, read_slab
+from .volume_cache import CHUNK_SIZE, DecompressedCache, is_gzip_path, source_key
+
 
 HERE = osp.dirname(__file__)
 
 with open(osp.join(HERE, 'labextension', 'package.json')) as fid:
     data = json.load(fid)
 
+# Written by hatch_build.precompress_assets next to the static assets
+ASSET_MANIFEST = "asset-manifest.json"
+
+# Content codings of precompressed siblings and their suffixes
+ASSET_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def load_asset_manifest(static_path):
+    """Entries of the asset manifest in ``static_path``, or {} without one."""
+    try:
+        with open(osp.join(static_path, ASSET_MANIFEST)) as fid:
+            return json.load(fid).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def accepted_encodings(header):
+    """Content codings an ``Accept-Encoding`` header allows (q > 0)."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
 class StaticFileHandler(web.StaticFileHandler):
-    """Custom static file handler with proper MIME types for JS/CSS files"""
-    
+    """Serve the labextension assets, precompressed and long-cached.
+
+    At wheel build time ``hatch_build.py`` writes ``.br`` and ``.gz``
+    siblings of the text assets and a manifest of their content hashes. For
+    a file in the manifest the handler serves the preferred sibling the
+    client accepts (brotli, then gzip) with ``Content-Encoding`` and
+    ``Vary: Accept-Encoding``, and a strong ETag from the manifest hash
+    rather than re-hashing the file. Files whose name carries a content
+    hash never change, so they are sent with ``Cache-Control: immutable``
+    and later JupyterLab starts do not even revalidate them; the others
+    (``index.js``, ``style.js``) are revalidated with a cheap 304.
+    """
+
+    def initialize(self, path, default_filename=None, manifest=None):
+        super().initialize(path, default_filename)
+        self.manifest = manifest or {}
+        self._asset = None
+        self._encoding = None
+
+    async def get(self, path, include_body=True):
+        self._asset = self.manifest.get(path)
+        if self._asset is not None:
+            accepted = accepted_encodings(self.request.headers.get("Accept-Encoding", ""))
+            self._encoding = next(
+                (e for e in self._asset["encodings"] if e in accepted or "*" in accepted),
+                None,
+            )
+            self.set_header("Vary", "Accept-Encoding")
+            if self._encoding is not None:
+                self.set_header("Content-Encoding", self._encoding)
+        await super().get(path, include_body=include_body)
+
+    def validate_absolute_path(self, root, absolute_path):
+        """Resolve an asset to its precompressed sibling (see ``get``)."""
+        if self._encoding is not None:
+            absolute_path += ASSET_SUFFIXES[self._encoding]
+        return super().validate_absolute_path(root, absolute_path)
+
+    def compute_etag(self):
+        if self._asset is None:
+            return super().compute_etag()
+        suffix = f"-{self._encoding}" if self._encoding else ""
+        return f'"{self._asset["sha256"][:32]}{suffix}"'
+
+    def set_extra_headers(self, path):
+        if self._asset is None:
+            return
+        if self._asset["immutable"]:
+            self.set_header("Cache-Control", f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+        else:
+            self.set_header("Cache-Control", "no-cache")
+
     def get_content_type(self):
         """Override to ensure proper MIME types"""
-        content_type = super().get_content_type()
-        
         # Fix MIME types for specific file extensions
         if self.path.endswith('.js'):
             return 'application/javascript'
@@ -26,8 +122,256 @@ class StaticFileHandler(web.StaticFileHandler):
             return 'text/css'
         elif self.path.endswith('.json'):
             return 'application/json'
-        
-        return content_type
+        if self._encoding is not None:
+            # The type of the asset, not of its compressed sibling
+            return mimetypes.guess_type(self.path)[0] or 'application/octet-stream'
+        return super().get_content_type()
+
+class VolumeHandler(AuthenticatedFileHandler):
+    """Serve notebook-server files for the viewer, gunzipping ``.gz`` once.
+
+    Compressed files are decompressed into a ``DecompressedCache`` on first
+    request and served raw from there afterwards, so reopening a large
+    ``.nii.gz`` neither re-downloads the compressed file nor re-runs gunzip
+    in the browser. Responses support HTTP Range requests and carry a strong
+    ETag derived from the source path, mtime and size, which lets browsers
+    revalidate with a cheap 304. ``X-Niivue-Decompressed: 1`` tells the
+    client the body is no longer gzip-compressed.
+    """
+
+    def initialize(self, path, cache):
+        super().initialize(path)
+        self.cache = cache
+        self._source_path = None
+        self._cached_path = None
+
+    def on_finish(self):
+        if self._cached_path:
+            self.cache.release(self._cached_path)
+
+    @web.authenticated
+    @authorized
+    async def get(self, path, include_body=True):
+        self.check_xsrf_cookie()
+        self.path = self.parse_url_path(path)
+        absolute_path = self.get_absolute_path(self.root, self.path)
+        source = AuthenticatedFileHandler.validate_absolute_path(self, self.root, absolute_path)
+        if source is None:
+            return
+        self._source_path = source
+        if is_gzip_path(source):
+            try:
+                self._cached_path = await IOLoop.current().run_in_executor(
+                    None, self.cache.get, source
+                )
+            except (gzip.BadGzipFile, EOFError) as err:
+                self.log.warning(f"Could not decompress {source}: {err}")
+                raise web.HTTPError(415, f"Not a valid gzip file: {path}") from err
+            self.set_header("X-Niivue-Decompressed", "1")
+        await web.StaticFileHandler.get(self, path, include_body=include_body)
+
+    def validate_absolute_path(self, root, absolute_path):
+        """Resolve gzip sources to their decompressed copy (see ``get``)."""
+        if self._cached_path:
+            return web.StaticFileHandler.validate_absolute_path(
+                self, self.cache.directory, self._cached_path
+            )
+        return super().validate_absolute_path(root, absolute_path)
+
+    def compute_etag(self):
+        if self._source_path is None:
+            return None
+        return f'"{source_key(self._source_path)}"'
+
+    def get_content_type(self):
+        return "application/octet-stream"
+
+
+class _VolumeAPIHandler(APIHandler):
+    """Base for JSON/binary endpoints that read a volume under the server root."""
+
+    auth_resource = "contents"
+
+    def initialize(self, path, cache):
+        self.root = os.path.realpath(path)
+        self.cache = cache
+        self._cached_paths = []
+
+    def on_finish(self):
+        for cached in self._cached_paths:
+            self.cache.release(cached)
+
+    def resolve_source(self, path):
+        """Absolute path of ``path``, under the same root-containment and
+        hidden-file rules as ``/files``."""
+        absolute_path = os.path.realpath(os.path.join(self.root, path))
+        if not absolute_path.startswith(self.root + os.sep):
+            raise web.HTTPError(403, f"{path} is outside the server root")
+        if not self.contents_manager.allow_hidden and is_hidden(absolute_path, self.root):
+            raise web.HTTPError(404)
+        if not os.path.isfile(absolute_path):
+            raise web.HTTPError(404, f"File not found: {path}")
+        return absolute_path
+
+    async def resolve_volume(self, path):
+        """Absolute path of an uncompressed copy of ``path``.
+
+        Checks ``path`` like ``resolve_source`` and decompresses gzip files
+        through the shared cache; the copy is released when the request
+        finishes.
+        """
+        absolute_path = self.resolve_source(path)
+        if is_gzip_path(absolute_path):
+            try:
+                cached = await IOLoop.current().run_in_executor(
+                    None, self.cache.get, absolute_path
+                )
+            except (gzip.BadGzipFile, EOFError) as err:
+                raise web.HTTPError(415, f"Not a valid gzip file: {path}") from err
+            self._cached_paths.append(cached)
+            return cached
+        return absolute_path
+
+    async def read_volume_header(self, path):
+        volume = await self.resolve_volume(path)
+        try:
+            return volume, read_header(volume)
+        except NiftiError as err:
+            raise web.HTTPError(415, str(err)) from err
+
+
+class HeaderHandler(_VolumeAPIHandler):
+    """Return the shape, dtype, affine and voxel data size of a NIfTI volume.
+
+    Lets the viewer decide whether a volume fits in the browser before
+    downloading it, and plan slab requests if it does not.
+    """
+
+    @web.authenticated
+    @authorized
+    async def get(self, path):
+        _, header = await self.read_volume_header(path)
+        self.finish(json.dumps({
+            "shape": header["shape"],
+            "dtype": header["dtype"],
+            "affine": header["affine"],
+            "nbytes": header["nbytes"],
+            "max_voxels": DEFAULT_MAX_VOXELS,
+        }))
+
+
+class SlabHandler(_VolumeAPIHandler):
+    """Return a sub-block of a NIfTI volume as a standalone NIfTI-1 image.
+
+    Query arguments ``x``, ``y``, ``z`` and ``t`` take ``start:stop[:step]``
+    ranges or single indices (default: full extent, first frame for 4D).
+    ``max_voxels`` raises the spatial step uniformly, then the frame step,
+    until the slab fits; the handler returns 400 when ``max_voxels`` is too
+    small for any slab.
+    The file is memory-mapped, so only the requested voxels are read.
+    """
+
+    @web.authenticated
+    @authorized
+    async def get(self, path):
+        volume, header = await self.read_volume_header(path)
+        try:
+            max_voxels = int(self.get_argument("max_voxels", "0"))
+            slices = plan_slab(
+                header,
+                *(self.get_argument(axis, None) for axis in "xyzt"),
+                max_voxels=max_voxels,
+            )
+        except (NiftiError, ValueError) as err:
+            raise web.HTTPError(400, str(err)) from err
+        try:
+            body = await IOLoop.current().run_in_executor(
+                None, read_slab, volume, header, slices
+            )
+        except ImportError as err:
+            raise web.HTTPError(501, "The slab endpoint requires numpy") from err
+        self.set_header("Content-Type", "application/octet-stream")
+        self.finish(body)
+
+
+class PairedHandler(_VolumeAPIHandler):
+    """Return a detached header and its data file in one response.
+
+    For ``.mhd`` headers the data file is read from ``ElementDataFile``; for
+    ``.hdr`` headers it is the sibling ``.img``. Both are sent in the
+    envelope described in ``paired.py``, the voxels streamed in chunks, so
+    the viewer needs a single round trip instead of fetching the header,
+    parsing it and only then requesting the data. Gzipped files are
+    decompressed through the shared cache (``X-Niivue-Decompressed: 1``
+    when the header was). The strong ETag covers both source files and is
+    computed from their stat before either is decompressed, so reopening an
+    unchanged pair is a cheap 304 (an MHD header, which names its data
+    file, is still read).
+    """
+
+    @web.authenticated
+    @authorized
+    async def get(self, path):
+        header_source = self.resolve_source(path)
+        loop = IOLoop.current()
+        header = None
+        if names_data_file(path):
+            header = await loop.run_in_executor(
+                None, _read_file, await self.resolve_volume(path)
+            )
+        try:
+            candidates = data_candidates(path, header)
+        except PairedError as err:
+            raise web.HTTPError(415, str(err)) from err
+
+        sources = [header_source]
+        data_name = None
+        directory = posixpath.dirname(path)
+        for candidate in candidates:
+            name = posixpath.normpath(posixpath.join(directory, candidate))
+            if os.path.isfile(os.path.join(self.root, name)):
+                sources.append(self.resolve_source(name))
+                data_name = name
+                break
+        else:
+            if candidates:
+                raise web.HTTPError(404, f"Paired data file {candidates[0]} of {path} not found")
+
+        key = "\0".join(source_key(source) for source in sources)
+        self.set_header("Etag", f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"')
+        self.set_header("Cache-Control", "no-cache")
+        if is_gzip_path(header_source):
+            self.set_header("X-Niivue-Decompressed", "1")
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish(set_content_type="application/octet-stream")
+            return
+
+        if header is None:
+            header = await loop.run_in_executor(
+                None, _read_file, await self.resolve_volume(path)
+            )
+        data_path = await self.resolve_volume(data_name) if data_name else None
+        data_size = os.path.getsize(data_path) if data_path else 0
+        prefix = envelope_prefix(len(header), data_size)
+        self.set_header("Content-Length", len(prefix) + len(header) + data_size)
+        self.set_header("Content-Type", "application/octet-stream")
+        self.write(prefix + header)
+        if data_path:
+            with open(data_path, "rb") as fid:
+                while True:
+                    chunk = await loop.run_in_executor(None, fid.read, CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.write(chunk)
+                    await self.flush()
+        self.finish(set_content_type="application/octet-stream")
+
+
+def _read_file(path):
+    with open(path, "rb") as fid:
+        return fid.read()
+
 
 def setup_handlers(web_app, url_pattern):
     """Set up the extension handlers"""
@@ -41,7 +385,22 @@ def setup_handlers(web_app, url_pattern):
             (
                 url_path_join(static_url, r"(.*)"),
                 StaticFileHandler,
-                {"path": static_path}
+                {"path": static_path, "manifest": load_asset_manifest(static_path)}
             )
         ]
-        web_app.add_handlers(host_pattern, handlers)
\ No newline at end of file
+        web_app.add_handlers(host_pattern, handlers)
+
+    # Serve volumes, headers, slabs and paired files from the server root (gzip decompressed once)
+    base_url = web_app.settings.get("base_url", "/")
+    root_dir = web_app.settings.get("server_root_dir") or web_app.settings["contents_manager"].root_dir
+    cache = DecompressedCache()
+    options = {"path": root_dir, "cache": cache}
+    web_app.add_handlers(
+        host_pattern,
+        [
+            (url_path_join(base_url, "niivue", "volume", r"(.*)"), VolumeHandler, options),
+            (url_path_join(base_url, "niivue", "header", r"(.*)"), HeaderHandler, options),
+            (url_path_join(base_url, "niivue", "slab", r"(.*)"), SlabHandler, options),
+            (url_path_join(base_url, "niivue", "paired", r"(.*)"), PairedHandler, options),
+        ],
+    )
\ No newline at end of file
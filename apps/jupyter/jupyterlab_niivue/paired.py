@@ -0,0 +1,84 @@
+"""Detached-header formats for the paired endpoint.
+
+Some formats keep the header and the voxels in two files: a MetaImage
+header (``.mhd``) names its voxel file in ``ElementDataFile``, and a NIfTI
+or Analyze pair keeps the voxels of ``x.hdr`` in ``x.img``. Opening one
+through ``/files`` takes two round trips, the second only after the browser
+has parsed the header. The paired endpoint finds the data file on the
+server and returns both files in one response, framed as::
+
+    magic        8 bytes  b"NVPAIR01"
+    header size  uint64, little-endian
+    data size    uint64, little-endian
+    header bytes
+    data bytes
+
+A header without a separate data file (``ElementDataFile = LOCAL``) is
+returned with an empty data part.
+"""
+import re
+import struct
+
+PAIRED_MAGIC = b"NVPAIR01"
+ENVELOPE = struct.Struct("<8sQQ")
+
+_ELEMENT_DATA_FILE = re.compile(r"^\s*ElementDataFile\s*=\s*(.*?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+class PairedError(ValueError):
+    """The header names its data in a way the paired endpoint cannot serve."""
+
+
+def is_paired_path(path):
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return name.endswith((".mhd", ".hdr"))
+
+
+def _header_name(path):
+    name = path.rsplit("/", 1)[-1].lower()
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def names_data_file(path):
+    """True if the header at ``path`` names its data file (MHD), so it must be
+    read to find it; ``.hdr`` data is found from the path alone."""
+    return _header_name(path).endswith(".mhd")
+
+
+def mhd_data_file(text):
+    """Relative path of the voxel file an MHD header names, or None if embedded."""
+    match = _ELEMENT_DATA_FILE.search(text)
+    if not match:
+        return None
+    value = match.group(1).strip("\"'")
+    if not value or value.upper() == "LOCAL":
+        return None
+    if value.upper().startswith("LIST") or "%" in value:
+        raise PairedError(f"Multi-file MetaImage data is not supported: ElementDataFile = {value}")
+    return value.replace("\\", "/")
+
+
+def data_candidates(path, header):
+    """Paths, relative to the header's directory, where its data may be.
+
+    The first existing one is the data file; an empty list means the
+    header holds its own data. ``header`` is only used, and may be None,
+    unless ``names_data_file(path)``.
+    """
+    name = path.rsplit("/", 1)[-1]
+    if name.lower().endswith(".gz"):
+        name = name[:-3]
+    if names_data_file(path):
+        data_file = mhd_data_file(header.decode("latin-1"))
+        return [data_file] if data_file else []
+    if _header_name(path).endswith(".hdr"):
+        stem = name[:-4]
+        return [stem + ext for ext in (".img", ".IMG", ".img.gz")]
+    raise PairedError(f"Not a detached-header format: {path}")
+
+
+def envelope_prefix(header_size, data_size):
+    """Magic and part sizes that precede the header and data bytes."""
+    return ENVELOPE.pack(PAIRED_MAGIC, header_size, data_size)
@@ -0,0 +1,211 @@
+"""Header parsing and memory-mapped slab extraction for NIfTI-1 volumes.
+
+Some volumes (whole-brain histology, long 4D runs) do not fit in a browser
+tab. The slab endpoint memory-maps the uncompressed file on the server and
+returns only a sub-block of it, optionally strided, as a small standalone
+NIfTI-1 image whose affine places it at the right position in world space.
+Only the pages backing the requested voxels are read from disk.
+
+Header parsing is pure Python so the header endpoint works without NumPy;
+extracting slabs requires NumPy.
+"""
+import math
+import struct
+
+HEADER_SIZE = 348
+VOX_OFFSET = 352
+
+# NIfTI-1 datatype code -> NumPy type string (without byte order)
+DATATYPES = {
+    2: "u1",
+    4: "i2",
+    8: "i4",
+    16: "f4",
+    64: "f8",
+    256: "i1",
+    512: "u2",
+    768: "u4",
+    1024: "i8",
+    1280: "u8",
+}
+
+# Voxel budget of the overview the viewer loads for oversized volumes
+DEFAULT_MAX_VOXELS = 256 ** 3
+
+
+class NiftiError(ValueError):
+    """The file is not a NIfTI-1 volume the slab endpoint can serve."""
+
+
+def _quaternion_affine(b, c, d, offsets, pixdim):
+    a = math.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+    rotation = [
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+    ]
+    qfac = -1.0 if pixdim[0] < 0 else 1.0
+    zooms = [pixdim[1], pixdim[2], qfac * pixdim[3]]
+    rows = [[rotation[i][j] * zooms[j] for j in range(3)] + [offsets[i]] for i in range(3)]
+    return rows + [[0.0, 0.0, 0.0, 1.0]]
+
+
+def read_header(path):
+    """Parse the header of an uncompressed single-file NIfTI-1 image.
+
+    Returns a dict with ``shape``, ``dtype`` (NumPy type string including
+    byte order), ``vox_offset``, ``affine`` (4×4 nested lists), ``nbytes``
+    (size of the voxel data) and ``raw`` (the 348 header bytes).
+    """
+    with open(path, "rb") as fid:
+        raw = fid.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise NiftiError("Not a NIfTI-1 image: too short")
+    for endian in "<>":
+        if struct.unpack_from(endian + "i", raw, 0)[0] == HEADER_SIZE:
+            break
+    else:
+        raise NiftiError("Not a NIfTI-1 image: bad sizeof_hdr")
+    if raw[344:348] != b"n+1\0":
+        raise NiftiError("Only single-file NIfTI-1 images (magic 'n+1') are supported")
+
+    def field(fmt, offset):
+        return struct.unpack_from(endian + fmt, raw, offset)
+
+    dims = field("8h", 40)
+    shape = [int(n) for n in dims[1:1 + dims[0]]]
+    code = field("h", 70)[0]
+    if code not in DATATYPES:
+        raise NiftiError(f"Unsupported NIfTI datatype code {code}")
+    dtype = endian + DATATYPES[code]
+    pixdim = field("8f", 76)
+    qform_code, sform_code = field("2h", 252)
+    if sform_code > 0:
+        srow = field("12f", 280)
+        affine = [list(srow[0:4]), list(srow[4:8]), list(srow[8:12]), [0.0, 0.0, 0.0, 1.0]]
+    elif qform_code > 0:
+        affine = _quaternion_affine(*field("3f", 256), field("3f", 268), pixdim)
+    else:
+        affine = [
+            [pixdim[1], 0.0, 0.0, 0.0],
+            [0.0, pixdim[2], 0.0, 0.0],
+            [0.0, 0.0, pixdim[3], 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ]
+    itemsize = int(DATATYPES[code][1:])
+    return {
+        "shape": shape,
+        "dtype": dtype,
+        "vox_offset": int(field("f", 108)[0]),
+        "affine": affine,
+        "nbytes": math.prod(shape) * itemsize,
+        "raw": raw,
+    }
+
+
+def parse_slice(text, size):
+    """Parse ``start:stop[:step]`` (Python semantics) or a single index."""
+    if text is None or text == "":
+        return slice(0, size, 1)
+    try:
+        parts = [int(p) if p else None for p in text.split(":")]
+    except ValueError:
+        raise NiftiError(f"Invalid range {text!r}") from None
+    if len(parts) == 1:
+        index = parts[0] + size if parts[0] < 0 else parts[0]
+        if not 0 <= index < size:
+            raise NiftiError(f"Index {text} out of range for size {size}")
+        return slice(index, index + 1, 1)
+    if len(parts) > 3:
+        raise NiftiError(f"Invalid range {text!r}")
+    start, stop, step = slice(*parts).indices(size)
+    if step < 1 or start >= stop:
+        raise NiftiError(f"Empty or reversed range {text!r}")
+    return slice(start, stop, step)
+
+
+def plan_slab(header, x=None, y=None, z=None, t=None, max_voxels=None):
+    """Resolve query ranges into slices for each axis of the volume.
+
+    Unspecified spatial axes cover the full extent; ``t`` defaults to the
+    first frame so a 4D request stays bounded. With ``max_voxels`` the
+    spatial steps are raised uniformly until the slab fits, at most to the
+    length of the longest axis; if the frames alone still exceed the budget,
+    the frame step is raised too. Raises ``NiftiError`` when not even one
+    voxel per frame fits.
+    """
+    shape = header["shape"]
+    if not 3 <= len(shape) <= 4:
+        raise NiftiError(f"Only 3D and 4D volumes are supported, got {len(shape)}D")
+    slices = [parse_slice(r, n) for r, n in zip((x, y, z), shape)]
+    if len(shape) == 4:
+        slices.append(parse_slice(t if t is not None else "0", shape[3]))
+    if max_voxels:
+        def count(s, step=1):
+            return len(range(s.start, s.stop, max(s.step, step)))
+
+        def spatial(step):
+            return math.prod(count(s, step) for s in slices[:3])
+
+        frames = count(slices[3]) if len(slices) == 4 else 1
+        # Smallest step that fits: beyond the longest axis, a larger step no
+        # longer shrinks the slab
+        low, high = 1, max(s.stop - s.start for s in slices[:3])
+        while low < high:
+            middle = (low + high) // 2
+            if spatial(middle) * frames > max_voxels:
+                low = middle + 1
+            else:
+                high = middle
+        slices[:3] = [slice(s.start, s.stop, max(s.step, low)) for s in slices[:3]]
+        voxels = spatial(low)
+        if voxels * frames > max_voxels:
+            fitting = max_voxels // voxels
+            if fitting < 1:
+                raise NiftiError(f"max_voxels={max_voxels} is too small for any slab")
+            t = slices[3]
+            slices[3] = slice(t.start, t.stop, t.step * math.ceil(frames / fitting))
+    return slices
+
+
+def slab_header(header, slices, out_shape):
+    """Header for a slab: the source header with dims, pixdim and sform updated."""
+    endian = header["dtype"][0]
+    raw = bytearray(header["raw"]) + bytearray(VOX_OFFSET - HEADER_SIZE)
+    dims = [len(out_shape), *out_shape] + [1] * (7 - len(out_shape))
+    struct.pack_into(endian + "8h", raw, 40, *dims)
+    pixdim = list(struct.unpack_from(endian + "8f", raw, 76))
+    for axis in range(len(slices)):
+        pixdim[axis + 1] *= slices[axis].step
+    struct.pack_into(endian + "8f", raw, 76, *pixdim)
+    struct.pack_into(endian + "f", raw, 108, float(VOX_OFFSET))
+
+    # Voxel (i, j, k) of the slab is voxel start + step * (i, j, k) of the source
+    affine = header["affine"]
+    origin = [s.start for s in slices[:3]] + [1]
+    srow = []
+    for row in affine[:3]:
+        srow += [row[axis] * slices[axis].step for axis in range(3)]
+        srow.append(sum(row[axis] * origin[axis] for axis in range(4)))
+    struct.pack_into(endian + "2h", raw, 252, 0, 2)  # qform off, sform aligned
+    struct.pack_into(endian + "12f", raw, 280, *srow)
+    return bytes(raw)
+
+
+def read_slab(path, header, slices):
+    """Extract ``slices`` from ``path`` and return a standalone NIfTI-1 image."""
+    import numpy as np
+
+    volume = np.memmap(
+        path,
+        dtype=np.dtype(header["dtype"]),
+        mode="r",
+        offset=header["vox_offset"],
+        shape=tuple(header["shape"]),
+        order="F",
+    )
+    slab = volume[tuple(slices)]
+    if slab.ndim == 4 and slab.shape[3] == 1:
+        slab = slab[..., 0]
+    data = np.asfortranarray(slab)
+    return slab_header(header, slices, data.shape) + data.T.tobytes()
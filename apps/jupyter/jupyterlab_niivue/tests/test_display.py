@@ -0,0 +1,45 @@
+import pytest
+
+from jupyterlab_niivue.display import nifti_header, pack_volume
+from jupyterlab_niivue.slab import read_header
+
+np = pytest.importorskip("numpy")
+
+
+def roundtrip(tmp_path, header, voxels):
+    path = tmp_path / "image.nii"
+    path.write_bytes(header + bytes(voxels))
+    return read_header(str(path)), path.read_bytes()[len(header):]
+
+
+def test_pack_volume_sends_fortran_arrays_without_copying(tmp_path):
+    array = np.asfortranarray(np.arange(24, dtype=np.float32).reshape(2, 3, 4))
+    header, voxels = pack_volume(array, np.diag([2.0, 2.0, 2.0, 1.0]))
+    assert np.shares_memory(np.asarray(voxels), array)
+    parsed, data = roundtrip(tmp_path, header, voxels)
+    assert parsed["shape"] == [2, 3, 4] and parsed["dtype"] == "<f4"
+    assert parsed["affine"][0][0] == 2.0
+    assert np.array_equal(np.frombuffer(data, "<f4").reshape(2, 3, 4, order="F"), array)
+
+
+def test_pack_volume_reorders_c_arrays_x_fastest(tmp_path):
+    array = np.arange(24, dtype=np.int16).reshape(2, 3, 4)
+    header, voxels = pack_volume(array)
+    _, data = roundtrip(tmp_path, header, voxels)
+    assert np.array_equal(np.frombuffer(data, "<i2").reshape(2, 3, 4, order="F"), array)
+
+
+@pytest.mark.parametrize(
+    "dtype, expected",
+    [(np.bool_, "<u1"), (np.float16, "<f4"), (np.int64, "<i4"), (">f4", ">f4")],
+)
+def test_pack_volume_converts_dtypes_niivue_cannot_read(tmp_path, dtype, expected):
+    header, voxels = pack_volume(np.ones((2, 2, 2), dtype=dtype))
+    assert roundtrip(tmp_path, header, voxels)[0]["dtype"] == expected
+
+
+def test_pack_volume_rejects_unsupported_input():
+    with pytest.raises(ValueError, match="2D, 3D or 4D"):
+        pack_volume(np.zeros((2,) * 5))
+    with pytest.raises(ValueError, match="affine must be 4×4"):
+        nifti_header((2, 2, 2), np.dtype("<f4"), np.eye(3))
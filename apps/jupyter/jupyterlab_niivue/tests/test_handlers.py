@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+from tornado.httpclient import HTTPClientError
+
+from jupyter_server.utils import url_path_join
+from jupyterlab_niivue.handlers import StaticFileHandler, accepted_encodings, load_asset_manifest
+from jupyterlab_niivue.paired import ENVELOPE, PAIRED_MAGIC
+
+from .test_slab import write_nifti
+
+VOLUME = bytes(range(256)) * 64
+
+
+async def test_volume_gunzips_once_and_serves_ranges(jp_fetch, jp_root_dir, niivue_cache_dir):
+    (jp_root_dir / "scan.nii.gz").write_bytes(gzip.compress(VOLUME))
+    response = await jp_fetch("niivue", "volume", "scan.nii.gz", headers={"Range": "bytes=10-19"})
+    assert response.code == 206
+    assert response.body == VOLUME[10:20]
+    assert response.headers["X-Niivue-Decompressed"] == "1"
+    assert len(list(niivue_cache_dir.glob("*.raw"))) == 1
+
+    etag = response.headers["Etag"]
+    response = await jp_fetch(
+        "niivue", "volume", "scan.nii.gz", headers={"If-None-Match": etag}, raise_error=False
+    )
+    assert response.code == 304
+    assert len(list(niivue_cache_dir.glob("*.raw"))) == 1
+
+
+async def test_volume_serves_uncompressed_files_as_is(jp_fetch, jp_root_dir):
+    (jp_root_dir / "scan.nii").write_bytes(VOLUME)
+    response = await jp_fetch("niivue", "volume", "scan.nii")
+    assert response.body == VOLUME
+    assert "X-Niivue-Decompressed" not in response.headers
+
+
+async def test_volume_rejects_invalid_gzip(jp_fetch, jp_root_dir):
+    (jp_root_dir / "broken.nii.gz").write_bytes(b"not gzip at all")
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("niivue", "volume", "broken.nii.gz")
+    assert err.value.code == 415
+
+
+async def test_header_and_slab_endpoints(jp_fetch, jp_root_dir):
+    np = pytest.importorskip("numpy")
+    volume = np.zeros((8, 8, 8, 20), dtype=np.float32)
+    write_nifti(jp_root_dir / "run.nii", volume)
+    response = await jp_fetch("niivue", "header", "run.nii")
+    assert json.loads(response.body)["shape"] == [8, 8, 8, 20]
+
+    response = await jp_fetch("niivue", "slab", "run.nii", params={"t": ":", "max_voxels": "10"})
+    assert response.code == 200
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("niivue", "slab", "run.nii", params={"max_voxels": "-1"})
+    assert err.value.code == 400
+
+
+def parse_envelope(body):
+    magic, header_size, data_size = ENVELOPE.unpack_from(body)
+    assert magic == PAIRED_MAGIC
+    assert len(body) == ENVELOPE.size + header_size + data_size
+    header = body[ENVELOPE.size:ENVELOPE.size + header_size]
+    return header, body[ENVELOPE.size + header_size:]
+
+
+async def test_paired_serves_mhd_with_its_raw_file(jp_fetch, jp_root_dir):
+    mhd = b"NDims = 3\nElementDataFile = sphere.raw\n"
+    (jp_root_dir / "sphere.mhd").write_bytes(mhd)
+    (jp_root_dir / "sphere.raw").write_bytes(VOLUME)
+    response = await jp_fetch("niivue", "paired", "sphere.mhd")
+    assert parse_envelope(response.body) == (mhd, VOLUME)
+
+    response = await jp_fetch(
+        "niivue", "paired", "sphere.mhd",
+        headers={"If-None-Match": response.headers["Etag"]}, raise_error=False,
+    )
+    assert response.code == 304
+
+
+async def test_paired_serves_hdr_with_gzipped_img(jp_fetch, jp_root_dir, niivue_cache_dir):
+    (jp_root_dir / "brain.hdr").write_bytes(b"\x5c\x01\x00\x00" + bytes(344))
+    (jp_root_dir / "brain.img.gz").write_bytes(gzip.compress(VOLUME))
+    response = await jp_fetch("niivue", "paired", "brain.hdr")
+    header, data = parse_envelope(response.body)
+    assert len(header) == 348 and data == VOLUME
+
+    for cached in niivue_cache_dir.glob("*.raw"):
+        cached.unlink()
+    response = await jp_fetch(
+        "niivue", "paired", "brain.hdr",
+        headers={"If-None-Match": response.headers["Etag"]}, raise_error=False,
+    )
+    assert response.code == 304
+    assert list(niivue_cache_dir.glob("*.raw")) == []  # revalidated without gunzip
+
+
+async def test_paired_sends_local_mhd_without_data(jp_fetch, jp_root_dir):
+    mhd = b"NDims = 3\nElementDataFile = LOCAL\n"
+    (jp_root_dir / "local.mhd").write_bytes(mhd)
+    response = await jp_fetch("niivue", "paired", "local.mhd")
+    assert parse_envelope(response.body) == (mhd, b"")
+
+
+@pytest.mark.parametrize(
+    "element_data_file, code",
+    [("missing.raw", 404), ("../secret.raw", 403), ("LIST 2D", 415)],
+)
+async def test_paired_rejects_unservable_data_files(jp_fetch, jp_root_dir, element_data_file, code):
+    (jp_root_dir.parent / "secret.raw").write_bytes(b"secret")
+    (jp_root_dir / "bad.mhd").write_text(f"ElementDataFile = {element_data_file}\n")
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("niivue", "paired", "bad.mhd")
+    assert err.value.code == code
+
+
+async def test_volume_endpoints_stay_under_the_root(jp_fetch, jp_root_dir):
+    (jp_root_dir.parent / "secret.raw").write_bytes(b"secret")
+    for endpoint in ("header", "paired"):
+        with pytest.raises(HTTPClientError) as err:
+            await jp_fetch("niivue", endpoint, "..%2Fsecret.raw")
+        assert err.value.code in (403, 404)
+
+
+def test_accepted_encodings_honours_quality():
+    assert accepted_encodings("gzip, br;q=0, deflate;q=0.5") == {"gzip", "deflate"}
+    assert accepted_encodings("") == set()
+
+
+@pytest.fixture
+def static_assets(tmp_path, jp_web_app, jp_base_url):
+    """Labextension-like static directory served by ``StaticFileHandler``."""
+    static = tmp_path / "static"
+    static.mkdir()
+    script = b"console.log('niivue');\n" * 100
+    (static / "remoteEntry.js").write_bytes(script)
+    (static / "456.0123456789abcdef0123.js").write_bytes(script)
+    (static / "456.0123456789abcdef0123.js.gz").write_bytes(gzip.compress(script))
+    digest = hashlib.sha256(script).hexdigest()
+    (static / "asset-manifest.json").write_text(json.dumps({"files": {
+        "remoteEntry.js": {"sha256": digest, "size": len(script), "encodings": [], "immutable": False},
+        "456.0123456789abcdef0123.js": {
+            "sha256": digest, "size": len(script), "encodings": ["gzip"], "immutable": True,
+        },
+    }}))
+    jp_web_app.add_handlers(".*$", [(
+        url_path_join(jp_base_url, "niivue-test-static", r"(.*)"),
+        StaticFileHandler,
+        {"path": str(static), "manifest": load_asset_manifest(str(static))},
+    )])
+    return script, digest
+
+
+async def test_static_assets_negotiate_precompressed_siblings(jp_fetch, static_assets):
+    script, digest = static_assets
+    response = await jp_fetch(
+        "niivue-test-static", "456.0123456789abcdef0123.js",
+        headers={"Accept-Encoding": "br;q=0, gzip"}, decompress_response=False,
+    )
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["Etag"] == f'"{digest[:32]}-gzip"'
+    assert gzip.decompress(response.body) == script
+
+    response = await jp_fetch(
+        "niivue-test-static", "456.0123456789abcdef0123.js",
+        headers={"Accept-Encoding": "identity"}, decompress_response=False,
+    )
+    assert "Content-Encoding" not in response.headers
+    assert response.body == script
+
+
+async def test_static_assets_without_hash_are_revalidated(jp_fetch, static_assets):
+    script, digest = static_assets
+    response = await jp_fetch("niivue-test-static", "remoteEntry.js")
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["Content-Type"] == "application/javascript"
+    response = await jp_fetch(
+        "niivue-test-static", "remoteEntry.js",
+        headers={"If-None-Match": f'"{digest[:32]}"'}, raise_error=False,
+    )
+    assert response.code == 304
@@ -0,0 +1,61 @@
+import struct
+
+import pytest
+
+from jupyterlab_niivue.slab import NiftiError, plan_slab, read_header, read_slab
+
+
+def write_nifti(path, array):
+    """Minimal uncompressed NIfTI-1 image of a float32 array, 2 mm voxels."""
+    header = bytearray(352)
+    struct.pack_into("<i", header, 0, 348)
+    struct.pack_into("<8h", header, 40, array.ndim, *array.shape, *[1] * (7 - array.ndim))
+    struct.pack_into("<h", header, 70, 16)
+    struct.pack_into("<8f", header, 76, 1, 2, 2, 2, 1, 1, 1, 1)
+    struct.pack_into("<f", header, 108, 352.0)
+    struct.pack_into("<2h", header, 252, 0, 1)
+    struct.pack_into("<12f", header, 280, 2, 0, 0, -10, 0, 2, 0, -20, 0, 0, 2, -30)
+    header[344:348] = b"n+1\0"
+    path.write_bytes(bytes(header) + array.astype("<f4").tobytes(order="F"))
+    return str(path)
+
+
+def test_plan_slab_raises_spatial_step_until_it_fits():
+    slices = plan_slab({"shape": [64, 64, 64]}, max_voxels=32 ** 3)
+    assert [s.step for s in slices] == [2, 2, 2]
+
+
+def test_plan_slab_strides_frames_when_spatial_steps_are_exhausted():
+    slices = plan_slab({"shape": [64, 64, 64, 100]}, t=":", max_voxels=50)
+    assert [s.step for s in slices[:3]] == [64, 64, 64]
+    assert len(range(slices[3].start, slices[3].stop, slices[3].step)) <= 50
+
+
+def test_plan_slab_rejects_budgets_below_one_voxel():
+    with pytest.raises(NiftiError, match="too small"):
+        plan_slab({"shape": [8, 8, 8]}, max_voxels=-1)
+
+
+def test_plan_slab_parses_ranges():
+    x, y, z, t = plan_slab({"shape": [10, 10, 10, 5]}, x="2:8:2", z="-1", t="1:3")
+    assert (x, y, z, t) == (slice(2, 8, 2), slice(0, 10, 1), slice(9, 10, 1), slice(1, 3, 1))
+    with pytest.raises(NiftiError):
+        plan_slab({"shape": [10, 10, 10]}, x="5:2")
+
+
+def test_read_slab_extracts_subblock_with_shifted_affine(tmp_path):
+    np = pytest.importorskip("numpy")
+    volume = np.arange(4 * 6 * 8, dtype=np.float32).reshape(4, 6, 8)
+    path = write_nifti(tmp_path / "vol.nii", volume)
+    header = read_header(path)
+    assert header["shape"] == [4, 6, 8] and header["dtype"] == "<f4"
+
+    slices = plan_slab(header, x="1:4", y="::2")
+    out = tmp_path / "slab.nii"
+    out.write_bytes(read_slab(path, header, slices))
+    slab_header = read_header(str(out))
+    assert slab_header["shape"] == [3, 3, 8]
+    assert slab_header["affine"][0][3] == -10 + 2 * 1
+    assert slab_header["affine"][1][1] == 4
+    data = np.frombuffer(out.read_bytes()[352:], "<f4").reshape(3, 3, 8, order="F")
+    assert np.array_equal(data, volume[1:4, ::2])
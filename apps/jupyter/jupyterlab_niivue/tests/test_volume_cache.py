@@ -0,0 +1,61 @@
+import gzip
+import os
+
+import pytest
+
+from jupyterlab_niivue.volume_cache import DecompressedCache, source_key
+
+
+def write_gz(path, data):
+    path.write_bytes(gzip.compress(data))
+    return str(path)
+
+
+def test_cache_decompresses_once_per_source_version(tmp_path):
+    cache = DecompressedCache(tmp_path / "cache", max_bytes=1024 ** 2)
+    source = write_gz(tmp_path / "a.nii.gz", b"a" * 100)
+    first = cache.get(source)
+    assert open(first, "rb").read() == b"a" * 100
+    assert cache.get(source) == first
+
+    write_gz(tmp_path / "a.nii.gz", b"b" * 200)  # new size: new key
+    second = cache.get(source)
+    assert second != first and open(second, "rb").read() == b"b" * 200
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = DecompressedCache(tmp_path / "cache", max_bytes=250)
+    paths = [write_gz(tmp_path / f"{i}.nii.gz", bytes([i]) * 100) for i in range(3)]
+    cached = [cache.get(path) for path in paths[:2]]
+    for path in cached:
+        cache.release(path)
+    os.utime(cached[0], (0, 0))  # oldest
+    kept = cache.get(paths[2])
+    assert not os.path.exists(cached[0])
+    assert os.path.exists(cached[1]) and os.path.exists(kept)
+
+
+def test_cache_never_evicts_entries_in_use(tmp_path):
+    cache = DecompressedCache(tmp_path / "cache", max_bytes=150)
+    paths = [write_gz(tmp_path / f"{i}.nii.gz", bytes([i]) * 100) for i in range(3)]
+    in_use = cache.get(paths[0])
+    cache.get(paths[0])  # a second request for the same file
+    os.utime(in_use, (0, 0))  # oldest
+    cache.release(cache.get(paths[1]))
+    assert os.path.exists(in_use)
+    cache.release(in_use)
+    cache.evict()
+    assert os.path.exists(in_use)  # still held by the second request
+    cache.release(in_use)
+    cache.release(cache.get(paths[2]))
+    assert not os.path.exists(in_use)
+
+
+def test_cache_leaves_no_entry_for_invalid_gzip(tmp_path):
+    cache = DecompressedCache(tmp_path / "cache")
+    source = tmp_path / "broken.nii.gz"
+    source.write_bytes(b"not gzip")
+    with pytest.raises(gzip.BadGzipFile):
+        cache.get(str(source))
+    assert os.listdir(cache.directory) == []
+    assert len(source_key(str(source))) == 32
@@ -0,0 +1,149 @@
+"""On-disk cache of decompressed volumes for the volume endpoint.
+
+Opening a ``.nii.gz`` through ``/files`` downloads the compressed bytes and
+gunzips them in the browser on every open. ``DecompressedCache`` gunzips each
+file once into a cache directory instead, so the server can hand out the raw
+bytes (with Range and ETag support) and the browser can revalidate them with
+a 304. Entries are keyed on the source path, mtime and size, so editing or
+replacing a file yields a new entry; the least recently used entries are
+evicted once the cache exceeds its size budget. Paths handed out by ``get``
+are in use until the caller passes them to ``release``, and are never
+evicted before, so a request cannot lose its file between resolving and
+opening it.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """``$NIIVUE_CACHE_DIR``, else ``jupyterlab_niivue`` in the user cache dir."""
+    path = os.environ.get("NIIVUE_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "jupyterlab_niivue")
+
+
+def default_max_bytes():
+    """``$NIIVUE_CACHE_MAX_BYTES``, else 4 GiB."""
+    return int(os.environ.get("NIIVUE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+
+def is_gzip_path(path):
+    return path.lower().endswith(".gz")
+
+
+def source_key(path, stat=None):
+    """Strong validator for ``path``: a digest of its path, mtime and size."""
+    stat = stat or os.stat(path)
+    ident = f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+
+class DecompressedCache:
+    """Decompress gzip files once and keep the results under a size budget."""
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = os.path.abspath(directory or default_cache_dir())
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._in_use = {}  # path -> number of unreleased ``get`` calls
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + ".raw")
+
+    def get(self, path):
+        """Return the path of the decompressed copy of ``path``.
+
+        Blocking; call it from an executor. Concurrent requests for the same
+        file wait for a single decompression. The copy is kept until the
+        path is passed to ``release``.
+        """
+        key = source_key(path)
+        cached = self.path_for(key)
+        with self._lock:
+            event = self._pending.get(key)
+            if event is None:
+                if os.path.exists(cached):
+                    os.utime(cached)  # mark as recently used
+                    self._acquire(cached)
+                    return cached
+                event = self._pending[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            event.wait()
+            with self._lock:
+                if not os.path.exists(cached):
+                    raise OSError(f"Failed to decompress {path}")
+                self._acquire(cached)
+            return cached
+        try:
+            self._decompress(path, cached)
+            with self._lock:
+                self._acquire(cached)
+                self._evict()
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+        return cached
+
+    def _decompress(self, source, target):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, gzip.open(source, "rb") as src:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def release(self, cached):
+        """Let ``cached``, a path returned by ``get``, be evicted again."""
+        with self._lock:
+            count = self._in_use.get(cached, 0) - 1
+            if count > 0:
+                self._in_use[cached] = count
+            else:
+                self._in_use.pop(cached, None)
+
+    def _acquire(self, cached):
+        self._in_use[cached] = self._in_use.get(cached, 0) + 1
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its budget.
+
+        Entries in use (see ``release``) are skipped.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".raw") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in self._in_use:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
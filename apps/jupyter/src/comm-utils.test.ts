@@ -0,0 +1,72 @@
+import { describe, expect, it, vi } from 'vitest'
+import { IShowMessage, joinVolumeBuffers, KernelViewerRegistry } from './comm-utils'
+
+const message: IShowMessage = {
+  type: 'show',
+  volumes: [{ name: 'array.nii' }, { name: 'mask.nii', colormap: 'red', opacity: 0.4 }],
+}
+
+describe('joinVolumeBuffers', () => {
+  it('joins header and voxels of each volume', () => {
+    const voxels = new Uint8Array([9, 8, 7, 6])
+    const volumes = joinVolumeBuffers(message, [
+      new Uint8Array([1, 2]).buffer,
+      new DataView(voxels.buffer, 1, 2),
+      new Uint8Array([3]),
+      new Uint8Array([4, 5]),
+    ])
+    expect(Array.from(new Uint8Array(volumes[0].data))).toEqual([1, 2, 8, 7])
+    expect(Array.from(new Uint8Array(volumes[1].data))).toEqual([3, 4, 5])
+    expect(volumes[1]).toMatchObject({ name: 'mask.nii', colormap: 'red', opacity: 0.4 })
+  })
+
+  it('rejects a buffer count that does not match the volumes', () => {
+    expect(() => joinVolumeBuffers(message, [new ArrayBuffer(1)])).toThrow(/Expected 4 buffers/)
+  })
+})
+
+describe('KernelViewerRegistry', () => {
+  it('keeps the latest state and notifies subscribers', () => {
+    const registry = new KernelViewerRegistry()
+    const listener = vi.fn()
+    registry.open('c1')
+    expect(registry.has('c1')).toBe(true)
+    expect(registry.get('c1')).toBeNull()
+
+    const unsubscribe = registry.subscribe('c1', listener)
+    const state = { message, buffers: [] }
+    registry.update('c1', state)
+    expect(registry.get('c1')).toBe(state)
+    expect(listener).toHaveBeenCalledWith(state)
+
+    unsubscribe()
+    registry.update('c1', { message, buffers: [] })
+    expect(listener).toHaveBeenCalledTimes(1)
+  })
+
+  it('releases the data once the last subscriber leaves', () => {
+    const registry = new KernelViewerRegistry()
+    registry.open('c1')
+    registry.update('c1', { message, buffers: [] })
+    const first = registry.subscribe('c1', vi.fn())
+    const second = registry.subscribe('c1', vi.fn())
+    first()
+    expect(registry.get('c1')).not.toBeNull()
+    expect(registry.isReleased('c1')).toBe(false)
+
+    second()
+    expect(registry.isReleased('c1')).toBe(true)
+    expect(registry.get('c1')).toBeNull()
+    registry.update('c1', { message, buffers: [] })
+    expect(registry.get('c1')).toBeNull()
+  })
+
+  it('ignores updates of unknown or closed comms', () => {
+    const registry = new KernelViewerRegistry()
+    registry.update('c2', { message, buffers: [] })
+    expect(registry.has('c2')).toBe(false)
+    registry.open('c2')
+    registry.close('c2')
+    expect(registry.get('c2')).toBeNull()
+  })
+})
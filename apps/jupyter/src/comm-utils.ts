@@ -0,0 +1,124 @@
+/**
+ * Data handling for viewers driven from a notebook kernel
+ * (`jupyterlab_niivue.show`). The kernel sends each image as two comm
+ * buffers, a NIfTI-1 header and the voxels of the array, so that it never
+ * has to copy the array; here they are joined into standalone images.
+ */
+
+/** Comm target the kernel-side `Viewer` opens. */
+export const COMM_TARGET = 'jupyterlab_niivue'
+
+/** Output MIME type whose data names the comm of a kernel viewer. */
+export const NIIVUE_MIME_TYPE = 'application/vnd.niivue.viewer+json'
+
+export interface IKernelVolume {
+  name: string
+  colormap?: string
+  opacity?: number
+}
+
+/** Content of a `show` message; buffers hold a header and voxels per volume. */
+export interface IShowMessage {
+  type: 'show'
+  volumes: IKernelVolume[]
+}
+
+export interface IJoinedVolume extends IKernelVolume {
+  data: ArrayBuffer
+}
+
+function asBytes(buffer: ArrayBuffer | ArrayBufferView): Uint8Array {
+  return buffer instanceof ArrayBuffer
+    ? new Uint8Array(buffer)
+    : new Uint8Array(buffer.buffer, buffer.byteOffset, buffer.byteLength)
+}
+
+/** Join the header and voxel buffers of each volume into one NIfTI image. */
+export function joinVolumeBuffers(
+  message: IShowMessage,
+  buffers: ReadonlyArray<ArrayBuffer | ArrayBufferView>,
+): IJoinedVolume[] {
+  if (buffers.length !== 2 * message.volumes.length) {
+    throw new Error(
+      `Expected ${2 * message.volumes.length} buffers for ${message.volumes.length} volumes, got ${buffers.length}`,
+    )
+  }
+  return message.volumes.map((volume, i) => {
+    const header = asBytes(buffers[2 * i])
+    const voxels = asBytes(buffers[2 * i + 1])
+    const joined = new Uint8Array(header.byteLength + voxels.byteLength)
+    joined.set(header, 0)
+    joined.set(voxels, header.byteLength)
+    return { ...volume, data: joined.buffer }
+  })
+}
+
+export interface IKernelViewerState {
+  message: IShowMessage
+  buffers: ReadonlyArray<ArrayBuffer | ArrayBufferView>
+}
+
+/**
+ * Latest data of each kernel viewer, by comm id.
+ *
+ * The kernel opens the comm and sends data before its output is rendered,
+ * and sends more whenever the viewer is updated, so outputs look their
+ * viewer up here and subscribe to later updates. Once the last output of a
+ * viewer unsubscribes (its cell output was cleared or its notebook closed),
+ * the viewer's buffers are released and later updates are not kept, so
+ * repeated updates of large arrays do not pile up in the browser.
+ */
+export class KernelViewerRegistry {
+  private readonly _states = new Map<string, IKernelViewerState | null>()
+  private readonly _listeners = new Map<string, Set<(state: IKernelViewerState) => void>>()
+  private readonly _released = new Set<string>()
+
+  open(commId: string): void {
+    this._states.set(commId, null)
+  }
+
+  has(commId: string): boolean {
+    return this._states.has(commId)
+  }
+
+  get(commId: string): IKernelViewerState | null {
+    return this._states.get(commId) ?? null
+  }
+
+  /** Whether every output of `commId` is gone and its data was released. */
+  isReleased(commId: string): boolean {
+    return this._released.has(commId)
+  }
+
+  update(commId: string, state: IKernelViewerState): void {
+    if (!this._states.has(commId) || this._released.has(commId)) {
+      return
+    }
+    this._states.set(commId, state)
+    this._listeners.get(commId)?.forEach((listener) => listener(state))
+  }
+
+  /** Call `listener` on each update of `commId`; returns the unsubscribe function. */
+  subscribe(commId: string, listener: (state: IKernelViewerState) => void): () => void {
+    let listeners = this._listeners.get(commId)
+    if (!listeners) {
+      listeners = new Set()
+      this._listeners.set(commId, listeners)
+    }
+    listeners.add(listener)
+    return () => {
+      listeners.delete(listener)
+      if (listeners.size === 0 && this._states.has(commId)) {
+        this._states.set(commId, null)
+        this._released.add(commId)
+      }
+    }
+  }
+
+  /** Forget `commId` and release its data. */
+  close(commId: string): void {
+    this._states.delete(commId)
+    this._listeners.delete(commId)
+    this._released.delete(commId)
+  }
+}
@@ -1,7 +1,8 @@
-import { JupyterFrontEnd, JupyterFrontEndPlugin } from '@jupyterlab/application'
+import { ILabShell, JupyterFrontEnd, JupyterFrontEndPlugin } from '@jupyterlab/application'
 import { IDocumentManager } from '@jupyterlab/docmanager'
 import { IFileBrowserFactory } from '@jupyterlab/filebrowser'
 import { ITranslator, nullTranslator } from '@jupyterlab/translation'
+import { watchKernels } from './kernel'
 import { NiivueViewer } from './viewer'
 
 const FACTORY_NAME = 'Niivue Viewer'
@@ -12,16 +13,22 @@ const plugin: JupyterFrontEndPlugin<void> = {
   description: 'A JupyterLab extension for viewing NIfTI files with Niivue',
   autoStart: true,
   requires: [IDocumentManager, IFileBrowserFactory],
-  optional: [ITranslator],
+  optional: [ITranslator, ILabShell],
   activate: (
     app: JupyterFrontEnd,
     docManager: IDocumentManager,
     browserFactory: IFileBrowserFactory,
     translator: ITranslator | null,
+    labShell: ILabShell | null,
   ) => {
     console.log('JupyterLab extension jupyterlab-niivue is activated!')
     const trans = (translator ?? nullTranslator).load('jupyterlab')
 
+    // Accept viewers opened from notebook kernels (jupyterlab_niivue.show)
+    if (labShell) {
+      watchKernels(labShell)
+    }
+
     // All supported file types
     const fileTypes = [
       'nii',
@@ -34,6 +41,7 @@ const plugin: JupyterFrontEndPlugin<void> = {
       'nrrd',
       'mhd',
       'mha',
+      'hdr',
       'mgh',
       'mgz',
       'v',
@@ -175,6 +183,12 @@ const plugin: JupyterFrontEndPlugin<void> = {
         extensions: ['.mha'],
         mimeTypes: ['application/octet-stream'],
       },
+      {
+        name: 'hdr',
+        displayName: 'NIfTI/Analyze Header File',
+        extensions: ['.hdr'],
+        mimeTypes: ['application/octet-stream'],
+      },
       {
         name: 'mgh',
         displayName: 'MGH File',
@@ -0,0 +1,250 @@
+import { ILabShell } from '@jupyterlab/application'
+import { ISessionContext } from '@jupyterlab/apputils'
+import type { IRenderMime } from '@jupyterlab/rendermime-interfaces'
+import { Kernel } from '@jupyterlab/services'
+import { Widget } from '@lumino/widgets'
+import {
+  COMM_TARGET,
+  IKernelViewerState,
+  IShowMessage,
+  joinVolumeBuffers,
+  KernelViewerRegistry,
+  NIIVUE_MIME_TYPE,
+} from './comm-utils'
+import { getViewerHtml, VIEWER_SETTINGS } from './viewer'
+
+const DEFAULT_HEIGHT = 500
+
+// How long overlays wait for the base image to load
+const LOAD_TIMEOUT_MS = 60000
+
+/** Data of every kernel viewer open in this JupyterLab window. */
+export const kernelViewers = new KernelViewerRegistry()
+
+/** Accept the comms that kernel-side `Viewer`s open on `kernel`. */
+export function registerCommTarget(kernel: Kernel.IKernelConnection): void {
+  const commIds = new Set<string>()
+  kernel.registerCommTarget(COMM_TARGET, (comm) => {
+    commIds.add(comm.commId)
+    kernelViewers.open(comm.commId)
+    comm.onMsg = (msg) => {
+      const message = msg.content.data as unknown as IShowMessage
+      if (message.type === 'show') {
+        kernelViewers.update(comm.commId, { message, buffers: msg.buffers ?? [] })
+      }
+    }
+    comm.onClose = () => {
+      commIds.delete(comm.commId)
+      kernelViewers.close(comm.commId)
+    }
+  })
+  // A restarted kernel has lost its viewers; release their data
+  kernel.statusChanged.connect((_sender, status) => {
+    if (status === 'restarting' || status === 'autorestarting' || status === 'dead') {
+      commIds.forEach((commId) => kernelViewers.close(commId))
+      commIds.clear()
+    }
+  })
+}
+
+/**
+ * Register the comm target on the kernel of every notebook and console in
+ * the main area, now and as they open or change kernels.
+ */
+export function watchKernels(shell: ILabShell): void {
+  const seen = new WeakSet<Widget>()
+  const registered = new WeakSet<Kernel.IKernelConnection>()
+  const watch = () => {
+    for (const widget of shell.widgets('main')) {
+      const context = (widget as Widget & { sessionContext?: ISessionContext }).sessionContext
+      if (!context || seen.has(widget)) {
+        continue
+      }
+      seen.add(widget)
+      const register = () => {
+        const kernel = context.session?.kernel
+        if (kernel && !registered.has(kernel)) {
+          registered.add(kernel)
+          registerCommTarget(kernel)
+        }
+      }
+      context.kernelChanged.connect(register)
+      register()
+    }
+  }
+  shell.layoutModified.connect(watch)
+  watch()
+}
+
+function loadedCount(win: Window): number {
+  return (win as any).__niivue?.loadedCount ?? 0
+}
+
+/** Resolve once the viewer app in `win` has loaded more than `count` images. */
+function waitForLoad(win: Window, count: number): Promise<void> {
+  return new Promise((resolve, reject) => {
+    const start = Date.now()
+    const poll = () => {
+      if (loadedCount(win) > count) {
+        resolve()
+      } else if (Date.now() - start > LOAD_TIMEOUT_MS) {
+        reject(new Error('Timed out waiting for the image to load'))
+      } else {
+        setTimeout(poll, 50)
+      }
+    }
+    poll()
+  })
+}
+
+/**
+ * Output of `jupyterlab_niivue.show`: a viewer iframe fed from the kernel's
+ * comm. The first images load a fresh viewer app; later updates of the
+ * kernel viewer replace its volumes in place, keeping the view.
+ */
+export class KernelViewerOutput extends Widget implements IRenderMime.IRenderer {
+  private _iframe: HTMLIFrameElement
+  private _unsubscribe: (() => void) | null = null
+  private _loading: Promise<void> = Promise.resolve()
+  // Viewer app that has finished loading images, null until then
+  private _window: Window | null = null
+
+  constructor() {
+    super()
+    this.addClass('jp-NiivueKernelViewer')
+    this._iframe = document.createElement('iframe')
+    this._iframe.style.width = '100%'
+    this._iframe.style.height = '100%'
+    this._iframe.style.border = 'none'
+    // Any (re)load of the document starts an empty app
+    this._iframe.addEventListener('load', () => {
+      this._window = null
+    })
+    this.node.appendChild(this._iframe)
+  }
+
+  async renderModel(model: IRenderMime.IMimeModel): Promise<void> {
+    const { comm_id: commId, height } = model.data[NIIVUE_MIME_TYPE] as {
+      comm_id: string
+      height?: number
+    }
+    this.node.style.height = `${height ?? DEFAULT_HEIGHT}px`
+    // Subscribe before dropping the old subscription, so that re-rendering
+    // the same viewer does not release its data in between
+    const previous = this._unsubscribe
+    this._unsubscribe = null
+    if (!kernelViewers.has(commId) || kernelViewers.isReleased(commId)) {
+      previous?.()
+      this._showMessage(
+        'The data of this viewer is no longer available. Run the cell again to show it.',
+      )
+      return
+    }
+    if (!this._iframe.isConnected) {
+      this.node.replaceChildren(this._iframe)
+    }
+    this._unsubscribe = kernelViewers.subscribe(commId, (state) => this._queueLoad(state))
+    previous?.()
+    const state = kernelViewers.get(commId)
+    if (state) {
+      this._queueLoad(state)
+    }
+  }
+
+  private _queueLoad(state: IKernelViewerState): void {
+    this._loading = this._loading
+      .then(() => this._load(state))
+      .catch((error) => console.error('Failed to show kernel data in NiiVue:', error))
+  }
+
+  private async _load(state: IKernelViewerState): Promise<void> {
+    const volumes = joinVolumeBuffers(state.message, state.buffers)
+    // Transfer the joined buffers: the iframe gets them without a copy
+    if (this._window) {
+      const win = this._window
+      const loaded = loadedCount(win)
+      win.postMessage(
+        {
+          type: 'replaceVolumes',
+          body: {
+            index: 0,
+            volumes: volumes.map((volume) => ({
+              data: volume.data,
+              uri: volume.name,
+              colormap: volume.colormap,
+              opacity: volume.opacity,
+            })),
+          },
+        },
+        '*',
+        volumes.map((volume) => volume.data),
+      )
+      await waitForLoad(win, loaded)
+      return
+    }
+    const [base, ...overlays] = volumes
+    const win = await this._reloadViewer()
+    const loaded = loadedCount(win)
+    win.postMessage({ type: 'addImage', body: { data: base.data, uri: base.name } }, '*', [
+      base.data,
+    ])
+    await waitForLoad(win, loaded)
+    for (const overlay of overlays) {
+      win.postMessage(
+        {
+          type: 'overlay',
+          body: {
+            data: overlay.data,
+            uri: overlay.name,
+            colormap: overlay.colormap,
+            opacity: overlay.opacity,
+            index: 0,
+          },
+        },
+        '*',
+        [overlay.data],
+      )
+    }
+    // Later updates replace these volumes, so they must all be in first
+    await waitForLoad(win, loaded + overlays.length)
+    this._window = win
+  }
+
+  /** Load a fresh viewer app and resolve with its window once it listens. */
+  private _reloadViewer(): Promise<Window> {
+    return new Promise((resolve) => {
+      this._iframe.onload = () => {
+        const win = this._iframe.contentWindow
+        if (!win) {
+          return
+        }
+        // Same delays as NiivueWidget: the app registers its listeners after load
+        setTimeout(() => {
+          win.postMessage({ type: 'initSettings', body: VIEWER_SETTINGS }, '*')
+          setTimeout(() => resolve(win), 500)
+        }, 100)
+      }
+      this._iframe.srcdoc = getViewerHtml()
+    })
+  }
+
+  private _showMessage(message: string): void {
+    const div = document.createElement('div')
+    div.className = 'jp-NiivueWidget-error'
+    div.textContent = message
+    this.node.replaceChildren(div)
+  }
+
+  dispose(): void {
+    this._unsubscribe?.()
+    this._unsubscribe = null
+    super.dispose()
+  }
+}
+
+export const rendererFactory: IRenderMime.IRendererFactory = {
+  safe: true,
+  mimeTypes: [NIIVUE_MIME_TYPE],
+  defaultRank: 0,
+  createRenderer: () => new KernelViewerOutput(),
+}
@@ -0,0 +1,13 @@
+import type { IRenderMime } from '@jupyterlab/rendermime-interfaces'
+import { rendererFactory } from './kernel'
+
+/** Renders the outputs of `jupyterlab_niivue.show` in notebooks. */
+const extension: IRenderMime.IExtension = {
+  id: 'jupyterlab-niivue:kernel-viewer',
+  description: 'Renders NiiVue viewers opened from a notebook kernel',
+  rendererFactory,
+  rank: 0,
+  dataType: 'json',
+}
+
+export default extension
@@ -4,11 +4,21 @@ import { ServerConnection } from '@jupyterlab/services'
 import {
   fetchArrayBuffer,
   fetchJson,
+  fetchPairedVolume,
+  fetchVolume,
+  fetchVolumeHeader,
   getContentsUrl,
   getFileUrl,
+  getHdrPairedImgPaths,
   getJupyterUrl,
   getMhdPairedRawBasename,
   getMhdPairedRawPath,
+  getPairedUrl,
+  getSlabUrl,
+  getVolumeUrl,
+  isNiftiPath,
+  isPairedPath,
+  parsePairedEnvelope,
 } from './url-utils'
 
 describe('URL utilities', () => {
@@ -251,6 +261,7 @@ function mockResponse(opts: {
   body?: ArrayBuffer | string
   url?: string
   textThrows?: boolean
+  headers?: Record<string, string>
 }): Response {
   return {
     ok: opts.ok ?? true,
@@ -261,7 +272,7 @@ function mockResponse(opts: {
       get: (name: string) =>
         name.toLowerCase() === 'content-type'
           ? (opts.contentType ?? 'application/octet-stream')
-          : null,
+          : (opts.headers?.[name.toLowerCase()] ?? null),
     },
     arrayBuffer: async () =>
       typeof opts.body === 'string'
@@ -328,6 +339,157 @@ describe('fetchArrayBuffer', () => {
   })
 })
 
+describe('getVolumeUrl', () => {
+  it('constructs the volume endpoint URL with a JupyterHub prefix', () => {
+    expect(getVolumeUrl('http://hub/user/jd/', 'data/my brain.nii.gz')).toBe(
+      'http://hub/user/jd/niivue/volume/data/my%20brain.nii.gz',
+    )
+  })
+})
+
+describe('fetchVolume', () => {
+  const hubSettings = { baseUrl: 'http://hub/user/jd/' } as unknown as ServerConnection.ISettings
+
+  it('uses the volume endpoint and drops .gz when the server decompressed', async () => {
+    const spy = vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(
+      mockResponse({ body: 'raw', headers: { 'x-niivue-decompressed': '1' } }),
+    )
+    const result = await fetchVolume('data/brain.nii.gz', hubSettings)
+    expect(spy.mock.calls[0][0]).toBe('http://hub/user/jd/niivue/volume/data/brain.nii.gz')
+    expect(result.uri).toBe('data/brain.nii')
+    expect(new TextDecoder().decode(result.buffer)).toBe('raw')
+  })
+
+  it('keeps the name when the file was served as-is', async () => {
+    vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(mockResponse({ body: 'x' }))
+    expect((await fetchVolume('data/brain.nii.gz', hubSettings)).uri).toBe('data/brain.nii.gz')
+  })
+
+  it('falls back to /files when the endpoint is unavailable', async () => {
+    const spy = vi
+      .spyOn(ServerConnection, 'makeRequest')
+      .mockResolvedValueOnce(mockResponse({ ok: false, status: 404, statusText: 'Not Found' }))
+      .mockResolvedValueOnce(mockResponse({ body: 'gz' }))
+    const result = await fetchVolume('data/brain.nii.gz', hubSettings)
+    expect(spy.mock.calls[1][0]).toBe('http://hub/user/jd/files/data/brain.nii.gz')
+    expect(result.uri).toBe('data/brain.nii.gz')
+  })
+})
+
+describe('isNiftiPath', () => {
+  it('matches .nii and .nii.gz case-insensitively', () => {
+    expect(isNiftiPath('a/brain.nii')).toBe(true)
+    expect(isNiftiPath('a/BRAIN.NII.GZ')).toBe(true)
+    expect(isNiftiPath('a/brain.mgz')).toBe(false)
+    expect(isNiftiPath('a/brain.nii.bak')).toBe(false)
+  })
+})
+
+describe('getSlabUrl', () => {
+  it('appends the query to the slab endpoint URL', () => {
+    expect(getSlabUrl('http://hub/user/jd/', 'data/big brain.nii', { x: '0:64', max_voxels: 100 })).toBe(
+      'http://hub/user/jd/niivue/slab/data/big%20brain.nii?x=0%3A64&max_voxels=100',
+    )
+  })
+
+  it('omits the query string when there are no parameters', () => {
+    expect(getSlabUrl('http://hub/', 'a.nii')).toBe('http://hub/niivue/slab/a.nii')
+  })
+})
+
+describe('fetchVolumeHeader', () => {
+  const hubSettings = { baseUrl: 'http://hub/user/jd/' } as unknown as ServerConnection.ISettings
+
+  it('returns the header from the header endpoint', async () => {
+    const spy = vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(
+      mockResponse({ body: '{"shape": [2, 3, 4], "nbytes": 24}', contentType: 'application/json' }),
+    )
+    const header = await fetchVolumeHeader('data/brain.nii', hubSettings)
+    expect(spy.mock.calls[0][0]).toBe('http://hub/user/jd/niivue/header/data/brain.nii')
+    expect(header?.shape).toEqual([2, 3, 4])
+  })
+
+  it('returns null when the endpoint fails', async () => {
+    vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(
+      mockResponse({ ok: false, status: 415, statusText: 'Unsupported Media Type' }),
+    )
+    expect(await fetchVolumeHeader('data/brain.nii', hubSettings)).toBeNull()
+  })
+})
+
+function pairedEnvelope(header: string, data: number[]): ArrayBuffer {
+  const headerBytes = new TextEncoder().encode(header)
+  const bytes = new Uint8Array(24 + headerBytes.length + data.length)
+  bytes.set(new TextEncoder().encode('NVPAIR01'), 0)
+  const view = new DataView(bytes.buffer)
+  view.setUint32(8, headerBytes.length, true)
+  view.setUint32(16, data.length, true)
+  bytes.set(headerBytes, 24)
+  bytes.set(data, 24 + headerBytes.length)
+  return bytes.buffer
+}
+
+describe('isPairedPath', () => {
+  it('matches detached headers case-insensitively', () => {
+    expect(isPairedPath('a/image.mhd')).toBe(true)
+    expect(isPairedPath('a/IMAGE.HDR')).toBe(true)
+    expect(isPairedPath('a/image.hdr.gz')).toBe(true)
+    expect(isPairedPath('a/image.nhdr')).toBe(false)
+    expect(isPairedPath('a/image.mha')).toBe(false)
+  })
+})
+
+describe('getPairedUrl', () => {
+  it('constructs the paired endpoint URL', () => {
+    expect(getPairedUrl('http://hub/user/jd/', 'data/my scan.mhd')).toBe(
+      'http://hub/user/jd/niivue/paired/data/my%20scan.mhd',
+    )
+  })
+})
+
+describe('parsePairedEnvelope', () => {
+  it('splits header and data', () => {
+    const { header, data } = parsePairedEnvelope(pairedEnvelope('NDims = 3', [1, 2, 3]))
+    expect(new TextDecoder().decode(header)).toBe('NDims = 3')
+    expect(Array.from(new Uint8Array(data!))).toEqual([1, 2, 3])
+  })
+
+  it('returns null data for a header that holds its own data', () => {
+    expect(parsePairedEnvelope(pairedEnvelope('ElementDataFile = LOCAL', [])).data).toBeNull()
+  })
+
+  it('rejects other and truncated responses', () => {
+    expect(() => parsePairedEnvelope(new TextEncoder().encode('<html>').buffer)).toThrow(
+      /Not a paired volume response/,
+    )
+    const truncated = pairedEnvelope('h', [1, 2, 3]).slice(0, 26)
+    expect(() => parsePairedEnvelope(truncated)).toThrow(/Truncated/)
+  })
+})
+
+describe('fetchPairedVolume', () => {
+  const hubSettings = { baseUrl: 'http://hub/user/jd/' } as unknown as ServerConnection.ISettings
+
+  it('returns header and paired data from one request', async () => {
+    const spy = vi
+      .spyOn(ServerConnection, 'makeRequest')
+      .mockResolvedValue(mockResponse({ body: pairedEnvelope('hdr', [7, 8]) }))
+    const result = await fetchPairedVolume('data/scan.mhd', hubSettings)
+    expect(spy).toHaveBeenCalledTimes(1)
+    expect(spy.mock.calls[0][0]).toBe('http://hub/user/jd/niivue/paired/data/scan.mhd')
+    expect(result?.uri).toBe('data/scan.mhd')
+    expect(new TextDecoder().decode(result!.buffer)).toBe('hdr')
+    expect(Array.from(new Uint8Array(result!.pairedData!))).toEqual([7, 8])
+  })
+
+  it('returns null when the endpoint fails', async () => {
+    vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(
+      mockResponse({ ok: false, status: 404, statusText: 'Not Found' }),
+    )
+    expect(await fetchPairedVolume('data/scan.mhd', hubSettings)).toBeNull()
+  })
+})
+
 describe('fetchJson', () => {
   it('returns the parsed JSON on a successful response', async () => {
     vi.spyOn(ServerConnection, 'makeRequest').mockResolvedValue(
@@ -351,3 +513,17 @@ describe('fetchJson', () => {
     expect(result.n).toBe(42)
   })
 })
+
+describe('getHdrPairedImgPaths', () => {
+  it('lists the sibling .img spellings the paired endpoint tries', () => {
+    expect(getHdrPairedImgPaths('data/brain.hdr')).toEqual([
+      'data/brain.img',
+      'data/brain.IMG',
+      'data/brain.img.gz',
+    ])
+  })
+
+  it('strips a gzipped header extension', () => {
+    expect(getHdrPairedImgPaths('brain.HDR.gz')[0]).toBe('brain.img')
+  })
+})
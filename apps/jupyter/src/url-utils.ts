@@ -25,6 +25,189 @@ export function getContentsUrl(baseUrl: string, path: string): string {
   return URLExt.join(baseUrl, 'api/contents', URLExt.encodeParts(path))
 }
 
+/**
+ * Constructs a URL on the server extension's volume endpoint, which serves
+ * files from the server root with Range/ETag support and gunzips `.gz` files
+ * once into a server-side cache.
+ */
+export function getVolumeUrl(baseUrl: string, filePath: string): string {
+  return URLExt.join(baseUrl, 'niivue/volume', URLExt.encodeParts(filePath))
+}
+
+export interface IVolumeData {
+  buffer: ArrayBuffer
+  /** Name to hand to niivue; drops `.gz` when the server already gunzipped the file. */
+  uri: string
+}
+
+/**
+ * Fetches a volume through the volume endpoint, falling back to `/files` when
+ * the endpoint is unavailable (server extension not enabled, or any other
+ * failure, which `/files` then reports). Reopening a file is then a 304
+ * revalidation instead of a full download plus gunzip in the browser.
+ */
+export async function fetchVolume(
+  filePath: string,
+  serverSettings: ServerConnection.ISettings,
+): Promise<IVolumeData> {
+  try {
+    const response = await ServerConnection.makeRequest(
+      getVolumeUrl(serverSettings.baseUrl, filePath),
+      { method: 'GET' },
+      serverSettings,
+    )
+    const contentType = response.headers.get('content-type') ?? ''
+    if (response.ok && !contentType.includes('text/html')) {
+      const decompressed = response.headers.get('x-niivue-decompressed') === '1'
+      return {
+        buffer: await response.arrayBuffer(),
+        uri: decompressed ? filePath.replace(/\.gz$/i, '') : filePath,
+      }
+    }
+  } catch (error) {
+    console.warn(`Volume endpoint unavailable for ${filePath}, using /files:`, error)
+  }
+  const buffer = await fetchArrayBuffer(getFileUrl(serverSettings.baseUrl, filePath), serverSettings)
+  return { buffer, uri: filePath }
+}
+
+/** Header summary returned by the server extension's `niivue/header` endpoint. */
+export interface IVolumeHeader {
+  shape: number[]
+  dtype: string
+  affine: number[][]
+  /** Size of the voxel data in bytes */
+  nbytes: number
+  /** Voxel budget the server suggests for an overview slab */
+  max_voxels: number
+}
+
+/**
+ * Volumes whose voxel data exceed this size are not downloaded whole; the
+ * viewer loads a strided overview slab instead.
+ */
+export const MAX_BROWSER_VOLUME_BYTES = 1024 ** 3
+
+export function isNiftiPath(filePath: string): boolean {
+  return /\.nii(\.gz)?$/i.test(filePath)
+}
+
+/**
+ * Constructs a URL on the slab endpoint. `query` takes `x`, `y`, `z`, `t`
+ * ranges (`start:stop[:step]` or an index) and `max_voxels`.
+ */
+export function getSlabUrl(
+  baseUrl: string,
+  filePath: string,
+  query: Record<string, string | number> = {},
+): string {
+  const url = URLExt.join(baseUrl, 'niivue/slab', URLExt.encodeParts(filePath))
+  const params = new URLSearchParams(
+    Object.entries(query).map(([key, value]) => [key, String(value)]),
+  ).toString()
+  return params ? `${url}?${params}` : url
+}
+
+/**
+ * Fetches the header summary of a NIfTI volume, or null when the server
+ * extension is unavailable or cannot parse the file.
+ */
+export async function fetchVolumeHeader(
+  filePath: string,
+  serverSettings: ServerConnection.ISettings,
+): Promise<IVolumeHeader | null> {
+  try {
+    return await fetchJson<IVolumeHeader>(
+      URLExt.join(serverSettings.baseUrl, 'niivue/header', URLExt.encodeParts(filePath)),
+      serverSettings,
+    )
+  } catch {
+    return null
+  }
+}
+
+/** Magic bytes that open a response of the paired endpoint. */
+export const PAIRED_MAGIC = 'NVPAIR01'
+
+// Magic, header size and data size (uint64, little-endian)
+const PAIRED_PREFIX_BYTES = 24
+
+/** True for detached-header formats the paired endpoint serves (.mhd, .hdr). */
+export function isPairedPath(filePath: string): boolean {
+  return /\.(mhd|hdr)(\.gz)?$/i.test(filePath)
+}
+
+/**
+ * Constructs a URL on the paired endpoint, which returns a detached header
+ * together with the data file it refers to.
+ */
+export function getPairedUrl(baseUrl: string, filePath: string): string {
+  return URLExt.join(baseUrl, 'niivue/paired', URLExt.encodeParts(filePath))
+}
+
+export interface IPairedVolume extends IVolumeData {
+  /** Voxels of the separate data file, or null when the header holds them. */
+  pairedData: ArrayBuffer | null
+}
+
+/** Split a paired endpoint response into header and data. */
+export function parsePairedEnvelope(buffer: ArrayBuffer): {
+  header: ArrayBuffer
+  data: ArrayBuffer | null
+} {
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, Math.min(8, buffer.byteLength)))
+  if (buffer.byteLength < PAIRED_PREFIX_BYTES || magic !== PAIRED_MAGIC) {
+    throw new Error('Not a paired volume response')
+  }
+  const view = new DataView(buffer)
+  // uint64 as two uint32 halves (BigInt is not in the ES2018 lib)
+  const readSize = (offset: number) =>
+    view.getUint32(offset, true) + view.getUint32(offset + 4, true) * 2 ** 32
+  const headerSize = readSize(8)
+  const dataSize = readSize(16)
+  const dataStart = PAIRED_PREFIX_BYTES + headerSize
+  if (dataStart + dataSize !== buffer.byteLength) {
+    throw new Error(
+      `Truncated paired volume response: expected ${dataStart + dataSize} bytes, got ${buffer.byteLength}`,
+    )
+  }
+  return {
+    header: buffer.slice(PAIRED_PREFIX_BYTES, dataStart),
+    data: dataSize > 0 ? buffer.slice(dataStart) : null,
+  }
+}
+
+/**
+ * Fetches a detached header and its data file in one request through the
+ * paired endpoint. Returns null when the endpoint is unavailable or cannot
+ * serve the file, so the caller can fall back to fetching the two files.
+ */
+export async function fetchPairedVolume(
+  filePath: string,
+  serverSettings: ServerConnection.ISettings,
+): Promise<IPairedVolume | null> {
+  try {
+    const response = await ServerConnection.makeRequest(
+      getPairedUrl(serverSettings.baseUrl, filePath),
+      { method: 'GET' },
+      serverSettings,
+    )
+    if (!response.ok) {
+      return null
+    }
+    const { header, data } = parsePairedEnvelope(await response.arrayBuffer())
+    const decompressed = response.headers.get('x-niivue-decompressed') === '1'
+    return {
+      buffer: header,
+      uri: decompressed ? filePath.replace(/\.gz$/i, '') : filePath,
+      pairedData: data,
+    }
+  } catch (error) {
+    console.warn(`Paired endpoint unavailable for ${filePath}:`, error)
+    return null
+  }
+}
+
 /**
  * Fetches an ArrayBuffer from the given URL using ServerConnection.
  * Handles authentication and provides detailed error messages.
@@ -94,6 +277,16 @@ export function getMhdPairedRawPath(mhdPath: string, rawBasename: string): strin
   return `${dir}${rawBasename}`
 }
 
+/**
+ * Given the JupyterLab path of an Analyze/NIfTI .hdr file, returns the
+ * sibling paths its .img data file may have, in the order the paired
+ * endpoint tries them.
+ */
+export function getHdrPairedImgPaths(hdrPath: string): string[] {
+  const stem = hdrPath.replace(/\.hdr(\.gz)?$/i, '')
+  return ['.img', '.IMG', '.img.gz'].map(ext => `${stem}${ext}`)
+}
+
 /**
  * Fetches JSON from the given URL using ServerConnection.
  * Handles authentication and provides detailed error messages.
@@ -6,13 +6,70 @@ import { Widget } from '@lumino/widgets'
 import {
   fetchArrayBuffer,
   fetchJson,
+  fetchPairedVolume,
+  fetchVolume,
+  fetchVolumeHeader,
   getContentsUrl,
   getFileUrl,
+  getHdrPairedImgPaths,
   getJupyterUrl,
   getMhdPairedRawBasename,
   getMhdPairedRawPath,
+  getSlabUrl,
+  isNiftiPath,
+  isPairedPath,
+  MAX_BROWSER_VOLUME_BYTES,
 } from './url-utils'
 
+/** Settings sent to the viewer app with `initSettings`. */
+export const VIEWER_SETTINGS = {
+  showCrosshairs: true,
+  interpolation: true,
+  colorbar: false,
+  radiologicalConvention: false,
+  zoomDragMode: false,
+  defaultVolumeColormap: 'gray',
+  defaultOverlayColormap: 'redyell',
+}
+
+/** Document of the viewer iframe, which loads the niivue app bundle. */
+export function getViewerHtml(): string {
+  // Use the static file handler we set up in handlers.py
+  const scriptPath = getJupyterUrl('lab/extensions/@niivue/jupyter/static/niivue/index.js')
+  const cssPath = getJupyterUrl('lab/extensions/@niivue/jupyter/static/niivue/index.css')
+
+  return `<!doctype html>
+        <html lang="en">
+          <head>
+            <meta charset="utf-8" />
+            <style>
+              /* Embed critical CSS to avoid loading issues */
+              body { margin: 0; padding: 0; background: #1a1a1a; color: white; font-family: system-ui, sans-serif; }
+              #app { width: 100vw; height: 100vh; }
+              .loading { display: flex; justify-content: center; align-items: center; height: 100vh; }
+              .error { display: flex; flex-direction: column; justify-content: center; align-items: center; height: 100vh; color: #ff6b6b; }
+            </style>
+            <link rel="stylesheet" crossorigin href="${cssPath}">
+          </head>
+          <body class="text-white p-0">
+            <div id="app" class="w-screen h-screen">
+              <div class="loading">Loading NIfTI viewer...</div>
+            </div>
+            <script>
+              // Mock vscode API for Jupyter environment
+              window.vscode = {
+                postMessage: function(message) {
+                  window.parent.postMessage(message, '*');
+                }
+              };
+            </script>
+            <script type="module" crossorigin src="${scriptPath}"
+                    onerror="document.getElementById('app').innerHTML = '<div class=\\"error\\"><h3>Failed to load NIfTI viewer</h3><p>Could not load the required JavaScript files</p></div>';">
+            </script>
+          </body>
+        </html>`
+}
+
 export class NiivueWidget extends Widget {
   private _context: DocumentRegistry.IContext<DocumentRegistry.IModel>
   protected _iframe: HTMLIFrameElement
@@ -47,7 +104,7 @@ export class NiivueWidget extends Widget {
       const filePath = this._context.path
       console.log('Initializing this.onResize Niivue viewer for file:', filePath)
 
-      const html = this._getHtmlForViewer()
+      const html = getViewerHtml()
 
       // Write HTML to iframe
       this._iframe.srcdoc = html
@@ -78,60 +135,13 @@ export class NiivueWidget extends Widget {
     }
   }
 
-  private _getHtmlForViewer(): string {
-    // Use the static file handler we set up in handlers.py
-    const scriptPath = getJupyterUrl('lab/extensions/@niivue/jupyter/static/niivue/index.js')
-    const cssPath = getJupyterUrl('lab/extensions/@niivue/jupyter/static/niivue/index.css')
-
-    return `<!doctype html>
-          <html lang="en">
-            <head>
-              <meta charset="utf-8" />
-              <style>
-                /* Embed critical CSS to avoid loading issues */
-                body { margin: 0; padding: 0; background: #1a1a1a; color: white; font-family: system-ui, sans-serif; }
-                #app { width: 100vw; height: 100vh; }
-                .loading { display: flex; justify-content: center; align-items: center; height: 100vh; }
-                .error { display: flex; flex-direction: column; justify-content: center; align-items: center; height: 100vh; color: #ff6b6b; }
-              </style>
-              <link rel="stylesheet" crossorigin href="${cssPath}">
-            </head>
-            <body class="text-white p-0">
-              <div id="app" class="w-screen h-screen">
-                <div class="loading">Loading NIfTI viewer...</div>
-              </div>
-              <script>
-                // Mock vscode API for Jupyter environment
-                window.vscode = {
-                  postMessage: function(message) {
-                    window.parent.postMessage(message, '*');
-                  }
-                };
-              </script>
-              <script type="module" crossorigin src="${scriptPath}"
-                      onerror="document.getElementById('app').innerHTML = '<div class=\\"error\\"><h3>Failed to load NIfTI viewer</h3><p>Could not load the required JavaScript files</p></div>';">
-              </script>
-            </body>
-          </html>`
-  }
-
   protected _sendInitSettings(): void {
     if (this._iframe.contentWindow) {
-      const defaultSettings = {
-        showCrosshairs: true,
-        interpolation: true,
-        colorbar: false,
-        radiologicalConvention: false,
-        zoomDragMode: false,
-        defaultVolumeColormap: 'gray',
-        defaultOverlayColormap: 'redyell',
-      }
-
-      console.log('Sending init settings:', defaultSettings)
+      console.log('Sending init settings:', VIEWER_SETTINGS)
       this._iframe.contentWindow.postMessage(
         {
           type: 'initSettings',
-          body: defaultSettings,
+          body: VIEWER_SETTINGS,
         },
         '*',
       )
@@ -154,14 +164,42 @@ export class NiivueWidget extends Widget {
   }
 
   /**
-   * Fetch a file's bytes for an addImage/overlay message. For .mhd files,
-   * also resolve and fetch the paired raw file referenced by ElementDataFile
-   * and include its bytes as `pairedData`.
+   * Fetch a file's bytes for an addImage/overlay message. Detached headers
+   * (.mhd, .hdr) come with the bytes of their data file as `pairedData`,
+   * in a single request to the paired endpoint; without the server
+   * extension, .mhd files resolve and fetch the raw file referenced by
+   * ElementDataFile themselves.
    */
   protected async _buildImageBody(filePath: string): Promise<Record<string, unknown>> {
-    const fileUrl = getFileUrl(this._serverSettings.baseUrl, filePath)
-    const buffer = await fetchArrayBuffer(fileUrl, this._serverSettings)
-    const body: Record<string, unknown> = { data: buffer, uri: filePath }
+    if (isNiftiPath(filePath)) {
+      const header = await fetchVolumeHeader(filePath, this._serverSettings)
+      if (header && header.nbytes > MAX_BROWSER_VOLUME_BYTES) {
+        // Too large for the tab: load a strided overview of the first frame,
+        // read server-side from a memory map.
+        console.warn(
+          `${filePath} has ${header.nbytes} bytes of voxel data; loading an overview slab`,
+        )
+        const slabUrl = getSlabUrl(this._serverSettings.baseUrl, filePath, {
+          max_voxels: header.max_voxels,
+        })
+        return {
+          data: await fetchArrayBuffer(slabUrl, this._serverSettings),
+          uri: filePath.replace(/\.nii(\.gz)?$/i, '_overview.nii'),
+        }
+      }
+    }
+    if (isPairedPath(filePath)) {
+      const paired = await fetchPairedVolume(filePath, this._serverSettings)
+      if (paired) {
+        const body: Record<string, unknown> = { data: paired.buffer, uri: paired.uri }
+        if (paired.pairedData) {
+          body.pairedData = paired.pairedData
+        }
+        return body
+      }
+    }
+    const { buffer, uri } = await fetchVolume(filePath, this._serverSettings)
+    const body: Record<string, unknown> = { data: buffer, uri }
 
     if (filePath.toLowerCase().endsWith('.mhd')) {
       const rawBasename = getMhdPairedRawBasename(buffer)
@@ -179,6 +217,22 @@ export class NiivueWidget extends Widget {
             'MHD is a detached format and requires its referenced voxel file.'
         }
       }
+    } else if (/\.hdr(\.gz)?$/i.test(filePath)) {
+      const imgPaths = getHdrPairedImgPaths(filePath)
+      for (const imgPath of imgPaths) {
+        try {
+          body.pairedData = (await fetchVolume(imgPath, this._serverSettings)).buffer
+          break
+        } catch {
+          // Try the next spelling of the data file
+        }
+      }
+      if (!body.pairedData) {
+        console.warn(`Failed to fetch paired data file of ${filePath}`)
+        body.loadError =
+          `Missing paired data file ${imgPaths[0]}. ` +
+          'HDR is a detached format and requires its .img voxel file.'
+      }
     }
     return body
   }
@@ -239,6 +293,7 @@ export class NiivueWidget extends Widget {
               name.endsWith('.mgz') ||
               name.endsWith('.mha') ||
               name.endsWith('.mhd') ||
+              name.endsWith('.hdr') ||
               name.endsWith('.nrrd') ||
               name.endsWith('.nhdr') ||
               name.endsWith('.mnc') ||
@@ -326,6 +381,7 @@ export class NiivueWidget extends Widget {
               name.endsWith('.mgz') ||
               name.endsWith('.mha') ||
               name.endsWith('.mhd') ||
+              name.endsWith('.hdr') ||
               name.endsWith('.nrrd') ||
               name.endsWith('.nhdr') ||
               name.endsWith('.mnc') ||
@@ -7,19 +7,12 @@ st.set_page_config(layout="wide", page_title="NiiVue — Advanced")
 
 st.title("🧠 NiiVue Advanced Showcase")
 
-@st.cache_data
-def load_nifti(path: str) -> bytes:
-    return Path(path).read_bytes()
-
-
 # Load bundled example image
 data_path = Path(__file__).parent / "tests" / "assets" / "lesion.nii.gz"
 if not data_path.exists():
     st.error(f"Required file {data_path.name} not found.")
     st.stop()
 
-image_data = load_nifti(str(data_path))
-
 # Sidebar for configuration
 with st.sidebar:
     st.header("⚙️ Configuration")
@@ -49,8 +42,7 @@ settings = {
 
 # Render the viewer in styled mode
 niivue_viewer(
-    nifti_data=image_data,
-    filename=data_path.name,
+    nifti_data=data_path,  # memory-mapped, not read into memory
     height=height,
     view_mode=view_mode,
     styled=True,
@@ -0,0 +1,43 @@
+"""Grid Example — Many volumes in one component for quality control."""
+import streamlit as st
+from niivue_component import niivue_grid, niivue_viewer
+from pathlib import Path
+
+st.set_page_config(layout="wide", page_title="NiiVue — Grid")
+st.title("🧠 NiiVue Grid Example")
+st.caption(
+    "All cells share one iframe and one WebGL context and load as they scroll "
+    "into view. Click a cell to open it in a full viewer."
+)
+
+
+@st.cache_data
+def load_bytes(path: str) -> bytes:
+    return Path(path).read_bytes()
+
+
+assets = sorted((Path(__file__).parent / "tests" / "assets").glob("*.nii.gz"))
+if not assets:
+    st.error("No example images found in tests/assets.")
+    st.stop()
+
+copies = st.slider("Copies of each example image", 1, 100, 20)
+columns = st.slider("Columns", 2, 10, 6)
+
+# Repeating the same bytes objects costs nothing extra: each distinct
+# payload is registered with the media server once.
+volumes = [
+    {"data": load_bytes(str(path)), "name": path.name, "label": f"{path.name} #{i}"}
+    for i in range(copies)
+    for path in assets
+]
+clicked = niivue_grid(volumes, columns=columns, cell_height=180, height=700, key="grid")
+
+if clicked:
+    st.subheader(clicked["label"])
+    niivue_viewer(
+        nifti_data=volumes[clicked["index"]]["data"],
+        filename=clicked["name"],
+        update_interval_ms=None,
+        key="selected",
+    )
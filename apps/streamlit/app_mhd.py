@@ -16,17 +16,15 @@ for p in (mhd_path, raw_path):
         st.error(f"Required file {p} not found.")
         st.stop()
 
-mhd_bytes = mhd_path.read_bytes()
-raw_bytes = raw_path.read_bytes()
 st.info(
-    f"Loaded {mhd_path.name} ({len(mhd_bytes)} bytes) + "
-    f"{raw_path.name} ({len(raw_bytes)/1024:.0f} kB)"
+    f"Mapping {mhd_path.name} ({mhd_path.stat().st_size} bytes) + "
+    f"{raw_path.name} ({raw_path.stat().st_size/1024:.0f} kB)"
 )
 
+# Paths are memory-mapped rather than read into memory
 niivue_viewer(
-    nifti_data=mhd_bytes,
-    paired_data=raw_bytes,
-    filename=mhd_path.name,
+    nifti_data=mhd_path,
+    paired_data=raw_path,
     height=600,
     view_mode="multiplanar",
     key="mhd",
@@ -19,19 +19,10 @@ if not overlay_path.exists():
     st.error(f"Required file {overlay_path.name} not found.")
     st.stop()
 
-@st.cache_data
-def load_bytes(path: str) -> bytes:
-    return Path(path).read_bytes()
-
-
-background_data = load_bytes(str(background_path))
-overlay_data = load_bytes(str(overlay_path))
-
-# Define overlays
+# Define overlays; paths are memory-mapped, and named after the file
 overlays = [
     {
-        "data": overlay_data,
-        "name": overlay_path.name,
+        "data": overlay_path,
         "colormap": "red",
         "opacity": 0.4
     }
@@ -41,8 +32,7 @@ col1, col2 = st.columns([4, 1])
 
 with col1:
     niivue_viewer(
-        nifti_data=background_data,
-        filename="pcasl.nii.gz",
+        nifti_data=background_path,
         overlays=overlays,
         height=700,
         styled=True,
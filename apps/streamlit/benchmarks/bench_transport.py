@@ -0,0 +1,108 @@
+"""Benchmark: binary vs base64 transport for a 256³ float32 volume.
+
+Runs the real ``niivue_viewer`` argument path (validation, packing and
+Streamlit's component-arg marshalling) outside a Streamlit server and
+reports, per transport:
+
+- prepare: Python time from ``niivue_viewer(...)`` call to marshalled args
+- wire: bytes that reach the websocket for the payload
+- decode: time to turn the payload back into bytes on the receiving side
+  (for base64 this is a lower bound; the browser's ``atob`` + per-character
+  copy loop is several times slower than CPython's decoder)
+
+Usage::
+
+    python benchmarks/bench_transport.py [--size 256] [--repeat 3]
+"""
+import argparse
+import base64
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from streamlit import logger  # noqa: E402
+from streamlit.components.v1 import custom_component  # noqa: E402
+
+import niivue_component  # noqa: E402
+from niivue_component import niivue_viewer  # noqa: E402
+
+
+def make_volume(size: int) -> bytes:
+    """Uncompressed float32 NIfTI-1 bytes of shape (size, size, size)."""
+    header = bytearray(352)
+    struct.pack_into("<i", header, 0, 348)
+    struct.pack_into("<8h", header, 40, 3, size, size, size, 1, 1, 1, 1)
+    struct.pack_into("<hh", header, 70, 16, 32)  # datatype float32, bitpix
+    struct.pack_into("<8f", header, 76, 1, 1, 1, 1, 1, 1, 1, 1)
+    struct.pack_into("<f", header, 108, 352.0)  # vox_offset
+    header[344:348] = b"n+1\0"
+    return bytes(header) + os.urandom(size ** 3 * 4)
+
+
+def capture_special_args():
+    """Record the binary special args and JSON args Streamlit marshals."""
+    captured = {}
+    original_dumps = custom_component.json.dumps
+
+    def dumps(obj, *args, **kwargs):
+        text = original_dumps(obj, *args, **kwargs)
+        captured["json"] = len(text)
+        return text
+
+    custom_component.json.dumps = dumps
+    return captured, lambda: setattr(custom_component.json, "dumps", original_dumps)
+
+
+def run(transport: str, volume: bytes, repeat: int):
+    timings = []
+    captured, restore = capture_special_args()
+    try:
+        for i in range(repeat):
+            niivue_component._payload.payload_cache.clear()
+            start = time.perf_counter()
+            niivue_viewer(
+                nifti_data=volume,
+                filename="bench.nii",
+                transport=transport,
+                update_interval_ms=None,
+                key=f"bench_{transport}_{i}",
+            )
+            timings.append(time.perf_counter() - start)
+    finally:
+        restore()
+
+    if transport == "base64":
+        payload = base64.b64encode(volume)
+        wire = captured["json"]
+        start = time.perf_counter()
+        base64.b64decode(payload)
+        decode = time.perf_counter() - start
+    else:
+        wire = len(volume) + captured["json"]
+        decode = 0.0
+    return min(timings), wire, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    opts = parser.parse_args()
+    logger.set_log_level("error")  # silence bare-mode ScriptRunContext warnings
+
+    volume = make_volume(opts.size)
+    print(f"volume: {opts.size}³ float32, {len(volume) / 2**20:.1f} MiB")
+    print(f"{'transport':<10} {'prepare':>10} {'wire':>12} {'decode':>10} {'total':>10}")
+    for transport in ("base64", "binary"):
+        prepare, wire, decode = run(transport, volume, opts.repeat)
+        print(
+            f"{transport:<10} {prepare * 1e3:>8.1f}ms {wire / 2**20:>9.1f}MiB "
+            f"{decode * 1e3:>8.1f}ms {(prepare + decode) * 1e3:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
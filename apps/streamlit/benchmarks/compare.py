@@ -0,0 +1,63 @@
+"""Compare two benchmark result files written by the pytest benchmark suite.
+
+Cases are matched by name and parameters. For each metric the ratio
+``new / old`` is printed; ratios above ``--threshold`` are flagged as
+regressions and make the script exit with status 1.
+
+Usage::
+
+    python benchmarks/compare.py results/0.3.0.json results/dev.json [--threshold 1.1]
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("prepare_s", "peak_bytes", "payload_bytes")
+
+
+def load(path):
+    with open(path) as fid:
+        report = json.load(fid)
+    cases = {}
+    for entry in report["results"]:
+        params = ", ".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+        cases[f"{entry['name']}[{params}]"] = entry
+    return report["meta"], cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.1)
+    opts = parser.parse_args()
+
+    old_meta, old = load(opts.old)
+    new_meta, new = load(opts.new)
+    print(f"old: {old_meta['version']} ({old_meta['timestamp']})")
+    print(f"new: {new_meta['version']} ({new_meta['timestamp']})")
+    print(f"{'case':<60} " + " ".join(f"{m:>14}" for m in METRICS))
+
+    regressions = 0
+    for case in sorted(old.keys() & new.keys()):
+        cells = []
+        for metric in METRICS:
+            before, after = old[case].get(metric), new[case].get(metric)
+            if not before or after is None:
+                cells.append(f"{'-':>14}")
+                continue
+            ratio = after / before
+            flag = "!" if ratio > opts.threshold else " "
+            regressions += ratio > opts.threshold
+            cells.append(f"{ratio:>12.2f}x{flag}")
+        print(f"{case:<60} " + " ".join(cells))
+    for case in sorted(old.keys() ^ new.keys()):
+        print(f"{case:<60} only in {'old' if case in old else 'new'}")
+
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed by more than {opts.threshold:.2f}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Fixtures and JSON reporting for the payload benchmark suite.
+
+The suite is not part of the regular test run (``pytest.ini`` only collects
+``tests/``). Run it explicitly::
+
+    python -m pytest benchmarks -q [--bench-sizes 64,128,256,512]
+        [--bench-repeat 3] [--bench-out results.json]
+
+Every benchmark records one entry through the ``bench`` fixture; at the end
+of the session all entries are written to ``--bench-out`` (default
+``benchmarks/results/<version>.json``, ignored by git) together with the
+package, Python, NumPy and Streamlit versions, so runs of two releases can
+be diffed with ``benchmarks/compare.py``.
+"""
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+import streamlit
+from streamlit import logger
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import niivue_component  # noqa: E402
+
+DEFAULT_SIZES = "64,128,256"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("niivue benchmarks")
+    group.addoption(
+        "--bench-sizes",
+        default=DEFAULT_SIZES,
+        help=f"comma-separated volume edge lengths (default: {DEFAULT_SIZES})",
+    )
+    group.addoption(
+        "--bench-repeat", type=int, default=3, help="timed runs per case (best is kept)"
+    )
+    group.addoption("--bench-out", default=None, help="path of the JSON results file")
+
+
+def pytest_generate_tests(metafunc):
+    if "size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--bench-sizes").split(",")]
+        metafunc.parametrize("size", sizes)
+
+
+def _package_version():
+    from importlib import metadata
+
+    try:
+        return metadata.version("niivue-streamlit")
+    except metadata.PackageNotFoundError:
+        return "dev"
+
+
+@pytest.fixture(scope="session")
+def results(request):
+    entries = []
+    yield entries
+    if not entries:
+        return
+    version = _package_version()
+    path = request.config.getoption("--bench-out") or os.path.join(
+        RESULTS_DIR, f"{version}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    report = {
+        "meta": {
+            "version": version,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "streamlit": streamlit.__version__,
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "results": entries,
+    }
+    with open(path, "w") as fid:
+        json.dump(report, fid, indent=2)
+    print(f"\nbenchmark results written to {path}")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def quiet_streamlit():
+    logger.set_log_level("error")  # silence bare-mode ScriptRunContext warnings
+
+
+@pytest.fixture
+def component_args(monkeypatch):
+    """Record the arguments niivue_viewer passes on, then call through.
+
+    Unlike the unit tests' fake, the real component function still runs, so
+    timings include Streamlit's argument marshalling.
+    """
+    calls = []
+    real = niivue_component._component_func
+
+    def recording_component_func(**kwargs):
+        calls.append(kwargs)
+        return real(**kwargs)
+
+    monkeypatch.setattr(niivue_component, "_component_func", recording_component_func)
+    return calls
+
+
+def payload_size(args):
+    """Bytes sent to the browser: binary blobs plus the JSON arguments."""
+    blobs = sum(len(v) for k, v in args.items() if k.startswith("blob_"))
+    rest = {k: v for k, v in args.items() if not k.startswith("blob_")}
+    return blobs + len(json.dumps(rest, default=str))
+
+
+@pytest.fixture
+def bench(request, results, component_args):
+    """Measure a callable and record the result.
+
+    ``bench(fn, **params)`` runs ``fn`` ``--bench-repeat`` times and keeps the
+    best wall time, then once more under ``tracemalloc`` for the peak
+    allocation. The payload size is taken from the last component call.
+    Extra metrics can be added to the returned dict before the test ends.
+    """
+    repeat = request.config.getoption("--bench-repeat")
+
+    def run(fn, **params):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        entry = {
+            "name": request.node.originalname,
+            "params": params,
+            "prepare_s": min(timings),
+            "peak_bytes": peak,
+            "payload_bytes": payload_size(component_args[-1]),
+        }
+        results.append(entry)
+        return entry
+
+    return run
@@ -0,0 +1,207 @@
+"""Benchmarks of the ``niivue_viewer`` payload path.
+
+Each case times ``niivue_viewer(...)`` from the call to Streamlit's
+marshalled component arguments and records peak memory and payload size
+(see ``conftest.py``). Volumes are synthetic so the suite needs no data.
+"""
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from niivue_component import _payload, niivue_viewer
+from niivue_component._mesh import build_mesh_levels, compact_mesh, read_mz3
+
+DTYPES = ["uint8", "int16", "float32", "float64"]
+OVERLAY_SIZE = 128
+
+# Apps pass a key; without one Streamlit hashes the repr of every binary
+# argument to derive the element ID (see test_volume_without_key).
+KEY = "bench"
+
+
+def make_volume(size, dtype, seed=0):
+    """Random (size, size, size) volume of ``dtype``."""
+    values = np.random.default_rng(seed).random((size, size, size), dtype=np.float32)
+    if np.dtype(dtype).kind in "iu":
+        return (values * np.iinfo(dtype).max).astype(dtype)
+    return values.astype(dtype, copy=False)
+
+
+def make_mz3(n_vertices, seed=0):
+    """Uncompressed MZ3 mesh with ``n_vertices`` random vertices."""
+    rng = np.random.default_rng(seed)
+    n_faces = 2 * n_vertices
+    faces = rng.integers(0, n_vertices, size=(n_faces, 3), dtype=np.int32)
+    vertices = rng.random((n_vertices, 3), dtype=np.float32) * 100
+    header = struct.pack("<HHIII", 23117, 3, n_faces, n_vertices, 0)
+    return header + faces.tobytes() + vertices.tobytes()
+
+
+def make_surface(n_vertices):
+    """Uncompressed MZ3 of a wavy height field with about ``n_vertices``."""
+    n = int(np.sqrt(n_vertices))
+    x, y = np.meshgrid(np.arange(n, dtype=np.float32), np.arange(n, dtype=np.float32))
+    vertices = np.stack([x, y, 5 * np.sin(x / 20) * np.cos(y / 20)], axis=-1).reshape(-1, 3)
+    index = np.arange(n * n, dtype=np.int32).reshape(n, n)
+    a, b, c, d = index[:-1, :-1], index[1:, :-1], index[1:, 1:], index[:-1, 1:]
+    faces = np.concatenate([np.stack(t, axis=-1).reshape(-1, 3) for t in ((a, b, c), (a, c, d))])
+    header = struct.pack("<HHIII", 23117, 3, len(faces), len(vertices), 0)
+    return header + faces.tobytes() + vertices.tobytes()
+
+
+@pytest.mark.parametrize("transport", ["binary", "base64"])
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_volume(bench, size, dtype, transport):
+    """A single ndarray volume."""
+    volume = make_volume(size, dtype)
+    bench(
+        lambda: niivue_viewer(
+            nifti_data=volume, transport=transport, update_interval_ms=None, key=KEY
+        ),
+        size=size,
+        dtype=dtype,
+        transport=transport,
+    )
+
+
+def test_volume_without_key(bench, size):
+    """A float32 volume with no ``key``, so the element ID hashes the payload."""
+    volume = make_volume(size, "float32")
+    bench(
+        lambda: niivue_viewer(nifti_data=volume, update_interval_ms=None),
+        size=size,
+        dtype="float32",
+        transport="binary",
+    )
+
+
+@pytest.mark.parametrize("quantize", ["uint8", "uint16"])
+def test_volume_quantized(bench, size, quantize):
+    """A float32 volume quantized before transfer."""
+    volume = make_volume(size, "float32")
+    bench(
+        lambda: niivue_viewer(
+            nifti_data=volume, quantize=quantize, update_interval_ms=None, key=KEY
+        ),
+        size=size,
+        dtype="float32",
+        quantize=quantize,
+    )
+
+
+@pytest.mark.parametrize("n_overlays", [1, 4, 16])
+def test_overlays(bench, n_overlays):
+    """A base volume plus ``n_overlays`` float32 statistical maps."""
+    volume = make_volume(OVERLAY_SIZE, "int16")
+    overlays = [
+        {"data": make_volume(OVERLAY_SIZE, "float32", seed=i), "name": f"map{i}.nii", "id": f"{i}"}
+        for i in range(n_overlays)
+    ]
+    bench(
+        lambda: niivue_viewer(
+            nifti_data=volume, overlays=overlays, update_interval_ms=None, key=KEY
+        ),
+        size=OVERLAY_SIZE,
+        n_overlays=n_overlays,
+    )
+
+
+@pytest.mark.parametrize("n_vertices", [10_000, 100_000, 1_000_000])
+def test_meshes(bench, n_vertices):
+    """A single MZ3 mesh."""
+    mesh = make_mz3(n_vertices)
+    bench(
+        lambda: niivue_viewer(
+            meshes=[{"data": mesh, "name": "mesh.mz3"}], update_interval_ms=None, key=KEY
+        ),
+        n_vertices=n_vertices,
+    )
+
+
+@pytest.mark.parametrize("n_vertices", [10_000, 100_000])
+def test_meshes_compacted(bench, n_vertices):
+    """An ASCII OBJ mesh converted to MZ3 (``compact_meshes=True``).
+
+    ``prepare_s`` is the warm (cached) time and ``cold_s`` the first
+    conversion; ``source_bytes`` is the size of the OBJ.
+    """
+    faces, vertices, _ = read_mz3(make_mz3(n_vertices))
+    obj = "".join(
+        [f"v {x:.6f} {y:.6f} {z:.6f}\n" for x, y, z in vertices]
+        + [f"f {a} {b} {c}\n" for a, b, c in faces + 1]
+    ).encode()
+
+    def view():
+        niivue_viewer(
+            meshes=[{"data": obj, "name": "mesh.obj"}],
+            compact_meshes=True,
+            update_interval_ms=None,
+            key=KEY,
+        )
+
+    compact_mesh.clear()
+    start = time.perf_counter()
+    view()
+    cold = time.perf_counter() - start
+    entry = bench(view, n_vertices=n_vertices)
+    entry.update(cold_s=cold, source_bytes=len(obj))
+
+
+@pytest.mark.parametrize("n_vertices", [100_000, 1_000_000])
+def test_meshes_lod(bench, n_vertices):
+    """An MZ3 surface sent with 10% and 25% levels of detail (``mesh_lod=True``).
+
+    ``prepare_s`` is the warm (cached) time and ``cold_s`` the first build.
+    """
+    mesh = make_surface(n_vertices)
+
+    def view():
+        niivue_viewer(
+            meshes=[{"data": mesh, "name": "mesh.mz3"}],
+            mesh_lod=True,
+            update_interval_ms=None,
+            key=KEY,
+        )
+
+    build_mesh_levels.clear()
+    start = time.perf_counter()
+    view()
+    cold = time.perf_counter() - start
+    entry = bench(view, n_vertices=n_vertices)
+    entry["cold_s"] = cold
+
+
+@pytest.mark.parametrize("fresh", [False, True])
+def test_payload_cache(bench, size, fresh):
+    """base64 transport of the same content: one miss, then cache hits.
+
+    With ``fresh`` every run passes a new but identical bytes object, as
+    ``UploadedFile.getvalue()`` does, so hits cost a content digest.
+    ``prepare_s`` is the warm (cached) time and ``cold_s`` the first call
+    after clearing the cache; hits and misses come from the cache counters.
+    """
+    volume = make_volume(size, "float32").tobytes()
+
+    def view():
+        niivue_viewer(
+            nifti_data=bytes(memoryview(volume)) if fresh else volume,
+            transport="base64",
+            update_interval_ms=None,
+            key=KEY,
+        )
+
+    _payload.payload_cache.clear()
+    before = _payload.payload_cache.stats()
+    start = time.perf_counter()
+    view()
+    cold = time.perf_counter() - start
+    entry = bench(view, size=size, dtype="float32", transport="base64", fresh=fresh)
+    after = _payload.payload_cache.stats()
+    entry.update(
+        cold_s=cold,
+        cache_hits=after["hits"] - before["hits"],
+        cache_misses=after["misses"] - before["misses"],
+    )
+    assert entry["cache_misses"] == 1
@@ -1,24 +1,30 @@
 import os
 import warnings
+
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
-import base64
-
-_RELEASE = os.environ.get("NIIVUE_DEV") != "1"
 
+from ._codec import detect_deployment, encode_volume, resolve_codec
+from ._dicom import load_dicom, scan_dicom
+from ._drawing import drawing_mask, drawing_state, resolve_drawing
+from ._frames import FrameStream, frame_state, resolve_frame_window
+from ._loader import load_sources, prefetch, source_loader, source_name
+from ._memo import result_cache
+from ._mesh import (
+    build_mesh_levels,
+    compact_mesh,
+    compact_mesh_overlay,
+    lod_name,
+    resolve_lod,
+)
+from ._payload import PayloadPacker, is_bytes_like, is_volume_like, payload_cache
+from ._profile import NULL_PROFILE, profile_enabled, profiling
+from ._pyramid import DEFAULT_FACTORS, build_levels
+from ._quantize import quantize_volume, resolve_quantize
+from ._store import hold_payloads, session_owner, volume_store
 
-@st.cache_data(show_spinner=False, hash_funcs={bytes: id})
-def _encode_b64(data: bytes) -> str:
-    """Base64-encode bytes, cached by object identity.
-
-    ``hash_funcs={bytes: id}`` is critical: without it Streamlit hashes the
-    full bytes object on every call, which costs roughly as much as
-    encoding. With ``id`` the cache hits whenever the same bytes object is
-    passed — typically the value returned from a user-level
-    ``@st.cache_data`` loader — so repeated re-runs (e.g. fragment re-runs
-    on click) skip the encode entirely.
-    """
-    return base64.b64encode(data).decode()
+_RELEASE = os.environ.get("NIIVUE_DEV") != "1"
 
 # Declare a Streamlit component
 if not _RELEASE:
@@ -46,36 +52,68 @@ def niivue_viewer(
     styled=True,
     settings=None,
     update_interval_ms=100,
+    affine=None,
+    progressive=False,
+    quantize=None,
+    compact_meshes=False,
+    mesh_lod=False,
+    batch_events=None,
+    drawing=None,
+    frame_window=None,
+    codec=None,
+    transport="binary",
+    profile=None,
     key=None
 ):
     """Create a NiiVue viewer component.
 
     Parameters:
     -----------
-    nifti_data : bytes or None
-        Raw NIFTI file data for the main image
+    nifti_data : bytes-like, numpy.ndarray, path, callable or None
+        Raw NIFTI file data for the main image (``bytes``, ``bytearray``,
+        ``memoryview`` or ``mmap``), or a NumPy array of voxels indexed
+        (x, y, z[, t]) as returned by nibabel's ``get_fdata()``. Arrays are
+        sent as an uncompressed NIfTI-1 image built in memory, skipping gzip
+        on both ends. A path (``str`` or ``os.PathLike``) is memory-mapped
+        rather than read, so the file stays in the page cache instead of
+        the Python heap. Paths and zero-argument loaders returning bytes or
+        an array are loaded on a background thread pool, behind a spinner.
+        Paths and ``functools.partial`` loaders are cached; see
+        ``prefetch`` to load the next subjects ahead of time. Paths and
+        loaders are also accepted for ``paired_data`` and the ``data`` of
+        overlays and meshes.
     filename : str
-        Name of the file being displayed
-    paired_data : bytes or None
+        Name of the file being displayed (default for a path: its name)
+    paired_data : bytes-like, path, callable or None
         Raw voxel data for detached formats. Required when ``nifti_data`` is
         an MHD header with ``ElementDataFile`` pointing to a separate file
         (typically ``.raw``). Ignored for self-contained formats.
     overlays : list of dict, optional
         List of overlay images, each with:
-        - data: bytes - overlay image data
-        - name: str - overlay filename
+        - data: bytes, numpy.ndarray, path or loader - overlay image data
+        - affine: array-like, optional - 4×4 affine for ndarray data
+          (default: ``affine``)
+        - name: str - overlay filename (default for a path: its name)
+        - id: str, optional - stable identity across re-runs (default:
+          name plus data). Overlays are matched by identity, so only added
+          or removed overlays are transferred; colormap, opacity and order
+          changes are applied in the browser without reloading data.
         - colormap: str, optional - colormap name (default: 'red')
         - opacity: float, optional - opacity 0-1 (default: 0.5)
+        - quantize: str, bool or None, optional - as ``quantize`` below
+          (default: ``quantize``)
     meshes : list of dict, optional
         List of mesh surfaces to display (e.g. FreeSurfer pial, white, inflated), each with:
-        - data: bytes - mesh file data
-        - name: str - mesh filename (must include extension, e.g. 'lh.pial', 'brain.gii')
+        - data: bytes, path or loader - mesh file data
+        - name: str - mesh filename (must include extension, e.g. 'lh.pial', 'brain.gii';
+          default for a path: its name)
         - overlays: list of dict, optional - mesh overlays for the first mesh only
             (curvature, thickness, etc.). Overlays on non-first meshes are ignored.
             - data: bytes - overlay data
             - name: str - overlay filename (e.g. 'lh.thickness', 'lh.curv')
             - colormap: str, optional - colormap name (default: 'redyell')
             - opacity: float, optional - opacity 0-1 (default: 0.7)
+        - lod: bool or sequence of float, optional - as ``mesh_lod`` below
     height : int
         Height of the component in pixels (default: 600)
     view_mode : str
@@ -93,6 +131,108 @@ def niivue_viewer(
         (default: 100). Set to None to disable click feedback entirely —
         this restores the low-latency behaviour of the pre-overlay viewer
         and is recommended whenever the return value is not consumed.
+    affine : array-like or None
+        4×4 voxel-to-world affine for an ndarray ``nifti_data`` (default:
+        identity). Also the default for ndarray overlays without their own
+        ``affine``. Ignored for bytes payloads.
+    progressive : bool or sequence of int
+        Load large volumes progressively (default: False). The viewer first
+        shows block-mean downsampled copies of ``nifti_data`` and replaces
+        them in place with finer ones, ending with the full-resolution data,
+        so it becomes interactive long before the full volume is decoded.
+        True uses 4× and 2× levels; a sequence such as ``(8, 4, 2)`` picks
+        the factors. Requires ndarray or single-file NIfTI-1 ``nifti_data``;
+        volumes smaller than 64³ are sent as-is. Best combined with
+        ``transport='url'`` so finer levels are only fetched after the first
+        render.
+    quantize : str, bool or None
+        Quantize float (or wide integer) intensities to 'uint8' or 'uint16'
+        before transfer (default: None, send as-is; True means 'uint16').
+        The value range is mapped linearly onto the integer codes and the
+        NIfTI ``scl_slope``/``scl_inter`` fields record the mapping, so
+        displayed values and clicked voxel values stay in the original
+        units to within half a quantization step. Cuts payload size and
+        GPU memory 2-8×. Applies to ``nifti_data`` and is the default for
+        ``overlays``; requires ndarray or single-file NIfTI-1 data.
+    compact_meshes : bool
+        Convert ``meshes`` and their overlays to binary MZ3 on the server
+        before transfer (default: False). ASCII GIfTI, OBJ and VTK surfaces
+        shrink several-fold and, like binary GIfTI, VTK and FreeSurfer
+        surfaces and curv/thickness files, load in the browser without
+        text parsing. Conversions are cached by content. Formats that are
+        not recognised (e.g. MZ3, tractography) are sent as-is, as are
+        files that fail to parse (with a warning).
+    mesh_lod : bool or sequence of float
+        Send decimated levels of detail of large meshes (default: False).
+        The viewer first shows the lightest level and swaps in finer ones,
+        ending with the full mesh, while the browser is idle, so the 3D view
+        stays responsive with surfaces of millions of triangles. True keeps
+        about 10% and 25% of the faces; a sequence such as ``(0.05, 0.2)``
+        picks the fractions. Levels are built by vertex clustering, with
+        overlay values averaged over merged vertices, and cached by content.
+        Needs a GIfTI, OBJ, VTK, FreeSurfer or MZ3 mesh; meshes with fewer
+        than 100,000 faces are sent as-is.
+    batch_events : str, int or None
+        Buffer interaction events in the browser and return them as one
+        timestamped batch per update (default: None, return only the
+        latest voxel click). Besides clicks, batches report released drags
+        (measurement, contrast, pan), display window changes and drawing
+        edits. 'last' keeps the latest event of each type, 'all' keeps
+        every event (up to 1000 per batch) and a number keeps one event of
+        each type per window of that many milliseconds. Batches are
+        delivered at most once per ``update_interval_ms``, which must not
+        be None.
+    drawing : bool, bytes-like, numpy.ndarray, dict or None
+        Enable drawing on ``nifti_data`` and sync the drawing layer back to
+        Python (default: None). True starts from an empty layer; a mask
+        (NIfTI bytes or an ndarray on the ``nifti_data`` grid) is loaded as
+        the initial layer for editing; a dict takes ``data`` (the mask) and
+        ``pen`` (the label drawn, default 1; 0 erases). After each edit the
+        viewer sends only the changed slices, zlib-compressed, and
+        ``drawing_mask(key)`` returns the layer as a uint8 array in the
+        voxel order of ``nifti_data``. Requires ``key`` and
+        ``update_interval_ms``, which throttles the updates.
+    frame_window : int or None
+        Stream a 4D ``nifti_data`` frame by frame (default: None, send the
+        whole series). Only the current frame and ``frame_window`` frames on
+        either side are sent, as 3D images; the series stays in Python, so
+        an ``np.memmap`` or uncompressed NIfTI bytes are never read in full.
+        The viewer shows a frame slider, swaps prefetched frames instantly
+        and asks for the frames around a new position (a rerun). Clicks
+        return the voxel's time course over all frames. Requires ``key``
+        and ``update_interval_ms``; combine with ``transport='url'`` so
+        frames already in the browser are not resent.
+    codec : str or None
+        Compression of NIfTI volumes in transit (default: None, send them
+        as supplied). 'raw' sends them uncompressed, gunzipping ``.nii.gz``
+        data on the server, so the browser skips decompression. 'deflate'
+        gzips uncompressed data at the fastest level and 'gzip' at the
+        default level; gzipped data is kept as is. 'auto' picks per volume:
+        raw when the browser is local (the page was requested from
+        localhost), and for remote browsers the original gzip stream, or
+        'deflate' for uncompressed volumes of 256 KiB or more. Set the
+        ``NIIVUE_DEPLOYMENT`` environment variable to 'local' or 'remote'
+        to override the detection, e.g. behind a reverse proxy on the same
+        host. Transcoded volumes are cached by content. Other formats and
+        meshes are always sent as supplied.
+    transport : str
+        How payloads reach the browser (default: 'binary'). 'binary' sends
+        them as raw component arguments that arrive in the iframe as
+        ArrayBuffers with no text encoding. 'base64' is the legacy fallback
+        that inlines base64 strings in the JSON arguments (33% larger and
+        decoded character by character in the browser). 'url' registers each
+        payload once under a content hash with Streamlit's media file manager
+        and sends only its URL and hash, so re-runs that change other
+        arguments do not resend the data and the browser can skip reloading
+        payloads it already has.
+    profile : bool or None
+        Collect per-call telemetry (default: None, i.e. enabled when the
+        ``NIIVUE_PROFILE`` environment variable is ``1``). Python timings
+        (pyramid, quantization and encoding), the bytes sent and cache hits
+        are passed to the viewer, which adds its own timings for payload
+        decode, niivue load (parse and GPU upload) and first draw, and
+        returns both once a load has been drawn (see Returns). Requires
+        ``key``; without one profiling is skipped with a warning.
     key : str or None
         Unique key for the component
         
@@ -105,93 +245,536 @@ def niivue_viewer(
         - mm: [x, y, z] mm coordinates
         - value: voxel value at click position
         - filename: name of the file
+        - with ``frame_window``: frame (the frame shown) and time_course
+          (numpy array of the voxel's values over all frames)
+
+        With ``batch_events``, events arrive instead as:
+        - type: 'batch'
+        - seq: batch number, increasing for the lifetime of the viewer
+          (the last batch is returned again on unrelated reruns)
+        - sent_at: delivery time in ms since the epoch
+        - events: list of dicts with a 'type' ('voxel_click',
+          'drag_release', 'intensity_change' or 'drawing_change'), their
+          fields and 't', the event time in ms since the epoch
+        - coalesced: events merged away since the previous batch
+        - dropped: events discarded because the batch was full
+
+        With ``drawing``, a drawing update returns instead:
+        - type: 'drawing'
+        - version: number of the layer version
+        - mask: the layer, as returned by ``drawing_mask(key)``
+
+        With ``profile`` enabled, each completed load returns instead:
+        - type: 'profile'
+        - phase: 'base', 'overlays', 'refine', 'meshes' or 'lod'
+        - python: Python timings (``*_ms``), bytes_sent, payloads and
+          per-cache hits/misses of the run that sent the data
+        - frontend: decode_ms, load_ms, first_draw_ms, total_ms, bytes and
+          payloads as measured in the browser
     """
-    # Convert nifti_data to base64 if provided
-    nifti_base64 = ""
-    if nifti_data is not None:
-        nifti_base64 = _encode_b64(nifti_data)
+    _check_batch_events(batch_events, update_interval_ms)
+    nifti_data, filename, paired_data, overlays, meshes = _load_lazy_sources(
+        nifti_data, filename, paired_data, overlays, meshes
+    )
+    drawing = resolve_drawing(drawing)
+    drawing_sync = None
+    if drawing is not None:
+        if key is None:
+            raise ValueError("drawing requires a key to keep the layer between runs")
+        if update_interval_ms is None:
+            raise ValueError(
+                "drawing needs update_interval_ms: the layer is not sent back "
+                "when update_interval_ms is None"
+            )
+        # Apply the pending update first so this run already tells the
+        # viewer whether it has to resend the whole layer.
+        drawing_sync = drawing_state(key)
+        drawing_sync.apply(st.session_state.get(key))
+    frame_window = resolve_frame_window(frame_window)
+    frames = None
+    if frame_window is not None:
+        if key is None:
+            raise ValueError("frame_window requires a key to keep the current frame between runs")
+        if update_interval_ms is None:
+            raise ValueError(
+                "frame_window needs update_interval_ms: the viewer cannot ask "
+                "for frames when update_interval_ms is None"
+            )
+        if progressive or drawing is not None:
+            raise ValueError("frame_window cannot be combined with progressive or drawing")
+        if nifti_data is None:
+            raise ValueError("frame_window requires a 4D nifti_data")
+        stream = FrameStream(nifti_data, affine, frame_window, key)
+        current = frame_state(key, stream.series_id)
+        current.apply(st.session_state.get(key), stream.count)
+        frames = (stream, current.frame)
+    profile = profile_enabled(profile)
+    if profile and key is None:
+        warnings.warn(
+            "niivue_viewer: profile requires a key (profiling a keyless viewer "
+            "would remount it on every run); profiling skipped.",
+            stacklevel=2,
+        )
+        profile = False
+    with profiling(profile) as prof:
+        kwargs = _prepare_args(
+            prof, nifti_data, filename, paired_data, overlays, meshes, affine,
+            progressive, quantize, compact_meshes, mesh_lod, drawing, frames, codec,
+            transport, key,
+        )
+        profile_args = prof.as_dict() if profile else None
+
+    if drawing_sync is not None:
+        kwargs["drawing"].update(version=drawing_sync.version, resync=drawing_sync.resync)
+
+    component_value = _component_func(
+        **kwargs,
+        height=height,
+        view_mode=view_mode,
+        styled=styled,
+        settings=settings or {},
+        update_interval_ms=update_interval_ms,
+        batch_events=batch_events,
+        profile=profile_args,
+        default=None,
+        key=key,
+    )
+    if frames is not None and isinstance(component_value, dict) \
+            and component_value.get("type") == "voxel_click":
+        stream, frame = frames
+        component_value = dict(
+            component_value,
+            frame=component_value.get("frame", frame),
+            time_course=stream.time_course(component_value["voxel"]),
+        )
+    if drawing_sync is not None and isinstance(component_value, dict) \
+            and component_value.get("type") == "drawing":
+        drawing_sync.apply(component_value)
+        component_value = {
+            "type": "drawing",
+            "version": drawing_sync.version,
+            "mask": drawing_sync.mask,
+        }
+    return component_value
+
+
+def _check_batch_events(batch_events, update_interval_ms):
+    """Validate the ``batch_events`` mode of ``niivue_viewer``."""
+    if batch_events is None:
+        return
+    numeric = isinstance(batch_events, (int, float)) and not isinstance(batch_events, bool)
+    if not (batch_events in ("last", "all") or (numeric and batch_events > 0)):
+        raise ValueError(
+            "batch_events must be 'last', 'all', a positive number of "
+            f"milliseconds or None, got {batch_events!r}"
+        )
+    if update_interval_ms is None:
+        raise ValueError(
+            "batch_events needs update_interval_ms: events are not sent back "
+            "when update_interval_ms is None"
+        )
+
+
+def _lazy_entry(entry):
+    """``entry`` (an overlay or mesh) with a path's name as default name."""
+    if not isinstance(entry, dict) or "name" in entry or "filename" in entry:
+        return entry
+    name = source_name(entry.get("data"))
+    return entry if name is None else dict(entry, name=name)
+
+
+def _load_lazy_sources(nifti_data, filename, paired_data, overlays, meshes):
+    """Load the path and loader sources of ``niivue_viewer``, all at once."""
+    overlays = None if overlays is None else [_lazy_entry(o) for o in overlays]
+    meshes = None if meshes is None else [_lazy_entry(m) for m in meshes]
+    entries = [
+        (f"{kind} {i}", entry)
+        for kind, items in (("Overlay", overlays), ("Mesh", meshes))
+        for i, entry in enumerate(items or ())
+        if isinstance(entry, dict) and "data" in entry
+    ]
+    loaded = load_sources(
+        [nifti_data, paired_data] + [entry["data"] for _, entry in entries],
+        ["nifti_data", "paired_data"] + [label for label, _ in entries],
+    )
+    filename = filename or source_name(nifti_data) or ""
+    replaced = {
+        id(entry): dict(entry, data=data)
+        for (_, entry), data in zip(entries, loaded[2:])
+        if data is not entry["data"]
+    }
+    if replaced:
+        overlays = overlays and [replaced.get(id(o), o) for o in overlays]
+        meshes = meshes and [replaced.get(id(m), m) for m in meshes]
+    return loaded[0], filename, loaded[1], overlays, meshes
+
+
+def _volume_encoder(codec, prof=NULL_PROFILE):
+    """The ``PayloadPacker`` encode hook for ``codec``, or None to send as is."""
+    if resolve_codec(codec) is None:
+        return None
+    deployment = detect_deployment()
+    return lambda data: encode_volume(data, codec, deployment, prof)
+
+
+def _prepare_args(
+    prof, nifti_data, filename, paired_data, overlays, meshes, affine,
+    progressive, quantize, compact_meshes, mesh_lod, drawing, frames, codec,
+    transport, key,
+):
+    """Validate and pack the payload arguments of ``niivue_viewer``."""
+    packer = PayloadPacker(transport, prof, _volume_encoder(codec, prof), volume_store, key)
+    quantize_dtype = resolve_quantize(quantize)
+    lod_fractions = resolve_lod(mesh_lod)
+
+    def quantized(data, data_affine, dtype, label):
+        if dtype is None:
+            return data
+        try:
+            prof.lookup("quantize")
+            with prof.time("quantize"):
+                return quantize_volume(data, data_affine, dtype.name)
+        except ValueError as err:
+            raise ValueError(
+                f"{label}: quantize requires ndarray or NIfTI-1 data: {err}"
+            ) from err
 
-    # Convert paired_data (detached raw voxels for MHD) to base64 if provided
-    paired_base64 = ""
+    def compacted(convert, data, name, label):
+        if not compact_meshes:
+            return data, name
+        try:
+            prof.lookup("mesh")
+            with prof.time("mesh"):
+                return convert(data, name)
+        except ValueError as err:
+            warnings.warn(f"{label}: {err}; sending it unconverted.", stacklevel=4)
+            return data, name
+
+    def decimated(data, name, sources, fractions, label):
+        if fractions is None:
+            return []
+        try:
+            prof.lookup("lod")
+            with prof.time("lod"):
+                return build_mesh_levels(data, name, tuple(sources), fractions)
+        except ValueError as err:
+            warnings.warn(
+                f"{label}: mesh_lod skipped, sending full detail only: {err}", stacklevel=4
+            )
+            return []
+
+    # Pack nifti_data if provided
+    nifti_payload = ""
+    nifti_levels = None
+    frames_args = None
+    if frames is not None:
+        stream, current = frames
+        # Keep every frame alive while packing: the packer dedupes by id()
+        indices = list(stream.indices(current))
+        frame_data = [
+            quantized(stream.frame(index), stream.affine, quantize_dtype, "nifti_data")
+            for index in indices
+        ]
+        window = [
+            {"index": index, "data": packer.pack(data, stream.affine)}
+            for index, data in zip(indices, frame_data)
+        ]
+        nifti_payload = window[indices.index(current)]["data"]
+        frames_args = {
+            "count": stream.count,
+            "current": current,
+            "series": stream.series_id,
+            "window": window,
+        }
+    elif nifti_data is not None:
+        if not is_volume_like(nifti_data):
+            raise ValueError("nifti_data must be bytes, a numpy array, a path or a loader")
+        if quantize_dtype is not None and paired_data is not None:
+            raise ValueError("quantize is not supported with paired_data")
+        nifti_data = quantized(nifti_data, affine, quantize_dtype, "nifti_data")
+        levels = []
+        if progressive:
+            if paired_data is not None:
+                raise ValueError("progressive is not supported with paired_data")
+            factors = DEFAULT_FACTORS if progressive is True else tuple(progressive)
+            try:
+                # The affine is passed as a list so it is cached by value
+                affine_key = None if affine is None else np.asarray(affine).tolist()
+                prof.lookup("pyramid")
+                with prof.time("pyramid"):
+                    levels = build_levels(nifti_data, affine_key, factors)
+            except ValueError as err:
+                raise ValueError(
+                    f"progressive requires ndarray or NIfTI-1 nifti_data: {err}"
+                ) from err
+        nifti_payload = packer.pack(nifti_data, affine)
+        if levels:
+            # Coarsest level loads as the base image; the rest, ending with
+            # the full-resolution data, replace it in order.
+            nifti_levels = [packer.pack(level) for level in levels[1:]] + [nifti_payload]
+            nifti_payload = packer.pack(levels[0])
+
+    # Pack paired_data (detached raw voxels for MHD) if provided
+    paired_payload = None
     if paired_data is not None:
-        if not isinstance(paired_data, bytes):
-            raise ValueError("paired_data must be bytes")
-        paired_base64 = _encode_b64(paired_data)
+        if not is_bytes_like(paired_data):
+            raise ValueError("paired_data must be bytes, a path or a loader")
+        paired_payload = packer.pack(paired_data)
     
-    # Convert overlays to base64
+    # Pack overlays
     overlays_data = []
+    overlay_ids = set()
     if overlays:
         for i, overlay in enumerate(overlays):
             # Validate overlay structure
             if 'data' not in overlay:
                 raise ValueError(f"Overlay {i}: 'data' field is required")
-            if not isinstance(overlay['data'], bytes):
-                raise ValueError(f"Overlay {i}: 'data' must be bytes")
+            if not is_volume_like(overlay['data']):
+                raise ValueError(
+                    f"Overlay {i}: 'data' must be bytes, a numpy array, a path or a loader"
+                )
             if 'name' not in overlay and 'filename' not in overlay:
                 raise ValueError(f"Overlay {i}: either 'name' or 'filename' field is required")
+            overlay_id = overlay.get("id")
+            if overlay_id is not None:
+                if not isinstance(overlay_id, str):
+                    raise ValueError(f"Overlay {i}: 'id' must be a string")
+                if overlay_id in overlay_ids:
+                    raise ValueError(f"Overlay {i}: duplicate id {overlay_id!r}")
+                overlay_ids.add(overlay_id)
             
+            overlay_affine = overlay.get("affine", affine)
+            overlay_data = quantized(
+                overlay["data"],
+                overlay_affine,
+                resolve_quantize(overlay.get("quantize", quantize)),
+                f"Overlay {i}",
+            )
             overlay_dict = {
-                "data": _encode_b64(overlay["data"]),
+                "data": packer.pack(overlay_data, overlay_affine),
                 "name": overlay.get("name") or overlay.get("filename", "overlay"),
+                "id": overlay_id,
                 "colormap": overlay.get("colormap", "red"),
                 "opacity": overlay.get("opacity", 0.5),
             }
             overlays_data.append(overlay_dict)
     
-    # Convert meshes to base64
+    # Pack meshes
     meshes_data = []
     if meshes:
         for i, mesh in enumerate(meshes):
             if 'data' not in mesh:
                 raise ValueError(f"Mesh {i}: 'data' field is required")
-            if not isinstance(mesh['data'], bytes):
-                raise ValueError(f"Mesh {i}: 'data' must be bytes")
+            if not is_bytes_like(mesh['data']):
+                raise ValueError(f"Mesh {i}: 'data' must be bytes, a path or a loader")
             if 'name' not in mesh:
                 raise ValueError(f"Mesh {i}: 'name' field is required")
             
+            mesh_data, mesh_name = compacted(
+                compact_mesh, mesh["data"], mesh["name"], f"Mesh {i}"
+            )
             mesh_dict = {
-                "data": _encode_b64(mesh["data"]),
-                "name": mesh["name"],
+                "data": packer.pack(mesh_data),
+                "name": mesh_name,
             }
             
-            # Convert mesh overlays to base64 (only first mesh overlays are applied)
+            # Pack mesh overlays (only first mesh overlays are applied)
             mesh_overlays = []
+            overlay_sources = []
             if 'overlays' in mesh and mesh['overlays']:
                 if i > 0:
                     warnings.warn(
                         f"Mesh {i}: overlays are only supported on the first mesh and will be ignored.",
-                        stacklevel=2,
+                        stacklevel=3,
                     )
                 else:
                     for j, mo in enumerate(mesh['overlays']):
                         if 'data' not in mo:
                             raise ValueError(f"Mesh {i}, overlay {j}: 'data' field is required")
-                        if not isinstance(mo['data'], bytes):
+                        if not is_bytes_like(mo['data']):
                             raise ValueError(f"Mesh {i}, overlay {j}: 'data' must be bytes")
                         if 'name' not in mo:
                             raise ValueError(f"Mesh {i}, overlay {j}: 'name' field is required")
+                        mo_data, mo_name = compacted(
+                            compact_mesh_overlay, mo["data"], mo["name"],
+                            f"Mesh {i}, overlay {j}",
+                        )
+                        overlay_sources.append((mo_data, mo_name))
                         mesh_overlays.append({
-                            "data": _encode_b64(mo["data"]),
-                            "name": mo["name"],
+                            "data": packer.pack(mo_data),
+                            "name": mo_name,
                             "colormap": mo.get("colormap", "redyell"),
                             "opacity": mo.get("opacity", 0.7),
                         })
             mesh_dict["overlays"] = mesh_overlays
+
+            # Level of detail: the coarsest level is sent as the mesh and the
+            # finer ones, ending with the full mesh, replace it in order.
+            levels = decimated(
+                mesh_data,
+                mesh_name,
+                overlay_sources,
+                resolve_lod(mesh["lod"]) if "lod" in mesh else lod_fractions,
+                f"Mesh {i}",
+            )
+            if levels:
+                full = {
+                    "data": mesh_dict["data"],
+                    "name": mesh_name,
+                    "overlays": [{"data": o["data"], "name": o["name"]} for o in mesh_overlays],
+                }
+                coarse, *finer = [
+                    {
+                        "data": packer.pack(level_mesh),
+                        "name": lod_name(mesh_name, fraction),
+                        "overlays": [
+                            {"data": packer.pack(data), "name": lod_name(name, fraction)}
+                            for data, (_, name) in zip(level_overlays, overlay_sources)
+                        ],
+                    }
+                    for fraction, level_mesh, level_overlays in levels
+                ]
+                mesh_dict["data"] = coarse["data"]
+                mesh_dict["name"] = coarse["name"]
+                for overlay, level_overlay in zip(mesh_overlays, coarse["overlays"]):
+                    overlay.update(level_overlay)
+                mesh_dict["levels"] = finer + [full]
             meshes_data.append(mesh_dict)
     
-    # Call the component
-    component_value = _component_func(
-        nifti_data=nifti_base64,
+    drawing_args = None
+    if drawing is not None:
+        if not nifti_payload:
+            raise ValueError("drawing requires nifti_data to draw on")
+        if nifti_levels:
+            raise ValueError("drawing cannot be combined with progressive loading")
+        initial = drawing["data"]
+        drawing_args = {
+            "pen": drawing["pen"],
+            "initial": None if initial is None else packer.pack(initial, affine),
+        }
+
+    prof.payloads_packed(packer.nbytes, packer.count)
+    hold_payloads(session_owner(key), packer.store_keys)
+    return dict(
+        nifti_data=nifti_payload,
         filename=filename,
-        paired_data=paired_base64 if paired_base64 else None,
+        paired_data=paired_payload,
+        nifti_levels=nifti_levels,
         overlays=overlays_data if overlays_data else None,
         meshes=meshes_data if meshes_data else None,
+        drawing=drawing_args,
+        frames=frames_args,
+        **packer.blobs,
+    )
+
+
+def niivue_grid(
+    volumes,
+    columns=4,
+    cell_height=200,
+    height=600,
+    view_mode="axial",
+    colormap="gray",
+    quantize=None,
+    codec=None,
+    transport="url",
+    key=None
+):
+    """Show many volumes as a scrollable grid of thumbnails in one component.
+
+    Unlike one ``niivue_viewer`` per volume, the grid uses a single iframe
+    and a single hidden niivue instance (one WebGL context), which renders
+    the cells one at a time into plain 2D canvases. Cells are loaded lazily
+    as they scroll into view and their images freed when they scroll out,
+    so hundreds of scans can be reviewed on one page.
+
+    Parameters:
+    -----------
+    volumes : list
+        Volumes to show, in order. Each item is bytes-like, a NumPy array,
+        a path or a loader (as for ``niivue_viewer``'s ``nifti_data``), or
+        a dict with:
+        - data: bytes, numpy.ndarray, path or loader - image data
+        - name: str, optional - filename (default: the name of a path, else
+          'volume<i>.nii')
+        - label: str, optional - caption under the cell (default: name)
+        - affine: array-like, optional - 4×4 affine for ndarray data
+    columns : int
+        Number of cells per row (default: 4)
+    cell_height : int
+        Height of each cell in pixels (default: 200)
+    height : int
+        Height of the scrollable grid in pixels (default: 600)
+    view_mode : str
+        'axial' (default), 'coronal', 'sagittal', '3d' or 'multiplanar'
+    colormap : str
+        Colormap of every cell (default: 'gray')
+    quantize : str, bool or None
+        As for ``niivue_viewer``; quantizing to 'uint8' is usually enough
+        for QC thumbnails and shrinks each volume 2-8×.
+    codec : str or None
+        As for ``niivue_viewer``.
+    transport : str
+        As for ``niivue_viewer``, but 'url' by default so that the browser
+        only fetches the volumes of cells it actually shows. With 'binary'
+        or 'base64' every volume is sent on every run.
+    key : str or None
+        Unique key for the component
+
+    Returns:
+    --------
+    dict or None
+        The last clicked cell, if any:
+        - type: 'cell_click'
+        - index: position of the volume in ``volumes``
+        - name: its filename
+        - label: its caption
+    """
+    if not isinstance(columns, int) or columns < 1:
+        raise ValueError(f"columns must be a positive integer, got {columns!r}")
+    packer = PayloadPacker(
+        transport, encode=_volume_encoder(codec), store=volume_store, key=key
+    )
+    quantize_dtype = resolve_quantize(quantize)
+    entries = [volume if isinstance(volume, dict) else {"data": volume} for volume in volumes]
+    loaded = load_sources(
+        [entry.get("data") for entry in entries],
+        [f"Volume {i}" for i in range(len(entries))],
+    )
+    cells = []
+    for i, (entry, data) in enumerate(zip(entries, loaded)):
+        if "data" not in entry:
+            raise ValueError(f"Volume {i}: 'data' field is required")
+        if not is_volume_like(data):
+            raise ValueError(
+                f"Volume {i}: 'data' must be bytes, a numpy array, a path or a loader"
+            )
+        name = entry.get("name") or source_name(entry["data"]) or f"volume{i}.nii"
+        affine = entry.get("affine")
+        if quantize_dtype is not None:
+            try:
+                data = quantize_volume(data, affine, quantize_dtype.name)
+            except ValueError as err:
+                raise ValueError(
+                    f"Volume {i}: quantize requires ndarray or NIfTI-1 data: {err}"
+                ) from err
+        cells.append({
+            "data": packer.pack(data, affine),
+            "name": name,
+            "label": entry.get("label", name),
+        })
+    hold_payloads(session_owner(key), packer.store_keys)
+
+    return _component_func(
+        grid={
+            "cells": cells,
+            "columns": columns,
+            "cell_height": cell_height,
+            "view_mode": view_mode,
+            "colormap": colormap,
+        },
         height=height,
-        view_mode=view_mode,
-        styled=styled,
-        settings=settings or {},
-        update_interval_ms=update_interval_ms,
+        **packer.blobs,
         default=None,
-        key=key
+        key=key,
     )
-    return component_value
@@ -0,0 +1,151 @@
+"""Per-payload compression for ``niivue_viewer(codec=...)``.
+
+Volumes reach niivue either raw or gzipped; niivue recognizes gzip by its
+magic bytes, whatever the file name says. Which is faster depends on where
+the browser is. On the same machine the transfer is a memory copy, so
+gunzipping a ``.nii.gz`` in the browser (single-threaded JavaScript) costs
+more than it saves: the payload is better sent raw. Over a VPN or the
+internet bandwidth dominates and a large raw volume is better deflated,
+at the fastest level, which shrinks typical images 2-4x at a few hundred
+MB/s. An existing gzip stream is kept as is: it is already small, and
+recompressing it would only spend server time.
+
+``choose_codec`` picks one of these per payload from its size, whether it
+is already gzipped and the deployment: ``local`` when the page was
+requested from a loopback host, ``remote`` otherwise, overridden by the
+``NIIVUE_DEPLOYMENT`` environment variable. Only NIfTI payloads are
+transcoded; other formats (MGZ, meshes, ...) are sent as supplied.
+Transcoded bytes are cached by content, so reruns reuse them.
+"""
+import gzip
+import os
+import struct
+import zlib
+
+import streamlit as st
+
+from ._memo import memoize
+from ._profile import NULL_PROFILE, record_miss
+
+CODECS = ("auto", "raw", "deflate", "gzip")
+
+DEPLOYMENTS = ("local", "remote")
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# Below this size a raw payload is sent raw even to remote browsers: the
+# transfer saved does not pay for compressing and inflating it.
+MIN_DEFLATE_BYTES = 256 * 1024
+
+FAST_LEVEL = 1
+DEFAULT_LEVEL = 6
+
+GZIP_MAGIC = b"\x1f\x8b"
+NIFTI_HEADER_SIZES = (348, 540)
+
+# wbits selecting the gzip container for zlib's (de)compressors
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def resolve_codec(codec):
+    """Validate ``codec``: None (send as supplied) or one of ``CODECS``."""
+    if codec is not None and codec not in CODECS:
+        raise ValueError(f"codec must be one of {CODECS} or None, got {codec!r}")
+    return codec
+
+
+def detect_deployment() -> str:
+    """``$NIIVUE_DEPLOYMENT``, else ``local`` for loopback page requests.
+
+    Without a request (bare mode, tests) the browser, if any, is local.
+    """
+    deployment = os.environ.get("NIIVUE_DEPLOYMENT")
+    if deployment:
+        if deployment not in DEPLOYMENTS:
+            raise ValueError(
+                f"NIIVUE_DEPLOYMENT must be one of {DEPLOYMENTS}, got {deployment!r}"
+            )
+        return deployment
+    host = _request_host()
+    if host is None:
+        return "local"
+    return "local" if _hostname(host) in LOCAL_HOSTS else "remote"
+
+
+def _request_host():
+    try:
+        return st.context.headers.get("Host")
+    except AttributeError:  # Streamlit before st.context
+        return None
+
+
+def _hostname(host):
+    """``host`` of a Host header, without port or IPv6 brackets."""
+    if host.startswith("["):
+        return host[1:].split("]", 1)[0]
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+def is_gzip(data) -> bool:
+    return bytes(memoryview(data).cast("B")[:2]) == GZIP_MAGIC
+
+
+def is_nifti(data) -> bool:
+    """True for NIfTI-1/2 bytes, gzipped or not, judged by ``sizeof_hdr``."""
+    head = bytes(memoryview(data).cast("B")[:64])
+    if head[:2] == GZIP_MAGIC:
+        try:
+            head = zlib.decompressobj(_GZIP_WBITS).decompress(head, 4)
+        except zlib.error:
+            return False
+    if len(head) < 4:
+        return False
+    return any(struct.unpack(f"{order}i", head[:4])[0] in NIFTI_HEADER_SIZES for order in "<>")
+
+
+def choose_codec(codec, nbytes, gzipped, deployment) -> str:
+    """The encoding to send a NIfTI payload in: 'raw', 'deflate' or 'gzip'.
+
+    'gzip' keeps an existing gzip stream (or compresses a raw payload at
+    the default level); 'deflate' compresses a raw payload at the fastest
+    level. 'auto' picks per payload as described in the module docstring.
+    """
+    if codec != "auto":
+        return codec
+    if deployment == "local":
+        return "raw"
+    if gzipped:
+        return "gzip"
+    return "deflate" if nbytes >= MIN_DEFLATE_BYTES else "raw"
+
+
+def _compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+@memoize()
+def transcode(data, codec):
+    """``data`` in ``codec``; cached by content, so reruns transcode once."""
+    record_miss("codec")
+    view = memoryview(data).cast("B")
+    gzipped = is_gzip(view)
+    if codec == "raw":
+        # gzip.decompress reads every member (BGZF, concatenated streams)
+        return gzip.decompress(view) if gzipped else bytes(view)
+    if gzipped:
+        return bytes(view)
+    return _compress(view, FAST_LEVEL if codec == "deflate" else DEFAULT_LEVEL)
+
+
+def encode_volume(data, codec, deployment, prof=NULL_PROFILE):
+    """``data`` in the encoding ``choose_codec`` picks; non-NIfTI data as is."""
+    if not is_nifti(data):
+        return data
+    gzipped = is_gzip(data)
+    target = choose_codec(codec, memoryview(data).nbytes, gzipped, deployment)
+    if (target == "raw") != gzipped:
+        return data  # already in the target encoding
+    prof.lookup("codec")
+    with prof.time("codec"):
+        return transcode(data, target)
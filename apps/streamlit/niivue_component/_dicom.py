@@ -0,0 +1,279 @@
+"""DICOM series to a viewable volume, with headers parsed in parallel.
+
+Scanners write one file per slice, so a series is hundreds to thousands of
+small files. ``scan_dicom`` reads every header (without pixel data) on a
+thread pool and groups the files by ``SeriesInstanceUID``; ``load_dicom``
+then reads the pixel data of one series on the same pool, orders the slices
+along the slice normal and stacks them into an (x, y, z) array with its RAS
+affine, ready for ``niivue_viewer(nifti_data=volume, affine=affine)``.
+
+Threads rather than processes: file reads and pixel decoding release the
+GIL, blobs need no pickling, and worker processes would re-import the
+Streamlit script on platforms that spawn. Stacked volumes are cached per
+series UID and the identity of its files (path, size and mtime, or the
+content of blobs), so reruns and other sessions reuse them.
+
+Needs the optional ``pydicom`` dependency (``pip install
+niivue-streamlit[dicom]``). Classic single-frame series only; enhanced
+multi-frame objects are rejected.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ._memo import memoize
+from ._payload import content_key, is_bytes_like
+from ._profile import record_miss
+
+# Slices whose position along the normal differ by less than this (mm) are
+# treated as duplicates of one location
+POSITION_TOLERANCE = 1e-3
+
+
+def _pydicom():
+    try:
+        import pydicom
+    except ImportError as err:
+        raise ImportError(
+            "DICOM support requires pydicom: pip install niivue-streamlit[dicom]"
+        ) from err
+    return pydicom
+
+
+def _sources(source):
+    """File paths or bytes-like blobs from a directory, a path or a list."""
+    if isinstance(source, (str, os.PathLike)):
+        root = os.fspath(source)
+        if os.path.isfile(root):
+            return [root]
+        if not os.path.isdir(root):
+            raise ValueError(f"No such DICOM file or directory: {root!r}")
+        return sorted(
+            os.path.join(folder, name)
+            for folder, _, names in os.walk(root)
+            for name in names
+            if not name.startswith(".")
+        )
+    if is_bytes_like(source):
+        return [source]
+    items = list(source)
+    for i, item in enumerate(items):
+        if not (is_bytes_like(item) or isinstance(item, (str, os.PathLike))):
+            raise ValueError(f"DICOM source {i} must be a path or bytes, got {type(item).__name__}")
+    return [item if is_bytes_like(item) else os.fspath(item) for item in items]
+
+
+def _identity(item):
+    """Cache identity of one file: path, size and mtime, or blob content."""
+    if is_bytes_like(item):
+        return content_key(item)
+    stat = os.stat(item)
+    return item, stat.st_size, stat.st_mtime_ns
+
+
+def _read(item, headers_only):
+    pydicom = _pydicom()
+    handle = io.BytesIO(item) if is_bytes_like(item) else item
+    return pydicom.dcmread(handle, stop_before_pixels=headers_only)
+
+
+def _header(index, item):
+    """Sorting and grouping fields of one file, or None if it is not DICOM."""
+    pydicom = _pydicom()
+    try:
+        ds = _read(item, headers_only=True)
+    except (pydicom.errors.InvalidDicomError, EOFError, OSError):
+        return None
+    uid = ds.get("SeriesInstanceUID")
+    if uid is None or "Rows" not in ds:
+        return None  # DICOMDIR, structured reports, presentation states
+    return {
+        "index": index,
+        "uid": str(uid),
+        "description": str(ds.get("SeriesDescription", "")),
+        "modality": str(ds.get("Modality", "")),
+        "shape": (int(ds.Rows), int(ds.Columns)),
+        "frames": int(ds.get("NumberOfFrames", 1) or 1),
+        "position": _floats(ds.get("ImagePositionPatient")),
+        "orientation": _floats(ds.get("ImageOrientationPatient")),
+        "spacing": _floats(ds.get("PixelSpacing")),
+        "thickness": _floats([ds.get("SliceThickness")]),
+        "instance": int(ds.get("InstanceNumber", 0) or 0),
+    }
+
+
+def _floats(values):
+    try:
+        return tuple(float(v) for v in values)
+    except (TypeError, ValueError):
+        return None
+
+
+def _map(function, args, max_workers):
+    """``function(*a)`` for each tuple ``a`` of ``args``, on a thread pool."""
+    if not args:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(function, *zip(*args)))
+
+
+@memoize(key=lambda identity, _items, max_workers: (identity, max_workers))
+def _scan_cached(identity, _items, max_workers):
+    """Headers of ``_items`` grouped by series; cached per file identities."""
+    record_miss("dicom_scan")
+    headers = _map(_header, list(enumerate(_items)), max_workers)
+    series = {}
+    for header in headers:
+        if header is not None:
+            series.setdefault(header["uid"], []).append(header)
+    return series
+
+
+def _scan(items, max_workers):
+    return _scan_cached(tuple(_identity(item) for item in items), items, max_workers)
+
+
+def scan_dicom(source, max_workers=None) -> dict:
+    """Summarize the DICOM series in ``source``.
+
+    ``source`` is a directory (searched recursively), a file path, or a list
+    of paths or bytes-like blobs. Returns ``{series_uid: {"description",
+    "modality", "slices"}}``; files that are not DICOM images are skipped.
+    """
+    series = _scan(_sources(source), max_workers)
+    return {
+        uid: {
+            "description": headers[0]["description"],
+            "modality": headers[0]["modality"],
+            "slices": len(headers),
+        }
+        for uid, headers in series.items()
+    }
+
+
+def _normal(orientation):
+    row, col = np.asarray(orientation[:3]), np.asarray(orientation[3:])
+    return row, col, np.cross(row, col)
+
+
+def _order(headers):
+    """Headers sorted along the slice normal (else by instance number)."""
+    if all(h["position"] and h["orientation"] for h in headers):
+        normal = _normal(headers[0]["orientation"])[2]
+        return sorted(headers, key=lambda h: (float(np.dot(normal, h["position"])), h["instance"]))
+    return sorted(headers, key=lambda h: h["instance"])
+
+
+def series_affine(headers):
+    """RAS voxel-to-world affine of slices ordered by ``_order``.
+
+    Voxel axes are (column, row, slice). DICOM patient coordinates are LPS,
+    so the first two world axes are negated.
+    """
+    first = headers[0]
+    spacing = first["spacing"] or (1.0, 1.0)
+    if not (first["orientation"] and first["position"]):
+        lps = np.diag([spacing[1], spacing[0], (first["thickness"] or (1.0,))[0] or 1.0, 1.0])
+        return np.diag([-1.0, -1.0, 1.0, 1.0]) @ lps
+    row, col, normal = _normal(first["orientation"])
+    if len(headers) > 1:
+        step = (np.asarray(headers[-1]["position"]) - np.asarray(first["position"])) / (len(headers) - 1)
+    else:
+        step = normal * ((first["thickness"] or (1.0,))[0] or 1.0)
+    lps = np.eye(4)
+    lps[:3, 0] = row * spacing[1]
+    lps[:3, 1] = col * spacing[0]
+    lps[:3, 2] = step
+    lps[:3, 3] = first["position"]
+    return np.diag([-1.0, -1.0, 1.0, 1.0]) @ lps
+
+
+def _pixels(item):
+    ds = _read(item, headers_only=False)
+    pixels = ds.pixel_array
+    slope = float(ds.get("RescaleSlope", 1) or 1)
+    inter = float(ds.get("RescaleIntercept", 0) or 0)
+    return pixels, slope, inter
+
+
+def _rescaled(stack, slopes, inters):
+    """Apply per-slice rescaling; integer data stays integer when it can."""
+    slopes = np.asarray(slopes, np.float32).reshape(-1, 1, 1)
+    inters = np.asarray(inters).reshape(-1, 1, 1)
+    if np.all(slopes == 1) and np.all(inters == np.round(inters)):
+        shifted = stack.astype(np.int32) + inters.astype(np.int32)
+        for dtype in (np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if shifted.size == 0 or (shifted.min() >= info.min and shifted.max() <= info.max):
+                return shifted.astype(dtype, copy=False)
+    return stack.astype(np.float32) * slopes + inters.astype(np.float32)
+
+
+@memoize(key=lambda uid, identity, _items, _headers, max_workers: (uid, identity, max_workers))
+def _stack(uid, identity, _items, _headers, max_workers):
+    """The (x, y, z) volume and affine of one series; cached per files."""
+    record_miss("dicom")
+    headers = _order(_headers)
+    if len({h["shape"] for h in headers}) > 1:
+        raise ValueError(f"DICOM series {uid} mixes image sizes")
+    if any(h["frames"] > 1 for h in headers):
+        raise ValueError(f"DICOM series {uid} is multi-frame, which is not supported")
+    if len(headers) > 1 and all(h["position"] and h["orientation"] for h in headers):
+        normal = _normal(headers[0]["orientation"])[2]
+        along = np.array([np.dot(normal, h["position"]) for h in headers])
+        duplicated = np.min(np.diff(along)) < POSITION_TOLERANCE
+    else:
+        duplicated = False
+    if duplicated:
+        raise ValueError(
+            f"DICOM series {uid} has several images per location "
+            "(e.g. echoes or time points); select one by filtering the files"
+        )
+    # Each worker decodes one slice straight into the stack
+    first, slope, inter = _pixels(_items[headers[0]["index"]])
+    stack = np.empty((len(headers),) + first.shape, dtype=first.dtype)
+    stack[0] = first
+
+    def fill(k, item):
+        pixels, slope, inter = _pixels(item)
+        stack[k] = pixels
+        return slope, inter
+
+    rest = [(k, _items[h["index"]]) for k, h in enumerate(headers) if k > 0]
+    scaling = [(slope, inter)] + _map(fill, rest, max_workers)
+    slopes = [slope for slope, _ in scaling]
+    inters = [inter for _, inter in scaling]
+    # (slice, row, column) -> (column, row, slice), as NIfTI stores x fastest
+    volume = _rescaled(stack, slopes, inters).transpose(2, 1, 0)
+    volume.flags.writeable = False
+    return volume, series_affine(headers)
+
+
+def load_dicom(source, series_uid=None, max_workers=None):
+    """Stack one DICOM series into a volume ready for ``niivue_viewer``.
+
+    ``source`` is as for ``scan_dicom``. ``series_uid`` selects the series
+    and may be omitted when there is only one. Returns ``(volume, affine)``:
+    an (x, y, z) array (int16 when the rescaled values fit, else int32 or
+    float32) and its RAS affine. Cached per series and files, so calling it
+    on every rerun is cheap after the first; the volume is read-only.
+    ``max_workers`` sizes the thread pool (default: Python's default).
+    """
+    items = _sources(source)
+    series = _scan(items, max_workers)
+    if not series:
+        raise ValueError("No DICOM images found")
+    if series_uid is None:
+        if len(series) > 1:
+            raise ValueError(
+                f"Found {len(series)} DICOM series, pass series_uid to pick one of: "
+                + ", ".join(sorted(series))
+            )
+        series_uid = next(iter(series))
+    if series_uid not in series:
+        raise ValueError(f"No DICOM series with UID {series_uid!r}")
+    headers = series[series_uid]
+    identity = tuple(_identity(items[h["index"]]) for h in headers)
+    return _stack(series_uid, identity, items, headers, max_workers)
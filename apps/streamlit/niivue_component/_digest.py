@@ -0,0 +1,86 @@
+"""Content digests of payloads, computed once per immutable object.
+
+The shared caches are keyed on content, so that a fresh copy of the same
+data hits: ``content_key`` is the length plus a BLAKE2b digest of a buffer,
+``array_key`` adds the shape, dtype and memory order of an array. Hashing
+streams through the whole buffer, which for a large volume costs about as
+much as copying it, so no object should be hashed more than once.
+
+Objects held by a shared cache (the canonical copies of the volume store,
+results of the result cache, mapped files of the source loader) are pinned
+with ``pin``: their digest is computed the first time it is asked for and
+kept until the last cache holding them calls ``unpin``. An interned volume
+is then hashed once, however many caches and reruns look it up. Only
+immutable objects (``bytes`` and read-only mapped files) may be pinned;
+arrays and writable buffers can change under us and are hashed on every
+lookup.
+"""
+import hashlib
+import mmap
+import threading
+
+BYTES_LIKE = (bytes, bytearray, memoryview, mmap.mmap)
+
+_pinned = {}  # id(data) -> [data, pins, content key or None]
+_lock = threading.Lock()
+
+
+def is_bytes_like(data) -> bool:
+    """True for the buffer types ``niivue_viewer`` accepts as payload data."""
+    return isinstance(data, BYTES_LIKE)
+
+
+def pin(data, key=None):
+    """Remember the digest of the immutable ``data`` until it is unpinned.
+
+    ``key`` is its ``content_key`` if the caller already computed it.
+    """
+    with _lock:
+        entry = _pinned.get(id(data))
+        if entry is None:
+            _pinned[id(data)] = [data, 1, key]
+        else:
+            entry[1] += 1
+            entry[2] = entry[2] or key
+
+
+def unpin(data):
+    """Drop one ``pin`` of ``data``; the digest is forgotten after the last."""
+    with _lock:
+        entry = _pinned.get(id(data))
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _pinned[id(data)]
+
+
+def is_pinned(data) -> bool:
+    """True while some cache holds ``data`` pinned."""
+    entry = _pinned.get(id(data))
+    return entry is not None and entry[0] is data
+
+
+def content_key(data):
+    """Length plus a 16-byte BLAKE2b digest of a bytes-like object."""
+    # A pinned object is kept alive by its entry, so its id cannot be reused
+    entry = _pinned.get(id(data))
+    if entry is not None and entry[2] is not None:
+        return entry[2]
+    view = memoryview(data).cast("B")
+    key = view.nbytes, hashlib.blake2b(view, digest_size=16).digest()
+    if entry is not None:
+        entry[2] = key
+    return key
+
+
+def array_key(array):
+    """Shape, dtype, memory order and a 16-byte BLAKE2b digest of an ndarray."""
+    if array.flags.c_contiguous:
+        order, buffer = "C", array
+    elif array.flags.f_contiguous:
+        order, buffer = "F", array.T  # C-contiguous view of the same memory
+    else:
+        order, buffer = "C", array.copy()
+    digest = hashlib.blake2b(memoryview(buffer).cast("B"), digest_size=16).digest()
+    return array.shape, array.dtype.str, order, digest
@@ -0,0 +1,149 @@
+"""Round-trip of the drawing layer for ``niivue_viewer(drawing=...)``.
+
+The viewer sends the layer back as versioned updates (see ``drawing.ts``):
+the first holds the whole layer, later ones only the slabs of axial slices
+that changed since the previous update, each zlib-compressed and
+base64-encoded. Label masks are mostly runs of equal bytes, so a 256³ layer
+travels as a few tens of kilobytes. ``DrawingState`` applies the updates in
+order. Streamlit may coalesce reruns, so an update can arrive on top of a
+version other than the one it was diffed against; it is then not applied
+and ``resync`` is incremented, which makes the viewer send the whole layer
+again.
+
+niivue keeps the layer in its RAS-reoriented voxel order. ``mask`` undoes
+that with a transpose and flips, i.e. views, so the array lines up with the
+voxel grid of ``nifti_data`` without copying. A whole-layer update is
+decoded without copying too; the first slab update after it copies the
+(read-only) buffer once.
+"""
+import base64
+import zlib
+
+import numpy as np
+import streamlit as st
+
+from ._nifti import is_array
+from ._payload import is_bytes_like
+
+STATE_PREFIX = "niivue_drawing:"
+
+
+def resolve_drawing(drawing):
+    """Normalize ``drawing`` to ``{"data": initial mask or None, "pen": int}``, or None."""
+    if drawing is None or drawing is False:
+        return None
+    if drawing is True:
+        return {"data": None, "pen": 1}
+    if is_bytes_like(drawing) or is_array(drawing):
+        drawing = {"data": drawing}
+    if not isinstance(drawing, dict):
+        raise ValueError(
+            "drawing must be True, an initial mask (bytes or numpy array) or a "
+            f"dict with 'data' and/or 'pen', got {type(drawing).__name__}"
+        )
+    data = drawing.get("data")
+    if data is not None and not (is_bytes_like(data) or is_array(data)):
+        raise ValueError("drawing: 'data' must be bytes or a numpy array")
+    if is_array(data) and data.dtype == np.bool_:
+        data = data.astype(np.uint8)
+    pen = drawing.get("pen", 1)
+    if isinstance(pen, bool) or not isinstance(pen, (int, np.integer)) or not 0 <= pen <= 255:
+        raise ValueError(f"drawing: 'pen' must be an integer label from 0 to 255, got {pen!r}")
+    return {"data": data, "pen": int(pen)}
+
+
+def _decode_slab(slab, shape):
+    data = np.frombuffer(zlib.decompress(base64.b64decode(slab["data"])), np.uint8)
+    if data.size != np.prod(shape):
+        raise ValueError(
+            f"drawing slab {slab['start']}:{slab['stop']} has {data.size} voxels, "
+            f"expected {int(np.prod(shape))}"
+        )
+    return data.reshape(shape)
+
+
+def to_native(ras, perm):
+    """View of an (x, y, z) RAS-ordered layer in the image's own voxel order.
+
+    ``perm`` is niivue's ``permRAS``: RAS axis ``i`` is native axis
+    ``abs(perm[i]) - 1``, reversed when ``perm[i]`` is negative.
+    """
+    axes = [abs(int(p)) - 1 for p in perm]
+    if sorted(axes) != [0, 1, 2]:
+        return ras
+    native = ras.transpose(np.argsort(axes))
+    index = [slice(None)] * 3
+    for axis, p in zip(axes, perm):
+        if p < 0:
+            index[axis] = slice(None, None, -1)
+    return native[tuple(index)]
+
+
+class DrawingState:
+    """The drawing layer of one viewer, rebuilt from its updates."""
+
+    def __init__(self):
+        self.version = 0
+        self.resync = 0
+        self._layer = None  # (z, y, x): x varies fastest, as in niivue
+        self._perm = (1, 2, 3)
+        self._rejected = None
+
+    def apply(self, update) -> bool:
+        """Apply one update; False if it is not one, was seen, or was rejected."""
+        if not isinstance(update, dict) or update.get("type") != "drawing":
+            return False
+        version = update["version"]
+        if version in (self.version, self._rejected):
+            return False
+        nx, ny, nz = update["dims"]
+        base = update.get("base_version")
+        slabs = update["slabs"]
+        if base is None:
+            if len(slabs) == 1 and (slabs[0]["start"], slabs[0]["stop"]) == (0, nz):
+                layer = _decode_slab(slabs[0], (nz, ny, nx))
+                slabs = []
+            else:
+                layer = np.zeros((nz, ny, nx), np.uint8)
+        elif base != self.version or self._layer is None or self._layer.shape != (nz, ny, nx):
+            self._rejected = version
+            self.resync += 1
+            return False
+        else:
+            layer = self._layer
+        if slabs and not layer.flags.writeable:
+            layer = layer.copy()
+        for slab in slabs:
+            layer[slab["start"]:slab["stop"]] = _decode_slab(
+                slab, (slab["stop"] - slab["start"], ny, nx)
+            )
+        self._layer = layer
+        self._perm = tuple(update.get("perm") or (1, 2, 3))
+        self.version = version
+        return True
+
+    @property
+    def mask(self):
+        """The layer as a uint8 array in the image's voxel order, or None."""
+        if self._layer is None:
+            return None
+        return to_native(self._layer.T, self._perm)
+
+
+def drawing_state(key) -> DrawingState:
+    """The ``DrawingState`` of the viewer with ``key`` in this session."""
+    name = STATE_PREFIX + key
+    if name not in st.session_state:
+        st.session_state[name] = DrawingState()
+    return st.session_state[name]
+
+
+def drawing_mask(key):
+    """The drawing layer of the viewer with ``key``, or None.
+
+    A uint8 array in the voxel order of that viewer's ``nifti_data`` (0 is
+    background, other values are pen labels), as of the last update the
+    viewer sent. None before the first one.
+    """
+    state = st.session_state.get(STATE_PREFIX + key)
+    return None if state is None else state.mask
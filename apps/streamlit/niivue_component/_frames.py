@@ -0,0 +1,165 @@
+"""Lazy frame streaming of 4D series for ``niivue_viewer(frame_window=...)``.
+
+fMRI and diffusion series run to gigabytes, most of which the viewer never
+shows. In frame mode the series stays on the Python side, memory-mapped if
+it is an ``np.memmap`` or uncompressed NIfTI bytes, and each run sends only
+the current frame plus ``frame_window`` frames on either side as 3D NIfTI
+images. The viewer swaps frames in place as the user scrubs, prefetching
+the window, and asks for a new window with a ``frame_change`` value; a
+clicked voxel's time course is read from the series with one strided slice.
+
+A gzipped series cannot be viewed in place, and gigabyte series do not fit
+the result cache. It is decompressed once, in chunks, into an anonymous
+temporary file that is then memory-mapped: its pages live in the OS page
+cache rather than on the heap, and the file is deleted with its mapping.
+The mapping is kept in the session next to the viewer's frame, keyed by the
+content of the compressed series, so scrubbing reruns reuse it.
+
+The current frame is kept per viewer ``key`` in the session, next to an id
+of the series, so that loading another series starts again at frame 0.
+"""
+import gzip
+import hashlib
+import io
+import mmap
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+import streamlit as st
+
+from ._codec import is_gzip
+from ._digest import content_key
+from ._nifti import is_array, nifti_to_array
+
+STATE_PREFIX = "niivue_frames:"
+
+COPY_CHUNK_BYTES = 16 * 1024 ** 2
+
+
+def resolve_frame_window(frame_window):
+    """Validate ``frame_window``: None or a non-negative integer."""
+    if frame_window is None:
+        return None
+    if isinstance(frame_window, bool) or not isinstance(frame_window, (int, np.integer)) \
+            or frame_window < 0:
+        raise ValueError(
+            f"frame_window must be a non-negative integer or None, got {frame_window!r}"
+        )
+    return int(frame_window)
+
+
+class FrameStream:
+    """Frame-by-frame access to a 4D ``nifti_data``.
+
+    Accepts an (x, y, z, t) ndarray, including ``np.memmap``, or single-file
+    NIfTI-1 bytes. Uncompressed ``bytes`` and mapped files are viewed in
+    place, never read in full; gzipped bytes are decompressed once into a
+    mapped temporary file, kept in the session of the viewer ``key``, so
+    prefer uncompressed files or arrays for large series. ``affine``
+    overrides the one in NIfTI bytes.
+    """
+
+    def __init__(self, data, affine=None, window=0, key=None):
+        if is_array(data):
+            series = data
+        else:
+            if is_gzip(data):
+                data = _gunzipped(data, key)
+            try:
+                series, header_affine = nifti_to_array(data)
+            except ValueError as err:
+                raise ValueError(f"frame_window requires ndarray or NIfTI-1 nifti_data: {err}") from err
+            if affine is None:
+                affine = header_affine
+        if series.ndim != 4:
+            raise ValueError(
+                f"frame_window requires 4D nifti_data (x, y, z, t), got shape {series.shape}"
+            )
+        self.series = series
+        self.affine = affine
+        self.window = window
+        self.count = series.shape[3]
+        self.series_id = _series_id(series)
+
+    def indices(self, current):
+        """Frames sent with ``current``: the window around it, within the series."""
+        return range(max(0, current - self.window), min(self.count, current + self.window + 1))
+
+    def frame(self, index):
+        """One (x, y, z) frame; only this frame is read from a memory map."""
+        return self.series[..., index]
+
+    def time_course(self, voxel):
+        """Values of ``voxel`` over all frames, or None if it is out of bounds."""
+        x, y, z = (int(v) for v in voxel)
+        nx, ny, nz = self.series.shape[:3]
+        if not (0 <= x < nx and 0 <= y < ny and 0 <= z < nz):
+            return None
+        return np.asarray(self.series[x, y, z, :])
+
+
+def _gunzip_to_map(data):
+    """Decompress ``data`` into an anonymous temporary file and map it."""
+    source = data if isinstance(data, bytes) else bytes(data)
+    with tempfile.TemporaryFile() as out:
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(source)) as stream:
+                shutil.copyfileobj(stream, out, COPY_CHUNK_BYTES)
+        except (OSError, EOFError, zlib.error) as err:
+            raise ValueError(f"frame_window cannot decompress nifti_data: {err}") from err
+        if out.tell() == 0:
+            return b""
+        out.flush()
+        # The mapping keeps the file open; it is deleted when the map closes
+        mapped = mmap.mmap(out.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped)
+
+
+def _gunzipped(data, key):
+    """Decompressed gzipped series, mapped once per viewer ``key`` and content."""
+    if key is None:
+        return _gunzip_to_map(data)
+    name = f"{STATE_PREFIX}{key}:series"
+    digest = content_key(data)
+    held = st.session_state.get(name)
+    if held is None or held[0] != digest:
+        held = st.session_state[name] = (digest, _gunzip_to_map(data))
+    return held[1]
+
+
+def _series_id(series):
+    """Stable across runs for the same content: shape, dtype and a sample."""
+    sample = series.flat[np.linspace(0, series.size - 1, 256, dtype=np.intp)] if series.size else series
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr((series.shape, series.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(sample).tobytes())
+    return digest.hexdigest()
+
+
+class FrameState:
+    """The frame a viewer shows, for one series."""
+
+    def __init__(self, series_id):
+        self.series_id = series_id
+        self.frame = 0
+
+    def apply(self, value, count) -> bool:
+        """Follow a ``frame_change`` value from the viewer; False for other values."""
+        if not isinstance(value, dict) or value.get("type") != "frame_change":
+            return False
+        frame = value.get("frame")
+        if not isinstance(frame, int) or not 0 <= frame < count:
+            return False
+        self.frame = frame
+        return True
+
+
+def frame_state(key, series_id) -> FrameState:
+    """The ``FrameState`` of the viewer with ``key``, reset for a new series."""
+    name = STATE_PREFIX + key
+    state = st.session_state.get(name)
+    if state is None or state.series_id != series_id:
+        state = st.session_state[name] = FrameState(series_id)
+    return state
@@ -0,0 +1,286 @@
+"""Lazy payload sources, loaded on a background thread pool.
+
+Review apps step through subjects with a "next" button. Reading the next
+volume inside the rerun makes every click wait for the disk. Wherever
+``niivue_viewer`` takes payload data it therefore also accepts a path
+(``str`` or ``os.PathLike``) or a zero-argument loader returning bytes or
+an array. Sources are loaded on a process-wide thread pool, and the results
+are kept in a bounded LRU cache, interned in the shared volume store. A
+rerun waits only for sources that are not loaded yet, behind a spinner.
+``prefetch`` submits the next subjects ahead of time. By the time the user
+clicks "next", the volume is already in memory and the rerun only packs it.
+
+A path is memory-mapped rather than read (see ``_payload.map_file``), so
+its voxels stay in the page cache instead of the Python heap; loading asks
+the kernel to read them ahead. A path is identified by its absolute path,
+mtime and size, so an edited file is mapped again. A ``functools.partial``
+is identified by the code, constants and defaults of its function and by
+its arguments, so ``partial(load_subject, "sub-02")`` built afresh in every
+run still finds its prefetched result, while editing a literal in
+``load_subject`` loads again. Any other loader may depend on
+``st.session_state`` or other state the cache cannot see, so it is run on
+every call and never cached; its result could otherwise be stale or belong
+to another session. Results count against ``NIIVUE_PREFETCH_MAX_BYTES``
+(default 1 GiB); the least recently used ones are dropped beyond it, and
+loads still running are never dropped.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import streamlit as st
+
+from ._nifti import is_array
+from ._digest import pin, unpin
+from ._payload import (
+    TRANSPORTS,
+    is_bytes_like,
+    is_mapped,
+    is_volume_like,
+    map_file,
+    payload_cache,
+)
+from ._store import volume_store
+
+DEFAULT_PREFETCH_MAX_BYTES = 1024 ** 3
+
+DEFAULT_LOAD_WORKERS = 4
+
+
+def default_prefetch_max_bytes():
+    """``$NIIVUE_PREFETCH_MAX_BYTES``, else 1 GiB."""
+    return int(os.environ.get("NIIVUE_PREFETCH_MAX_BYTES", DEFAULT_PREFETCH_MAX_BYTES))
+
+
+def is_path(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def is_cacheable_source(source) -> bool:
+    """True for sources whose results are cached: a path or a partial."""
+    return is_path(source) or isinstance(source, functools.partial)
+
+
+def is_lazy_source(source) -> bool:
+    """True for sources loaded on the pool: a path or a zero-argument callable."""
+    return is_path(source) or callable(source)
+
+
+def source_name(source):
+    """File name of a path source (for niivue's format detection), else None."""
+    return os.path.basename(os.fspath(source)) if is_path(source) else None
+
+
+def _function_identity(function):
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return function
+    try:
+        cells = tuple(cell.cell_contents for cell in function.__closure__ or ())
+        kwdefaults = tuple(sorted((function.__kwdefaults__ or {}).items()))
+        identity = (
+            function.__module__, function.__qualname__, code.co_code, code.co_consts,
+            function.__defaults__, kwdefaults, cells,
+        )
+        hash(identity)
+    except (TypeError, ValueError):  # unhashable closure or empty cell
+        return function
+    return identity
+
+
+def source_key(source):
+    """Cache identity of a lazy source (see the module docstring)."""
+    if is_path(source):
+        path = os.path.abspath(os.fspath(source))
+        try:
+            stat = os.stat(path)
+        except OSError as err:
+            raise ValueError(f"Cannot read {path!r}: {err.strerror}") from err
+        return ("path", path, stat.st_mtime_ns, stat.st_size)
+    if isinstance(source, functools.partial):
+        identity = (
+            "partial",
+            _function_identity(source.func),
+            source.args,
+            tuple(sorted(source.keywords.items())),
+        )
+        try:
+            hash(identity)
+            return identity
+        except TypeError:
+            pass
+    return None  # loaded on every call, never cached
+
+
+def _nbytes(data):
+    return data.nbytes if is_array(data) else memoryview(data).nbytes
+
+
+def _load(source):
+    data = map_file(source) if is_path(source) else source()
+    if not is_volume_like(data):
+        raise ValueError(
+            f"Loader {source!r} must return bytes or a numpy array, got {type(data).__name__}"
+        )
+    if is_bytes_like(data):
+        _, data = volume_store.intern(data)
+    return data
+
+
+class SourceLoader:
+    """Load lazy sources on a thread pool and keep the results under a budget.
+
+    ``submit`` returns a future per source, shared by every caller asking
+    for the same source while its result is cached. Safe to share between
+    sessions (threads).
+    """
+
+    def __init__(self, max_bytes=None, max_workers=DEFAULT_LOAD_WORKERS):
+        self.max_bytes = default_prefetch_max_bytes() if max_bytes is None else max_bytes
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._futures = OrderedDict()  # source key -> Future
+        self._pinned = {}  # source key -> mapped result, pinned while cached
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, source):
+        key = source_key(source)
+        if key is None:
+            return self.run(_load, source)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and future.exception()):
+                self._futures.move_to_end(key)
+                self.hits += 1
+                return future
+            self.misses += 1
+            future = self._futures[key] = self._pool().submit(_load, source)
+        future.add_done_callback(lambda done: self._loaded(key, done))
+        return future
+
+    def _loaded(self, key, future):
+        with self._lock:
+            # A mapped file cannot change under us: keep its digest while cached
+            if self._futures.get(key) is future and not future.exception():
+                data = future.result()
+                if is_mapped(data):
+                    pin(data)
+                    self._pinned[key] = data
+        self._evict()
+
+    def run(self, function, *args):
+        """Run ``function(*args)`` on the pool (for follow-up work on results)."""
+        with self._lock:
+            return self._pool().submit(function, *args)
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="niivue-load")
+        return self._executor
+
+    def _evict(self):
+        with self._lock:
+            loaded = {
+                key: _nbytes(future.result())
+                for key, future in self._futures.items()
+                if future.done() and not future.exception()
+            }
+            total = sum(loaded.values())
+            for key, nbytes in loaded.items():
+                if total <= self.max_bytes:
+                    break
+                del self._futures[key]
+                self._unpin(key)
+                total -= nbytes
+                self.evictions += 1
+
+    def _unpin(self, key):
+        data = self._pinned.pop(key, None)
+        if data is not None:
+            unpin(data)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._pinned):
+                self._unpin(key)
+            self._futures.clear()
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters, loads in flight and the current size."""
+        with self._lock:
+            done = [f for f in self._futures.values() if f.done() and not f.exception()]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loading": sum(not f.done() for f in self._futures.values()),
+                "entries": len(done),
+                "nbytes": sum(_nbytes(f.result()) for f in done),
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared by all sessions of the server process
+source_loader = SourceLoader()
+
+
+def _submit(source, label):
+    try:
+        return source_loader.submit(source)
+    except ValueError as err:
+        raise ValueError(f"{label}: {err}") from err
+
+
+def load_sources(sources, labels):
+    """Load the lazy ``sources`` (all at once, on the pool); others pass through.
+
+    ``labels`` name the sources in errors. Shows a spinner while any of
+    them is still loading.
+    """
+    futures = [
+        _submit(source, label) if is_lazy_source(source) else None
+        for source, label in zip(sources, labels)
+    ]
+    pending = [f for f in futures if f is not None and not f.done()]
+    if pending:
+        with st.spinner("Loading…"):
+            wait(pending)
+    return [s if f is None else f.result() for s, f in zip(sources, futures)]
+
+
+def _warm_base64(data):
+    if is_bytes_like(data):
+        payload_cache.encode(data)
+
+
+def _after_load(future):
+    if future.exception() is None:
+        source_loader.run(_warm_base64, future.result())
+
+
+def prefetch(sources, transport="binary"):
+    """Start loading ``sources`` in the background and return immediately.
+
+    ``sources`` are paths or ``functools.partial`` loaders, e.g. the next
+    few subjects of a review queue; other loaders are never cached, so
+    loading them ahead of time would be wasted. Their results wait in a cache
+    bounded by ``NIIVUE_PREFETCH_MAX_BYTES`` (default 1 GiB), so a later
+    ``niivue_viewer`` call with the same source does not touch the disk.
+    With ``transport='base64'`` the base64 encodings of bytes payloads are
+    computed ahead of time too.
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError(f"transport must be one of {TRANSPORTS}, got {transport!r}")
+    for source in sources:
+        if not is_cacheable_source(source):
+            raise ValueError(
+                f"prefetch expects paths or functools.partial loaders, got {type(source).__name__}"
+            )
+        future = source_loader.submit(source)
+        if transport == "base64":
+            future.add_done_callback(_after_load)
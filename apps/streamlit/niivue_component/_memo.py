@@ -0,0 +1,175 @@
+"""Byte-bounded cache of derived payloads, shared by all sessions.
+
+NIfTI images of arrays, transcoded volumes, quantized volumes, pyramid
+levels, compacted meshes and stacked DICOM series are expensive to rebuild
+and are reused across reruns and sessions. ``st.cache_resource`` can only
+bound such caches by entry count, so sixteen 1 GiB volumes would all be
+kept. ``memoize`` keeps them in
+one process-wide ``ResultCache`` instead, charged for the bytes of each
+result (buffers and arrays, also inside tuples, lists and dicts) and
+evicted least recently used first beyond ``NIIVUE_RESULT_CACHE_MAX_BYTES``
+(default 512 MiB). A result larger than the budget is returned uncached.
+
+Arguments are keyed by content, as for the payload cache: bytes-like
+objects by ``content_key``, arrays by their shape, dtype, layout and a
+digest of their voxels, so a fresh copy of the same data hits and an array
+edited in place misses. Cached ``bytes`` results are pinned (see
+``_digest``), so passing one on to another cached function, or to the
+store, does not hash it again.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from ._digest import array_key, content_key, is_bytes_like, pin, unpin
+from ._nifti import is_array
+
+DEFAULT_RESULT_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+
+def default_result_cache_max_bytes():
+    """``$NIIVUE_RESULT_CACHE_MAX_BYTES``, else 512 MiB."""
+    return int(os.environ.get("NIIVUE_RESULT_CACHE_MAX_BYTES", DEFAULT_RESULT_CACHE_MAX_BYTES))
+
+
+def data_key(value):
+    """Hashable key of an argument: by content for buffers and arrays."""
+    if is_bytes_like(value):
+        return content_key(value)
+    if is_array(value):
+        return array_key(value)
+    if isinstance(value, (tuple, list)):
+        return type(value).__name__, tuple(data_key(item) for item in value)
+    if isinstance(value, dict):
+        return "dict", tuple(sorted((k, data_key(v)) for k, v in value.items()))
+    return value
+
+
+def _frozen_parts(value):
+    """The ``bytes`` objects of a result, nested ones included."""
+    if isinstance(value, bytes):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _frozen_parts(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _frozen_parts(item)
+
+
+def result_nbytes(value) -> int:
+    """Bytes held by a result: its buffers and arrays, nested ones included."""
+    if is_array(value):
+        return value.nbytes
+    if is_bytes_like(value):
+        return memoryview(value).nbytes
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(result_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(result_nbytes(item) for item in value.values())
+    return 0
+
+
+class ResultCache:
+    """LRU cache of computed results under a byte budget.
+
+    ``get`` returns the cached result for a key or computes, stores and
+    returns it. Safe to share between sessions (threads); two threads
+    missing the same key at once both compute it.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = default_result_cache_max_bytes() if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (result, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        result = compute()
+        nbytes = result_nbytes(result)
+        if nbytes <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (result, nbytes)
+                    self._nbytes += nbytes
+                    for part in _frozen_parts(result):
+                        pin(part)
+                    self._evict()
+        return result
+
+    def _drop(self, entry):
+        result, nbytes = entry
+        self._nbytes -= nbytes
+        for part in _frozen_parts(result):
+            unpin(part)
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._drop(entry)
+            self.evictions += 1
+
+    def clear(self, name=None):
+        """Drop every entry, or only those of the memoized function ``name``."""
+        with self._lock:
+            for key in [
+                k for k in self._entries
+                if name is None or (isinstance(k, tuple) and k[0] == name)
+            ]:
+                self._drop(self._entries.pop(key))
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters plus the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared by all sessions of the server process
+result_cache = ResultCache()
+
+
+def _args_key(*args, **kwargs):
+    return data_key(args), data_key(kwargs)
+
+
+def memoize(key=_args_key):
+    """Cache a function's results in ``result_cache``.
+
+    ``key`` maps the call's arguments to the cache key (default: all
+    arguments, by content); results of different functions never collide.
+    Like ``st.cache_resource``, the wrapper has a ``clear()`` that drops the
+    function's cached results.
+    """
+    def decorate(function):
+        name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def cached(*args, **kwargs):
+            return result_cache.get(
+                (name, key(*args, **kwargs)), lambda: function(*args, **kwargs)
+            )
+
+        cached.clear = lambda: result_cache.clear(name)
+        return cached
+
+    return decorate
@@ -0,0 +1,459 @@
+"""Conversion of meshes and mesh overlays to compact binary MZ3.
+
+ASCII GIfTI, OBJ and ASCII VTK surfaces are several times larger than the
+geometry they hold and are parsed text-first in the browser. ``compact_mesh``
+converts them (and binary GIfTI, VTK and FreeSurfer surfaces) once on the
+server into uncompressed little-endian MZ3: a 16-byte header followed by
+int32 faces and float32 vertices, which niivue copies straight into typed
+arrays. ``compact_mesh_overlay`` does the same for per-vertex values
+(FreeSurfer curv/thickness, GIfTI shape/func) as a scalar-only MZ3.
+
+Formats that are not recognised (tractography, meshes that are already
+MZ3, ...) are passed through unchanged.
+"""
+import base64
+import gzip
+import re
+import struct
+import zlib
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from ._memo import memoize
+from ._profile import record_miss
+
+MZ3_MAGIC = 23117  # "MZ"
+MZ3_FACES = 1
+MZ3_VERTICES = 2
+MZ3_RGBA = 4
+MZ3_SCALARS = 8
+MZ3_DOUBLE = 16
+
+FREESURFER_TRIANGLE_MAGIC = b"\xff\xff\xfe"
+FREESURFER_CURV_MAGIC = b"\xff\xff\xff"
+
+GIFTI_DTYPES = {
+    "NIFTI_TYPE_UINT8": "u1",
+    "NIFTI_TYPE_INT16": "i2",
+    "NIFTI_TYPE_INT32": "i4",
+    "NIFTI_TYPE_FLOAT32": "f4",
+    "NIFTI_TYPE_FLOAT64": "f8",
+}
+GIFTI_BASE64 = ("Base64Binary", "GIFTI_ENCODING_B64BIN")
+GIFTI_GZIP_BASE64 = ("GZipBase64Binary", "GIFTI_ENCODING_B64GZ")
+GIFTI_POINTSET = "NIFTI_INTENT_POINTSET"
+GIFTI_TRIANGLE = "NIFTI_INTENT_TRIANGLE"
+
+
+def write_mz3(faces=None, vertices=None, scalars=None) -> bytes:
+    """Serialize a mesh (``faces`` and ``vertices``) and/or ``scalars`` as MZ3.
+
+    ``faces`` is (n, 3) integer, ``vertices`` (m, 3) and ``scalars`` (m,) or
+    (k, m) for ``k`` per-vertex layers.
+    """
+    attr, parts = 0, []
+    n_faces = n_vertices = 0
+    if faces is not None:
+        faces = np.ascontiguousarray(faces, dtype="<i4").reshape(-1, 3)
+        attr |= MZ3_FACES
+        n_faces = len(faces)
+        parts.append(faces)
+    if vertices is not None:
+        vertices = np.ascontiguousarray(vertices, dtype="<f4").reshape(-1, 3)
+        attr |= MZ3_VERTICES
+        n_vertices = len(vertices)
+        parts.append(vertices)
+    if scalars is not None:
+        scalars = np.ascontiguousarray(scalars, dtype="<f4")
+        scalars = scalars.reshape(-1, scalars.shape[-1])
+        attr |= MZ3_SCALARS
+        n_vertices = scalars.shape[1]
+        parts.append(scalars)
+    header = struct.pack("<HHIII", MZ3_MAGIC, attr, n_faces, n_vertices, 0)
+    return b"".join([header, *(memoryview(p).cast("B") for p in parts)])
+
+
+def read_mz3(data):
+    """Parse MZ3 bytes (optionally gzipped) into ``(faces, vertices, scalars)``.
+
+    Missing parts are None; ``scalars`` has shape (layers, vertices).
+    """
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    magic, attr, n_faces, n_vertices, n_skip = struct.unpack_from("<HHIII", data, 0)
+    if magic != MZ3_MAGIC:
+        raise ValueError("Not an MZ3 file")
+    offset = 16 + n_skip
+    faces = vertices = scalars = None
+    if attr & MZ3_FACES:
+        faces = np.frombuffer(data, "<i4", n_faces * 3, offset).reshape(-1, 3)
+        offset += faces.nbytes
+    if attr & MZ3_VERTICES:
+        vertices = np.frombuffer(data, "<f4", n_vertices * 3, offset).reshape(-1, 3)
+        offset += vertices.nbytes
+    if attr & MZ3_RGBA:
+        offset += n_vertices * 4
+    if attr & MZ3_SCALARS:
+        dtype = "<f8" if attr & MZ3_DOUBLE else "<f4"
+        scalars = np.frombuffer(data, dtype, offset=offset).reshape(-1, n_vertices)
+    return faces, vertices, scalars
+
+
+def _read_freesurfer_surface(data):
+    end = data.index(b"\n\n", 3) + 2  # "created by ..." comment
+    n_vertices, n_faces = struct.unpack_from(">ii", data, end)
+    offset = end + 8
+    vertices = np.frombuffer(data, ">f4", n_vertices * 3, offset).reshape(-1, 3)
+    faces = np.frombuffer(data, ">i4", n_faces * 3, offset + vertices.nbytes).reshape(-1, 3)
+    return faces, vertices
+
+
+def _read_freesurfer_curv(data):
+    n_vertices, _, per_vertex = struct.unpack_from(">iii", data, 3)
+    values = np.frombuffer(data, ">f4", n_vertices * per_vertex, 15)
+    return values.reshape(n_vertices, per_vertex).T
+
+
+def _read_obj(data):
+    vertices, faces, polygons = [], [], []
+    for line in data.decode("utf-8", "replace").splitlines():
+        if line.startswith("v "):
+            vertices.append(line[2:])
+        elif line.startswith("f "):
+            face = [int(token.split("/", 1)[0]) for token in line[2:].split()]
+            if len(face) == 3:
+                faces.extend(face)
+            else:
+                polygons.append(face)
+    vertices = np.array(
+        [row.split()[:3] for row in vertices], dtype=np.float32
+    ).reshape(-1, 3)
+    for polygon in polygons:  # fan-triangulate quads and larger polygons
+        for i in range(1, len(polygon) - 1):
+            faces.extend((polygon[0], polygon[i], polygon[i + 1]))
+    faces = np.array(faces, dtype=np.int64).reshape(-1, 3)
+    # OBJ indices are 1-based; negative ones count back from the end
+    faces = np.where(faces < 0, faces + len(vertices), faces - 1)
+    return faces, vertices
+
+
+def _read_vtk(data):
+    header_end = 0
+    for _ in range(3):
+        header_end = data.index(b"\n", header_end) + 1
+    lines = data[:header_end].decode("ascii", "replace").splitlines()
+    binary = lines[2].strip().upper() == "BINARY"
+    body = data[header_end:]
+
+    def section(keyword):
+        match = re.search(rb"^" + keyword + rb"\s+(\d+)\s+(\w+)\s*\n", body, re.M)
+        if match is None:
+            raise ValueError(f"VTK file has no {keyword.decode()} section")
+        return match
+
+    points = section(b"POINTS")
+    n_points = int(points.group(1))
+    polygons = section(b"POLYGONS")
+    n_polygons, size = int(polygons.group(1)), int(polygons.group(2))
+    if binary:
+        dtype = {b"float": ">f4", b"double": ">f8"}[points.group(2).lower()]
+        vertices = np.frombuffer(body, dtype, n_points * 3, points.end())
+        cells = np.frombuffer(body, ">i4", size, polygons.end())
+    else:
+        text = body[points.end():polygons.start()].split()
+        vertices = np.array(text[:n_points * 3], dtype=np.float32)
+        cells = np.array(body[polygons.end():].split()[:size], dtype=np.int64)
+    if size == n_polygons * 4 and np.all(cells[::4] == 3):
+        faces = cells.reshape(-1, 4)[:, 1:]
+    else:
+        faces, i = [], 0
+        while i < len(cells):
+            count = cells[i]
+            polygon = cells[i + 1:i + 1 + count]
+            faces.extend(
+                (polygon[0], polygon[j], polygon[j + 1]) for j in range(1, count - 1)
+            )
+            i += count + 1
+    return np.asarray(faces).reshape(-1, 3), vertices.reshape(-1, 3)
+
+
+def _gifti_arrays(data):
+    """Yield ``(intent, array)`` for each DataArray of a GIfTI file."""
+    root = ET.fromstring(data)
+    for element in root.iter("DataArray"):
+        dtype = np.dtype(GIFTI_DTYPES[element.get("DataType")])
+        dims = [int(element.get(f"Dim{i}")) for i in range(int(element.get("Dimensionality")))]
+        encoding = element.get("Encoding")
+        text = element.findtext("Data") or ""
+        if encoding == "ASCII":
+            array = np.array(text.split(), dtype=dtype)
+        elif encoding in GIFTI_BASE64 + GIFTI_GZIP_BASE64:
+            raw = base64.b64decode(text)
+            if encoding in GIFTI_GZIP_BASE64:
+                raw = zlib.decompress(raw, 32 + zlib.MAX_WBITS)  # zlib or gzip
+            endian = ">" if element.get("Endian") == "BigEndian" else "<"
+            array = np.frombuffer(raw, dtype.newbyteorder(endian))
+        else:
+            raise ValueError(f"Unsupported GIfTI encoding {encoding}")
+        order = "F" if "ColumnMajor" in (element.get("ArrayIndexingOrder") or "") else "C"
+        yield element.get("Intent"), array.reshape(dims, order=order)
+
+
+def _read_gifti_surface(data):
+    arrays = dict(_gifti_arrays(data))
+    if GIFTI_POINTSET not in arrays or GIFTI_TRIANGLE not in arrays:
+        raise ValueError("GIfTI file has no surface (pointset and triangles)")
+    return arrays[GIFTI_TRIANGLE], arrays[GIFTI_POINTSET]
+
+
+def _read_gifti_values(data):
+    layers = [
+        array.reshape(len(array), -1).T
+        for intent, array in _gifti_arrays(data)
+        if intent not in (GIFTI_POINTSET, GIFTI_TRIANGLE)
+    ]
+    if not layers:
+        raise ValueError("GIfTI file has no per-vertex data")
+    return np.concatenate(layers)
+
+
+def mesh_reader(data, name):
+    """Reader for a mesh in ``data``, or None if it should be sent as-is."""
+    lower = name.lower()
+    if data[:3] == FREESURFER_TRIANGLE_MAGIC:
+        return _read_freesurfer_surface
+    if lower.endswith(".gii"):
+        return _read_gifti_surface
+    if lower.endswith(".obj"):
+        return _read_obj
+    if lower.endswith(".vtk"):
+        return _read_vtk
+    return None
+
+
+def overlay_reader(data, name):
+    """Reader for per-vertex values in ``data``, or None to send as-is."""
+    if data[:3] == FREESURFER_CURV_MAGIC:
+        return _read_freesurfer_curv
+    if name.lower().endswith(".gii"):
+        return _read_gifti_values
+    return None
+
+
+def _read_mz3_surface(data):
+    faces, vertices, _ = read_mz3(data)
+    if faces is None or vertices is None:
+        raise ValueError("MZ3 file has no faces and vertices")
+    return faces, vertices
+
+
+def _read_mz3_values(data):
+    scalars = read_mz3(data)[2]
+    if scalars is None:
+        raise ValueError("MZ3 file has no per-vertex data")
+    return scalars
+
+
+def parse_mesh(data, name):
+    """``(faces, vertices)`` of a mesh in any format ``compact_mesh`` reads or MZ3."""
+    if data[:2] == struct.pack("<H", MZ3_MAGIC) or name.lower().endswith(".mz3"):
+        return _read_mz3_surface(data)
+    reader = mesh_reader(data, name)
+    if reader is None:
+        raise ValueError(f"unsupported mesh format {name!r}")
+    return reader(data)
+
+
+def parse_mesh_overlay(data, name):
+    """Per-vertex values ``(layers, vertices)`` of a mesh overlay or MZ3."""
+    if data[:2] == struct.pack("<H", MZ3_MAGIC) or name.lower().endswith(".mz3"):
+        return _read_mz3_values(data)
+    reader = overlay_reader(data, name)
+    if reader is None:
+        raise ValueError(f"unsupported mesh overlay format {name!r}")
+    return reader(data)
+
+
+def _mz3_name(name):
+    return name if name.lower().endswith(".mz3") else f"{name}.mz3"
+
+
+@memoize()
+def compact_mesh(data, name):
+    """Convert a mesh to MZ3. Returns ``(data, name)``, unchanged if unsupported.
+
+    Cached by content, so re-runs with the same upload convert it once.
+    Raises ``ValueError`` if a supported format cannot be parsed.
+    """
+    record_miss("mesh")
+    data = bytes(data)
+    reader = mesh_reader(data, name)
+    if reader is None:
+        return data, name
+    try:
+        faces, vertices = reader(data)
+    except (ValueError, KeyError, IndexError, struct.error, ET.ParseError) as err:
+        raise ValueError(f"Could not parse mesh {name!r}: {err}") from err
+    return write_mz3(faces, vertices), _mz3_name(name)
+
+
+@memoize()
+def compact_mesh_overlay(data, name):
+    """Convert per-vertex values to a scalar-only MZ3, like ``compact_mesh``."""
+    record_miss("mesh")
+    data = bytes(data)
+    reader = overlay_reader(data, name)
+    if reader is None:
+        return data, name
+    try:
+        values = reader(data)
+    except (ValueError, KeyError, IndexError, struct.error, ET.ParseError) as err:
+        raise ValueError(f"Could not parse mesh overlay {name!r}: {err}") from err
+    return write_mz3(scalars=values), _mz3_name(name)
+
+
+DEFAULT_LOD_FRACTIONS = (0.1, 0.25)
+
+# Meshes with fewer faces render smoothly and are sent as-is.
+MIN_LOD_FACES = 100_000
+
+
+def resolve_lod(lod):
+    """Face fractions (ascending) for a ``mesh_lod`` value, or None if off."""
+    if lod is None or lod is False:
+        return None
+    if lod is True:
+        return DEFAULT_LOD_FRACTIONS
+    try:
+        fractions = tuple(sorted({float(f) for f in lod}))
+    except (TypeError, ValueError):
+        fractions = ()
+    if not fractions or not all(0 < f < 1 for f in fractions):
+        raise ValueError(
+            f"mesh_lod must be True, False or a sequence of face fractions "
+            f"between 0 and 1, got {lod!r}"
+        )
+    return fractions
+
+
+def _grid_labels(vertices, grid):
+    """Label of the ``grid``³ bounding-box cell of each vertex, densely numbered."""
+    low = vertices.min(axis=0)
+    cell = max(float((vertices.max(axis=0) - low).max()), 1e-12) / grid
+    index = np.minimum(((vertices - low) / cell).astype(np.int64), grid - 1)
+    cells = (index[:, 0] * grid + index[:, 1]) * grid + index[:, 2]
+    _, labels = np.unique(cells, return_inverse=True)
+    return labels
+
+
+def _collapse(faces, labels):
+    """Faces relabelled by cluster, without those collapsed to a line or point."""
+    faces = labels[faces]
+    a, b, c = faces.T
+    return faces[(a != b) & (b != c) & (a != c)]
+
+
+def _merge(faces, vertices, labels):
+    """Vertex-clustering simplification for the clusters given by ``labels``.
+
+    The vertices of each cluster are merged into their mean; faces that
+    collapse to a line or point, and duplicates, are dropped. Returns
+    ``(faces, vertices, labels)``.
+    """
+    counts = np.bincount(labels)
+    merged = np.stack(
+        [np.bincount(labels, weights=vertices[:, axis]) / counts for axis in range(3)],
+        axis=1,
+    )
+    faces = _collapse(faces, labels)
+    # Same triangle, whatever its winding: keep the first occurrence
+    corners = np.sort(faces, axis=1).astype(np.int64)
+    n = len(merged)
+    if n ** 3 < 2 ** 63:
+        keys = (corners[:, 0] * n + corners[:, 1]) * n + corners[:, 2]
+    else:
+        keys = corners.view(np.dtype((np.void, 24))).ravel()
+    _, first = np.unique(keys, return_index=True)
+    return faces[np.sort(first)], merged.astype(np.float32), labels
+
+
+def decimate(faces, vertices, fraction, tolerance=0.1, max_steps=6):
+    """Cluster ``vertices`` so roughly ``fraction`` of ``faces`` remain.
+
+    Vertices falling in the same cell of a regular grid over the bounding box
+    are merged (see ``_merge``); ``labels`` in the returned ``(faces,
+    vertices, labels)`` maps each input vertex to its merged vertex, for
+    resampling per-vertex values. The face count of a clustered surface
+    grows with the square of the grid resolution, so the grid is refined
+    from a coarse guess by that rule until the count is within
+    ``tolerance`` of the target.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    target = fraction * len(faces)
+    grid, best = 64, None
+    for _ in range(max_steps):
+        labels = _grid_labels(vertices, grid)
+        count = len(_collapse(faces, labels))
+        if best is None or abs(count - target) < abs(best[0] - target):
+            best = count, labels
+        if abs(count - target) <= tolerance * target:
+            break
+        next_grid = int(np.clip(round(grid * np.sqrt(target / max(count, 1))), 2, 2 ** 20))
+        if next_grid == grid:
+            break
+        grid = next_grid
+    return _merge(faces, vertices, best[1])
+
+
+def resample_values(values, labels, n_vertices):
+    """Average per-vertex ``values`` (layers, vertices) onto merged vertices."""
+    counts = np.bincount(labels, minlength=n_vertices)
+    return np.stack([
+        np.bincount(labels, weights=layer, minlength=n_vertices) / counts
+        for layer in np.asarray(values, dtype=np.float64)
+    ])
+
+
+@memoize()
+def build_mesh_levels(data, name, overlays=(), fractions=DEFAULT_LOD_FRACTIONS):
+    """Decimated MZ3 levels of a mesh and its overlays, coarsest first.
+
+    ``overlays`` is a sequence of ``(data, name)`` per-vertex files, which
+    are resampled onto every level by averaging the values of the merged
+    vertices. Returns a list of ``(fraction, mesh, [overlay, ...])`` with
+    MZ3 bytes, one per fraction that actually reduces the face count (and
+    below the previous level), and an empty list for meshes with fewer than
+    ``MIN_LOD_FACES`` faces. Raises ``ValueError`` if the mesh or an overlay
+    cannot be parsed.
+    """
+    record_miss("lod")
+    faces, vertices = parse_mesh(bytes(data), name)
+    faces = np.asarray(faces, dtype=np.int64)
+    values = [parse_mesh_overlay(bytes(d), n) for d, n in overlays]
+    for layers, (_, overlay_name) in zip(values, overlays):
+        if layers.shape[-1] != len(vertices):
+            raise ValueError(
+                f"overlay {overlay_name!r} has {layers.shape[-1]} values for "
+                f"{len(vertices)} vertices"
+            )
+    if len(faces) < MIN_LOD_FACES:
+        return []
+    levels, previous = [], 0
+    for fraction in sorted(fractions):
+        lod_faces, lod_vertices, labels = decimate(faces, vertices, fraction)
+        if len(lod_faces) <= previous or len(lod_faces) >= len(faces):
+            continue
+        previous = len(lod_faces)
+        levels.append((
+            fraction,
+            write_mz3(lod_faces, lod_vertices),
+            [write_mz3(scalars=resample_values(v, labels, len(lod_vertices))) for v in values],
+        ))
+    return levels
+
+
+def lod_name(name, fraction):
+    """File name of a decimated level, e.g. ``lh.pial.lod10.mz3``."""
+    stem = name[:-4] if name.lower().endswith(".mz3") else name
+    return f"{stem}.lod{round(fraction * 100)}.mz3"
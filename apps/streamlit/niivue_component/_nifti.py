@@ -0,0 +1,178 @@
+"""Build uncompressed NIfTI-1 images from NumPy arrays in memory.
+
+Pipelines usually hold volumes as an ``ndarray`` plus a 4×4 affine. Writing
+them out with nibabel and gzipping them just to hand ``bytes`` to
+``niivue_viewer`` costs a compression pass on the server and a
+decompression pass in the browser. ``array_to_nifti`` instead prepends a
+352-byte header to the array buffer: the voxel data is copied once into the
+result and never compressed.
+
+``nifti_to_array`` is the minimal inverse, used where the component has to
+look at voxel values itself (e.g. to build a progressive pyramid).
+"""
+import gzip
+import struct
+
+import numpy as np
+
+# NIfTI-1 datatype codes for the dtypes niivue can display.
+DATATYPE_CODES = {
+    np.dtype(np.uint8): 2,
+    np.dtype(np.int16): 4,
+    np.dtype(np.int32): 8,
+    np.dtype(np.float32): 16,
+    np.dtype(np.float64): 64,
+    np.dtype(np.int8): 256,
+    np.dtype(np.uint16): 512,
+    np.dtype(np.uint32): 768,
+    np.dtype(np.int64): 1024,
+    np.dtype(np.uint64): 1280,
+}
+
+HEADER_SIZE = 348
+VOX_OFFSET = 352  # header + 4-byte (empty) extension block
+
+NIFTI_UNITS_MM = 2
+NIFTI_UNITS_SEC = 8
+NIFTI_XFORM_ALIGNED_ANAT = 2
+
+
+def is_array(data) -> bool:
+    """True if ``data`` is a NumPy array to be converted to NIfTI."""
+    return isinstance(data, np.ndarray)
+
+
+def _coerce_affine(affine) -> np.ndarray:
+    if affine is None:
+        return np.eye(4)
+    affine = np.asarray(affine, dtype=np.float64)
+    if affine.shape == (3, 4):
+        affine = np.vstack([affine, [0.0, 0.0, 0.0, 1.0]])
+    if affine.shape != (4, 4):
+        raise ValueError(f"affine must have shape (4, 4), got {affine.shape}")
+    return affine
+
+
+def nifti_header(shape, dtype, affine=None, scl_slope=1.0, scl_inter=0.0) -> bytes:
+    """Return the header and empty extension block for an image.
+
+    The affine is stored as the sform (``sform_code`` 2, aligned anatomical),
+    which niivue uses when no qform is present. ``pixdim`` holds the voxel
+    sizes, i.e. the column norms of the affine's 3×3 part. ``scl_slope`` and
+    ``scl_inter`` map stored values to display values.
+    """
+    dtype = np.dtype(dtype)
+    code = DATATYPE_CODES.get(dtype.newbyteorder("="))
+    if code is None:
+        supported = ", ".join(sorted(str(d) for d in DATATYPE_CODES))
+        raise ValueError(f"Unsupported dtype {dtype}; expected one of: {supported}")
+    if not 1 <= len(shape) <= 7:
+        raise ValueError(f"Array must have 1 to 7 dimensions, got {len(shape)}")
+    affine = _coerce_affine(affine)
+
+    header = bytearray(VOX_OFFSET)
+    dims = [len(shape), *shape] + [1] * (7 - len(shape))
+    zooms = np.sqrt((affine[:3, :3] ** 2).sum(axis=0))
+    struct.pack_into("<i", header, 0, HEADER_SIZE)
+    struct.pack_into("<8h", header, 40, *dims)
+    struct.pack_into("<hh", header, 70, code, dtype.itemsize * 8)
+    struct.pack_into("<8f", header, 76, 1.0, *zooms, 1.0, 1.0, 1.0, 1.0)
+    struct.pack_into("<fff", header, 108, float(VOX_OFFSET), scl_slope, scl_inter)
+    struct.pack_into("<B", header, 123, NIFTI_UNITS_MM | NIFTI_UNITS_SEC)
+    struct.pack_into("<hh", header, 252, 0, NIFTI_XFORM_ALIGNED_ANAT)
+    struct.pack_into("<12f", header, 280, *affine[:3].ravel())
+    header[344:348] = b"n+1\0"
+    return bytes(header)
+
+
+def array_to_nifti(data, affine=None, scl_slope=1.0, scl_inter=0.0) -> bytes:
+    """Serialize ``data`` as an uncompressed single-file NIfTI-1 image.
+
+    Axes are interpreted as (x, y, z[, t, ...]) like ``nibabel``'s
+    ``get_fdata()``. Booleans are stored as ``uint8``. Big-endian arrays are
+    byte-swapped; otherwise the array buffer is copied straight into the
+    result, with no intermediate ``tobytes()`` when it is already
+    Fortran-ordered (as nibabel returns it).
+    """
+    if data.dtype == np.bool_:
+        data = data.view(np.uint8)
+    if data.dtype.byteorder == ">":
+        data = data.astype(data.dtype.newbyteorder("<"))
+    header = nifti_header(data.shape, data.dtype, affine, scl_slope, scl_inter)
+    # NIfTI stores x fastest, i.e. Fortran order; the transpose of a
+    # Fortran-ordered array is C-contiguous and exposes that buffer as-is.
+    voxels = np.asfortranarray(data).T
+    return b"".join([header, memoryview(voxels).cast("B")])
+
+
+def _quaternion_affine(quatern, offsets, pixdim):
+    """Voxel-to-world affine from the NIfTI-1 qform fields."""
+    b, c, d = quatern
+    a = np.sqrt(max(0.0, 1.0 - (b * b + c * c + d * d)))
+    rotation = np.array([
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a + c * c - b * b - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a + d * d - c * c - b * b],
+    ])
+    qfac = -1.0 if pixdim[0] < 0 else 1.0
+    affine = np.eye(4)
+    affine[:3, :3] = rotation * [pixdim[1], pixdim[2], qfac * pixdim[3]]
+    affine[:3, 3] = offsets
+    return affine
+
+
+def nifti_to_array(data):
+    """Parse single-file NIfTI-1 bytes (optionally gzipped).
+
+    Returns ``(array, affine)`` with the array indexed (x, y, z[, t, ...]) as
+    a read-only view of the (decompressed) buffer. Read-only buffers, such
+    as memory-mapped files, are viewed in place; others are copied first so
+    the array cannot change under the caller. ``scl_slope`` and
+    ``scl_inter`` are applied when set, yielding ``float32``. The affine is
+    the sform, else the qform, else a scaling by the voxel sizes. Raises
+    ``ValueError`` for anything else (NIfTI-2, detached ``.hdr``/``.img``,
+    other formats).
+    """
+    if not memoryview(data).readonly:
+        data = bytes(data)
+    data = memoryview(data).cast("B")
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Not a NIfTI-1 image: too short")
+    for endian in "<>":
+        if struct.unpack_from(endian + "i", data, 0)[0] == HEADER_SIZE:
+            break
+    else:
+        raise ValueError("Not a NIfTI-1 image: bad sizeof_hdr")
+    if data[344:348] != b"n+1\0":
+        raise ValueError("Only single-file NIfTI-1 images (magic 'n+1') are supported")
+
+    def field(fmt, offset):
+        return struct.unpack_from(endian + fmt, data, offset)
+
+    dims = field("8h", 40)
+    shape = tuple(int(n) for n in dims[1:1 + dims[0]])
+    code = field("h", 70)[0]
+    dtype = next((dt for dt, c in DATATYPE_CODES.items() if c == code), None)
+    if dtype is None:
+        raise ValueError(f"Unsupported NIfTI datatype code {code}")
+    dtype = dtype.newbyteorder(endian)
+    pixdim = field("8f", 76)
+    vox_offset = int(field("f", 108)[0])
+    slope, inter = field("2f", 112)
+
+    count = int(np.prod(shape))
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=vox_offset)
+    array = array.reshape(shape, order="F")
+    if slope not in (0.0, 1.0) or inter != 0.0:
+        array = array.astype(np.float32) * np.float32(slope or 1.0) + np.float32(inter)
+
+    qform_code, sform_code = field("2h", 252)
+    if sform_code > 0:
+        affine = np.vstack([np.array(field("12f", 280)).reshape(3, 4), [0, 0, 0, 1]])
+    elif qform_code > 0:
+        affine = _quaternion_affine(field("3f", 256), field("3f", 268), pixdim)
+    else:
+        affine = np.diag([pixdim[1], pixdim[2], pixdim[3], 1.0])
+    return array, affine
@@ -0,0 +1,349 @@
+"""Transport of binary payloads (volumes, overlays, meshes) to the frontend.
+
+Streamlit forwards top-level component arguments that are ``bytes`` as raw
+binary ("special args") which the iframe receives as a ``Uint8Array``; all
+other arguments are serialized to JSON. Nested structures such as the
+``overlays`` list therefore cannot carry bytes directly. ``PayloadPacker``
+hoists every blob into its own top-level ``blob_<n>`` argument and leaves a
+small ``{"blob": "blob_<n>", "hash": ...}`` reference in the JSON tree, which
+the frontend resolves back to an ``ArrayBuffer`` (see ``resolvePayload`` in
+``utils.ts``). The hash is the payload's BLAKE2b ``content_key`` digest, so the
+frontend can tell payloads apart without comparing their bytes.
+
+The opt-in ``url`` transport keeps payloads out of the component args
+altogether: each blob is registered once with Streamlit's media file manager,
+whose file IDs are content hashes, and only ``{"url": ..., "hash": ...}`` is
+sent. Re-runs that change only ``view_mode`` or ``settings`` then cost a few
+hundred bytes instead of a full resend, and the browser can skip reloading a
+payload whose hash it has already loaded.
+
+The legacy base64 transport is kept as a fallback: the reference is then the
+base64 string itself, exactly as before. Encodings are kept in a bounded,
+content-keyed ``PayloadCache`` so re-runs do not re-encode.
+
+NumPy arrays are accepted wherever bytes are and are converted to
+uncompressed NIfTI-1 images first (see ``_nifti.py``).
+
+Memory-mapped files (``mmap.mmap`` or a ``memoryview`` of one, as
+``map_file`` returns for paths) are accepted too. Their pages live in the
+OS page cache, shared by every session and process mapping the same file,
+so nothing holds a heap copy of the file between runs: base64 encodes
+straight from the mapping, and the binary and url transports take the one
+``bytes`` copy Streamlit requires only for the duration of the run.
+"""
+import base64
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from streamlit import config, runtime
+
+from ._digest import array_key, content_key, is_bytes_like, is_pinned, pin, unpin
+from ._memo import memoize
+from ._nifti import array_to_nifti, is_array
+from ._profile import NULL_PROFILE, record_miss
+
+TRANSPORTS = ("binary", "base64", "url")
+
+MEDIA_MIMETYPE = "application/octet-stream"
+
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+
+def default_cache_max_bytes():
+    """``$NIIVUE_PAYLOAD_CACHE_MAX_BYTES``, else 512 MiB."""
+    return int(os.environ.get("NIIVUE_PAYLOAD_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+
+
+class PayloadCache:
+    """Bounded LRU cache of base64-encoded payloads, keyed on content.
+
+    The key is the length plus a BLAKE2b digest of the data, so a fresh but
+    identical bytes object (e.g. from ``UploadedFile.getvalue()`` on every
+    run) still hits, and a recycled ``id`` can never return another
+    payload's encoding. The digest is computed once per ``bytes`` object:
+    each entry keeps a reference to the last object it was looked up with,
+    and a lookup with that same object skips hashing. Mutable buffers
+    (``bytearray``, writable ``memoryview``) are always hashed and never
+    kept; read-only mapped files are kept like ``bytes``.
+
+    Entries are charged for the encoded string plus the referenced source,
+    and the least recently used ones are evicted once ``max_bytes`` is
+    exceeded. Safe to share between sessions (threads).
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = default_cache_max_bytes() if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # content key -> (source, encoded, size)
+        self._keys_by_id = {}  # id(source) -> content key
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def encode(self, data) -> str:
+        """Return the base64 encoding of ``data``, from the cache if possible."""
+        with self._lock:
+            key = self._keys_by_id.get(id(data)) if is_frozen(data) else None
+            if key is not None and self._entries[key][0] is data:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+        key = content_key(data)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if is_frozen(data) and entry[0] is not data:
+                    self._replace(key, data, entry[1])
+                return entry[1]
+            self.misses += 1
+        record_miss("encode_b64")
+        encoded = base64.b64encode(memoryview(data).cast("B")).decode()
+        if is_frozen(data):
+            with self._lock:
+                if key not in self._entries:
+                    self._replace(key, data, encoded)
+                    self._evict()
+        return encoded
+
+    def _replace(self, key, source, encoded):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._forget(old)
+        size = len(encoded) + memoryview(source).nbytes
+        self._entries[key] = (source, encoded, size)
+        self._keys_by_id[id(source)] = key
+        self._nbytes += size
+        pin(source, key)
+
+    def _forget(self, entry):
+        source, _, size = entry
+        self._keys_by_id.pop(id(source), None)
+        self._nbytes -= size
+        unpin(source)
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._forget(entry)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                unpin(entry[0])
+            self._entries.clear()
+            self._keys_by_id.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters plus the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared by all sessions of the server process
+payload_cache = PayloadCache()
+
+
+@memoize()
+def nifti_image(array, affine=None):
+    """``array_to_nifti``, cached by the content of ``array`` and ``affine``.
+
+    A fresh copy of the same array gets the same image object back, so a
+    rerun neither converts it again nor has the store hash the image.
+    """
+    record_miss("nifti")
+    return array_to_nifti(array, affine)
+
+
+def is_volume_like(data) -> bool:
+    """True for payloads accepted as volumes: bytes-like or a NumPy array."""
+    return is_bytes_like(data) or is_array(data)
+
+
+def is_mapped(data) -> bool:
+    """True for a memory-mapped file or a ``memoryview`` of one."""
+    if isinstance(data, memoryview):
+        data = data.obj
+    return isinstance(data, mmap.mmap)
+
+
+def is_frozen(data) -> bool:
+    """True for payloads that cannot change under us: ``bytes`` and read-only maps."""
+    return isinstance(data, bytes) or (is_mapped(data) and memoryview(data).readonly)
+
+
+def map_file(path):
+    """Read-only ``memoryview`` of the file at ``path``, mapped into memory.
+
+    Pages are read on first access, and the kernel is asked to start
+    reading them ahead right away. The file must not be truncated while
+    the view is in use. Empty files, which cannot be mapped, give ``b""``.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+        mapped.madvise(mmap.MADV_WILLNEED)
+    return memoryview(mapped)
+
+
+def as_bytes(data) -> bytes:
+    """Return ``data`` as ``bytes``, without copying when it already is."""
+    return data if isinstance(data, bytes) else bytes(data)
+
+
+def register_media(data: bytes, coordinates: str) -> dict:
+    """Register ``data`` with Streamlit's media file manager.
+
+    The manager stores each distinct content once (its file ID is a content
+    hash) and keeps it alive for as long as a session re-registers it on
+    every run, so repeated calls are cheap. A registration replaces the
+    session's previous one at the same ``coordinates``, so these must be
+    unique per payload within a run. The returned URL is prefixed
+    with ``server.baseUrlPath`` because the component iframe, unlike
+    Streamlit's own elements, does not rewrite media URLs.
+    """
+    url = runtime.get_instance().media_file_mgr.add(data, MEDIA_MIMETYPE, coordinates)
+    file_hash = url.rsplit("/", 1)[-1].split(".", 1)[0]
+    base_path = config.get_option("server.baseUrlPath").strip("/")
+    if base_path:
+        url = f"/{base_path}{url}"
+    return {"url": url, "hash": file_hash}
+
+
+class PayloadPacker:
+    """Collect the binary payloads of a single ``niivue_viewer`` call.
+
+    ``pack`` returns the value to place in the JSON args; after all payloads
+    are packed, ``blobs`` holds the extra top-level arguments to pass to the
+    component function. The same object packed twice (e.g. one mask used as
+    two overlays) is only sent once. NumPy arrays are converted to NIfTI
+    once per call, together with their ``affine``.
+
+    The ``url`` transport needs a running Streamlit server; without one
+    (bare mode, unit tests) it falls back to ``binary``. ``nbytes`` and
+    ``count`` total the distinct payloads packed so far. ``encode``, if
+    given, maps the bytes of each payload to the bytes to send (see
+    ``_codec.encode_volume``); it should return the same object for the same
+    input, so shared payloads stay deduplicated. ``store``, if given, is a
+    ``_store.VolumeStore`` through which the bytes to send are interned, so
+    sessions sending identical payloads share one copy; ``store_keys``
+    collects the keys of the interned ones. ``key``, the viewer key,
+    namespaces the media registrations of the ``url`` transport.
+    """
+
+    def __init__(
+        self, transport="binary", profile=NULL_PROFILE, encode=None, store=None, key=None
+    ):
+        if transport not in TRANSPORTS:
+            raise ValueError(
+                f"transport must be one of {TRANSPORTS}, got {transport!r}"
+            )
+        self.transport = transport
+        self.profile = profile
+        self.encode = encode
+        self.store = store
+        self.key = key
+        self.store_keys = set()
+        self.nbytes = 0
+        self.count = 0
+        self.blobs = {}
+        self._refs_by_id = {}
+        self._packed = {}
+        self._keep = []
+
+    def pack(self, data, affine=None):
+        with self.profile.time("encode"):
+            if is_array(data):
+                return self._pack_array(data, affine)
+            if self.encode is not None:
+                data = self._encoded(data)
+            key, data = self._interned(data)
+            if self.transport == "base64":
+                return self._pack_base64(data)
+            return self._pack_bytes(data, key)
+
+    def _encoded(self, data):
+        encoded = self.encode(data)
+        if encoded is not data:
+            # Keep it alive for the call: payloads are deduped by id()
+            self._keep.append(encoded)
+        return encoded
+
+    def _interned(self, data):
+        """``(key, data)`` through the store; the key is None if not shared."""
+        if self.store is None:
+            return None, data
+        key, canonical = self.store.intern(data)
+        if key is not None:
+            self.store_keys.add(key)
+        return key, canonical
+
+    def _pack_base64(self, data):
+        key = ("b64", id(data))
+        packed = self._packed.get(key)
+        if packed is None:
+            self.profile.lookup("encode_b64")
+            packed = self._packed[key] = payload_cache.encode(data)
+            self._count(packed)
+        return packed
+
+    def _pack_array(self, data, affine):
+        key = (id(data), id(affine))
+        packed = self._packed.get(key)
+        if packed is None:
+            self.profile.lookup("nifti")
+            nifti = nifti_image(data, affine)
+            if self.encode is not None:
+                nifti = self._encoded(nifti)
+            shared, nifti = self._interned(nifti)
+            if self.transport == "base64" and shared is None and not is_pinned(nifti):
+                # Fresh bytes on every run: hashing them for the payload cache
+                # costs about as much as encoding, so bypass it.
+                packed = base64.b64encode(nifti).decode()
+                self._count(packed)
+            elif self.transport == "base64":
+                # Interned or cached: every run encodes the same object
+                packed = self._pack_base64(nifti)
+            else:
+                packed = self._pack_bytes(nifti, shared)
+            self._packed[key] = packed
+        return packed
+
+    def _pack_bytes(self, data, shared=None):
+        """Reference to ``data``; ``shared`` is its store key, if interned."""
+        ref = self._refs_by_id.get(id(data))
+        if ref is not None:
+            return ref
+        # Interned payloads were already hashed by the store
+        digest = (shared or content_key(data))[1].hex()
+        self._count(data)
+        if self.transport == "url" and runtime.exists():
+            # Coordinates by content: ids of temporary copies get reused
+            ref = register_media(as_bytes(data), f"niivue_component.{self.key}.{digest}")
+        else:
+            key = f"blob_{len(self.blobs)}"
+            self.blobs[key] = as_bytes(data)
+            ref = {"blob": key, "hash": digest}
+        # Keep it alive for the call: refs are looked up by id()
+        self._keep.append(data)
+        self._refs_by_id[id(data)] = ref
+        return ref
+
+    def _count(self, data):
+        self.nbytes += len(data) if isinstance(data, str) else memoryview(data).nbytes
+        self.count += 1
@@ -0,0 +1,121 @@
+"""Opt-in per-call telemetry for ``niivue_viewer(profile=True)``.
+
+While a call is being profiled, ``Profile`` collects wall times of the
+Python-side steps that prepare the arguments (pyramid, quantization,
+encoding), the number of bytes handed to the browser and per-cache hit/miss
+counts. Streamlit's own marshalling of the arguments happens after they are
+built and is not included. The timings are sent to the frontend with the
+other arguments; the frontend adds its own (payload decode, niivue load,
+first draw) and reports both back as the component value, so one structured
+dict covers the whole path of a load.
+
+Cache hits are lookups minus misses. Call sites count each lookup of a
+cache with ``Profile.lookup``; the volume store, which passes small and
+mapped payloads through without looking them up, counts its own lookups with
+``record_lookup``. The bodies of ``_memo.memoize``d functions only run on a
+miss and call ``record_miss``, as do the other caches on their misses.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def profile_enabled(profile=None) -> bool:
+    """``profile`` if given, else whether ``$NIIVUE_PROFILE`` is set to 1."""
+    if profile is None:
+        return os.environ.get("NIIVUE_PROFILE") == "1"
+    return bool(profile)
+
+
+def active():
+    """The ``Profile`` of the call running on this thread, if any."""
+    return getattr(_local, "profile", None)
+
+
+def record_lookup(cache: str):
+    """Count a lookup of ``cache``; for caches that decide what they look up."""
+    profile = active()
+    if profile is not None:
+        profile.lookups[cache] += 1
+
+
+def record_miss(cache: str):
+    """Count a miss of ``cache``; call from the body of a cached function."""
+    profile = active()
+    if profile is not None:
+        profile.misses[cache] += 1
+
+
+class Profile:
+    """Timings and counters of a single profiled ``niivue_viewer`` call."""
+
+    def __init__(self):
+        self.timings = Counter()
+        self.lookups = Counter()
+        self.misses = Counter()
+        self.bytes_sent = 0
+        self.payloads = 0
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def time(self, step: str):
+        """Add the wall time of the block to ``step`` (in ms)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[step] += (time.perf_counter() - start) * 1e3
+
+    def lookup(self, cache: str):
+        self.lookups[cache] += 1
+
+    def payloads_packed(self, nbytes: int, count: int):
+        self.bytes_sent = nbytes
+        self.payloads = count
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": (time.perf_counter() - self._start) * 1e3,
+            **{f"{step}_ms": ms for step, ms in self.timings.items()},
+            "bytes_sent": self.bytes_sent,
+            "payloads": self.payloads,
+            "caches": {
+                cache: {"hits": calls - self.misses[cache], "misses": self.misses[cache]}
+                for cache, calls in self.lookups.items()
+            },
+        }
+
+
+class _NullProfile:
+    """Stand-in used when profiling is off; every method is a no-op."""
+
+    @contextmanager
+    def time(self, step):
+        yield
+
+    def lookup(self, cache):
+        pass
+
+    def payloads_packed(self, nbytes, count):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
+
+
+@contextmanager
+def profiling(enabled: bool):
+    """Profile the calls made in the block on this thread if ``enabled``."""
+    if not enabled:
+        yield NULL_PROFILE
+        return
+    previous = active()
+    _local.profile = profile = Profile()
+    try:
+        yield profile
+    finally:
+        _local.profile = previous
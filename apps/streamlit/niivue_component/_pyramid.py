@@ -0,0 +1,79 @@
+"""Downsampled previews for progressive loading of large volumes.
+
+``progressive`` mode sends a pyramid of block-mean downsampled copies of the
+main volume, coarsest first, so niivue can render something within a
+fraction of the full load time and then swap in finer levels as they
+arrive. Levels are uncompressed NIfTI-1 (see ``_nifti.py``) and carry an
+affine adjusted for the coarser grid, so overlays and world coordinates line
+up at every level.
+"""
+import numpy as np
+
+from ._memo import memoize
+from ._nifti import array_to_nifti, is_array, nifti_to_array
+from ._profile import record_miss
+
+DEFAULT_FACTORS = (4, 2)
+
+# Levels are only worth building when the full volume is this large.
+MIN_VOXELS = 64 ** 3
+
+
+def downsample(data, affine, factor):
+    """Block-mean downsample the three spatial axes of ``data`` by ``factor``.
+
+    Edges are padded by replication up to a multiple of ``factor``. Extra
+    axes (e.g. time) are kept. Returns ``(array, affine)`` where the affine
+    maps the centre of each block to the centre of the original voxels it
+    averages.
+    """
+    spatial = data.shape[:3]
+    pad = [(0, -n % factor) for n in spatial] + [(0, 0)] * (data.ndim - 3)
+    if any(after for _, after in pad):
+        data = np.pad(data, pad, mode="edge")
+    # In Fortran order, splitting an axis of length n into (factor, n // factor)
+    # puts each block's voxels on the first (fastest) new axis, and needs no
+    # copy for Fortran-ordered input such as nibabel's get_fdata().
+    blocks = []
+    for n in data.shape[:3]:
+        blocks += [factor, n // factor]
+    blocked = data.reshape(*blocks, *data.shape[3:], order="F")
+    out = blocked.mean(axis=(0, 2, 4), dtype=np.float32)
+
+    scale = np.diag([factor, factor, factor, 1.0])
+    scale[:3, 3] = (factor - 1) / 2
+    return out, np.asarray(affine, dtype=np.float64) @ scale
+
+
+@memoize()
+def build_levels(data, affine=None, factors=DEFAULT_FACTORS):
+    """NIfTI bytes of each downsampled level, coarsest first.
+
+    ``data`` is an ndarray (with ``affine``) or single-file NIfTI-1 bytes.
+    Factors that would shrink a spatial axis below 2 voxels are skipped, as
+    is the whole pyramid for volumes smaller than ``MIN_VOXELS``. Cached by
+    content, so re-runs with the same volume reuse the levels and a volume
+    edited in place gets new ones.
+    """
+    record_miss("pyramid")
+    if is_array(data):
+        array = data
+        if affine is None:
+            affine = np.eye(4)
+    else:
+        array, affine = nifti_to_array(data)
+    if array.ndim < 3 or np.prod(array.shape[:3]) < MIN_VOXELS:
+        return []
+    levels = []
+    # Finest first, each level derived from the previous one when the
+    # factors divide, so only the first pass reads the full volume.
+    source, source_affine, source_factor = array, affine, 1
+    for factor in sorted(set(factors)):
+        if factor < 2 or min(array.shape[:3]) < 2 * factor:
+            continue
+        if factor % source_factor:
+            source, source_affine, source_factor = array, affine, 1
+        source, source_affine = downsample(source, source_affine, factor // source_factor)
+        source_factor = factor
+        levels.append(array_to_nifti(source, source_affine))
+    return levels[::-1]
@@ -0,0 +1,103 @@
+"""Intensity quantization of volumes before transfer.
+
+Statistical maps and probability masks usually arrive as ``float32`` or
+``float64`` although 8 to 16 bits are plenty for display. ``quantize`` maps
+the finite value range linearly onto ``uint8`` or ``uint16`` and returns the
+``scl_slope``/``scl_inter`` pair that maps the codes back; niivue applies
+them on load, so displayed intensities, colorbars and the values returned by
+voxel clicks stay in the original units. Payloads shrink 2 to 8 times, as do
+transfer time and GPU texture memory.
+"""
+import numpy as np
+
+from ._memo import memoize
+from ._nifti import array_to_nifti, is_array, nifti_to_array
+from ._profile import record_miss
+
+QUANTIZE_DTYPES = {"uint8": np.dtype(np.uint8), "uint16": np.dtype(np.uint16)}
+
+
+def resolve_quantize(value):
+    """Target dtype for a ``quantize`` option, or None when disabled.
+
+    ``True`` means ``'uint16'``; ``None`` and ``False`` disable quantization.
+    """
+    if value is None or value is False:
+        return None
+    if value is True:
+        value = "uint16"
+    dtype = QUANTIZE_DTYPES.get(value)
+    if dtype is None:
+        raise ValueError(
+            f"quantize must be one of {tuple(QUANTIZE_DTYPES)}, True or None, got {value!r}"
+        )
+    return dtype
+
+
+def quantize(data, dtype):
+    """Quantize ``data`` to ``dtype``. Returns ``(codes, scl_slope, scl_inter)``.
+
+    Integer data no wider than ``dtype`` is returned as-is, and wider
+    integer data whose range fits is stored exactly with a unit slope.
+    Otherwise the finite range is spread over all codes; when it spans
+    zero, zero gets a code of its own so thresholded maps keep an exact
+    background. NaNs and infinities map to that code (or the minimum).
+    """
+    dtype = np.dtype(dtype)
+    levels = np.iinfo(dtype).max + 1
+    if data.dtype == np.bool_ or (
+        data.dtype.kind in "iu" and data.dtype.itemsize <= dtype.itemsize
+    ):
+        return data, 1.0, 0.0  # already as small as it gets
+    if data.size == 0:
+        return data.astype(dtype), 1.0, 0.0
+
+    if data.dtype.kind in "iu":
+        lo, hi = int(data.min()), int(data.max())
+        if hi - lo < levels:
+            if lo >= 0 and hi < levels:
+                return data.astype(dtype), 1.0, 0.0
+            return (data.astype(np.int64) - lo).astype(dtype), 1.0, float(lo)
+        mask = None
+    else:
+        mask = np.isfinite(data)
+        lo = float(np.min(data, where=mask, initial=np.inf))
+        hi = float(np.max(data, where=mask, initial=-np.inf))
+        if lo > hi:  # no finite values
+            return np.zeros(data.shape, dtype=dtype), 1.0, 0.0
+
+    if hi == lo:
+        slope, inter = 1.0, lo
+    elif lo < 0.0 < hi:
+        slope = (hi - lo) / (levels - 2)
+        inter = -np.ceil(-lo / slope) * slope
+    else:
+        slope, inter = (hi - lo) / (levels - 1), lo
+    background = 0.0 if inter <= 0.0 <= hi else inter
+
+    # One float32 work buffer, updated in place
+    work = np.array(data, dtype=np.float32, order="K")
+    if mask is not None and not mask.all():
+        work[~mask] = background
+    work -= np.float32(inter)
+    work *= np.float32(1.0 / slope)
+    np.rint(work, out=work)
+    np.clip(work, 0, levels - 1, out=work)
+    return work.astype(dtype), float(slope), float(inter)
+
+
+@memoize()
+def quantize_volume(data, affine=None, dtype="uint16"):
+    """Quantized uncompressed NIfTI-1 bytes for an ndarray or NIfTI-1 bytes.
+
+    Bytes are decoded (and any existing scaling applied) first, and keep
+    their own affine. Cached by content, like the progressive pyramid, so
+    re-runs with the same data skip the pass and edited data does not.
+    """
+    record_miss("quantize")
+    if is_array(data):
+        array = data
+    else:
+        array, affine = nifti_to_array(data)
+    codes, slope, inter = quantize(array, dtype)
+    return array_to_nifti(codes, affine, scl_slope=slope, scl_inter=inter)
@@ -0,0 +1,214 @@
+"""Process-wide store of payload bytes, shared by all sessions.
+
+When many users open the same atlas, every session brings its own copy of
+it: ``st.cache_data`` unpickles a fresh one per call, ``UploadedFile``
+returns a fresh one per upload, NumPy arrays are converted to a new NIfTI
+image on every run, and each copy is then packed, base64-encoded or
+registered on its own. ``VolumeStore`` interns payloads by content: the
+first copy of a content becomes the canonical, immutable ``bytes`` object,
+and later calls with identical content get that object back. The packer,
+the base64 ``PayloadCache`` and the media file manager then all hold the
+one copy, and a session's own copy is freed when its run ends, so server
+memory stays flat as users open the same data.
+
+Each session references the entries its viewers sent: a keyed viewer the
+payloads of its latest run, unkeyed viewers everything they sent. The
+references of sessions that are no longer active (closed, or disconnected
+from the browser) are dropped on the next viewer call of any session.
+Unreferenced entries are evicted least recently used first once the store
+exceeds ``max_bytes`` (``$NIIVUE_STORE_MAX_BYTES``, default 1 GiB; 0
+disables the store); a payload that does not fit even then is sent without
+being stored, so the store never exceeds its cap.
+
+Interning hashes each payload once per object, and canonical copies are
+pinned (see ``_digest``), so the caches downstream reuse their digest.
+Payloads under ``MIN_SHARED_BYTES`` are not worth it and are passed
+through, and so are memory-mapped files: the page cache already shares
+them, and interning would copy them onto the heap.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from ._digest import pin, unpin
+from ._payload import as_bytes, content_key, is_mapped
+from ._profile import record_lookup, record_miss
+
+DEFAULT_STORE_MAX_BYTES = 1024 ** 3
+
+MIN_SHARED_BYTES = 64 * 1024
+
+
+def default_store_max_bytes():
+    """``$NIIVUE_STORE_MAX_BYTES``, else 1 GiB."""
+    return int(os.environ.get("NIIVUE_STORE_MAX_BYTES", DEFAULT_STORE_MAX_BYTES))
+
+
+class VolumeStore:
+    """Content-addressed store of immutable payloads with per-owner references.
+
+    ``intern`` returns the canonical copy of a payload; ``hold`` records the
+    content keys an owner (a session's viewer) uses, replacing or extending
+    what it held before. Safe to share between sessions (threads).
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = default_store_max_bytes() if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # content key -> canonical bytes
+        self._keys_by_id = {}  # id(canonical) -> content key
+        self._refs = {}  # content key -> number of owners holding it
+        self._held = {}  # owner -> set of content keys
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def intern(self, data):
+        """``(key, canonical)``: the content key and shared copy of ``data``.
+
+        The key is None for payloads that are not shared (too small, mapped,
+        or the store is disabled or full); ``canonical`` is then ``data``
+        itself.
+        """
+        nbytes = memoryview(data).nbytes
+        if not self.enabled or nbytes < MIN_SHARED_BYTES or is_mapped(data):
+            return None, data
+        record_lookup("store")
+        with self._lock:
+            key = self._keys_by_id.get(id(data))
+            if key is not None and self._entries[key] is data:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, data
+        key = content_key(data)
+        with self._lock:
+            canonical = self._entries.get(key)
+            if canonical is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, canonical
+            self.misses += 1
+            record_miss("store")
+            self._evict(self.max_bytes - nbytes)
+            if self._nbytes + nbytes > self.max_bytes:
+                return None, data
+        # Copying a large volume takes a while: other sessions must not wait
+        canonical = as_bytes(data)
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:  # interned by another session meanwhile
+                self._entries.move_to_end(key)
+                return key, stored
+            self._evict(self.max_bytes - nbytes)
+            if self._nbytes + nbytes > self.max_bytes:
+                return None, data
+            self._entries[key] = canonical
+            self._keys_by_id[id(canonical)] = key
+            self._nbytes += nbytes
+            pin(canonical, key)
+            return key, canonical
+
+    def hold(self, owner, keys, replace=True):
+        """Reference ``keys`` for ``owner``, dropping its others if ``replace``."""
+        keys = {key for key in keys if key is not None}
+        with self._lock:
+            held = self._held.get(owner, set())
+            new = keys if replace else held | keys
+            for key in new - held:
+                self._refs[key] = self._refs.get(key, 0) + 1
+            self._unref(held - new)
+            if new:
+                self._held[owner] = new
+            else:
+                self._held.pop(owner, None)
+
+    def release(self, match):
+        """Drop the references of every owner for which ``match(owner)`` is true."""
+        with self._lock:
+            for owner in [owner for owner in self._held if match(owner)]:
+                self._unref(self._held.pop(owner))
+            self._evict(self.max_bytes)
+
+    def _unref(self, keys):
+        for key in keys:
+            count = self._refs.get(key, 0) - 1
+            if count > 0:
+                self._refs[key] = count
+            else:
+                self._refs.pop(key, None)
+
+    def _evict(self, budget):
+        """Evict unreferenced entries, oldest first, until ``budget`` is met."""
+        for key in list(self._entries):
+            if self._nbytes <= budget:
+                break
+            if key in self._refs:
+                continue
+            canonical = self._entries.pop(key)
+            self._keys_by_id.pop(id(canonical), None)
+            self._nbytes -= len(canonical)
+            unpin(canonical)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for canonical in self._entries.values():
+                unpin(canonical)
+            self._entries.clear()
+            self._keys_by_id.clear()
+            self._refs.clear()
+            self._held.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters plus the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "referenced": len(self._refs),
+                "owners": len(self._held),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared by all sessions of the server process
+volume_store = VolumeStore()
+
+
+def release_inactive_sessions():
+    """Drop the references of sessions the runtime no longer has active."""
+    if runtime.exists():
+        active = runtime.get_instance().is_active_session
+        volume_store.release(lambda owner: not active(owner[0]))
+
+
+def session_owner(key):
+    """Owner of a viewer's references: (session id, viewer key), or None.
+
+    Also releases the references of sessions that have ended since the last
+    call. Outside a script run (bare mode, tests) there is no session and
+    payloads are interned without references.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    release_inactive_sessions()
+    return (ctx.session_id, key)
+
+
+def hold_payloads(owner, keys):
+    """Record the payloads a viewer sent in this run (see module docstring)."""
+    if owner is not None:
+        volume_store.hold(owner, keys, replace=owner[1] is not None)
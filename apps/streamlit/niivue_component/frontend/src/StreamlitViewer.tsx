@@ -1,6 +1,7 @@
 import { ComponentProps, Streamlit, withStreamlitConnection } from 'streamlit-component-lib'
 import { useEffect } from 'preact/hooks'
 import { StreamlitArgs } from './types'
+import { GridViewer } from './components/GridViewer'
 import { StyledViewer } from './components/StyledViewer'
 import { UnstyledCanvas } from './components/UnstyledCanvas'
 
@@ -12,6 +13,11 @@ const StreamlitViewer = ({ args }: ComponentProps) => {
     Streamlit.setComponentReady()
   }, [])
 
+  // niivue_grid renders its own thumbnail grid instead of a single viewer
+  if (typedArgs.grid) {
+    return <GridViewer args={typedArgs} />
+  }
+
   // Determine which component to render based on styled flag
   const styled = typedArgs.styled ?? true
 
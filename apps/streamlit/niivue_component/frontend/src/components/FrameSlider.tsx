@@ -0,0 +1,24 @@
+interface FrameSliderProps {
+  count: number
+  frame: number
+  setFrame: (frame: number) => void
+}
+
+/** Time axis of a series streamed with `frame_window`. */
+export const FrameSlider = ({ count, frame, setFrame }: FrameSliderProps) => (
+  <div className="flex items-center gap-2 px-2 py-1 bg-gray-900 text-xs text-gray-300">
+    <input
+      type="range"
+      className="flex-1"
+      min={0}
+      max={count - 1}
+      step={1}
+      value={frame}
+      aria-label="Frame"
+      onInput={(e) => setFrame(Number((e.target as HTMLInputElement).value))}
+    />
+    <span className="tabular-nums">
+      {frame + 1} / {count}
+    </span>
+  </div>
+)
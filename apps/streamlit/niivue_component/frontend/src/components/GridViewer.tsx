@@ -0,0 +1,176 @@
+import NiiVue from '@niivue/niivue'
+import { useEffect, useRef, useState } from 'preact/hooks'
+import { Streamlit } from 'streamlit-component-lib'
+import { CellScheduler } from '../grid'
+import { CellClickEventData, GridArgs, StreamlitArgs, VIEW_MODE_TO_SLICE_TYPE } from '../types'
+import { loadPayload, payloadFingerprint } from '../utils'
+
+interface GridViewerProps {
+  args: StreamlitArgs
+}
+
+const GAP_PX = 4
+const LABEL_PX = 18
+
+/**
+ * `niivue_grid`: every volume is a plain 2D canvas; one hidden niivue
+ * instance (the only WebGL context) loads the volume of each visible cell in
+ * turn, draws it, copies the frame into the cell and drops the volume again.
+ * Cells are observed with an IntersectionObserver (one row of look-ahead),
+ * so volumes of cells that are never scrolled to are never fetched, and the
+ * bitmaps of cells scrolled out of view are released.
+ */
+export const GridViewer = ({ args }: GridViewerProps) => {
+  const grid = args.grid as GridArgs
+  const height = args.height || 600
+  const scrollRef = useRef<HTMLDivElement | null>(null)
+  const glCanvasRef = useRef<HTMLCanvasElement | null>(null)
+  const cellRefs = useRef<(HTMLCanvasElement | null)[]>([])
+  const nvRef = useRef<{ nv: NiiVue; attached: Promise<void> } | null>(null)
+  const [width, setWidth] = useState(() => document.body.clientWidth)
+
+  const columns = Math.max(1, grid.columns)
+  const cellWidth = Math.max(16, Math.floor((width - GAP_PX * (columns - 1)) / columns))
+  const cellHeight = grid.cell_height
+  const cellsKey = JSON.stringify(grid.cells.map((cell) => `${cell.name}|${payloadFingerprint(cell.data, args)}`))
+
+  useEffect(() => {
+    Streamlit.setFrameHeight(height)
+  }, [height])
+
+  useEffect(() => {
+    const onResize = () => setWidth(document.body.clientWidth)
+    window.addEventListener('resize', onResize)
+    return () => window.removeEventListener('resize', onResize)
+  }, [])
+
+  // One niivue instance for the lifetime of the grid. The frame is copied out
+  // right after drawScene, within the same task, so the WebGL2 backend's
+  // drawing buffer still holds it.
+  useEffect(() => {
+    const canvas = glCanvasRef.current
+    if (!canvas) return
+    const nv = new NiiVue({ isDragDropEnabled: false, backgroundColor: [0, 0, 0, 1] })
+    if (nv.opts) nv.opts.backend = 'webgl2'
+    const attached = nv.attachToCanvas(canvas).then(() => {
+      nv.crosshairWidth = 0
+    })
+    nvRef.current = { nv, attached }
+  }, [])
+
+  useEffect(() => {
+    const root = scrollRef.current
+    const renderer = nvRef.current
+    const glCanvas = glCanvasRef.current
+    if (!root || !renderer || !glCanvas) return
+    const { nv, attached } = renderer
+    const cells = grid.cells
+    const snapshot = args
+    const sliceType = VIEW_MODE_TO_SLICE_TYPE[grid.view_mode ?? 'axial'] ?? VIEW_MODE_TO_SLICE_TYPE.axial
+    const ratio = window.devicePixelRatio || 1
+
+    const free = (index: number) => {
+      const target = cellRefs.current[index]
+      if (target) {
+        // Zero size releases the backing store; CSS keeps the layout
+        target.width = 0
+        target.height = 0
+      }
+    }
+
+    const render = async (index: number) => {
+      const cell = cells[index]
+      const data = await loadPayload(cell.data, snapshot)
+      await attached
+      await nv.addVolume({
+        url: new File([data], cell.name),
+        name: cell.name,
+        colormap: grid.colormap || 'gray',
+      })
+      try {
+        nv.sliceType = sliceType
+        nv.drawScene()
+        const target = cellRefs.current[index]
+        if (target) {
+          target.width = Math.round(cellWidth * ratio)
+          target.height = Math.round(cellHeight * ratio)
+          target.getContext('2d')?.drawImage(glCanvas, 0, 0, target.width, target.height)
+        }
+      } finally {
+        while (nv.volumes.length > 0) {
+          nv.model.removeVolume(nv.volumes.length - 1)
+        }
+        nv.updateGLVolume()
+      }
+    }
+
+    const scheduler = new CellScheduler(render, free)
+    const observer = new IntersectionObserver(
+      (entries) => {
+        for (const entry of entries) {
+          const index = Number((entry.target as HTMLElement).dataset.index)
+          if (entry.isIntersecting) {
+            scheduler.show(index)
+          } else {
+            scheduler.hide(index)
+          }
+        }
+      },
+      { root, rootMargin: `${cellHeight}px 0px` },
+    )
+    cellRefs.current.slice(0, cells.length).forEach((target) => target && observer.observe(target))
+    return () => {
+      observer.disconnect()
+      scheduler.dispose()
+      cells.forEach((_, index) => free(index))
+    }
+  }, [cellsKey, cellWidth, cellHeight, grid.view_mode, grid.colormap])
+
+  const onCellClick = (index: number) => {
+    const cell = grid.cells[index]
+    const event: CellClickEventData = {
+      type: 'cell_click',
+      index,
+      name: cell.name,
+      label: cell.label ?? cell.name,
+    }
+    Streamlit.setComponentValue(event)
+  }
+
+  return (
+    <div ref={scrollRef} className="w-full h-full overflow-y-auto bg-gray-900">
+      <div
+        style={{
+          display: 'grid',
+          gridTemplateColumns: `repeat(${columns}, ${cellWidth}px)`,
+          gap: `${GAP_PX}px`,
+        }}
+      >
+        {grid.cells.map((cell, index) => (
+          <div key={index} className="cursor-pointer" onClick={() => onCellClick(index)}>
+            <canvas
+              ref={(el) => {
+                cellRefs.current[index] = el
+              }}
+              data-index={index}
+              width={0}
+              height={0}
+              style={{ width: `${cellWidth}px`, height: `${cellHeight}px`, display: 'block', background: 'black' }}
+            />
+            <div
+              className="truncate text-xs text-gray-300"
+              style={{ height: `${LABEL_PX}px`, lineHeight: `${LABEL_PX}px` }}
+              title={cell.label ?? cell.name}
+            >
+              {cell.label ?? cell.name}
+            </div>
+          </div>
+        ))}
+      </div>
+      {/* The only WebGL context: sized like a cell, kept out of view */}
+      <div style={{ position: 'fixed', left: '-10000px', top: 0, width: `${cellWidth}px`, height: `${cellHeight}px` }}>
+        <canvas ref={glCanvasRef} style={{ width: '100%', height: '100%' }} />
+      </div>
+    </div>
+  )
+}
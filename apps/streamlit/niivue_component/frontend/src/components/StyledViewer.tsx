@@ -1,19 +1,21 @@
 import { Container, ImageDrop, Menu, StatusBar } from '@niivue/react'
 import { useStreamlitNiivue } from '../hooks/useStreamlitNiivue'
 import { StreamlitArgs } from '../types'
+import { FrameSlider } from './FrameSlider'
 
 interface StyledViewerProps {
   args: StreamlitArgs
 }
 
 export const StyledViewer = ({ args }: StyledViewerProps) => {
-  const appProps = useStreamlitNiivue(args)
+  const { appProps, frames } = useStreamlitNiivue(args)
 
   return (
     <ImageDrop>
       <div className="flex flex-col h-full bg-gray-900">
         <Menu {...appProps} />
         <Container {...appProps} />
+        {frames && <FrameSlider {...frames} />}
         <StatusBar {...appProps} />
       </div>
     </ImageDrop>
@@ -1,17 +1,21 @@
 import { Container } from '@niivue/react'
 import { useStreamlitNiivue } from '../hooks/useStreamlitNiivue'
 import { StreamlitArgs } from '../types'
+import { FrameSlider } from './FrameSlider'
 
 interface UnstyledCanvasProps {
   args: StreamlitArgs
 }
 
 export const UnstyledCanvas = ({ args }: UnstyledCanvasProps) => {
-  const appProps = useStreamlitNiivue(args)
+  const { appProps, frames } = useStreamlitNiivue(args)
 
   return (
-    <div className="w-full h-full bg-gray-900">
-      <Container {...appProps} />
+    <div className="flex flex-col w-full h-full bg-gray-900">
+      <div className="flex-1 min-h-0">
+        <Container {...appProps} />
+      </div>
+      {frames && <FrameSlider {...frames} />}
     </div>
   )
 }
@@ -0,0 +1,111 @@
+/**
+ * Round-trip of the niivue drawing layer for `niivue_viewer(drawing=...)`.
+ *
+ * niivue keeps the drawing as one byte per voxel of the base image, in its
+ * RAS-reoriented voxel order (x fastest, z slowest). `DrawingSync` keeps a
+ * copy of what was last sent and, on each sync, sends only the slabs of
+ * axial slices that changed since, each zlib-compressed (the browser's
+ * `deflate` CompressionStream) and base64-encoded. The first sync after a
+ * load, and any sync after Python asks for a resync, sends the whole layer.
+ * Python rebuilds the array and undoes the RAS reorientation
+ * (`_drawing.py`).
+ */
+import type { DrawingEventData } from './types'
+
+/** Ranges [start, stop) of consecutive slices that differ between two layers. */
+export function dirtySlabs(current: Uint8Array, previous: Uint8Array, sliceSize: number): [number, number][] {
+  const slabs: [number, number][] = []
+  const nSlices = Math.floor(current.length / sliceSize)
+  for (let z = 0; z < nSlices; z++) {
+    const offset = z * sliceSize
+    let dirty = false
+    for (let i = offset; i < offset + sliceSize; i++) {
+      if (current[i] !== previous[i]) {
+        dirty = true
+        break
+      }
+    }
+    if (!dirty) continue
+    const last = slabs[slabs.length - 1]
+    if (last && last[1] === z) {
+      last[1] = z + 1
+    } else {
+      slabs.push([z, z + 1])
+    }
+  }
+  return slabs
+}
+
+/** zlib-compress (RFC 1950, as Python's `zlib.decompress` expects) and base64-encode. */
+export async function deflateBase64(bytes: Uint8Array): Promise<string> {
+  const stream = new Blob([bytes]).stream().pipeThrough(new CompressionStream('deflate'))
+  const compressed = new Uint8Array(await new Response(stream).arrayBuffer())
+  let binary = ''
+  for (let i = 0; i < compressed.length; i += 0x8000) {
+    binary += String.fromCharCode(...compressed.subarray(i, i + 0x8000))
+  }
+  return window.btoa(binary)
+}
+
+/** The drawing layer of a niivue instance, or null before one exists. */
+export function readDrawing(nv: any): { bitmap: Uint8Array; dims: [number, number, number]; perm: number[] } | null {
+  const bitmap: Uint8Array | null = nv.drawBitmap ?? null
+  const back = nv.back ?? nv.volumes?.[0]
+  const dimsRAS: number[] | undefined = back?.dimsRAS
+  if (!bitmap || !dimsRAS) return null
+  return {
+    bitmap,
+    dims: [dimsRAS[1], dimsRAS[2], dimsRAS[3]],
+    perm: Array.from(back.permRAS ?? [1, 2, 3]),
+  }
+}
+
+/**
+ * Versioned sender of drawing updates. `version` continues from the one
+ * Python last stored, so a remounted viewer never reuses a version number.
+ */
+export class DrawingSync {
+  private snapshot: Uint8Array | null = null
+  private resyncHandled: number
+
+  constructor(
+    public version: number,
+    resync = 0,
+  ) {
+    this.resyncHandled = resync
+  }
+
+  /** Send the whole layer next time (a new image or initial drawing). */
+  reset(): void {
+    this.snapshot = null
+  }
+
+  /** Python lost an update: send the whole layer next time (once per request). */
+  requestResync(resync: number): boolean {
+    if (resync <= this.resyncHandled) return false
+    this.resyncHandled = resync
+    this.snapshot = null
+    return true
+  }
+
+  /** The update since the last call, or null if nothing changed. */
+  async next(bitmap: Uint8Array, dims: [number, number, number], perm: number[]): Promise<DrawingEventData | null> {
+    const sliceSize = dims[0] * dims[1]
+    const full = !this.snapshot || this.snapshot.length !== bitmap.length
+    const ranges: [number, number][] = full ? [[0, dims[2]]] : dirtySlabs(bitmap, this.snapshot!, sliceSize)
+    if (ranges.length === 0) return null
+    const baseVersion = full ? null : this.version
+    // Copy before compressing so strokes made meanwhile go into the next update
+    const copies = ranges.map(([start, stop]) => bitmap.slice(start * sliceSize, stop * sliceSize))
+    if (full) {
+      this.snapshot = bitmap.slice()
+    } else {
+      ranges.forEach(([start], i) => this.snapshot!.set(copies[i], start * sliceSize))
+    }
+    const version = ++this.version
+    const slabs = await Promise.all(
+      ranges.map(async ([start, stop], i) => ({ start, stop, data: await deflateBase64(copies[i]) })),
+    )
+    return { type: 'drawing', version, base_version: baseVersion, dims, perm, slabs }
+  }
+}
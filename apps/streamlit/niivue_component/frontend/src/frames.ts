@@ -0,0 +1,52 @@
+/**
+ * Frame cache for `niivue_viewer(frame_window=...)`.
+ *
+ * Python sends the frames of a 4D series around the current one. The cache
+ * starts fetching (or, for binary args, just slicing) each of them as soon as
+ * a run delivers it, nearest to the current frame first, so scrubbing to a
+ * neighbouring frame swaps it in without waiting for Python. Frames that fall
+ * out of the window are dropped, except the one on screen.
+ */
+export class FrameCache {
+  private series: string | null = null
+  private readonly frames = new Map<number, Promise<ArrayBuffer>>()
+
+  /** Switch to `series`, dropping the frames of any other one. */
+  use(series: string): void {
+    if (series !== this.series) {
+      this.series = series
+      this.frames.clear()
+    }
+  }
+
+  has(index: number): boolean {
+    return this.frames.has(index)
+  }
+
+  get(index: number): Promise<ArrayBuffer> | undefined {
+    return this.frames.get(index)
+  }
+
+  /** Cache the frames of `window` and drop the others, except `keep`. */
+  update<T>(
+    window: { index: number; data: T }[],
+    current: number,
+    keep: number | null,
+    fetch: (data: T) => Promise<ArrayBuffer>,
+  ): void {
+    const wanted = new Set(window.map((frame) => frame.index))
+    for (const index of [...this.frames.keys()]) {
+      if (!wanted.has(index) && index !== keep) this.frames.delete(index)
+    }
+    const nearest = [...window].sort((a, b) => Math.abs(a.index - current) - Math.abs(b.index - current))
+    for (const { index, data } of nearest) {
+      if (this.frames.has(index)) continue
+      const promise = fetch(data)
+      // A failed fetch is retried the next time a run sends the frame
+      promise.catch(() => {
+        if (this.frames.get(index) === promise) this.frames.delete(index)
+      })
+      this.frames.set(index, promise)
+    }
+  }
+}
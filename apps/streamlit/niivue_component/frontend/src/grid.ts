@@ -0,0 +1,77 @@
+/**
+ * Render scheduling for `niivue_grid`.
+ *
+ * A single hidden niivue instance renders every cell, one at a time, so the
+ * scheduler decides which cell goes next: cells become wanted when they
+ * scroll into view and unwanted when they scroll out. Wanted cells are
+ * rendered in grid order; a cell that scrolls out before its turn is never
+ * loaded, and one that scrolls out after being drawn is freed.
+ */
+export class CellScheduler {
+  private readonly wanted = new Set<number>()
+  private readonly rendered = new Set<number>()
+  private running = false
+  private disposed = false
+
+  constructor(
+    private readonly render: (index: number) => Promise<void>,
+    private readonly free: (index: number) => void,
+  ) {}
+
+  /** Cell `index` entered the viewport: render it when its turn comes. */
+  show(index: number): void {
+    this.wanted.add(index)
+    void this.run()
+  }
+
+  /** Cell `index` left the viewport: drop it from the queue or free it. */
+  hide(index: number): void {
+    this.wanted.delete(index)
+    if (this.rendered.delete(index)) {
+      this.free(index)
+    }
+  }
+
+  /** Stop rendering; a render in progress finishes but nothing follows it. */
+  dispose(): void {
+    this.disposed = true
+    this.wanted.clear()
+  }
+
+  isRendered(index: number): boolean {
+    return this.rendered.has(index)
+  }
+
+  /** Lowest wanted cell that has not been rendered yet. */
+  next(): number | undefined {
+    let best: number | undefined
+    for (const index of this.wanted) {
+      if (!this.rendered.has(index) && (best === undefined || index < best)) {
+        best = index
+      }
+    }
+    return best
+  }
+
+  private async run(): Promise<void> {
+    if (this.running) return
+    this.running = true
+    try {
+      for (let index = this.next(); index !== undefined && !this.disposed; index = this.next()) {
+        try {
+          await this.render(index)
+        } catch (err) {
+          console.error(`Failed to render grid cell ${index}:`, err)
+        }
+        // Scrolled out while rendering: free it right away
+        if (this.wanted.has(index)) {
+          this.rendered.add(index)
+        } else {
+          this.free(index)
+        }
+      }
+    } finally {
+      this.running = false
+    }
+  }
+}
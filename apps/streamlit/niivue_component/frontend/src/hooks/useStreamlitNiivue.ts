@@ -1,15 +1,44 @@
+import type NiiVue from '@niivue/niivue'
 import { handleMessage, initCanvas, isImageType, useAppState } from '@niivue/react'
-import { useEffect, useRef } from 'preact/hooks'
+import { useEffect, useRef, useState } from 'preact/hooks'
 import { Streamlit } from 'streamlit-component-lib'
+import { DrawingSync, readDrawing } from '../drawing'
+import { FrameCache } from '../frames'
 import { StreamlitArgs, VIEW_MODE_TO_SLICE_TYPE } from '../types'
-import { base64ToArrayBuffer, buildVoxelClickPayload, throttle } from '../utils'
-
-/** Sample characters from a base64 string for fingerprinting (avoids hashing overhead) */
-function dataFingerprint(data: string | undefined): string {
-  if (!data) return '0'
-  const len = data.length
-  const mid = Math.floor(len / 2)
-  return `${len}:${data.slice(0, 8)}${data.slice(mid, mid + 8)}${data.slice(-8)}`
+import {
+  buildDragReleasePayload,
+  buildIntensityPayload,
+  buildVoxelClickPayload,
+  EventBatcher,
+  diffOverlayKeys,
+  LoadProfiler,
+  loadPayload,
+  meshLevel,
+  overlayKeys,
+  payloadFingerprint,
+  throttle,
+  whenIdle,
+} from '../utils'
+
+/** A volume overlay loaded into niivue and the display props last applied. */
+interface LoadedOverlay {
+  volume: NiiVue['volumes'][number]
+  colormap: string
+  opacity: number
+}
+
+/** Profilers are only created with `profile=True`; otherwise run the step. */
+const decode = (profiler: LoadProfiler | null, work: () => Promise<ArrayBuffer>) =>
+  profiler ? profiler.decode(work) : work()
+const load = <T>(profiler: LoadProfiler | null, work: () => Promise<T>) =>
+  profiler ? profiler.load(work) : work()
+
+/** Send the timings of a finished load to Python once it has been drawn. */
+const reportProfile = (profiler: LoadProfiler | null) => {
+  profiler
+    ?.report()
+    .then((event) => Streamlit.setComponentValue(event))
+    .catch((err) => console.error('Failed to report profile:', err))
 }
 
 /** Shared hook for Streamlit NiiVue components */
@@ -38,9 +67,32 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
   const { sliceType, settings } = appProps
   const prevDataRef = useRef<string | null>(null)
   const prevMeshRef = useRef<string | null>(null)
-  const loadedOverlaysRef = useRef<string[]>([])
+  const loadedOverlaysRef = useRef(new Map<string, LoadedOverlay>())
+  // Queue for async operations that add/remove/reorder volumes of the base
+  // canvas (overlay syncs, progressive refinement), so they never interleave.
+  const volumeOpsRef = useRef<Promise<void>>(Promise.resolve())
+  const refinedRef = useRef<string | null>(null)
   const loadedMeshesRef = useRef<string | null>(null)
   const loadedMeshOverlaysRef = useRef<string[]>([])
+  // Queue for async operations that add/remove meshes or mesh layers (mesh
+  // loads, mesh overlay loads, level-of-detail swaps), like volumeOpsRef.
+  const meshOpsRef = useRef<Promise<void>>(Promise.resolve())
+  // mesh_lod: level currently displayed (-1 = coarsest, as sent in data) and
+  // the mesh list whose finer levels have been scheduled
+  const meshLevelRef = useRef(-1)
+  const lodRef = useRef<string | null>(null)
+  // Payloads may have to be fetched (transport="url"), so loads are async.
+  // Each effect bumps its generation before loading; a load that finishes
+  // after newer args arrived sees a stale generation and is dropped.
+  const loadGenRef = useRef({ base: 0, overlays: 0, meshes: 0, meshOverlays: 0 })
+  // profile=True: the base image is loaded by NiiVueCanvas, so its profiler
+  // waits here until the new instance reports isLoaded.
+  const baseProfileRef = useRef<{ profiler: LoadProfiler; since: number } | null>(null)
+  // frame_window: prefetched frames, the frame on screen, and the frame the
+  // slider asked for before Python has caught up with it
+  const frameCacheRef = useRef(new FrameCache())
+  const shownFrameRef = useRef<number | null>(null)
+  const [localFrame, setLocalFrame] = useState<number | null>(null)
 
   // Sync view mode (axial, coronal, etc)
   useEffect(() => {
@@ -69,95 +121,217 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
     }
   }, [settingsKey])
 
-  // Compute a stable ID for the mesh list using data fingerprints (for change detection)
+  // Compute stable IDs for the base image and mesh list using data
+  // fingerprints (for change detection). Binary payloads are fresh Uint8Array
+  // instances on every re-run, so identity comparison would always differ.
+  // In frame mode nifti_data is the current frame, which must not reload
+  // the base image: frames are swapped in place instead.
+  const niftiId = args.frames
+    ? `frames:${args.frames.series}`
+    : args.nifti_data
+    ? `${payloadFingerprint(args.nifti_data, args)}|${payloadFingerprint(args.paired_data, args)}|${payloadFingerprint(args.nifti_levels?.at(-1), args)}`
+    : null
   const meshId = args.meshes
-    ? JSON.stringify(args.meshes.map(m => `${m.name}-${dataFingerprint(m.data)}`))
+    ? JSON.stringify(args.meshes.map(m => `${m.name}-${payloadFingerprint(m.data, args)}`))
     : null
 
   // Load base image or first mesh via the standard message system
   useEffect(() => {
-    const hasVolume = args.nifti_data && args.nifti_data !== prevDataRef.current
+    const hasVolume = niftiId && niftiId !== prevDataRef.current
     const hasMeshOnly = !args.nifti_data && args.meshes && args.meshes.length > 0 && meshId !== prevMeshRef.current
 
     if (!hasVolume && !hasMeshOnly) {
       return
     }
 
-    prevDataRef.current = args.nifti_data || null
+    prevDataRef.current = niftiId
     prevMeshRef.current = meshId
-    loadedOverlaysRef.current = [] // Reset overlays when base changes
+    loadedOverlaysRef.current = new Map() // Reset overlays when base changes
     loadedMeshesRef.current = null // Reset loaded meshes
     loadedMeshOverlaysRef.current = [] // Reset mesh overlays
+    meshLevelRef.current = -1
+    lodRef.current = null
+    shownFrameRef.current = args.frames?.current ?? null
+    setLocalFrame(null)
 
     // Initialize canvas for 1 base image
     initCanvas(appProps, 1)
+    const gen = ++loadGenRef.current.base
+    const profiler = args.profile ? new LoadProfiler('base', args.profile) : null
+    const profileBase = () => {
+      baseProfileRef.current = profiler ? { profiler, since: performance.now() } : null
+    }
 
-    if (args.nifti_data) {
-      // Load volume as base image
-      const filename = args.filename || 'image.nii'
-      const body: Record<string, unknown> = {
-        data: base64ToArrayBuffer(args.nifti_data),
-        uri: filename,
-      }
-      if (args.paired_data) {
-        body.pairedData = base64ToArrayBuffer(args.paired_data)
-      } else if (filename.toLowerCase().endsWith('.mhd')) {
-        body.loadError =
-          `MHD is a detached format. Pass the referenced voxel file ` +
-          `(e.g. .raw) via the paired_data argument: ` +
-          `niivue_viewer(nifti_data=mhd_bytes, paired_data=raw_bytes, filename="${filename}")`
+    const loadBase = async () => {
+      if (args.nifti_data) {
+        // Load volume as base image
+        const niftiData = args.nifti_data
+        const filename = args.filename || 'image.nii'
+        const body: Record<string, unknown> = {
+          data: await decode(profiler, () => loadPayload(niftiData, args)),
+          uri: filename,
+        }
+        const pairedData = args.paired_data
+        if (pairedData) {
+          body.pairedData = await decode(profiler, () => loadPayload(pairedData, args))
+        } else if (filename.toLowerCase().endsWith('.mhd')) {
+          body.loadError =
+            `MHD is a detached format. Pass the referenced voxel file ` +
+            `(e.g. .raw) via the paired_data argument: ` +
+            `niivue_viewer(nifti_data=mhd_bytes, paired_data=raw_bytes, filename="${filename}")`
+        }
+        if (gen !== loadGenRef.current.base) return
+        profileBase()
+        handleMessage({ type: 'addImage', body }, appProps)
+      } else if (args.meshes && args.meshes.length > 0) {
+        // Load first mesh as base image (mesh-only mode)
+        const firstMesh = args.meshes[0]
+        const data = await decode(profiler, () => loadPayload(firstMesh.data, args))
+        if (gen !== loadGenRef.current.base) return
+        profileBase()
+        handleMessage({
+          type: 'addImage',
+          body: { data, uri: firstMesh.name },
+        }, appProps)
       }
-      handleMessage({ type: 'addImage', body }, appProps)
-    } else if (args.meshes && args.meshes.length > 0) {
-      // Load first mesh as base image (mesh-only mode)
-      const firstMesh = args.meshes[0]
-      handleMessage({
-        type: 'addImage',
-        body: {
-          data: base64ToArrayBuffer(firstMesh.data),
-          uri: firstMesh.name,
-        },
-      }, appProps)
     }
-  }, [args.nifti_data, meshId])
+    loadBase().catch((err) => console.error('Failed to load base image:', err))
+  }, [niftiId, meshId])
 
-  // Load overlays after base image is loaded
+  // profile=True: report the base load once the instance it went to (the
+  // newest one) has loaded it.
+  useEffect(() => {
+    const pending = baseProfileRef.current
+    if (!pending || !appProps.nvArray.value.at(-1)?.isLoaded) {
+      return
+    }
+    baseProfileRef.current = null
+    pending.profiler.loaded(pending.since)
+    reportProfile(pending.profiler)
+  }, [appProps.nvArray.value, appProps.nvArray.value.at(-1)?.isLoaded])
+
+  // Sync overlays incrementally after the base image is loaded. Overlays are
+  // keyed by `overlayKeys` (Python `id`, else name + data fingerprint), so
+  // only added overlays are transferred/decoded and only removed ones are
+  // dropped; colormap, opacity and order changes are applied in place with
+  // setVolume / moveVolumeToBottom. Syncs run one at a time on a promise
+  // volume-ops queue so the loaded map is never mutated by two syncs at once;
+  // a sync superseded before it starts is skipped.
   useEffect(() => {
     const nv = appProps.nvArray.value[0]
-    if (!nv || !nv.isLoaded || !args.overlays || args.overlays.length === 0) {
+    if (!nv || !nv.isLoaded) {
       return
     }
-
-    // Include data length in overlay ID for change detection
-    const overlayIds = args.overlays.map(o => `${o.name}-${o.colormap}-${o.opacity}-${o.data?.length || 0}`)
-    const currentIds = loadedOverlaysRef.current
-    
-    // If overlay list changed, clear and reload all overlays
-    if (JSON.stringify(overlayIds) !== JSON.stringify(currentIds)) {
-      // Remove all overlays except base volume (index 0). v1: removal is a
-      // synchronous model op (index-based); refresh the GPU once after.
-      while (nv.volumes.length > 1) {
-        nv.model.removeVolume(nv.volumes.length - 1)
+    const overlays = args.overlays ?? []
+    const keys = overlayKeys(overlays, args)
+    const gen = ++loadGenRef.current.overlays
+    const snapshot = args
+
+    const syncOverlays = async () => {
+      if (gen !== loadGenRef.current.overlays || nv !== appProps.nvArray.value[0]) return
+      const loaded = loadedOverlaysRef.current
+      const { remove, add } = diffOverlayKeys([...loaded.keys()], keys)
+      const profiler = add.length > 0 && snapshot.profile
+        ? new LoadProfiler('overlays', snapshot.profile)
+        : null
+
+      // v1: removal is a synchronous model op (index-based); refresh the GPU
+      // once after.
+      for (const key of remove) {
+        const index = nv.volumes.indexOf(loaded.get(key)!.volume)
+        if (index > 0) nv.model.removeVolume(index)
+        loaded.delete(key)
       }
-      nv.updateGLVolume()
-      
-      // Load all overlays sequentially
-      for (const overlay of args.overlays) {
-        handleMessage({
+      if (remove.length > 0) nv.updateGLVolume()
+
+      for (let i = 0; i < overlays.length; i++) {
+        if (!add.includes(keys[i])) continue
+        const overlay = overlays[i]
+        const colormap = overlay.colormap || 'red'
+        const opacity = overlay.opacity ?? 0.5
+        const data = await decode(profiler, () => loadPayload(overlay.data, snapshot))
+        if (nv !== appProps.nvArray.value[0]) return // base image replaced
+        await load(profiler, () => handleMessage({
           type: 'overlay',
           body: {
-            data: base64ToArrayBuffer(overlay.data),
+            data,
             uri: (overlay.name && isImageType(overlay.name)) ? overlay.name : `${overlay.name || 'overlay'}.nii.gz`,
-            colormap: overlay.colormap || 'red',
-            opacity: overlay.opacity ?? 0.5,
+            colormap,
+            opacity,
             index: 0,
           },
-        }, appProps)
+        }, appProps))
+        loaded.set(keys[i], { volume: nv.volumes[nv.volumes.length - 1], colormap, opacity })
+      }
+
+      // Display-only changes: no data transfer, no re-decode
+      for (let i = 0; i < overlays.length; i++) {
+        const entry = loaded.get(keys[i])
+        const colormap = overlays[i].colormap || 'red'
+        const opacity = overlays[i].opacity ?? 0.5
+        if (!entry || (entry.colormap === colormap && entry.opacity === opacity)) continue
+        const index = nv.volumes.indexOf(entry.volume)
+        if (index < 0) continue
+        nv.setVolume(index, { colormap, opacity })
+        entry.colormap = colormap
+        entry.opacity = opacity
+      }
+
+      // Order: moving each volume to the bottom in reverse of the desired
+      // order (base last) leaves them in exactly that order.
+      const desired = [nv.volumes[0]]
+      for (const key of keys) {
+        const entry = loaded.get(key)
+        if (entry) desired.push(entry.volume)
+      }
+      if (desired.some((volume, i) => nv.volumes[i] !== volume)) {
+        for (const volume of desired.reverse()) {
+          nv.moveVolumeToBottom(nv.volumes.indexOf(volume))
+        }
       }
-      loadedOverlaysRef.current = overlayIds
+      reportProfile(profiler)
     }
+    volumeOpsRef.current = volumeOpsRef.current
+      .then(syncOverlays)
+      .catch((err) => console.error('Failed to sync overlays:', err))
   }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, args.overlays])
 
+  // Progressive mode: once the coarsest level is displayed as the base image,
+  // load each finer level in turn, add it, move it to the bottom and drop the
+  // level it replaces. Overlays stay loaded and are resliced to the new base.
+  useEffect(() => {
+    const nv = appProps.nvArray.value[0]
+    const levels = args.nifti_levels
+    if (!nv || !nv.isLoaded || !levels || levels.length === 0 || refinedRef.current === niftiId) {
+      return
+    }
+    refinedRef.current = niftiId
+    const snapshot = args
+    const uri = args.filename || 'image.nii'
+    const profiler = args.profile ? new LoadProfiler('refine', args.profile) : null
+
+    const refine = async () => {
+      for (const level of levels) {
+        const data = await decode(profiler, () => loadPayload(level, snapshot))
+        if (nv !== appProps.nvArray.value[0]) return // base image replaced
+        const previous = nv.volumes[0]
+        await load(profiler, async () => {
+          await handleMessage({
+            type: 'overlay',
+            body: { data, uri, colormap: settings.value.defaultVolumeColormap, opacity: 1, index: 0 },
+          }, appProps)
+          nv.moveVolumeToBottom(nv.volumes.length - 1)
+          nv.model.removeVolume(nv.volumes.indexOf(previous))
+          nv.updateGLVolume()
+        })
+      }
+      reportProfile(profiler)
+    }
+    volumeOpsRef.current = volumeOpsRef.current
+      .then(refine)
+      .catch((err) => console.error('Failed to load finer levels:', err))
+  }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, niftiId])
+
   // Load additional meshes after base is loaded (volume + meshes mode, or extra meshes in mesh-only mode)
   useEffect(() => {
     const nv = appProps.nvArray.value[0]
@@ -170,28 +344,37 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
       return
     }
 
-    // Clear previously loaded additional meshes. v1: removal is a synchronous
-    // model op (index-based); refresh the GPU once after.
-    const keepCount = args.nifti_data ? 0 : 1
-    while (nv.meshes.length > keepCount) {
-      nv.model.removeMesh(nv.meshes.length - 1)
-    }
-    nv.updateGLVolume()
-
     // In mesh-only mode, first mesh is already loaded as base
     const startIndex = args.nifti_data ? 0 : 1
-
-    for (let i = startIndex; i < args.meshes.length; i++) {
-      const meshEntry = args.meshes[i]
-      handleMessage({
-        type: 'overlay',
-        body: {
-          data: base64ToArrayBuffer(meshEntry.data),
-          uri: meshEntry.name,
-          index: 0,
-        },
-      }, appProps)
+    const meshes = args.meshes
+    const gen = ++loadGenRef.current.meshes
+    const profiler = args.profile && startIndex < meshes.length
+      ? new LoadProfiler('meshes', args.profile)
+      : null
+
+    const loadMeshes = async () => {
+      if (gen !== loadGenRef.current.meshes) return
+      // Clear previously loaded additional meshes. v1: removal is a synchronous
+      // model op (index-based); refresh the GPU once after.
+      while (nv.meshes.length > startIndex) {
+        nv.model.removeMesh(nv.meshes.length - 1)
+      }
+      nv.updateGLVolume()
+      meshLevelRef.current = -1
+      for (let i = startIndex; i < meshes.length; i++) {
+        const meshEntry = meshes[i]
+        const data = await decode(profiler, () => loadPayload(meshEntry.data, args))
+        if (gen !== loadGenRef.current.meshes) return
+        await load(profiler, () => handleMessage({
+          type: 'overlay',
+          body: { data, uri: meshEntry.name, index: 0 },
+        }, appProps))
+      }
+      reportProfile(profiler)
     }
+    meshOpsRef.current = meshOpsRef.current
+      .then(loadMeshes)
+      .catch((err) => console.error('Failed to load meshes:', err))
     loadedMeshesRef.current = meshId
     loadedMeshOverlaysRef.current = [] // Reset mesh overlays when meshes change
   }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, meshId])
@@ -217,33 +400,115 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
     }
 
     const overlayIds = meshOverlays.map(o =>
-      `${o.name}-${o.colormap}-${o.opacity}-${dataFingerprint(o.data)}`
+      `${o.name}-${o.colormap}-${o.opacity}-${payloadFingerprint(o.data, args)}`
     )
 
     if (JSON.stringify(overlayIds) !== JSON.stringify(loadedMeshOverlaysRef.current)) {
-      // Clear existing mesh layers before re-adding to prevent accumulation.
-      // v1: go through removeMeshLayer so the mesh colors recomposite (mutating
-      // mesh.layers directly would leave the previous overlay colors baked in).
-      const baseMesh = nv.meshes[0]
-      while (baseMesh.layers && baseMesh.layers.length > 0) {
-        nv.removeMeshLayer(0, baseMesh.layers.length - 1)
+      loadedMeshOverlaysRef.current = overlayIds
+      const gen = ++loadGenRef.current.meshOverlays
+      const snapshot = args
+
+      const loadMeshOverlays = async () => {
+        if (gen !== loadGenRef.current.meshOverlays || nv.meshes.length === 0) return
+        // Clear existing mesh layers before re-adding to prevent accumulation.
+        // v1: go through removeMeshLayer so the mesh colors recomposite (mutating
+        // mesh.layers directly would leave the previous overlay colors baked in).
+        const baseMesh = nv.meshes[0]
+        while (baseMesh.layers && baseMesh.layers.length > 0) {
+          nv.removeMeshLayer(0, baseMesh.layers.length - 1)
+        }
+        // mesh_lod: overlay data must match the level the mesh is shown at
+        const levelOverlays = meshLevel(firstMesh, meshLevelRef.current).overlays ?? []
+        for (let i = 0; i < meshOverlays.length; i++) {
+          const overlay = meshOverlays[i]
+          const source = levelOverlays[i] ?? overlay
+          const data = await loadPayload(source.data, snapshot)
+          if (gen !== loadGenRef.current.meshOverlays) return
+          await handleMessage({
+            type: 'addMeshOverlay',
+            body: {
+              data,
+              uri: source.name,
+              colormap: overlay.colormap || 'redyell',
+              opacity: overlay.opacity ?? 0.7,
+              index: 0,
+            },
+          }, appProps)
+        }
       }
+      meshOpsRef.current = meshOpsRef.current
+        .then(loadMeshOverlays)
+        .catch((err) => console.error('Failed to load mesh overlays:', err))
+    }
+  }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, args.meshes])
 
-      for (const overlay of meshOverlays) {
-        handleMessage({
-          type: 'addMeshOverlay',
-          body: {
-            data: base64ToArrayBuffer(overlay.data),
-            uri: overlay.name,
-            colormap: overlay.colormap || 'redyell',
-            opacity: overlay.opacity ?? 0.7,
-            index: 0,
-          },
-        }, appProps)
+  // mesh_lod: once the coarsest levels are displayed, swap in each finer
+  // level while the browser is idle, ending with the full meshes. A swap
+  // adds the new meshes after the current ones, then removes the old ones,
+  // so the view never shows an empty scene; the first mesh's overlays are
+  // re-added with the data resampled for the new level.
+  useEffect(() => {
+    const nv = appProps.nvArray.value[0]
+    const meshes = args.meshes
+    const depth = Math.max(0, ...(meshes ?? []).map((mesh) => mesh.levels?.length ?? 0))
+    if (!nv || !nv.isLoaded || !meshes || depth === 0 || lodRef.current === meshId) {
+      return
+    }
+    lodRef.current = meshId
+    const gen = loadGenRef.current.meshes
+    const snapshot = args
+    const profiler = args.profile ? new LoadProfiler('lod', args.profile) : null
+    const stale = () => gen !== loadGenRef.current.meshes || nv !== appProps.nvArray.value[0]
+
+    const upgrade = async () => {
+      for (let level = 0; level < depth; level++) {
+        await whenIdle()
+        if (stale()) return
+        const entries = meshes.map((mesh) => meshLevel(mesh, level))
+        const data: ArrayBuffer[] = []
+        for (const entry of entries) {
+          data.push(await decode(profiler, () => loadPayload(entry.data, snapshot)))
+        }
+        const overlays = loadedMeshOverlaysRef.current.length > 0 ? entries[0].overlays ?? [] : []
+        const overlayData: ArrayBuffer[] = []
+        for (const overlay of overlays) {
+          overlayData.push(await decode(profiler, () => loadPayload(overlay.data, snapshot)))
+        }
+        if (stale()) return
+        await load(profiler, async () => {
+          const previous = nv.meshes.length
+          for (let i = 0; i < entries.length; i++) {
+            await handleMessage({
+              type: 'overlay',
+              body: { data: data[i], uri: entries[i].name, index: 0 },
+            }, appProps)
+          }
+          for (let i = 0; i < previous; i++) {
+            nv.model.removeMesh(0)
+          }
+          nv.updateGLVolume()
+          meshLevelRef.current = level
+          const styles = meshes[0].overlays ?? []
+          for (let i = 0; i < overlays.length; i++) {
+            await handleMessage({
+              type: 'addMeshOverlay',
+              body: {
+                data: overlayData[i],
+                uri: overlays[i].name,
+                colormap: styles[i]?.colormap || 'redyell',
+                opacity: styles[i]?.opacity ?? 0.7,
+                index: 0,
+              },
+            }, appProps)
+          }
+        })
       }
-      loadedMeshOverlaysRef.current = overlayIds
+      reportProfile(profiler)
     }
-  }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, args.meshes])
+    meshOpsRef.current = meshOpsRef.current
+      .then(upgrade)
+      .catch((err) => console.error('Failed to load finer mesh levels:', err))
+  }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, meshId])
 
   // Throttled wrapper for Streamlit.setComponentValue to avoid overwhelming
   // Python with updates during mouse drag. update_interval_ms === null
@@ -268,25 +533,73 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
     throttleIntervalRef.current = null
   }
 
+  // batch_events: events are buffered and the throttle delivers the whole
+  // buffer instead of the latest click. One batcher lives as long as the
+  // component so batch numbers keep increasing across re-renders.
+  const batchMode = feedbackDisabled ? null : (args.batch_events ?? null)
+  const batcherRef = useRef<EventBatcher | null>(null)
+  const throttledFlush = useRef<ReturnType<typeof throttle<() => void>> | null>(null)
+  const flushIntervalRef = useRef<number | null>(null)
+  if (batchMode !== null) {
+    if (!batcherRef.current) {
+      batcherRef.current = new EventBatcher(batchMode)
+    }
+    batcherRef.current.mode = batchMode
+    if (flushIntervalRef.current !== intervalMs) {
+      throttledFlush.current?.cancel()
+      throttledFlush.current = throttle(() => {
+        const batch = batcherRef.current?.flush()
+        if (batch) Streamlit.setComponentValue(batch)
+      }, intervalMs)
+      flushIntervalRef.current = intervalMs
+    }
+  } else if (throttledFlush.current) {
+    throttledFlush.current.cancel()
+    throttledFlush.current = null
+    flushIntervalRef.current = null
+  }
+
   // Sync click events back to Streamlit
   useEffect(() => {
     if (feedbackDisabled) {
       return
     }
 
+    const batched = batchMode !== null
+    const isLoaded = () => appProps.nvArray.value.length > 0 && appProps.nvArray.value[0]?.isLoaded
+    const emit = (event: { type: string; [field: string]: unknown }) => {
+      batcherRef.current?.push(event)
+      throttledFlush.current?.()
+    }
+
     const handleLocationChange = (detail: any) => {
-      if (appProps.nvArray.value.length > 0 && appProps.nvArray.value[0]?.isLoaded) {
-        throttledSetValue.current?.(buildVoxelClickPayload(detail, args.filename))
+      if (!isLoaded()) return
+      const frame = shownFrameRef.current
+      const payload = { ...buildVoxelClickPayload(detail, args.filename), ...(frame !== null && { frame }) }
+      if (batched) {
+        emit(payload)
+      } else {
+        throttledSetValue.current?.(payload)
       }
     }
 
     // v1: location updates arrive on the 'locationChange' DOM event (the
     // settable nv.onLocationChange callback was removed). Attach to every
-    // instance and clean up with the same listener reference.
-    const onLoc = (e: CustomEvent) => handleLocationChange(e.detail)
+    // instance and clean up with the same listener reference. Drags,
+    // window changes and drawing edits are only reported in batches.
+    const listeners: [string, (e: CustomEvent) => void][] = [
+      ['locationChange', (e) => handleLocationChange(e.detail)],
+    ]
+    if (batched) {
+      listeners.push(
+        ['dragRelease', (e) => isLoaded() && emit(buildDragReleasePayload(e.detail))],
+        ['intensityChange', (e) => isLoaded() && emit(buildIntensityPayload(e.detail))],
+        ['drawingChanged', (e) => isLoaded() && emit({ type: 'drawing_change', action: e.detail?.action ?? 'draw' })],
+      )
+    }
     appProps.nvArray.value.forEach((nv) => {
       if (nv.canvas) {
-        nv.addEventListener('locationChange', onLoc)
+        listeners.forEach(([name, listener]) => nv.addEventListener(name as any, listener as any))
       }
     })
 
@@ -294,16 +607,163 @@ export const useStreamlitNiivue = (args: StreamlitArgs) => {
       throttledSetValue.current?.cancel()
       appProps.nvArray.value.forEach((nv) => {
         if (nv.canvas) {
-          nv.removeEventListener('locationChange', onLoc)
+          listeners.forEach(([name, listener]) => nv.removeEventListener(name as any, listener as any))
         }
       })
     }
-  }, [appProps.nvArray.value, args.filename, feedbackDisabled, intervalMs])
+  }, [appProps.nvArray.value, args.filename, feedbackDisabled, intervalMs, batchMode])
+
+  // No delivery after unmount: Streamlit has dropped the component by then
+  useEffect(() => () => throttledFlush.current?.cancel(), [])
+
+  // drawing=...: enable drawing on the base image, load the initial layer
+  // once per image, and send the layer back to Python as versioned updates
+  // (see drawing.ts) after each edit, throttled like click feedback. Updates
+  // are chained so their versions reach Python in order.
+  const drawingRef = useRef<{ sync: DrawingSync; image: string | null } | null>(null)
+  const drawingOpsRef = useRef<Promise<void>>(Promise.resolve())
+  const drawingInitialId = args.drawing?.initial ? payloadFingerprint(args.drawing.initial, args) : null
+  useEffect(() => {
+    // Drawing fields are not part of the typed v1 surface used elsewhere
+    const nv = appProps.nvArray.value[0] as any
+    const drawing = args.drawing
+    if (!nv || !nv.isLoaded) {
+      return
+    }
+    if (!drawing || feedbackDisabled) {
+      if (drawingRef.current) {
+        nv.setDrawingEnabled(false)
+        drawingRef.current = null
+      }
+      return
+    }
+    if (!drawingRef.current) {
+      drawingRef.current = { sync: new DrawingSync(drawing.version, drawing.resync), image: null }
+    }
+    const state = drawingRef.current
+    const snapshot = args
+
+    const send = () => {
+      drawingOpsRef.current = drawingOpsRef.current
+        .then(async () => {
+          if (state !== drawingRef.current || nv !== appProps.nvArray.value[0]) return
+          const layer = readDrawing(nv)
+          if (!layer) return
+          const update = await state.sync.next(layer.bitmap, layer.dims, layer.perm)
+          if (update) Streamlit.setComponentValue(update)
+        })
+        .catch((err) => console.error('Failed to sync drawing:', err))
+    }
+
+    const imageKey = `${niftiId}|${drawingInitialId}`
+    if (state.image !== imageKey) {
+      state.image = imageKey
+      drawingOpsRef.current = drawingOpsRef.current
+        .then(async () => {
+          nv.setDrawingEnabled(true)
+          if (drawing.initial) {
+            const data = await loadPayload(drawing.initial, snapshot)
+            const url = URL.createObjectURL(new Blob([data]))
+            try {
+              await nv.loadDrawingFromUrl(url)
+            } finally {
+              URL.revokeObjectURL(url)
+            }
+          }
+          state.sync.reset()
+        })
+        .catch((err) => console.error('Failed to load drawing:', err))
+      send()
+    } else if (state.sync.requestResync(drawing.resync)) {
+      send()
+    }
+    nv.setPenValue(drawing.pen, false)
+
+    // 'drawingChanged' follows each stroke, fill and undo; pointerup covers
+    // builds that do not emit it (an unchanged layer sends nothing).
+    const throttledSend = throttle(send, intervalMs)
+    nv.addEventListener('drawingChanged', throttledSend)
+    nv.canvas?.addEventListener('pointerup', throttledSend)
+    return () => {
+      throttledSend.cancel()
+      nv.removeEventListener('drawingChanged', throttledSend)
+      nv.canvas?.removeEventListener('pointerup', throttledSend)
+    }
+  }, [
+    appProps.nvArray.value,
+    appProps.nvArray.value[0]?.isLoaded,
+    niftiId,
+    drawingInitialId,
+    args.drawing?.pen,
+    args.drawing?.resync,
+    feedbackDisabled,
+    intervalMs,
+  ])
+
+  // frame_window: cache the frames each run sends, then show the wanted
+  // frame (the slider's, else Python's) by swapping it in as the base volume
+  // like a progressive level, on the volume queue. A frame outside the
+  // cached window is shown once the run answering its frame_change arrives.
+  const frames = args.frames ?? null
+  const windowKey = frames ? `${frames.series}|${frames.window.map((frame) => frame.index).join(',')}` : null
+  const wantedFrame = frames ? (localFrame ?? frames.current) : null
+  useEffect(() => {
+    if (!frames) return
+    const cache = frameCacheRef.current
+    const snapshot = args
+    cache.use(frames.series)
+    cache.update(frames.window, wantedFrame ?? frames.current, shownFrameRef.current, (data) => loadPayload(data, snapshot))
+  }, [windowKey])
+
+  useEffect(() => {
+    const nv = appProps.nvArray.value[0]
+    if (!nv || !nv.isLoaded || wantedFrame === null || wantedFrame === shownFrameRef.current) {
+      return
+    }
+    const pending = frameCacheRef.current.get(wantedFrame)
+    if (!pending) return
+    const target = wantedFrame
+    const uri = args.filename || 'image.nii'
+
+    const swap = async () => {
+      const data = await pending
+      if (nv !== appProps.nvArray.value[0] || shownFrameRef.current === target) return
+      const previous = nv.volumes[0]
+      await handleMessage({
+        type: 'overlay',
+        body: { data, uri, colormap: previous?.colormap ?? settings.value.defaultVolumeColormap, opacity: 1, index: 0 },
+      }, appProps)
+      nv.moveVolumeToBottom(nv.volumes.length - 1)
+      nv.model.removeVolume(nv.volumes.indexOf(previous))
+      nv.updateGLVolume()
+      shownFrameRef.current = target
+    }
+    volumeOpsRef.current = volumeOpsRef.current
+      .then(swap)
+      .catch((err) => console.error('Failed to show frame:', err))
+  }, [appProps.nvArray.value, appProps.nvArray.value[0]?.isLoaded, wantedFrame, windowKey])
+
+  // The slider shows cached frames at once and asks Python for the window
+  // around the new position, throttled like click feedback.
+  const throttledFrameRequest = useRef<ReturnType<typeof throttle<(frame: number) => void>> | null>(null)
+  useEffect(() => {
+    throttledFrameRequest.current = throttle((frame: number) => {
+      Streamlit.setComponentValue({ type: 'frame_change', frame })
+    }, intervalMs)
+    return () => throttledFrameRequest.current?.cancel()
+  }, [intervalMs])
+  const requestFrame = (frame: number) => {
+    setLocalFrame(frame)
+    if (!feedbackDisabled) throttledFrameRequest.current?.(frame)
+  }
 
   // Set frame height
   useEffect(() => {
     Streamlit.setFrameHeight(args.height || 600)
   }, [args.height])
 
-  return appProps
+  return {
+    appProps,
+    frames: frames && wantedFrame !== null ? { count: frames.count, frame: wantedFrame, setFrame: requestFrame } : null,
+  }
 }
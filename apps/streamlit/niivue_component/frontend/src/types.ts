@@ -1,28 +1,80 @@
 import { SLICE_TYPE } from '@niivue/niivue'
 
+/** Reference to a top-level `blob_<n>` argument (`transport="binary"`). */
+export interface BlobRef {
+  blob: string
+  hash?: string // BLAKE2b digest of the payload
+}
+
+/** Content-addressed media URL served by Streamlit (`transport="url"`). */
+export interface UrlRef {
+  url: string
+  hash: string
+}
+
+/**
+ * A binary payload as sent by the Python wrapper: a base64 string (legacy
+ * `transport="base64"`), a reference to a top-level argument that Streamlit
+ * delivers as a Uint8Array, or a media URL plus content hash.
+ */
+export type PayloadRef = string | BlobRef | UrlRef
+
+export interface VolumeOverlay {
+  data: PayloadRef // overlay
+  name: string
+  // Stable identity across re-runs; defaults to name + data fingerprint
+  id?: string | null
+  colormap?: string
+  opacity?: number
+}
+
 export interface MeshOverlay {
-  data: string // base64 encoded overlay data
+  data: PayloadRef // overlay data
   name: string
   colormap?: string
   opacity?: number
 }
 
+/** One level of detail of a mesh: its data and matching overlay data. */
+export interface MeshLevel {
+  data: PayloadRef
+  name: string
+  overlays?: { data: PayloadRef; name: string }[]
+}
+
 export interface MeshData {
-  data: string // base64 encoded mesh data
+  data: PayloadRef // mesh data
   name: string
   overlays?: MeshOverlay[]
+  // mesh_lod: finer levels replacing data (and overlay data) in order,
+  // ending with the full mesh
+  levels?: MeshLevel[] | null
+}
+
+/** One volume of a `niivue_grid`. */
+export interface GridCell {
+  data: PayloadRef
+  name: string
+  label?: string
+}
+
+/** Layout and cells of a `niivue_grid` (replaces the single viewer). */
+export interface GridArgs {
+  cells: GridCell[]
+  columns: number
+  cell_height: number
+  view_mode?: 'axial' | 'coronal' | 'sagittal' | '3d' | 'multiplanar'
+  colormap?: string
 }
 
 export interface StreamlitArgs {
-  nifti_data?: string // base64 encoded main image
+  nifti_data?: PayloadRef // main image
   filename?: string
-  paired_data?: string // base64 encoded paired raw voxels for detached MHD
-  overlays?: Array<{
-    data: string // base64 encoded overlay
-    name: string
-    colormap?: string
-    opacity?: number
-  }>
+  paired_data?: PayloadRef | null // paired raw voxels for detached MHD
+  // progressive mode: finer levels replacing nifti_data in order, ending
+  // with the full-resolution volume
+  nifti_levels?: PayloadRef[] | null
+  overlays?: VolumeOverlay[]
   meshes?: MeshData[]
   height?: number
   view_mode?: 'axial' | 'coronal' | 'sagittal' | '3d' | 'multiplanar'
@@ -37,6 +89,56 @@ export interface StreamlitArgs {
   // null disables feedback entirely — no setComponentValue calls, no Python
   // round-trips on mouse interaction.
   update_interval_ms?: number | null
+  // Buffer interaction events and deliver them as one batch per update;
+  // null sends each voxel_click on its own
+  batch_events?: BatchMode | null
+  // drawing=...: enable drawing and sync the layer back to Python
+  drawing?: DrawingArgs | null
+  // frame_window: a 4D series streamed as 3D frames; nifti_data is the
+  // current frame
+  frames?: FramesArgs | null
+  // niivue_grid: many volumes rendered as thumbnails by one niivue instance
+  grid?: GridArgs | null
+  // profile=True: Python-side telemetry of the run that sent these args,
+  // echoed back with the frontend timings of the load they trigger
+  profile?: Record<string, unknown> | null
+  // Binary payloads referenced by PayloadRef.blob
+  [blob: `blob_${number}`]: Uint8Array | undefined
+}
+
+/** `frame_window`: the frames of a 4D series sent with this run. */
+export interface FramesArgs {
+  count: number
+  current: number
+  // id of the series; frames of another series are never mixed in
+  series: string
+  window: { index: number; data: PayloadRef }[]
+}
+
+export interface FrameChangeEventData {
+  type: 'frame_change'
+  frame: number
+}
+
+/** `drawing`: pen, optional initial layer and Python's sync state. */
+export interface DrawingArgs {
+  pen: number
+  initial?: PayloadRef | null
+  // last version Python applied; updates continue from it
+  version: number
+  // incremented by Python when an update could not be applied
+  resync: number
+}
+
+/** One update of the drawing layer: zlib + base64 slabs of axial slices. */
+export interface DrawingEventData {
+  type: 'drawing'
+  version: number
+  // version the slabs apply on top of; null for the whole layer
+  base_version: number | null
+  dims: [number, number, number]
+  perm: number[]
+  slabs: { start: number; stop: number; data: string }[]
 }
 
 export interface ClickEventData {
@@ -47,6 +149,57 @@ export interface ClickEventData {
   filename: string
 }
 
+export interface CellClickEventData {
+  type: 'cell_click'
+  index: number
+  name: string
+  label: string
+}
+
+/**
+ * batch_events: how events of one type are coalesced before delivery:
+ * keep only the latest ('last'), keep every event ('all'), or keep one per
+ * window of that many milliseconds.
+ */
+export type BatchMode = 'last' | 'all' | number
+
+/** An interaction event as delivered to Python, stamped with its time (ms since epoch). */
+export interface TimedEvent {
+  type: string
+  t: number
+  [field: string]: unknown
+}
+
+export interface BatchEventData {
+  type: 'batch'
+  seq: number
+  sent_at: number
+  events: TimedEvent[]
+  // events merged away by coalescing, and dropped because the batch was full
+  coalesced: number
+  dropped: number
+}
+
+/** Browser-side timings of one load, in milliseconds. */
+export interface FrontendTimings {
+  // payload decode: base64 decode, blob slice or media fetch
+  decode_ms: number
+  // niivue parse and GPU upload (one step in niivue v1's addVolume/addMesh)
+  load_ms: number
+  // from the end of the load until the frame showing it
+  first_draw_ms: number
+  total_ms: number
+  bytes: number
+  payloads: number
+}
+
+export interface ProfileEventData {
+  type: 'profile'
+  phase: 'base' | 'overlays' | 'refine' | 'meshes' | 'lod'
+  python: Record<string, unknown> | null
+  frontend: FrontendTimings
+}
+
 export const VIEW_MODE_TO_SLICE_TYPE: Record<string, number> = {
   axial: SLICE_TYPE.AXIAL,
   coronal: SLICE_TYPE.CORONAL,
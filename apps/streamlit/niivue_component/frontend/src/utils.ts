@@ -1,3 +1,18 @@
+import type {
+  BatchEventData,
+  BatchMode,
+  BlobRef,
+  FrontendTimings,
+  MeshData,
+  MeshLevel,
+  PayloadRef,
+  ProfileEventData,
+  StreamlitArgs,
+  TimedEvent,
+  UrlRef,
+  VolumeOverlay,
+} from './types'
+
 /** The subset of niivue's `locationChange` event detail we read for feedback. */
 export interface NiivueLocationDetail {
   vox: number[]
@@ -35,6 +50,29 @@ export function buildVoxelClickPayload(
   }
 }
 
+const roundVoxel = (vox: ArrayLike<number>) => [Math.round(vox[0]), Math.round(vox[1]), Math.round(vox[2])]
+
+/** `batch_events`: a drag (measure/contrast/pan) released on the canvas. */
+export function buildDragReleasePayload(detail: any) {
+  return {
+    type: 'drag_release',
+    voxel_start: roundVoxel(detail?.voxStart ?? [0, 0, 0]),
+    voxel_end: roundVoxel(detail?.voxEnd ?? [0, 0, 0]),
+    mm_start: Array.from(detail?.mmStart ?? [0, 0, 0]).slice(0, 3) as number[],
+    mm_end: Array.from(detail?.mmEnd ?? [0, 0, 0]).slice(0, 3) as number[],
+  }
+}
+
+/** `batch_events`: the display window of a volume changed (e.g. by a contrast drag). */
+export function buildIntensityPayload(volume: any) {
+  return {
+    type: 'intensity_change',
+    name: volume?.name ?? '',
+    cal_min: volume?.cal_min ?? 0,
+    cal_max: volume?.cal_max ?? 0,
+  }
+}
+
 export function base64ToArrayBuffer(base64: string): ArrayBuffer {
   const binary_string = window.atob(base64)
   const len = binary_string.length
@@ -45,6 +83,271 @@ export function base64ToArrayBuffer(base64: string): ArrayBuffer {
   return bytes.buffer
 }
 
+function isUrlRef(ref: PayloadRef): ref is UrlRef {
+  return typeof ref === 'object' && 'url' in ref
+}
+
+/** Look up the Uint8Array a `{ blob }` reference points at. */
+function getBlob(ref: BlobRef, args: StreamlitArgs): Uint8Array {
+  const bytes = (args as Record<string, unknown>)[ref.blob]
+  if (!(bytes instanceof Uint8Array)) {
+    throw new Error(`Missing binary payload "${ref.blob}"`)
+  }
+  return bytes
+}
+
+/**
+ * Resolve a payload sent by the Python wrapper to an ArrayBuffer.
+ * Binary payloads arrive as Uint8Array views, usually into the larger buffer
+ * of the whole Streamlit message; only the viewed range is copied out, and
+ * a view spanning its entire buffer is handed over without any copy.
+ */
+export function resolvePayload(ref: PayloadRef, args: StreamlitArgs): ArrayBuffer {
+  if (typeof ref === 'string') {
+    return base64ToArrayBuffer(ref)
+  }
+  if (isUrlRef(ref)) {
+    throw new Error(`Payload ${ref.url} must be fetched; use loadPayload`)
+  }
+  const bytes = getBlob(ref, args)
+  const { buffer, byteOffset, byteLength } = bytes
+  if (byteOffset === 0 && byteLength === buffer.byteLength && buffer instanceof ArrayBuffer) {
+    return buffer
+  }
+  return buffer.slice(byteOffset, byteOffset + byteLength) as ArrayBuffer
+}
+
+/**
+ * Resolve a media URL from the Python wrapper. The URL is root-relative to
+ * the Streamlit server, which is the parent page; in dev mode the iframe is
+ * served from the Vite server instead, so resolve against the referrer.
+ */
+export function resolveMediaUrl(url: string): string {
+  return new URL(url, document.referrer || window.location.href).toString()
+}
+
+/**
+ * Resolve any payload to an ArrayBuffer, fetching media URLs. The URLs are
+ * content-addressed, so the browser's HTTP cache may answer them.
+ */
+export async function loadPayload(ref: PayloadRef, args: StreamlitArgs): Promise<ArrayBuffer> {
+  if (!isUrlRef(ref)) {
+    return resolvePayload(ref, args)
+  }
+  const response = await fetch(resolveMediaUrl(ref.url), { cache: 'force-cache' })
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status} ${response.statusText} fetching ${ref.url}`)
+  }
+  return response.arrayBuffer()
+}
+
+/** 53-bit hash (cyrb53) of every character or byte of `data`. */
+function contentHash(data: string | Uint8Array): string {
+  let h1 = 0xdeadbeef
+  let h2 = 0x41c6ce57
+  const text = typeof data === 'string'
+  for (let i = 0; i < data.length; i++) {
+    const c = text ? (data as string).charCodeAt(i) : (data as Uint8Array)[i]
+    h1 = Math.imul(h1 ^ c, 2654435761)
+    h2 = Math.imul(h2 ^ c, 1597334677)
+  }
+  h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909)
+  h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909)
+  return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16)
+}
+
+/**
+ * Change-detection key for a payload. Media URLs and binary blobs carry the
+ * BLAKE2b digest Python computed for them, so comparing keys never touches
+ * the payload. Base64 strings (and blobs from senders without a digest) are
+ * hashed in full: sampling misses same-sized maps that differ mid-buffer.
+ * Binary payloads are fresh Uint8Array instances on every Streamlit re-run,
+ * so identity cannot be used to detect changes.
+ */
+export function payloadFingerprint(ref: PayloadRef | null | undefined, args: StreamlitArgs): string {
+  if (!ref) return '0'
+  if (isUrlRef(ref)) return ref.hash
+  if (typeof ref === 'string') return `${ref.length}:${contentHash(ref)}`
+  if (ref.hash) return ref.hash
+  const bytes = getBlob(ref, args)
+  return `${bytes.length}:${contentHash(bytes)}`
+}
+
+/**
+ * Stable keys for volume overlays: the Python-side `id` when given, else the
+ * name plus a data fingerprint. Display properties (colormap, opacity) are
+ * deliberately not part of the key so changing them never reloads data.
+ * Repeated keys (the same file added twice) get an occurrence suffix.
+ */
+export function overlayKeys(overlays: VolumeOverlay[], args: StreamlitArgs): string[] {
+  const seen = new Map<string, number>()
+  return overlays.map((overlay) => {
+    const key = overlay.id ?? `${overlay.name}|${payloadFingerprint(overlay.data, args)}`
+    const count = seen.get(key) ?? 0
+    seen.set(key, count + 1)
+    return count ? `${key}#${count}` : key
+  })
+}
+
+/** Keys to drop and to load to go from the loaded overlays to the desired ones. */
+export function diffOverlayKeys(
+  loaded: string[],
+  desired: string[],
+): { remove: string[]; add: string[] } {
+  const loadedSet = new Set(loaded)
+  const desiredSet = new Set(desired)
+  return {
+    remove: loaded.filter((key) => !desiredSet.has(key)),
+    add: desired.filter((key) => !loadedSet.has(key)),
+  }
+}
+
+/**
+ * The data of a mesh at level of detail `level`: -1 is the coarsest level
+ * sent as `mesh.data`, 0.. index `mesh.levels`. Meshes with fewer levels
+ * (or none) stay at their finest one.
+ */
+export function meshLevel(mesh: MeshData, level: number): MeshLevel {
+  const levels = mesh.levels ?? []
+  if (level < 0 || levels.length === 0) {
+    return { data: mesh.data, name: mesh.name, overlays: mesh.overlays ?? [] }
+  }
+  return levels[Math.min(level, levels.length - 1)]
+}
+
+/**
+ * Accumulates the timings of one load for `profile=True`. `decode` and
+ * `load` time a step and add it to the matching total; `report` waits for
+ * the next painted frame, records the first-draw time and builds the event.
+ */
+export class LoadProfiler {
+  private readonly start = performance.now()
+  private loadEnd = this.start
+  readonly timings: FrontendTimings = {
+    decode_ms: 0,
+    load_ms: 0,
+    first_draw_ms: 0,
+    total_ms: 0,
+    bytes: 0,
+    payloads: 0,
+  }
+
+  constructor(
+    readonly phase: ProfileEventData['phase'],
+    private readonly python: Record<string, unknown> | null,
+  ) {}
+
+  async decode(work: () => Promise<ArrayBuffer>): Promise<ArrayBuffer> {
+    const start = performance.now()
+    const data = await work()
+    this.timings.decode_ms += performance.now() - start
+    this.timings.bytes += data.byteLength
+    this.timings.payloads++
+    return data
+  }
+
+  async load<T>(work: () => Promise<T>): Promise<T> {
+    const start = performance.now()
+    const result = await work()
+    this.loadEnd = performance.now()
+    this.timings.load_ms += this.loadEnd - start
+    return result
+  }
+
+  /** Record a load step that completed elsewhere (e.g. in NiiVueCanvas). */
+  loaded(since: number): void {
+    this.loadEnd = performance.now()
+    this.timings.load_ms += this.loadEnd - since
+  }
+
+  async report(): Promise<ProfileEventData> {
+    await nextFrame()
+    const now = performance.now()
+    this.timings.first_draw_ms = now - this.loadEnd
+    this.timings.total_ms = now - this.start
+    return { type: 'profile', phase: this.phase, python: this.python, frontend: { ...this.timings } }
+  }
+}
+
+/**
+ * Resolves once the frame after the next one starts, i.e. after whatever
+ * was drawn in the next animation frame has been presented.
+ */
+export function nextFrame(): Promise<void> {
+  return new Promise((resolve) => requestAnimationFrame(() => requestAnimationFrame(() => resolve())))
+}
+
+/**
+ * Buffers interaction events between deliveries for `batch_events`. Each
+ * event is stamped on arrival; an event replaces the buffered one of the same
+ * type when the mode is 'last', or when both fall in the same window of N ms
+ * for a numeric mode. `flush` hands over the buffer as one numbered batch.
+ * At most `maxEvents` are buffered; the oldest are dropped beyond that.
+ */
+export class EventBatcher {
+  private events: TimedEvent[] = []
+  private seq = 0
+  private coalesced = 0
+  private dropped = 0
+
+  constructor(
+    public mode: BatchMode,
+    private readonly maxEvents = 1000,
+  ) {}
+
+  get size(): number {
+    return this.events.length
+  }
+
+  push(event: { type: string; [field: string]: unknown }, t = Date.now()): void {
+    const mode = this.mode
+    if (mode !== 'all') {
+      let i = this.events.length - 1
+      while (i >= 0 && this.events[i].type !== event.type) i--
+      if (i >= 0 && (mode === 'last' || Math.floor(this.events[i].t / mode) === Math.floor(t / mode))) {
+        this.events.splice(i, 1)
+        this.coalesced++
+      }
+    }
+    if (this.events.length >= this.maxEvents) {
+      this.events.shift()
+      this.dropped++
+    }
+    this.events.push({ ...event, t })
+  }
+
+  flush(): BatchEventData | null {
+    if (this.events.length === 0) return null
+    const batch: BatchEventData = {
+      type: 'batch',
+      seq: ++this.seq,
+      sent_at: Date.now(),
+      events: this.events,
+      coalesced: this.coalesced,
+      dropped: this.dropped,
+    }
+    this.events = []
+    this.coalesced = 0
+    this.dropped = 0
+    return batch
+  }
+}
+
+/**
+ * Resolves when the browser is idle (`requestIdleCallback`), or after at
+ * most `timeout` ms; falls back to a short timer where idle callbacks are
+ * not supported.
+ */
+export function whenIdle(timeout = 2000): Promise<void> {
+  return new Promise((resolve) => {
+    if (typeof requestIdleCallback === 'function') {
+      requestIdleCallback(() => resolve(), { timeout })
+    } else {
+      setTimeout(resolve, 100)
+    }
+  })
+}
+
 /**
  * Creates a throttled version of a function that fires at most once per interval.
  * Uses leading + trailing edge behavior:
@@ -0,0 +1,35 @@
+import { describe, expect, it } from 'vitest'
+import { dirtySlabs, DrawingSync } from '../src/drawing'
+
+describe('drawing', () => {
+  describe('dirtySlabs', () => {
+    const sliceSize = 4
+
+    it('finds nothing for identical layers', () => {
+      const layer = new Uint8Array(20)
+      expect(dirtySlabs(layer, layer.slice(), sliceSize)).toEqual([])
+    })
+
+    it('merges consecutive changed slices into slabs', () => {
+      const previous = new Uint8Array(24)
+      const current = previous.slice()
+      current[1] = 1 // slice 0
+      current[6] = 1 // slice 1
+      current[19] = 2 // slice 4
+      expect(dirtySlabs(current, previous, sliceSize)).toEqual([
+        [0, 2],
+        [4, 5],
+      ])
+    })
+  })
+
+  describe('DrawingSync', () => {
+    it('honours each resync request once', () => {
+      const sync = new DrawingSync(5, 1)
+      expect(sync.version).toBe(5)
+      expect(sync.requestResync(1)).toBe(false)
+      expect(sync.requestResync(2)).toBe(true)
+      expect(sync.requestResync(2)).toBe(false)
+    })
+  })
+})
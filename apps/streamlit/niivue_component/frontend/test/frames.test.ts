@@ -0,0 +1,39 @@
+import { describe, expect, it, vi } from 'vitest'
+import { FrameCache } from '../src/frames'
+
+const window = (...indices: number[]) => indices.map((index) => ({ index, data: `frame${index}` }))
+
+describe('FrameCache', () => {
+  it('fetches the window nearest to the current frame first', () => {
+    const cache = new FrameCache()
+    const fetch = vi.fn(async () => new ArrayBuffer(1))
+    cache.use('a')
+    cache.update(window(3, 4, 5, 6, 7), 5, null, fetch)
+    expect(fetch.mock.calls.map(([data]) => data)).toEqual(['frame5', 'frame4', 'frame6', 'frame3', 'frame7'])
+  })
+
+  it('fetches each frame once and drops frames outside the window', () => {
+    const cache = new FrameCache()
+    const fetch = vi.fn(async () => new ArrayBuffer(1))
+    cache.use('a')
+    cache.update(window(0, 1, 2), 1, null, fetch)
+    cache.update(window(1, 2, 3), 2, 0, fetch)
+    expect(fetch).toHaveBeenCalledTimes(4)
+    expect(cache.has(0)).toBe(true) // on screen
+    cache.update(window(2, 3, 4), 3, 3, fetch)
+    expect(cache.has(0)).toBe(false)
+    expect(cache.has(1)).toBe(false)
+  })
+
+  it('forgets failed fetches and other series', async () => {
+    const cache = new FrameCache()
+    cache.use('a')
+    cache.update(window(0), 0, null, () => Promise.reject(new Error('offline')))
+    await expect(cache.get(0)).rejects.toThrow('offline')
+    expect(cache.has(0)).toBe(false)
+
+    cache.update(window(0), 0, null, async () => new ArrayBuffer(1))
+    cache.use('b')
+    expect(cache.has(0)).toBe(false)
+  })
+})
@@ -0,0 +1,60 @@
+import { describe, expect, it, vi } from 'vitest'
+import { CellScheduler } from '../src/grid'
+
+/** A render function whose calls resolve only when released. */
+function deferredRender() {
+  const pending: (() => void)[] = []
+  const calls: number[] = []
+  const render = vi.fn((index: number) => {
+    calls.push(index)
+    return new Promise<void>((resolve) => pending.push(resolve))
+  })
+  const release = async () => {
+    pending.shift()?.()
+    await new Promise((resolve) => setTimeout(resolve, 0))
+  }
+  return { render, calls, release }
+}
+
+describe('CellScheduler', () => {
+  it('renders visible cells one at a time in grid order', async () => {
+    const { render, calls, release } = deferredRender()
+    const scheduler = new CellScheduler(render, vi.fn())
+    scheduler.show(5)
+    scheduler.show(2)
+    scheduler.show(3)
+    expect(calls).toEqual([5])
+    await release()
+    expect(calls).toEqual([5, 2])
+    await release()
+    await release()
+    expect(calls).toEqual([5, 2, 3])
+    expect(scheduler.isRendered(3)).toBe(true)
+  })
+
+  it('skips cells hidden before their turn and frees rendered ones', async () => {
+    const { render, calls, release } = deferredRender()
+    const free = vi.fn()
+    const scheduler = new CellScheduler(render, free)
+    scheduler.show(0)
+    scheduler.show(1)
+    scheduler.hide(1)
+    await release()
+    expect(calls).toEqual([0])
+    expect(free).not.toHaveBeenCalled()
+    scheduler.hide(0)
+    expect(free).toHaveBeenCalledWith(0)
+    expect(scheduler.isRendered(0)).toBe(false)
+  })
+
+  it('frees a cell that scrolled out while it was rendering', async () => {
+    const { render, release } = deferredRender()
+    const free = vi.fn()
+    const scheduler = new CellScheduler(render, free)
+    scheduler.show(4)
+    scheduler.hide(4)
+    await release()
+    expect(free).toHaveBeenCalledWith(4)
+    expect(scheduler.isRendered(4)).toBe(false)
+  })
+})
@@ -1,5 +1,19 @@
 import { describe, expect, it, vi } from 'vitest'
-import { base64ToArrayBuffer, buildVoxelClickPayload, throttle } from '../src/utils'
+import {
+  base64ToArrayBuffer,
+  buildDragReleasePayload,
+  buildIntensityPayload,
+  buildVoxelClickPayload,
+  diffOverlayKeys,
+  EventBatcher,
+  LoadProfiler,
+  loadPayload,
+  meshLevel,
+  overlayKeys,
+  payloadFingerprint,
+  resolvePayload,
+  throttle,
+} from '../src/utils'
 
 describe('utils', () => {
   describe('buildVoxelClickPayload', () => {
@@ -61,6 +75,156 @@ describe('utils', () => {
     })
   })
 
+  describe('resolvePayload', () => {
+    it('decodes a base64 string payload', () => {
+      const result = resolvePayload('SGVsbG8gV29ybGQ=', {})
+      expect(new TextDecoder().decode(result)).toBe('Hello World')
+    })
+
+    it('returns the underlying buffer of a blob spanning it without copying', () => {
+      const bytes = new Uint8Array([1, 2, 3, 4])
+      const result = resolvePayload({ blob: 'blob_0' }, { blob_0: bytes })
+      expect(result).toBe(bytes.buffer)
+    })
+
+    it('copies out only the viewed range of a blob inside a larger buffer', () => {
+      const message = new Uint8Array([9, 9, 1, 2, 3, 9])
+      const view = message.subarray(2, 5)
+      const result = resolvePayload({ blob: 'blob_0' }, { blob_0: view })
+      expect(Array.from(new Uint8Array(result))).toEqual([1, 2, 3])
+    })
+
+    it('throws when the referenced blob is missing', () => {
+      expect(() => resolvePayload({ blob: 'blob_3' }, {})).toThrow('blob_3')
+    })
+  })
+
+  describe('payloadFingerprint', () => {
+    it('is stable across fresh Uint8Array instances with the same content', () => {
+      const a = payloadFingerprint({ blob: 'blob_0' }, { blob_0: new Uint8Array([1, 2, 3]) })
+      const b = payloadFingerprint({ blob: 'blob_0' }, { blob_0: new Uint8Array([1, 2, 3]) })
+      expect(a).toBe(b)
+    })
+
+    it('differs when the length or any byte differs', () => {
+      const base = payloadFingerprint({ blob: 'blob_0' }, { blob_0: new Uint8Array([1, 2, 3]) })
+      expect(payloadFingerprint({ blob: 'blob_0' }, { blob_0: new Uint8Array([1, 2, 4]) })).not.toBe(base)
+      expect(payloadFingerprint({ blob: 'blob_0' }, { blob_0: new Uint8Array([1, 2]) })).not.toBe(base)
+    })
+
+    it('tells apart same-sized payloads that differ mid-buffer', () => {
+      const a = new Uint8Array(4096)
+      const b = new Uint8Array(4096)
+      b[1234] = 1
+      expect(payloadFingerprint({ blob: 'blob_0' }, { blob_0: a })).not.toBe(
+        payloadFingerprint({ blob: 'blob_0' }, { blob_0: b }),
+      )
+      expect(payloadFingerprint('A'.repeat(4096), {})).not.toBe(
+        payloadFingerprint(`${'A'.repeat(1234)}B${'A'.repeat(2861)}`, {}),
+      )
+    })
+
+    it('uses the digest sent with binary references', () => {
+      const args = { blob_0: new Uint8Array([1, 2, 3]) }
+      expect(payloadFingerprint({ blob: 'blob_0', hash: 'abc' }, args)).toBe('abc')
+      expect(payloadFingerprint({ blob: 'blob_0', hash: 'def' }, args)).toBe('def')
+    })
+
+    it('returns "0" for a missing payload', () => {
+      expect(payloadFingerprint(undefined, {})).toBe('0')
+      expect(payloadFingerprint(null, {})).toBe('0')
+    })
+
+    it('uses the content hash of url references', () => {
+      expect(payloadFingerprint({ url: '/media/abc.bin', hash: 'abc' }, {})).toBe('abc')
+    })
+  })
+
+  describe('loadPayload', () => {
+    it('resolves blob references without fetching', async () => {
+      const fetchSpy = vi.spyOn(globalThis, 'fetch')
+      const buffer = await loadPayload({ blob: 'blob_0' }, { blob_0: new Uint8Array([7, 8]) })
+      expect(Array.from(new Uint8Array(buffer))).toEqual([7, 8])
+      expect(fetchSpy).not.toHaveBeenCalled()
+      fetchSpy.mockRestore()
+    })
+
+    it('fetches url references', async () => {
+      const fetchSpy = vi.spyOn(globalThis, 'fetch').mockResolvedValue(
+        new Response(new Uint8Array([1, 2, 3])),
+      )
+      const buffer = await loadPayload({ url: '/media/abc.bin', hash: 'abc' }, {})
+      expect(Array.from(new Uint8Array(buffer))).toEqual([1, 2, 3])
+      expect(String(fetchSpy.mock.calls[0][0])).toContain('/media/abc.bin')
+      fetchSpy.mockRestore()
+    })
+
+    it('rejects on HTTP errors', async () => {
+      const fetchSpy = vi.spyOn(globalThis, 'fetch').mockResolvedValue(
+        new Response(null, { status: 404, statusText: 'Not Found' }),
+      )
+      await expect(loadPayload({ url: '/media/gone.bin', hash: 'gone' }, {})).rejects.toThrow('404')
+      fetchSpy.mockRestore()
+    })
+  })
+
+  describe('overlayKeys', () => {
+    const args = { blob_0: new Uint8Array([1, 2, 3]), blob_1: new Uint8Array([4, 5]) }
+
+    it('ignores display properties', () => {
+      const a = overlayKeys([{ data: { blob: 'blob_0' }, name: 'z.nii', opacity: 0.2 }], args)
+      const b = overlayKeys([{ data: { blob: 'blob_0' }, name: 'z.nii', opacity: 0.9, colormap: 'hot' }], args)
+      expect(a).toEqual(b)
+    })
+
+    it('prefers the explicit id and disambiguates repeats', () => {
+      const keys = overlayKeys(
+        [
+          { data: { blob: 'blob_0' }, name: 'z.nii', id: 'stat' },
+          { data: { blob: 'blob_1' }, name: 'm.nii' },
+          { data: { blob: 'blob_1' }, name: 'm.nii' },
+        ],
+        args,
+      )
+      expect(keys[0]).toBe('stat')
+      expect(keys[2]).toBe(`${keys[1]}#1`)
+    })
+  })
+
+  describe('diffOverlayKeys', () => {
+    it('returns only the keys to drop and to load', () => {
+      expect(diffOverlayKeys(['a', 'b', 'c'], ['c', 'a', 'd'])).toEqual({ remove: ['b'], add: ['d'] })
+    })
+
+    it('is empty for a pure reorder', () => {
+      expect(diffOverlayKeys(['a', 'b'], ['b', 'a'])).toEqual({ remove: [], add: [] })
+    })
+  })
+
+  describe('meshLevel', () => {
+    const mesh = {
+      data: { blob: 'blob_0' },
+      name: 'lh.pial.lod10.mz3',
+      overlays: [{ data: { blob: 'blob_1' }, name: 'lh.curv.lod10.mz3' }],
+      levels: [
+        { data: { blob: 'blob_2' }, name: 'lh.pial.lod25.mz3', overlays: [] },
+        { data: { blob: 'blob_3' }, name: 'lh.pial', overlays: [] },
+      ],
+    }
+
+    it('starts at the coarsest level and ends at the full mesh', () => {
+      expect(meshLevel(mesh, -1).name).toBe('lh.pial.lod10.mz3')
+      expect(meshLevel(mesh, -1).overlays).toEqual(mesh.overlays)
+      expect(meshLevel(mesh, 0).name).toBe('lh.pial.lod25.mz3')
+      expect(meshLevel(mesh, 5).name).toBe('lh.pial')
+    })
+
+    it('keeps meshes without levels as sent', () => {
+      const plain = { data: { blob: 'blob_0' }, name: 'brain.mz3' }
+      expect(meshLevel(plain, 1)).toEqual({ data: plain.data, name: 'brain.mz3', overlays: [] })
+    })
+  })
+
   describe('throttle', () => {
     it('should fire immediately on first call (leading edge)', () => {
       const fn = vi.fn()
@@ -163,4 +327,104 @@ describe('utils', () => {
       vi.useRealTimers()
     })
   })
+
+  describe('LoadProfiler', () => {
+    it('accumulates decode and load steps and reports after a frame', async () => {
+      vi.stubGlobal('requestAnimationFrame', (cb: FrameRequestCallback) => setTimeout(() => cb(0), 0))
+      const profiler = new LoadProfiler('overlays', { encode_ms: 3 })
+
+      const data = await profiler.decode(async () => new ArrayBuffer(10))
+      await profiler.decode(async () => new ArrayBuffer(6))
+      expect(data.byteLength).toBe(10)
+      expect(await profiler.load(async () => 'done')).toBe('done')
+
+      const event = await profiler.report()
+      expect(event.type).toBe('profile')
+      expect(event.phase).toBe('overlays')
+      expect(event.python).toEqual({ encode_ms: 3 })
+      expect(event.frontend.bytes).toBe(16)
+      expect(event.frontend.payloads).toBe(2)
+      expect(event.frontend.total_ms).toBeGreaterThanOrEqual(
+        event.frontend.decode_ms + event.frontend.load_ms,
+      )
+      vi.unstubAllGlobals()
+    })
+  })
+
+  describe('EventBatcher', () => {
+    const click = (value: number) => ({ type: 'voxel_click', value })
+
+    it('keeps only the latest event of each type in last mode', () => {
+      const batcher = new EventBatcher('last')
+      batcher.push(click(1), 10)
+      batcher.push({ type: 'drag_release' }, 20)
+      batcher.push(click(2), 30)
+
+      const batch = batcher.flush()!
+      expect(batch.type).toBe('batch')
+      expect(batch.seq).toBe(1)
+      expect(batch.events).toEqual([
+        { type: 'drag_release', t: 20 },
+        { type: 'voxel_click', value: 2, t: 30 },
+      ])
+      expect(batch.coalesced).toBe(1)
+      expect(batcher.size).toBe(0)
+    })
+
+    it('keeps every event in all mode and drops the oldest when full', () => {
+      const batcher = new EventBatcher('all', 2)
+      batcher.push(click(1), 10)
+      batcher.push(click(2), 20)
+      batcher.push(click(3), 30)
+
+      const batch = batcher.flush()!
+      expect(batch.events.map((e) => e.value)).toEqual([2, 3])
+      expect(batch.dropped).toBe(1)
+      expect(batch.coalesced).toBe(0)
+    })
+
+    it('keeps one event per type and window in numeric mode', () => {
+      const batcher = new EventBatcher(100)
+      batcher.push(click(1), 1010)
+      batcher.push(click(2), 1090)
+      batcher.push(click(3), 1110)
+
+      expect(batcher.flush()!.events.map((e) => e.value)).toEqual([2, 3])
+    })
+
+    it('numbers batches and returns null when empty', () => {
+      const batcher = new EventBatcher('last')
+      expect(batcher.flush()).toBeNull()
+      batcher.push(click(1))
+      expect(batcher.flush()!.seq).toBe(1)
+      batcher.push(click(2))
+      const batch = batcher.flush()!
+      expect(batch.seq).toBe(2)
+      expect(batch.coalesced).toBe(0)
+    })
+  })
+
+  describe('batched event payloads', () => {
+    it('builds drag_release and intensity_change events', () => {
+      const drag = buildDragReleasePayload({
+        voxStart: [1.4, 2.6, 3],
+        voxEnd: [4, 5, 6.2],
+        mmStart: new Float32Array([1, 2, 3, 1]),
+        mmEnd: new Float32Array([4, 5, 6, 1]),
+      })
+      expect(drag).toEqual({
+        type: 'drag_release',
+        voxel_start: [1, 3, 3],
+        voxel_end: [4, 5, 6],
+        mm_start: [1, 2, 3],
+        mm_end: [4, 5, 6],
+      })
+      expect(buildIntensityPayload({ name: 't1.nii', cal_min: 10, cal_max: 90 })).toEqual({
+        type: 'intensity_change',
+        name: 't1.nii',
+        cal_min: 10,
+        cal_max: 90,
+      })
+    })
+  })
 })
@@ -0,0 +1,102 @@
+"""Unit tests for the per-payload codec choice."""
+
+import gzip
+
+import numpy as np
+import pytest
+
+from niivue_component._codec import (
+    MIN_DEFLATE_BYTES,
+    choose_codec,
+    detect_deployment,
+    encode_volume,
+    is_nifti,
+    resolve_codec,
+)
+from niivue_component._nifti import array_to_nifti
+
+
+def nifti(shape=(8, 8, 8)):
+    return array_to_nifti(np.arange(np.prod(shape), dtype=np.int16).reshape(shape) % 7)
+
+
+@pytest.mark.parametrize("codec, nbytes, gzipped, deployment, expected", [
+    ("auto", 10 ** 8, True, "local", "raw"),
+    ("auto", 10 ** 8, False, "local", "raw"),
+    ("auto", 10 ** 8, True, "remote", "gzip"),
+    ("auto", MIN_DEFLATE_BYTES, False, "remote", "deflate"),
+    ("auto", MIN_DEFLATE_BYTES - 1, False, "remote", "raw"),
+    ("deflate", 10, False, "local", "deflate"),
+    ("raw", 10 ** 8, True, "remote", "raw"),
+])
+def test_choose_codec(codec, nbytes, gzipped, deployment, expected):
+    assert choose_codec(codec, nbytes, gzipped, deployment) == expected
+
+
+def test_is_nifti():
+    data = nifti()
+    assert is_nifti(data) and is_nifti(gzip.compress(data))
+    assert not is_nifti(b"\x00" * 100)
+    assert not is_nifti(gzip.compress(b"\x00" * 100))
+    assert not is_nifti(b"\x1f\x8b")
+
+
+def test_raw_gunzips_once():
+    data = nifti()
+    gz = gzip.compress(data)
+    raw = encode_volume(gz, "raw", "remote")
+    assert raw == data
+    assert encode_volume(bytes(gz), "raw", "remote") is raw  # cached by content
+    assert encode_volume(data, "raw", "remote") is data
+
+
+def test_deflate_round_trips_and_keeps_gzip():
+    data = nifti((32, 32, 32))
+    deflated = encode_volume(data, "deflate", "remote")
+    assert len(deflated) < len(data) and gzip.decompress(deflated) == data
+    gz = gzip.compress(data)
+    assert encode_volume(gz, "deflate", "remote") is gz
+    assert encode_volume(gz, "gzip", "remote") is gz
+
+
+def test_other_formats_are_sent_as_supplied():
+    mgz = gzip.compress(b"\x00\x00\x00\x01" + b"\x00" * 400)
+    assert encode_volume(mgz, "raw", "local") is mgz
+
+
+def test_detect_deployment(monkeypatch):
+    monkeypatch.delenv("NIIVUE_DEPLOYMENT", raising=False)
+    assert detect_deployment() == "local"  # no request in bare mode
+    monkeypatch.setenv("NIIVUE_DEPLOYMENT", "remote")
+    assert detect_deployment() == "remote"
+    monkeypatch.setenv("NIIVUE_DEPLOYMENT", "vpn")
+    with pytest.raises(ValueError, match="NIIVUE_DEPLOYMENT"):
+        detect_deployment()
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("localhost:8501", "local"),
+    ("127.0.0.1", "local"),
+    ("[::1]:8501", "local"),
+    ("scanner.example.org:8501", "remote"),
+])
+def test_detect_deployment_from_host(monkeypatch, host, expected):
+    import niivue_component._codec as codec
+
+    monkeypatch.delenv("NIIVUE_DEPLOYMENT", raising=False)
+    monkeypatch.setattr(codec, "_request_host", lambda: host)
+    assert detect_deployment() == expected
+
+
+def test_resolve_codec():
+    assert resolve_codec(None) is None
+    assert resolve_codec("auto") == "auto"
+    with pytest.raises(ValueError, match="codec must be one of"):
+        resolve_codec("brotli")
+
+
+def test_raw_codec_decompresses_every_gzip_member():
+    """BGZF and concatenated .nii.gz files are decoded whole, not truncated."""
+    data = nifti((16, 16, 16))
+    members = gzip.compress(data[:1000]) + gzip.compress(data[1000:])
+    assert encode_volume(members, "raw", "local") == data
@@ -0,0 +1,110 @@
+"""Unit tests for DICOM series ingestion."""
+
+import io
+
+import numpy as np
+import pytest
+
+pydicom = pytest.importorskip("pydicom")
+
+from pydicom.dataset import FileDataset, FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid  # noqa: E402
+
+from niivue_component import load_dicom, scan_dicom  # noqa: E402
+from niivue_component._dicom import _rescaled  # noqa: E402
+
+ROWS, COLS = 6, 5
+
+
+def make_slice(series_uid, k, z, description="T1", intercept=0):
+    """One axial 16-bit slice at height ``z``, filled with ``100 + k``."""
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.4"
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(None, {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.SeriesInstanceUID = series_uid
+    ds.SeriesDescription = description
+    ds.Modality = "MR"
+    ds.InstanceNumber = k + 1
+    ds.ImagePositionPatient = [-10.0, -20.0, z]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing = [0.5, 0.8]
+    ds.SliceThickness = 2
+    ds.Rows, ds.Columns = ROWS, COLS
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.RescaleSlope = 1
+    ds.RescaleIntercept = intercept
+    pixels = np.full((ROWS, COLS), 100 + k, np.uint16)
+    pixels[0, 1] = 0  # marks row 0, column 1
+    ds.PixelData = pixels.tobytes()
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def make_series(n=4, uid=None, **kwargs):
+    uid = uid or generate_uid()
+    # Instance order reversed against position, to check sorting by position
+    return uid, [make_slice(uid, k, z=2.0 * (n - 1 - k), **kwargs) for k in range(n)]
+
+
+def test_load_blobs_sorted_by_position():
+    uid, blobs = make_series()
+    volume, affine = load_dicom(blobs[::-1])
+    assert volume.shape == (COLS, ROWS, 4)
+    # z increases from the last instance (lowest) to the first
+    assert [int(volume[2, 2, k]) for k in range(4)] == [103, 102, 101, 100]
+    assert volume[1, 0, 0] == 0
+    np.testing.assert_allclose(np.diag(affine), [-0.8, -0.5, 2.0, 1.0])
+    np.testing.assert_allclose(affine[:3, 3], [10.0, 20.0, 0.0])
+
+
+def test_directory_with_two_series(tmp_path):
+    uid_a, blobs_a = make_series(3, description="T1")
+    uid_b, blobs_b = make_series(2, description="FLAIR")
+    for i, blob in enumerate(blobs_a + blobs_b):
+        (tmp_path / f"IM{i:04d}").write_bytes(blob)
+    (tmp_path / "notes.txt").write_text("not dicom")
+
+    series = scan_dicom(tmp_path, max_workers=2)
+    assert series == {
+        uid_a: {"description": "T1", "modality": "MR", "slices": 3},
+        uid_b: {"description": "FLAIR", "modality": "MR", "slices": 2},
+    }
+    with pytest.raises(ValueError, match="pass series_uid"):
+        load_dicom(tmp_path)
+    volume, _ = load_dicom(tmp_path, series_uid=uid_b)
+    assert volume.shape == (COLS, ROWS, 2)
+
+
+def test_rescale_intercept_keeps_integers():
+    _, blobs = make_series(2, intercept=-1024)
+    volume, _ = load_dicom(blobs)
+    assert volume.dtype == np.int16
+    assert volume[2, 2, 0] == 101 - 1024
+
+
+def test_rescale_slope_gives_float():
+    stack = np.ones((2, 2, 2), np.uint16)
+    assert _rescaled(stack, [0.5, 1.0], [0.0, 1.0]).dtype == np.float32
+
+
+def test_duplicate_positions_rejected():
+    uid = generate_uid()
+    blobs = [make_slice(uid, 0, z=0.0), make_slice(uid, 1, z=0.0)]
+    with pytest.raises(ValueError, match="several images per location"):
+        load_dicom(blobs)
+
+
+def test_no_dicom():
+    with pytest.raises(ValueError, match="No DICOM images"):
+        load_dicom([b"not a dicom file"])
+    with pytest.raises(ValueError, match="No such DICOM"):
+        load_dicom("/nonexistent/dicom")
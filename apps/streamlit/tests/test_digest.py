@@ -0,0 +1,81 @@
+"""Unit tests for content digests and their reuse across caches."""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from niivue_component import _digest, _memo, _payload
+from niivue_component._digest import content_key, is_pinned, pin, unpin
+from niivue_component._memo import ResultCache
+from niivue_component._payload import PayloadPacker
+from niivue_component._store import MIN_SHARED_BYTES, VolumeStore
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Sizes of the buffers hashed by ``content_key``."""
+    sizes = []
+    original = hashlib.blake2b
+
+    def blake2b(data, **kwargs):
+        sizes.append(memoryview(data).nbytes)
+        return original(data, **kwargs)
+
+    monkeypatch.setattr(_digest.hashlib, "blake2b", blake2b)
+    return sizes
+
+
+def test_pinned_objects_are_hashed_once(hashed):
+    """A pinned object is hashed on first use only, until its last unpin."""
+    data = b"\x01" * 64
+    pin(data)
+    pin(data)
+    assert content_key(data) == content_key(data) == content_key(b"\x01" * 64)
+    assert len(hashed) == 2  # the pinned object once, the fresh copy once
+    unpin(data)
+    content_key(data)
+    assert len(hashed) == 2 and is_pinned(data)
+    unpin(data)
+    content_key(data)
+    assert len(hashed) == 3 and not is_pinned(data)
+
+
+def test_store_pins_its_canonical_copies(hashed):
+    """Later lookups of an interned payload reuse its digest until evicted."""
+    store = VolumeStore(max_bytes=MIN_SHARED_BYTES)
+    _, canonical = store.intern(bytearray(MIN_SHARED_BYTES))
+    assert is_pinned(canonical)
+    content_key(canonical)
+    assert len(hashed) == 1
+    store.intern(b"\x01" * MIN_SHARED_BYTES)  # evicts the first entry
+    assert not is_pinned(canonical)
+    store.clear()
+
+
+def test_arrays_are_converted_and_hashed_once_per_run(monkeypatch, hashed):
+    """A fresh copy of an array reuses its cached image: one hash, no copy."""
+    monkeypatch.setattr(_memo, "result_cache", ResultCache(max_bytes=1024 ** 2))
+    store = VolumeStore(max_bytes=1024 ** 2)
+    volume = np.arange(32 ** 3, dtype=np.float32).reshape(32, 32, 32)
+    images = []
+    for _ in range(2):
+        packer = PayloadPacker("binary", store=store)
+        packer.pack(volume.copy())
+        images.append(next(iter(packer.blobs.values())))
+    assert images[0] is images[1]
+    # The array on each run, the image once (store and blob ref share it)
+    assert hashed == [volume.nbytes, len(images[0]), volume.nbytes]
+    _memo.result_cache.clear()
+    store.clear()
+    assert not is_pinned(images[0])
+
+
+def test_payload_cache_pins_its_sources():
+    """Sources kept by the base64 cache are pinned while they are cached."""
+    cache = _payload.PayloadCache(max_bytes=1024 ** 2)
+    data = b"\x02" * 64
+    cache.encode(data)
+    assert is_pinned(data)
+    cache.clear()
+    assert not is_pinned(data)
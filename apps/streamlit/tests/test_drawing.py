@@ -0,0 +1,121 @@
+"""Unit tests for the drawing layer round-trip."""
+
+import base64
+import zlib
+
+import numpy as np
+import pytest
+
+from niivue_component._drawing import DrawingState, resolve_drawing, to_native
+
+DIMS = (4, 3, 5)  # x, y, z as sent by the viewer
+
+
+def encode(layer, start, stop):
+    """A slab of a (z, y, x) layer as the viewer sends it."""
+    data = base64.b64encode(zlib.compress(layer[start:stop].tobytes())).decode()
+    return {"start": start, "stop": stop, "data": data}
+
+
+def update(layer, version, base=None, slabs=None, perm=(1, 2, 3)):
+    nz = layer.shape[0]
+    return {
+        "type": "drawing",
+        "version": version,
+        "base_version": base,
+        "dims": list(DIMS),
+        "perm": list(perm),
+        "slabs": [encode(layer, a, b) for a, b in (slabs or [(0, nz)])],
+    }
+
+
+def empty_layer():
+    return np.zeros(DIMS[::-1], np.uint8)
+
+
+def test_full_update_is_decoded_without_copy():
+    layer = empty_layer()
+    layer[2, 1, 3] = 1
+    state = DrawingState()
+    assert state.apply(update(layer, 1))
+    assert state.version == 1
+    mask = state.mask
+    assert mask.shape == DIMS
+    assert mask[3, 1, 2] == 1 and mask.sum() == 1
+    assert not mask.flags.writeable  # a view of the decompressed buffer
+
+
+def test_slab_updates_patch_the_layer():
+    layer = empty_layer()
+    state = DrawingState()
+    state.apply(update(layer, 1))
+    layer[1:3] = 2
+    assert state.apply(update(layer, 2, base=1, slabs=[(1, 3)]))
+    layer[4, 0, 0] = 3
+    assert state.apply(update(layer, 3, base=2, slabs=[(4, 5)]))
+    np.testing.assert_array_equal(state.mask, layer.T)
+    assert state.resync == 0
+
+
+def test_repeated_update_is_ignored():
+    layer = empty_layer()
+    state = DrawingState()
+    payload = update(layer, 1)
+    assert state.apply(payload)
+    assert not state.apply(payload)
+    assert not state.apply(None)
+    assert not state.apply({"type": "voxel_click"})
+
+
+def test_gap_requests_resync_once():
+    layer = empty_layer()
+    state = DrawingState()
+    state.apply(update(layer, 1))
+    layer[0] = 1
+    lost_base = update(layer, 3, base=2, slabs=[(0, 1)])
+    assert not state.apply(lost_base)
+    assert not state.apply(lost_base)  # same update on an unrelated rerun
+    assert state.resync == 1 and state.version == 1
+    assert state.apply(update(layer, 4))
+    np.testing.assert_array_equal(state.mask, layer.T)
+
+
+def test_bad_slab_size():
+    layer = empty_layer()
+    payload = update(layer, 1)
+    payload["dims"] = [4, 3, 6]
+    payload["slabs"][0]["stop"] = 6
+    with pytest.raises(ValueError, match="expected 72"):
+        DrawingState().apply(payload)
+
+
+@pytest.mark.parametrize("perm", [(1, 2, 3), (-1, 2, 3), (2, 3, 1), (-3, 1, -2)])
+def test_to_native_undoes_reorientation(perm):
+    native = np.arange(24).reshape(2, 3, 4)
+    # niivue: RAS axis i is native axis abs(perm[i]) - 1, reversed if negative
+    axes = [abs(p) - 1 for p in perm]
+    ras = native.transpose(axes)
+    for i, p in enumerate(perm):
+        if p < 0:
+            ras = np.flip(ras, axis=i)
+    np.testing.assert_array_equal(to_native(ras, perm), native)
+
+
+def test_resolve_drawing():
+    assert resolve_drawing(None) is None
+    assert resolve_drawing(False) is None
+    assert resolve_drawing(True) == {"data": None, "pen": 1}
+    resolved = resolve_drawing(np.ones((2, 2, 2), bool))
+    assert resolved["data"].dtype == np.uint8 and resolved["pen"] == 1
+    assert resolve_drawing({"pen": 0}) == {"data": None, "pen": 0}
+
+
+@pytest.mark.parametrize("drawing, match", [
+    ("mask.nii", "drawing must be"),
+    ({"data": "mask.nii"}, "'data' must be"),
+    ({"pen": 256}, "'pen' must be"),
+    ({"pen": True}, "'pen' must be"),
+])
+def test_resolve_drawing_invalid(drawing, match):
+    with pytest.raises(ValueError, match=match):
+        resolve_drawing(drawing)
@@ -0,0 +1,109 @@
+"""Unit tests for frame streaming of 4D series."""
+
+import gzip
+
+import numpy as np
+import pytest
+
+from niivue_component import _frames
+from niivue_component._frames import FrameState, FrameStream, resolve_frame_window
+from niivue_component._nifti import array_to_nifti
+from niivue_component._payload import is_mapped, map_file
+
+
+def series(shape=(3, 4, 5, 10)):
+    return np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+
+
+def test_window_is_clipped_to_the_series():
+    stream = FrameStream(series(), window=2)
+    assert stream.count == 10
+    assert list(stream.indices(0)) == [0, 1, 2]
+    assert list(stream.indices(5)) == [3, 4, 5, 6, 7]
+    assert list(stream.indices(9)) == [7, 8, 9]
+
+
+def test_frames_and_time_course():
+    data = series()
+    stream = FrameStream(data)
+    np.testing.assert_array_equal(stream.frame(4), data[..., 4])
+    np.testing.assert_array_equal(stream.time_course([1, 2, 3]), data[1, 2, 3])
+    assert stream.time_course([3, 0, 0]) is None
+
+
+def test_memmap_is_read_lazily(tmp_path):
+    data = series()
+    path = tmp_path / "bold.raw"
+    np.asfortranarray(data).T.tofile(path)  # x fastest, as in NIfTI
+    mapped = np.memmap(path, dtype=np.float32, shape=data.shape, order="F")
+    stream = FrameStream(mapped)
+    assert isinstance(stream.frame(2), np.memmap)
+    np.testing.assert_array_equal(stream.frame(2), data[..., 2])
+
+
+def test_mapped_nifti_is_viewed_in_place(tmp_path):
+    """A mapped NIfTI file is viewed, not copied onto the heap."""
+    data = series()
+    path = tmp_path / "bold.nii"
+    path.write_bytes(array_to_nifti(data, np.eye(4)))
+    view = map_file(path)
+    stream = FrameStream(view)
+    assert np.shares_memory(stream.series, np.frombuffer(view, dtype=np.uint8))
+    np.testing.assert_array_equal(stream.frame(2), data[..., 2])
+
+
+def test_gzipped_series_is_decompressed_once(monkeypatch):
+    """Reruns of a viewer with the same gzipped series reuse its mapped copy."""
+    session = {}
+    monkeypatch.setattr(_frames.st, "session_state", session)
+    data = series()
+    compressed = gzip.compress(array_to_nifti(data, np.eye(4)))
+    first = FrameStream(compressed, key="bold")
+    second = FrameStream(bytes(compressed), key="bold")
+    assert np.shares_memory(first.series, second.series)
+    assert is_mapped(session["niivue_frames:bold:series"][1])
+    np.testing.assert_array_equal(second.frame(9), data[..., 9])
+    third = FrameStream(gzip.compress(array_to_nifti(data + 1, np.eye(4))), key="bold")
+    np.testing.assert_array_equal(third.frame(0), data[..., 0] + 1)
+    assert not np.shares_memory(first.series, third.series)
+
+
+def test_corrupt_gzipped_series_raises():
+    """Truncated gzip input is reported as a ValueError, not a raw OSError."""
+    with pytest.raises(ValueError, match="cannot decompress"):
+        FrameStream(b"\x1f\x8b" + b"\x00" * 64)
+
+
+def test_nifti_bytes_keep_their_affine():
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    stream = FrameStream(array_to_nifti(series(), affine))
+    np.testing.assert_allclose(stream.affine, affine)
+    np.testing.assert_array_equal(stream.frame(1), series()[..., 1])
+
+
+def test_series_id_follows_content():
+    assert FrameStream(series()).series_id == FrameStream(series()).series_id
+    assert FrameStream(series()).series_id != FrameStream(series() + 1).series_id
+
+
+def test_not_4d():
+    with pytest.raises(ValueError, match="requires 4D nifti_data"):
+        FrameStream(np.zeros((4, 4, 4), np.float32))
+    with pytest.raises(ValueError, match="requires ndarray or NIfTI-1"):
+        FrameStream(b"\x00" * 400)
+
+
+def test_frame_state_follows_frame_changes():
+    state = FrameState("s")
+    assert state.apply({"type": "frame_change", "frame": 7}, 10)
+    assert state.frame == 7
+    assert not state.apply({"type": "frame_change", "frame": 10}, 10)
+    assert not state.apply({"type": "voxel_click"}, 10)
+    assert not state.apply(None, 10)
+    assert state.frame == 7
+
+
+@pytest.mark.parametrize("window", [-1, 1.5, True, "2"])
+def test_resolve_frame_window_invalid(window):
+    with pytest.raises(ValueError, match="frame_window must be"):
+        resolve_frame_window(window)
@@ -0,0 +1,109 @@
+"""Unit tests for lazy payload sources and prefetching."""
+
+import functools
+
+import pytest
+
+from niivue_component import _loader
+from niivue_component._loader import SourceLoader, load_sources, prefetch, source_key
+
+
+def read_subject(name, scale=1):
+    return name.encode() * scale
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    """A private loader, so tests neither share nor leak cached results."""
+    loader = SourceLoader(max_bytes=1024)
+    monkeypatch.setattr(_loader, "source_loader", loader)
+    return loader
+
+
+def test_path_sources_are_loaded_once_until_the_file_changes(loader, tmp_path):
+    """A path is read once; a rewritten file is read again."""
+    path = tmp_path / "scan.nii"
+    path.write_bytes(b"\x01" * 8)
+    assert load_sources([path, str(path)], ["a", "b"]) == [b"\x01" * 8] * 2
+    assert loader.stats()["misses"] == 1 and loader.stats()["hits"] == 1
+    path.write_bytes(b"\x02" * 16)
+    assert load_sources([path], ["a"]) == [b"\x02" * 16]
+    assert loader.stats()["misses"] == 2
+
+
+def test_partials_built_afresh_find_their_result(loader):
+    """Partials of the same function and arguments share one load."""
+    first = functools.partial(read_subject, "sub-01", scale=2)
+    assert source_key(first) == source_key(functools.partial(read_subject, "sub-01", scale=2))
+    assert source_key(first) != source_key(functools.partial(read_subject, "sub-02", scale=2))
+    prefetch([first])
+    load_sources([functools.partial(read_subject, "sub-01", scale=2)], ["a"])
+    assert loader.stats()["misses"] == 1 and loader.stats()["hits"] == 1
+
+
+def _script_function(source):
+    """``load`` as defined by one run of a script with the given source."""
+    namespace = {"__name__": __name__}
+    exec(source, namespace)
+    return namespace["load"]
+
+
+def test_partials_of_an_edited_function_load_again(loader):
+    """Editing a constant or default in the script changes the identity."""
+    original = _script_function("def load(name, *, scale=2):\n    return name.encode() * scale + b'a'\n")
+    rerun = _script_function("def load(name, *, scale=2):\n    return name.encode() * scale + b'a'\n")
+    key = source_key(functools.partial(original, "sub-01"))
+    assert source_key(functools.partial(rerun, "sub-01")) == key
+    for edited in (
+        "def load(name, *, scale=2):\n    return name.encode() * scale + b'b'\n",
+        "def load(name, *, scale=3):\n    return name.encode() * scale + b'a'\n",
+        "def load(name='x', *, scale=2):\n    return name.encode() * scale + b'a'\n",
+    ):
+        assert source_key(functools.partial(_script_function(edited), "sub-01")) != key
+
+
+def test_other_loaders_run_on_every_call(loader):
+    """A plain function may read session state, so it is never cached."""
+    state = {"subject": "sub-01"}
+
+    def current_subject():
+        return state["subject"].encode()
+
+    assert source_key(current_subject) is None
+    assert load_sources([current_subject], ["a"]) == [b"sub-01"]
+    state["subject"] = "sub-02"
+    assert load_sources([current_subject], ["a"]) == [b"sub-02"]
+    assert loader.stats()["entries"] == 0
+
+
+def test_non_lazy_sources_pass_through(loader):
+    """Bytes and None are returned as given, without touching the pool."""
+    assert load_sources([b"\x00", None], ["a", "b"]) == [b"\x00", None]
+    assert loader.stats()["misses"] == 0
+
+
+def test_loaded_results_are_bounded(loader):
+    """Past the budget the least recently used results are dropped."""
+    load_sources([functools.partial(read_subject, "x" * 600)], ["a"])
+    load_sources([functools.partial(read_subject, "y" * 600)], ["b"])
+    stats = loader.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 1
+    assert stats["nbytes"] <= stats["max_bytes"]
+
+
+def test_missing_path_and_bad_loader_raise_labelled_errors(loader, tmp_path):
+    """Errors name the argument the source was passed as."""
+    with pytest.raises(ValueError, match="Overlay 0: Cannot read"):
+        load_sources([tmp_path / "missing.nii"], ["Overlay 0"])
+    with pytest.raises(ValueError, match="must return bytes or a numpy array"):
+        load_sources([lambda: "not bytes"], ["nifti_data"])
+
+
+def test_prefetch_rejects_eager_sources_and_unknown_transports(loader):
+    """prefetch only takes cached sources, and a known transport."""
+    with pytest.raises(ValueError, match="prefetch expects paths or functools.partial loaders"):
+        prefetch([b"\x00"])
+    with pytest.raises(ValueError, match="prefetch expects paths or functools.partial loaders"):
+        prefetch([lambda: b"\x00"])
+    with pytest.raises(ValueError, match="transport must be one of"):
+        prefetch([], transport="carrier-pigeon")
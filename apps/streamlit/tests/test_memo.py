@@ -0,0 +1,79 @@
+"""Unit tests for the byte-bounded cache of derived payloads."""
+
+import numpy as np
+import pytest
+
+from niivue_component import _memo
+from niivue_component._memo import ResultCache, data_key, memoize
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A private result cache with a 1 KiB budget."""
+    cache = ResultCache(max_bytes=1024)
+    monkeypatch.setattr(_memo, "result_cache", cache)
+    return cache
+
+
+def test_memoize_keys_arguments_by_content(cache):
+    """Fresh identical copies hit; an array edited in place misses."""
+    calls = []
+
+    @memoize()
+    def total(data, scale=1):
+        calls.append(1)
+        return bytes(memoryview(data)) * scale
+
+    volume = np.arange(8.0)
+    total(volume, scale=2)
+    total(volume.copy(), scale=2)
+    assert len(calls) == 1
+    volume[3] = 0
+    total(volume, scale=2)
+    total(bytes(8), scale=2)
+    total(bytearray(8), scale=2)
+    assert len(calls) == 3
+
+
+def test_memoized_clear_drops_only_its_results(cache):
+    """``f.clear()`` forgets f's results and keeps other functions' ones."""
+    calls = []
+
+    @memoize()
+    def first(data):
+        calls.append("first")
+        return data
+
+    @memoize()
+    def second(data):
+        calls.append("second")
+        return data
+
+    first(b"a"), second(b"a")
+    first.clear()
+    first(b"a"), second(b"a")
+    assert calls == ["first", "second", "first"]
+    assert cache.stats()["nbytes"] == 2
+
+
+def test_result_cache_charges_bytes_and_evicts_lru(cache):
+    """Results are charged for their buffers; the oldest go past the budget."""
+    for fill in range(3):
+        cache.get(fill, lambda: (bytes([fill]) * 400, {"levels": [np.zeros(0)]}))
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2 and stats["nbytes"] == 800
+    cache.get(2, lambda: pytest.fail("should hit"))
+
+
+def test_result_cache_returns_oversized_results_uncached(cache):
+    """A result over the whole budget is computed but never stored."""
+    assert cache.get("big", lambda: b"\x00" * 2048) == b"\x00" * 2048
+    assert cache.stats()["entries"] == 0
+
+
+def test_data_key_distinguishes_memory_order():
+    """Same voxel bytes in another layout are another array."""
+    array = np.arange(6).reshape(2, 3)
+    assert data_key(array) == data_key(array.copy())
+    assert data_key(np.asfortranarray(array)) != data_key(array)
+    assert data_key(array[:, ::2]) == data_key(np.ascontiguousarray(array[:, ::2]))
@@ -0,0 +1,196 @@
+"""Unit tests for server-side mesh compaction to MZ3."""
+
+import base64
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from niivue_component import _mesh
+from niivue_component._mesh import (
+    build_mesh_levels,
+    compact_mesh,
+    compact_mesh_overlay,
+    decimate,
+    lod_name,
+    read_mz3,
+    resolve_lod,
+    write_mz3,
+)
+
+# A unit square split into two triangles
+VERTICES = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float32)
+FACES = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+
+
+def grid_surface(n):
+    """A wavy (n, n) height field triangulated into 2 * (n - 1)² faces."""
+    x, y = np.meshgrid(np.linspace(0, 1, n), np.linspace(0, 1, n), indexing="ij")
+    vertices = np.stack([x, y, 0.1 * np.sin(6 * x)], axis=-1).reshape(-1, 3)
+    index = np.arange(n * n).reshape(n, n)
+    a, b, c, d = index[:-1, :-1], index[1:, :-1], index[1:, 1:], index[:-1, 1:]
+    faces = np.concatenate([
+        np.stack([a, b, c], axis=-1).reshape(-1, 3),
+        np.stack([a, c, d], axis=-1).reshape(-1, 3),
+    ])
+    return faces.astype(np.int32), vertices.astype(np.float32)
+
+
+def gifti(*arrays, encoding="ASCII"):
+    """Minimal GIfTI document holding ``(intent, array)`` pairs."""
+    types = {"f": "NIFTI_TYPE_FLOAT32", "i": "NIFTI_TYPE_INT32"}
+    elements = []
+    for intent, array in arrays:
+        if encoding == "ASCII":
+            text = " ".join(str(v) for v in array.ravel())
+        else:
+            raw = zlib.compress(array.astype(array.dtype.newbyteorder("<")).tobytes())
+            text = base64.b64encode(raw).decode()
+        dims = " ".join(f'Dim{i}="{n}"' for i, n in enumerate(array.shape))
+        elements.append(
+            f'<DataArray Intent="{intent}" DataType="{types[array.dtype.kind]}" '
+            f'ArrayIndexingOrder="RowMajorOrder" Dimensionality="{array.ndim}" {dims} '
+            f'Encoding="{encoding}" Endian="LittleEndian"><Data>{text}</Data></DataArray>'
+        )
+    return f'<?xml version="1.0"?><GIFTI Version="1.0">{"".join(elements)}</GIFTI>'.encode()
+
+
+def freesurfer_surface(vertices, faces):
+    header = b"\xff\xff\xfecreated by test\n\n" + struct.pack(">ii", len(vertices), len(faces))
+    return header + vertices.astype(">f4").tobytes() + faces.astype(">i4").tobytes()
+
+
+def assert_mesh(data, vertices=VERTICES, faces=FACES):
+    read_faces, read_vertices, scalars = read_mz3(data)
+    np.testing.assert_array_equal(read_faces, faces)
+    np.testing.assert_allclose(read_vertices, vertices)
+    assert scalars is None
+
+
+def test_mz3_roundtrip():
+    """Header, faces, vertices and scalar layers survive a write/read cycle."""
+    data = write_mz3(FACES, VERTICES)
+    assert len(data) == 16 + FACES.nbytes + VERTICES.nbytes
+    assert_mesh(data)
+    values = np.arange(8, dtype=np.float32).reshape(2, 4)
+    faces, vertices, scalars = read_mz3(write_mz3(scalars=values))
+    assert faces is None and vertices is None
+    np.testing.assert_array_equal(scalars, values)
+
+
+@pytest.mark.parametrize("encoding", ["ASCII", "GZipBase64Binary"])
+def test_compact_gifti(encoding):
+    data = gifti(
+        ("NIFTI_INTENT_POINTSET", VERTICES),
+        ("NIFTI_INTENT_TRIANGLE", FACES),
+        encoding=encoding,
+    )
+    compact, name = compact_mesh(data, "lh.pial.gii")
+    assert name == "lh.pial.gii.mz3"
+    assert_mesh(compact)
+
+
+def test_compact_obj():
+    """OBJ quads are fan-triangulated; texture/normal indices are dropped."""
+    obj = b"# square\nv 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nvn 0 0 1\nf 1/1/1 2/2/1 3/3/1 -1/4/1\n"
+    compact, name = compact_mesh(obj, "square.obj")
+    assert name == "square.obj.mz3"
+    assert_mesh(compact)
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_compact_vtk(binary):
+    cells = np.hstack([np.full((2, 1), 3), FACES])
+    header = f"# vtk DataFile Version 3.0\nsquare\n{'BINARY' if binary else 'ASCII'}\nDATASET POLYDATA\n"
+    if binary:
+        points = VERTICES.astype(">f4").tobytes() + b"\n"
+        polygons = cells.astype(">i4").tobytes() + b"\n"
+    else:
+        points = " ".join(map(str, VERTICES.ravel())).encode() + b"\n"
+        polygons = " ".join(map(str, cells.ravel())).encode() + b"\n"
+    data = (
+        header.encode() + b"POINTS 4 float\n" + points
+        + f"POLYGONS 2 {cells.size}\n".encode() + polygons
+    )
+    assert_mesh(compact_mesh(data, "square.vtk")[0])
+
+
+def test_compact_freesurfer_surface():
+    """FreeSurfer surfaces are detected by magic, whatever their name."""
+    compact, name = compact_mesh(freesurfer_surface(VERTICES, FACES), "lh.white")
+    assert name == "lh.white.mz3"
+    assert_mesh(compact)
+
+
+def test_compact_mesh_overlays():
+    """curv files and GIfTI shape arrays become scalar-only MZ3."""
+    values = np.array([0.5, -1.0, 2.0, 0.0], dtype=np.float32)
+    curv = b"\xff\xff\xff" + struct.pack(">iii", 4, 2, 1) + values.astype(">f4").tobytes()
+    compact, name = compact_mesh_overlay(curv, "lh.curv")
+    assert name == "lh.curv.mz3"
+    np.testing.assert_array_equal(read_mz3(compact)[2], values[None])
+    shape = gifti(("NIFTI_INTENT_SHAPE", values))
+    compact, _ = compact_mesh_overlay(shape, "lh.shape.gii")
+    np.testing.assert_array_equal(read_mz3(compact)[2], values[None])
+
+
+def test_compact_passthrough_and_errors():
+    """Unknown formats pass through; broken known ones raise ValueError."""
+    mz3 = write_mz3(FACES, VERTICES)
+    assert compact_mesh(mz3, "brain.mz3") == (mz3, "brain.mz3")
+    assert compact_mesh(b"TRK", "fibers.trk") == (b"TRK", "fibers.trk")
+    with pytest.raises(ValueError, match="Could not parse mesh"):
+        compact_mesh(b"<GIFTI>", "broken.gii")
+    with pytest.raises(ValueError, match="no surface"):
+        compact_mesh(gifti(("NIFTI_INTENT_SHAPE", VERTICES[:, 0])), "shape.gii")
+
+
+def test_decimate_hits_fraction():
+    """Clustering keeps about the requested share of faces, all valid."""
+    faces, vertices = grid_surface(200)
+    lod_faces, lod_vertices, labels = decimate(faces, vertices, 0.1)
+    assert 0.08 < len(lod_faces) / len(faces) < 0.12
+    assert labels.shape == (len(vertices),) and labels.max() == len(lod_vertices) - 1
+    a, b, c = lod_faces.T
+    assert np.all((a != b) & (b != c) & (a != c))
+    # merged vertices stay on the surface
+    np.testing.assert_allclose(lod_vertices[:, 2], 0.1 * np.sin(6 * lod_vertices[:, 0]), atol=0.01)
+
+
+def test_build_mesh_levels(monkeypatch):
+    """Levels are coarsest first and overlays are resampled onto each."""
+    monkeypatch.setattr(_mesh, "MIN_LOD_FACES", 1000)
+    faces, vertices = grid_surface(120)
+    height = write_mz3(scalars=vertices[:, 2])
+    levels = build_mesh_levels(
+        write_mz3(faces, vertices), "wave.mz3", ((height, "height.mz3"),), (0.1, 0.25)
+    )
+    assert [fraction for fraction, _, _ in levels] == [0.1, 0.25]
+    counts = []
+    for _, mesh, (overlay,) in levels:
+        lod_faces, lod_vertices, _ = read_mz3(mesh)
+        counts.append(len(lod_faces))
+        # the mean height of merged vertices is the height of their mean
+        np.testing.assert_allclose(read_mz3(overlay)[2][0], lod_vertices[:, 2], atol=1e-5)
+    assert counts[0] < counts[1] < len(faces)
+
+
+def test_build_mesh_levels_small_and_mismatched(monkeypatch):
+    """Small meshes get no levels; overlays must match the vertex count."""
+    mesh = write_mz3(FACES, VERTICES)
+    assert build_mesh_levels(mesh, "square.mz3") == []
+    monkeypatch.setattr(_mesh, "MIN_LOD_FACES", 1)
+    with pytest.raises(ValueError, match="3 values for 4 vertices"):
+        build_mesh_levels(mesh, "square.mz3", ((write_mz3(scalars=np.zeros(3)), "x.mz3"),))
+
+
+def test_resolve_lod_and_names():
+    assert resolve_lod(False) is None and resolve_lod(None) is None
+    assert resolve_lod(True) == (0.1, 0.25)
+    assert resolve_lod([0.5, 0.05]) == (0.05, 0.5)
+    for bad in ([], [1.5], "fast", 3):
+        with pytest.raises(ValueError, match="mesh_lod must be"):
+            resolve_lod(bad)
+    assert lod_name("lh.pial", 0.1) == "lh.pial.lod10.mz3"
+    assert lod_name("lh.pial.gii.mz3", 0.25) == "lh.pial.gii.lod25.mz3"
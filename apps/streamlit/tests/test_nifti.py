@@ -0,0 +1,96 @@
+"""Unit tests for in-memory NIfTI encoding and decoding."""
+
+import gzip
+import struct
+
+import numpy as np
+import pytest
+
+from niivue_component._nifti import VOX_OFFSET, array_to_nifti, nifti_to_array
+
+
+def _header_field(data, fmt, offset):
+    return struct.unpack_from("<" + fmt, data, offset)
+
+
+def test_array_to_nifti_header():
+    """Shape, datatype, voxel sizes and sform are written to the header."""
+    affine = np.diag([2.0, 3.0, 4.0, 1.0])
+    affine[:3, 3] = [-10, -20, -30]
+    data = array_to_nifti(np.zeros((4, 5, 6), dtype=np.float32), affine)
+
+    assert len(data) == VOX_OFFSET + 4 * 5 * 6 * 4
+    assert _header_field(data, "i", 0) == (348,)
+    assert _header_field(data, "4h", 40) == (3, 4, 5, 6)
+    assert _header_field(data, "hh", 70) == (16, 32)
+    assert _header_field(data, "3f", 80) == (2.0, 3.0, 4.0)
+    assert _header_field(data, "f", 108) == (VOX_OFFSET,)
+    assert _header_field(data, "h", 254) == (2,)
+    assert _header_field(data, "4f", 280) == (2.0, 0.0, 0.0, -10.0)
+    assert data[344:348] == b"n+1\0"
+
+
+def test_array_to_nifti_voxel_order():
+    """Voxels are stored x-fastest regardless of the array's memory order."""
+    arr = np.arange(24, dtype=np.int16).reshape(2, 3, 4)
+    expected = arr.tobytes(order="F")
+    assert array_to_nifti(arr)[VOX_OFFSET:] == expected
+    assert array_to_nifti(np.asfortranarray(arr))[VOX_OFFSET:] == expected
+
+
+def test_array_to_nifti_big_endian_and_bool():
+    """Big-endian arrays are swapped and booleans stored as uint8."""
+    arr = np.arange(8, dtype=">i4").reshape(2, 2, 2)
+    data = array_to_nifti(arr)
+    assert data[VOX_OFFSET:] == arr.astype("<i4").tobytes(order="F")
+
+    mask = array_to_nifti(np.ones((2, 2, 2), dtype=bool))
+    assert _header_field(mask, "hh", 70) == (2, 8)
+    assert mask[VOX_OFFSET:] == b"\x01" * 8
+
+
+def test_array_to_nifti_rejects_bad_input():
+    """Unsupported dtypes and malformed affines raise ValueError."""
+    with pytest.raises(ValueError, match="Unsupported dtype"):
+        array_to_nifti(np.zeros((2, 2, 2), dtype=np.complex64))
+    with pytest.raises(ValueError, match="affine must have shape"):
+        array_to_nifti(np.zeros((2, 2, 2)), affine=np.eye(3))
+
+
+def test_array_to_nifti_roundtrip_nibabel():
+    """nibabel reads back the same voxels and affine."""
+    nib = pytest.importorskip("nibabel")
+    arr = np.random.default_rng(0).random((5, 6, 7)).astype(np.float32)
+    affine = np.array([[0, 0, 1.5, -5], [2, 0, 0, 3], [0, 1, 0, 7], [0, 0, 0, 1]], dtype=float)
+    img = nib.Nifti1Image.from_bytes(array_to_nifti(arr, affine))
+    np.testing.assert_array_equal(img.get_fdata(dtype=np.float32), arr)
+    np.testing.assert_allclose(img.affine, affine)
+
+
+def test_nifti_to_array_roundtrip():
+    """nifti_to_array reads back array_to_nifti output, also gzipped."""
+    arr = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+    affine = np.diag([1.5, 2.0, 2.5, 1.0])
+    affine[:3, 3] = [1, 2, 3]
+    for data in (array_to_nifti(arr, affine), gzip.compress(array_to_nifti(arr, affine))):
+        out, out_affine = nifti_to_array(data)
+        np.testing.assert_array_equal(out, arr)
+        np.testing.assert_allclose(out_affine, affine)
+
+
+def test_nifti_to_array_qform_and_scaling():
+    """The qform is used without an sform and scl_slope/scl_inter are applied."""
+    header = bytearray(array_to_nifti(np.ones((2, 2, 2), dtype=np.int16)))
+    struct.pack_into("<ff", header, 112, 2.0, 10.0)  # scl_slope, scl_inter
+    struct.pack_into("<hh", header, 252, 1, 0)  # qform only
+    struct.pack_into("<6f", header, 256, 0, 0, 1, 5, 6, 7)  # 180° about z
+    out, affine = nifti_to_array(bytes(header))
+    assert out.dtype == np.float32 and np.all(out == 12.0)
+    np.testing.assert_allclose(affine[:3, :3], np.diag([-1.0, -1.0, 1.0]), atol=1e-6)
+    np.testing.assert_allclose(affine[:3, 3], [5, 6, 7])
+
+
+def test_nifti_to_array_rejects_other_formats():
+    """Non-NIfTI-1 data raises ValueError."""
+    with pytest.raises(ValueError, match="NIfTI-1"):
+        nifti_to_array(b"\x00" * 400)
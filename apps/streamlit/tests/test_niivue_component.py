@@ -2,7 +2,8 @@
 
 import base64
 import pytest
-from niivue_component import niivue_viewer
+from niivue_component import niivue_grid, niivue_viewer
+from niivue_component._payload import content_key
 
 
 def test_niivue_viewer_basic():
@@ -248,7 +249,7 @@ def test_niivue_viewer_mesh_validation_missing_data():
 
 def test_niivue_viewer_mesh_validation_data_not_bytes():
     """Test that non-bytes 'data' in mesh raises ValueError."""
-    meshes = [{'data': 'not bytes', 'name': 'lh.pial'}]
+    meshes = [{'data': 12345, 'name': 'lh.pial'}]
     
     with pytest.raises(ValueError, match="'data' must be bytes"):
         niivue_viewer(meshes=meshes, key="test_mesh_bad_data")
@@ -316,3 +317,641 @@ def test_niivue_viewer_mesh_overlay_on_second_mesh_warns():
         niivue_viewer(meshes=meshes, key="test_mesh_overlay_warn")
         assert len(w) == 1
         assert "only supported on the first mesh" in str(w[0].message)
+
+
+@pytest.fixture
+def captured_args(monkeypatch):
+    """Capture the arguments niivue_viewer passes to the component function."""
+    import niivue_component
+
+    calls = []
+
+    def fake_component_func(**kwargs):
+        calls.append(kwargs)
+        return kwargs.get("default")
+
+    monkeypatch.setattr(niivue_component, "_component_func", fake_component_func)
+    return calls
+
+
+def test_niivue_viewer_binary_transport_hoists_blobs(captured_args):
+    """Binary transport sends payloads as top-level bytes args, not base64."""
+    volume = b'\x00' * 100
+    overlay = b'\xFF' * 50
+    mesh = b'\xAA' * 30
+
+    niivue_viewer(
+        nifti_data=volume,
+        filename="test.nii",
+        overlays=[{'data': overlay, 'name': 'o.nii'}],
+        meshes=[{'data': mesh, 'name': 'lh.pial'}],
+        key="test_binary",
+    )
+    args = captured_args[0]
+    assert args["nifti_data"] == {"blob": "blob_0", "hash": content_key(volume)[1].hex()}
+    assert args["overlays"][0]["data"] == {"blob": "blob_1", "hash": content_key(overlay)[1].hex()}
+    assert args["meshes"][0]["data"] == {"blob": "blob_2", "hash": content_key(mesh)[1].hex()}
+    assert args["blob_0"] is volume
+    assert args["blob_1"] is overlay
+    assert args["blob_2"] is mesh
+
+
+def test_niivue_viewer_binary_transport_dedupes_same_object(captured_args):
+    """The same bytes object used twice is only sent once."""
+    mask = b'\x01' * 64
+    niivue_viewer(
+        nifti_data=b'\x00' * 100,
+        overlays=[{'data': mask, 'name': 'a.nii'}, {'data': mask, 'name': 'b.nii'}],
+        key="test_binary_dedupe",
+    )
+    args = captured_args[0]
+    assert args["overlays"][0]["data"] == args["overlays"][1]["data"]
+    assert sorted(k for k in args if k.startswith("blob_")) == ["blob_0", "blob_1"]
+
+
+def test_niivue_viewer_binary_refs_carry_content_digest(captured_args):
+    """Same-sized payloads differing only mid-buffer get different hashes."""
+    first = bytearray(4096)
+    second = bytearray(4096)
+    second[2048] = 1
+    niivue_viewer(
+        nifti_data=b'\x00' * 100,
+        overlays=[{'data': first, 'name': 'm.nii'}, {'data': second, 'name': 'm.nii'}],
+        key="test_binary_digest",
+    )
+    a, b = (overlay["data"] for overlay in captured_args[0]["overlays"])
+    assert a["hash"] != b["hash"]
+    assert a["hash"] == content_key(first)[1].hex()
+
+
+def test_niivue_viewer_binary_transport_accepts_memoryview(captured_args):
+    """memoryview and bytearray payloads are accepted and sent as bytes."""
+    niivue_viewer(
+        nifti_data=memoryview(b'\x00\x01\x02'),
+        paired_data=bytearray(b'\x03\x04'),
+        key="test_binary_memoryview",
+    )
+    args = captured_args[0]
+    assert args[args["nifti_data"]["blob"]] == b'\x00\x01\x02'
+    assert args[args["paired_data"]["blob"]] == b'\x03\x04'
+
+
+def test_niivue_viewer_shares_identical_payloads_between_calls(captured_args):
+    """Identical large payloads from separate calls are sent as one object."""
+    from niivue_component import volume_store
+
+    volume = b'\x05' * (256 * 1024)
+    for key in ("test_shared_a", "test_shared_b"):
+        niivue_viewer(nifti_data=bytearray(volume), key=key)
+    first, second = (args[args["nifti_data"]["blob"]] for args in captured_args)
+    assert first == volume and first is second
+    assert volume_store.stats()["hits"] >= 1
+
+
+def test_niivue_viewer_loads_path_sources(captured_args, tmp_path):
+    """Paths are read on the loader pool and name the file by default."""
+    path = tmp_path / "brain.nii"
+    path.write_bytes(b'\x00\x01\x02\x03')
+    mesh = tmp_path / "lh.pial"
+    mesh.write_bytes(b'\x04\x05')
+    niivue_viewer(nifti_data=path, meshes=[{"data": str(mesh)}], key="test_path_sources")
+    args = captured_args[0]
+    assert args["filename"] == "brain.nii"
+    assert args[args["nifti_data"]["blob"]] == b'\x00\x01\x02\x03'
+    assert args["meshes"][0]["name"] == "lh.pial"
+    assert args[args["meshes"][0]["data"]["blob"]] == b'\x04\x05'
+
+
+def test_niivue_viewer_accepts_mmap(captured_args, tmp_path):
+    """An mmap object is accepted as payload data and sent as bytes."""
+    import mmap
+
+    path = tmp_path / "brain.nii"
+    path.write_bytes(b'\x00\x01\x02\x03')
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    niivue_viewer(nifti_data=mapped, key="test_mmap")
+    args = captured_args[0]
+    assert args[args["nifti_data"]["blob"]] == b'\x00\x01\x02\x03'
+
+
+def test_niivue_viewer_base64_transport(captured_args):
+    """The base64 fallback inlines encoded strings and sends no blobs."""
+    volume = b'\x00\x01\x02\x03'
+    niivue_viewer(nifti_data=volume, transport="base64", key="test_base64")
+    args = captured_args[0]
+    assert args["nifti_data"] == base64.b64encode(volume).decode()
+    assert not any(k.startswith("blob_") for k in args)
+
+
+def test_niivue_viewer_invalid_transport():
+    """An unknown transport raises ValueError."""
+    with pytest.raises(ValueError, match="transport must be one of"):
+        niivue_viewer(nifti_data=b'\x00', transport="carrier-pigeon", key="test_bad_transport")
+
+
+def test_niivue_viewer_nifti_data_not_bytes():
+    """Non-bytes nifti_data raises ValueError."""
+    with pytest.raises(ValueError, match="nifti_data must be bytes"):
+        niivue_viewer(nifti_data=12345, key="test_nifti_not_bytes")
+
+
+@pytest.fixture
+def fake_media_runtime(monkeypatch):
+    """Pretend a Streamlit server is running and record media registrations."""
+    from niivue_component import _payload
+
+    added = []
+
+    class FakeMediaFileManager:
+        def add(self, data, mimetype, coordinates):
+            added.append((data, mimetype, coordinates))
+            return f"/media/hash{len(added)}.bin"
+
+    class FakeRuntime:
+        media_file_mgr = FakeMediaFileManager()
+
+    monkeypatch.setattr(_payload.runtime, "exists", lambda: True)
+    monkeypatch.setattr(_payload.runtime, "get_instance", lambda: FakeRuntime())
+    return added
+
+
+def test_niivue_viewer_url_transport(captured_args, fake_media_runtime):
+    """URL transport registers payloads as media and sends only references."""
+    volume = b'\x00' * 100
+    niivue_viewer(nifti_data=volume, transport="url", key="test_url")
+    args = captured_args[0]
+    assert args["nifti_data"] == {"url": "/media/hash1.bin", "hash": "hash1"}
+    assert not any(k.startswith("blob_") for k in args)
+    assert fake_media_runtime[0][0] is volume
+
+
+def test_niivue_viewer_url_transport_coordinates_are_unique(captured_args, fake_media_runtime):
+    """Each distinct payload gets its own media coordinates, namespaced by key."""
+    niivue_viewer(
+        nifti_data=b'\x01' * 100,
+        overlays=[{'data': b'\x02' * 100, 'name': 'mask.nii'}],
+        transport="url",
+        key="test_url_coords",
+    )
+    coordinates = [c for _, _, c in fake_media_runtime]
+    assert len(set(coordinates)) == 2
+    assert all(c.startswith("niivue_component.test_url_coords.") for c in coordinates)
+
+
+def test_niivue_viewer_url_transport_base_url_path(captured_args, fake_media_runtime, monkeypatch):
+    """Media URLs are prefixed with server.baseUrlPath."""
+    from niivue_component import _payload
+
+    monkeypatch.setattr(_payload.config, "get_option", lambda name: "/viewer/")
+    niivue_viewer(nifti_data=b'\x00', transport="url", key="test_url_base")
+    assert captured_args[0]["nifti_data"]["url"] == "/viewer/media/hash1.bin"
+
+
+def test_niivue_viewer_url_transport_without_runtime(captured_args):
+    """Without a running server, the url transport falls back to binary."""
+    niivue_viewer(nifti_data=b'\x00', transport="url", key="test_url_bare")
+    assert captured_args[0]["nifti_data"]["blob"] == "blob_0"
+
+
+def test_niivue_viewer_accepts_numpy_arrays(captured_args):
+    """ndarray volumes and overlays are sent as uncompressed NIfTI blobs."""
+    import numpy as np
+
+    volume = np.zeros((4, 4, 4), dtype=np.float32)
+    mask = np.ones((4, 4, 4), dtype=np.uint8)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    niivue_viewer(
+        nifti_data=volume,
+        affine=affine,
+        overlays=[{'data': mask, 'name': 'mask.nii'}, {'data': mask, 'name': 'again.nii'}],
+        key="test_numpy",
+    )
+    args = captured_args[0]
+    nifti = args[args["nifti_data"]["blob"]]
+    assert nifti[344:348] == b"n+1\0"
+    assert len(nifti) == 352 + volume.nbytes
+    # The same array with the same affine is converted and sent once
+    assert args["overlays"][0]["data"] == args["overlays"][1]["data"]
+    overlay = args[args["overlays"][0]["data"]["blob"]]
+    assert overlay[280:284] == np.float32(2.0).tobytes()
+
+
+def test_niivue_viewer_numpy_base64_transport(captured_args):
+    """ndarray payloads also work with the base64 transport."""
+    import numpy as np
+
+    niivue_viewer(nifti_data=np.zeros((2, 2, 2), dtype=np.int16), transport="base64", key="test_numpy_b64")
+    decoded = base64.b64decode(captured_args[0]["nifti_data"])
+    assert decoded[344:348] == b"n+1\0"
+
+
+def test_niivue_viewer_overlay_ids(captured_args):
+    """Overlay ids are passed through so the frontend can diff overlays."""
+    niivue_viewer(
+        nifti_data=b'\x00' * 100,
+        overlays=[
+            {'data': b'\x01' * 10, 'name': 'a.nii', 'id': 'zstat1'},
+            {'data': b'\x02' * 10, 'name': 'b.nii'},
+        ],
+        key="test_overlay_ids",
+    )
+    overlays = captured_args[0]["overlays"]
+    assert overlays[0]["id"] == "zstat1"
+    assert overlays[1]["id"] is None
+
+
+def test_niivue_viewer_overlay_id_validation():
+    """Overlay ids must be unique strings."""
+    with pytest.raises(ValueError, match="duplicate id"):
+        niivue_viewer(
+            nifti_data=b'\x00',
+            overlays=[
+                {'data': b'\x01', 'name': 'a.nii', 'id': 'x'},
+                {'data': b'\x02', 'name': 'b.nii', 'id': 'x'},
+            ],
+            key="test_overlay_dup_id",
+        )
+    with pytest.raises(ValueError, match="'id' must be a string"):
+        niivue_viewer(
+            nifti_data=b'\x00',
+            overlays=[{'data': b'\x01', 'name': 'a.nii', 'id': 1}],
+            key="test_overlay_bad_id",
+        )
+
+
+def test_niivue_viewer_progressive(captured_args):
+    """Progressive mode sends the coarsest level first and the rest in order."""
+    import numpy as np
+
+    volume = np.zeros((64, 64, 64), dtype=np.float32)
+    niivue_viewer(nifti_data=volume, progressive=True, key="test_progressive")
+    args = captured_args[0]
+    coarse = args[args["nifti_data"]["blob"]]
+    levels = [args[ref["blob"]] for ref in args["nifti_levels"]]
+    assert len(coarse) == 352 + 16 ** 3 * 4
+    assert [len(level) for level in levels] == [352 + 32 ** 3 * 4, 352 + volume.nbytes]
+
+
+def test_niivue_viewer_progressive_small_volume(captured_args):
+    """Volumes too small for a pyramid are sent as usual."""
+    niivue_viewer(nifti_data=b'\x00' * 100, key="test_progressive_off")
+    assert captured_args[0]["nifti_levels"] is None
+
+
+def test_niivue_viewer_progressive_requires_nifti():
+    """Progressive mode rejects bytes it cannot parse."""
+    with pytest.raises(ValueError, match="progressive requires"):
+        niivue_viewer(nifti_data=b'\x00' * 400, progressive=True, key="test_progressive_bad")
+
+
+def test_niivue_viewer_quantize(captured_args):
+    """quantize shrinks the volume and overlays can override it."""
+    import numpy as np
+
+    from niivue_component._nifti import nifti_to_array
+
+    volume = np.linspace(0, 1, 8 ** 3, dtype=np.float32).reshape(8, 8, 8)
+    niivue_viewer(
+        nifti_data=volume,
+        quantize="uint8",
+        overlays=[
+            {"data": volume, "name": "a.nii", "id": "a"},
+            {"data": volume, "name": "b.nii", "id": "b", "quantize": None},
+        ],
+        key="test_quantize",
+    )
+    args = captured_args[0]
+    base = args[args["nifti_data"]["blob"]]
+    assert len(base) == 352 + volume.size
+    decoded, _ = nifti_to_array(base)
+    np.testing.assert_allclose(decoded, volume, atol=0.5 / 255 + 1e-6)
+    a, b = (args[overlay["data"]["blob"]] for overlay in args["overlays"])
+    assert len(a) == 352 + volume.size
+    assert len(b) == 352 + volume.nbytes
+
+
+def test_niivue_viewer_quantize_validation():
+    """Unknown targets and unparseable bytes are rejected."""
+    with pytest.raises(ValueError, match="quantize must be one of"):
+        niivue_viewer(nifti_data=b'\x00' * 400, quantize="float16", key="test_quantize_bad")
+    with pytest.raises(ValueError, match="quantize requires"):
+        niivue_viewer(nifti_data=b'\x00' * 400, quantize=True, key="test_quantize_bytes")
+
+
+def test_niivue_viewer_profile(captured_args):
+    """profile=True sends Python timings, bytes and cache counters."""
+    import numpy as np
+
+    volume = np.zeros((8, 8, 8), dtype=np.float32)
+    niivue_viewer(nifti_data=volume, quantize="uint8", profile=True, key="test_profile")
+    profile = captured_args[0]["profile"]
+    assert profile["bytes_sent"] == 352 + volume.size
+    assert profile["payloads"] == 1
+    assert profile["encode_ms"] >= 0 and profile["quantize_ms"] >= 0
+    assert profile["caches"]["quantize"]["hits"] + profile["caches"]["quantize"]["misses"] == 1
+
+
+def test_niivue_viewer_profile_counts_base64_cache_hits(captured_args):
+    """A base64 payload encoded on an earlier run counts as a cache hit."""
+    volume = b'\x07' * 1000
+    for _ in range(2):
+        niivue_viewer(nifti_data=volume, transport="base64", profile=True, key="test_profile_b64")
+    assert captured_args[1]["profile"]["caches"]["encode_b64"] == {"hits": 1, "misses": 0}
+
+
+def test_niivue_viewer_profile_counts_only_store_lookups(captured_args):
+    """Payloads the store passes through are not reported as store hits."""
+    niivue_viewer(nifti_data=b'\x01' * 1000, profile=True, key="test_profile_store")
+    assert "store" not in captured_args[0]["profile"]["caches"]
+    volume = b'\x02' * (64 * 1024)
+    for _ in range(2):
+        niivue_viewer(nifti_data=volume, profile=True, key="test_profile_store")
+    assert captured_args[2]["profile"]["caches"]["store"] == {"hits": 1, "misses": 0}
+
+
+def test_niivue_viewer_profile_env_and_key(captured_args, monkeypatch):
+    """NIIVUE_PROFILE enables profiling; keyless viewers skip it with a warning."""
+    monkeypatch.setenv("NIIVUE_PROFILE", "1")
+    niivue_viewer(nifti_data=b'\x00' * 10, key="test_profile_env")
+    assert captured_args[0]["profile"] is not None
+    with pytest.warns(UserWarning, match="profile requires a key"):
+        niivue_viewer(nifti_data=b'\x00' * 10)
+    assert captured_args[1]["profile"] is None
+
+
+def test_niivue_viewer_compact_meshes(captured_args):
+    """compact_meshes converts known formats to MZ3 and passes others through."""
+    obj = b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n"
+    mz3 = b"MZ" + b"\x00" * 14
+    niivue_viewer(
+        meshes=[
+            {"data": obj, "name": "tri.obj"},
+            {"data": mz3, "name": "done.mz3"},
+        ],
+        compact_meshes=True,
+        profile=True,
+        key="test_compact_meshes",
+    )
+    args = captured_args[0]
+    first, second = args["meshes"]
+    assert first["name"] == "tri.obj.mz3"
+    assert len(args[first["data"]["blob"]]) == 16 + 3 * 4 + 9 * 4
+    assert second["name"] == "done.mz3"
+    assert args[second["data"]["blob"]] == mz3
+    assert sum(args["profile"]["caches"]["mesh"].values()) == 2
+
+
+def test_niivue_viewer_compact_meshes_parse_error_warns(captured_args):
+    """A file that fails to parse is sent unconverted with a warning."""
+    broken = b"<gifti"
+    with pytest.warns(UserWarning, match="Mesh 0: Could not parse mesh"):
+        niivue_viewer(
+            meshes=[{"data": broken, "name": "lh.gii"}],
+            compact_meshes=True,
+            key="test_compact_meshes_broken",
+        )
+    mesh = captured_args[0]["meshes"][0]
+    assert mesh["name"] == "lh.gii"
+    assert captured_args[0][mesh["data"]["blob"]] == broken
+
+
+def test_niivue_viewer_mesh_lod(captured_args, monkeypatch):
+    """mesh_lod sends the coarsest level first, then finer ones and the full mesh."""
+    import numpy as np
+
+    from niivue_component import _mesh
+
+    monkeypatch.setattr(_mesh, "MIN_LOD_FACES", 100)
+    x, y = np.meshgrid(np.arange(60.0), np.arange(60.0), indexing="ij")
+    vertices = np.stack([x, y, np.sin(x / 5)], axis=-1).reshape(-1, 3)
+    index = np.arange(3600).reshape(60, 60)
+    faces = np.concatenate([
+        np.stack([index[:-1, :-1], index[1:, :-1], index[1:, 1:]], axis=-1).reshape(-1, 3),
+        np.stack([index[:-1, :-1], index[1:, 1:], index[:-1, 1:]], axis=-1).reshape(-1, 3),
+    ])
+    mesh = _mesh.write_mz3(faces, vertices)
+    curv = _mesh.write_mz3(scalars=vertices[:, 2])
+    niivue_viewer(
+        meshes=[
+            {"data": mesh, "name": "wave.mz3", "overlays": [{"data": curv, "name": "wave.curv.mz3"}]},
+            {"data": mesh, "name": "copy.mz3", "lod": False},
+        ],
+        mesh_lod=True,
+        key="test_mesh_lod",
+    )
+    args = captured_args[0]
+    first, second = args["meshes"]
+    assert first["name"] == "wave.lod10.mz3"
+    assert first["overlays"][0]["name"] == "wave.curv.lod10.mz3"
+    assert first["overlays"][0]["colormap"] == "redyell"
+    assert [level["name"] for level in first["levels"]] == ["wave.lod25.mz3", "wave.mz3"]
+    assert args[first["levels"][-1]["data"]["blob"]] is mesh
+    assert args[first["levels"][-1]["overlays"][0]["data"]["blob"]] is curv
+    assert "levels" not in second
+
+
+def test_niivue_viewer_mesh_lod_validation():
+    """Invalid fractions raise; unparseable meshes warn and are sent whole."""
+    with pytest.raises(ValueError, match="mesh_lod must be"):
+        niivue_viewer(meshes=[{"data": b"x", "name": "a.mz3"}], mesh_lod=[2], key="test_lod_bad")
+    with pytest.warns(UserWarning, match="Mesh 0: mesh_lod skipped"):
+        niivue_viewer(meshes=[{"data": b"TRK", "name": "f.trk"}], mesh_lod=True, key="test_lod_trk")
+
+
+def test_niivue_grid(captured_args, fake_media_runtime):
+    """The grid sends one media reference per volume and no inline payloads."""
+    import numpy as np
+
+    volumes = [
+        b'\x00' * 100,
+        {"data": np.zeros((4, 4, 4), dtype=np.uint8), "name": "sub-02.nii", "label": "sub-02"},
+    ]
+    niivue_grid(volumes, columns=2, cell_height=150, key="test_grid")
+    args = captured_args[0]
+    grid = args["grid"]
+    assert grid["columns"] == 2 and grid["cell_height"] == 150
+    assert [cell["name"] for cell in grid["cells"]] == ["volume0.nii", "sub-02.nii"]
+    assert [cell["label"] for cell in grid["cells"]] == ["volume0.nii", "sub-02"]
+    assert grid["cells"][0]["data"] == {"url": "/media/hash1.bin", "hash": "hash1"}
+    assert len(fake_media_runtime) == 2
+    assert not any(k.startswith("blob_") for k in args)
+
+
+def test_niivue_grid_validation():
+    """Bad columns and volumes are rejected."""
+    with pytest.raises(ValueError, match="columns must be a positive integer"):
+        niivue_grid([b'\x00'], columns=0, key="test_grid_columns")
+    with pytest.raises(ValueError, match="Volume 1: 'data' must be bytes"):
+        niivue_grid([b'\x00', 12345], key="test_grid_data")
+    with pytest.raises(ValueError, match="Volume 0: 'data' field is required"):
+        niivue_grid([{"name": "scan.nii"}], key="test_grid_missing")
+
+
+@pytest.mark.parametrize("mode", ["last", "all", 250, 12.5])
+def test_niivue_viewer_batch_events(captured_args, mode):
+    """batch_events modes are passed through to the frontend."""
+    niivue_viewer(nifti_data=b'\x00' * 100, batch_events=mode, key="test_batch")
+    assert captured_args[-1]["batch_events"] == mode
+
+
+def test_niivue_viewer_batch_events_default(captured_args):
+    """Without batch_events the viewer returns single events as before."""
+    niivue_viewer(nifti_data=b'\x00' * 100, key="test_batch_default")
+    assert captured_args[-1]["batch_events"] is None
+
+
+@pytest.mark.parametrize("mode", ["first", 0, -5, True, [100]])
+def test_niivue_viewer_batch_events_invalid(mode):
+    with pytest.raises(ValueError, match="batch_events must be"):
+        niivue_viewer(nifti_data=b'\x00' * 100, batch_events=mode, key="test_batch_bad")
+
+
+def test_niivue_viewer_batch_events_needs_feedback():
+    with pytest.raises(ValueError, match="needs update_interval_ms"):
+        niivue_viewer(
+            nifti_data=b'\x00' * 100,
+            batch_events="all",
+            update_interval_ms=None,
+            key="test_batch_no_feedback",
+        )
+
+
+def test_niivue_viewer_drawing_args(captured_args):
+    """drawing sends the pen, the initial mask and the sync state."""
+    import numpy as np
+
+    mask = np.zeros((4, 4, 4), bool)
+    niivue_viewer(
+        nifti_data=np.zeros((4, 4, 4), np.float32),
+        drawing={"data": mask, "pen": 2},
+        key="test_drawing_args",
+    )
+    args = captured_args[-1]
+    assert args["drawing"]["initial"]["blob"] == "blob_1"
+    assert args["drawing"] == {"pen": 2, "initial": args["drawing"]["initial"], "version": 0, "resync": 0}
+    assert args["blob_1"][:4] == (348).to_bytes(4, "little")
+
+
+def test_niivue_viewer_drawing_update_returns_mask(monkeypatch):
+    """A drawing update is applied and returned as a mask."""
+    import zlib
+
+    import numpy as np
+
+    import niivue_component
+    from niivue_component import drawing_mask
+
+    layer = np.zeros((2, 3, 4), np.uint8)
+    layer[1, 2, 3] = 1
+    payload = {
+        "type": "drawing", "version": 1, "base_version": None,
+        "dims": [4, 3, 2], "perm": [1, 2, 3],
+        "slabs": [{"start": 0, "stop": 2, "data": base64.b64encode(zlib.compress(layer.tobytes())).decode()}],
+    }
+    monkeypatch.setattr(niivue_component, "_component_func", lambda **kwargs: payload)
+
+    result = niivue_viewer(nifti_data=b'\x00' * 100, drawing=True, key="test_drawing_update")
+    assert result["type"] == "drawing" and result["version"] == 1
+    assert result["mask"].shape == (4, 3, 2) and result["mask"][3, 2, 1] == 1
+    assert drawing_mask("test_drawing_update") is not None
+    assert drawing_mask("test_drawing_unknown") is None
+
+
+@pytest.mark.parametrize("kwargs, match", [
+    ({"key": None}, "requires a key"),
+    ({"update_interval_ms": None}, "needs update_interval_ms"),
+    ({"nifti_data": None}, "requires nifti_data"),
+    ({"progressive": True}, "progressive"),
+])
+def test_niivue_viewer_drawing_invalid(kwargs, match):
+    import numpy as np
+
+    options = {"nifti_data": np.zeros((64, 64, 64), np.float32), "drawing": True, "key": "test_drawing_bad"}
+    options.update(kwargs)
+    with pytest.raises(ValueError, match=match):
+        niivue_viewer(**options)
+
+
+def test_niivue_viewer_frame_window_sends_window(captured_args):
+    """frame_window sends the current frame as nifti_data plus its window."""
+    import numpy as np
+
+    bold = np.arange(4 * 4 * 4 * 20, dtype=np.float32).reshape(4, 4, 4, 20)
+    niivue_viewer(nifti_data=bold, frame_window=2, key="test_frames")
+    args = captured_args[-1]
+    frames = args["frames"]
+    assert frames["count"] == 20 and frames["current"] == 0
+    assert [frame["index"] for frame in frames["window"]] == [0, 1, 2]
+    assert args["nifti_data"] == frames["window"][0]["data"]
+    assert len([name for name in args if name.startswith("blob_")]) == 3
+
+
+def test_niivue_viewer_frame_window_time_course(monkeypatch):
+    """A click in frame mode returns the voxel's time course."""
+    import numpy as np
+
+    import niivue_component
+
+    bold = np.random.default_rng(0).random((4, 4, 4, 20), dtype=np.float32)
+    click = {"type": "voxel_click", "voxel": [1, 2, 3], "mm": [1, 2, 3], "value": 0.5, "filename": "", "frame": 4}
+    monkeypatch.setattr(niivue_component, "_component_func", lambda **kwargs: click)
+
+    result = niivue_viewer(nifti_data=bold, frame_window=1, key="test_frames_click")
+    assert result["frame"] == 4
+    np.testing.assert_array_equal(result["time_course"], bold[1, 2, 3])
+
+
+@pytest.mark.parametrize("kwargs, match", [
+    ({"key": None}, "requires a key"),
+    ({"update_interval_ms": None}, "needs update_interval_ms"),
+    ({"drawing": True}, "cannot be combined"),
+    ({"nifti_data": None}, "requires a 4D nifti_data"),
+])
+def test_niivue_viewer_frame_window_invalid(kwargs, match):
+    import numpy as np
+
+    options = {"nifti_data": np.zeros((4, 4, 4, 3), np.float32), "frame_window": 1, "key": "test_frames_bad"}
+    options.update(kwargs)
+    with pytest.raises(ValueError, match=match):
+        niivue_viewer(**options)
+
+
+def test_niivue_viewer_codec_raw_gunzips_volumes(captured_args):
+    """codec='raw' sends gzipped NIfTI uncompressed; meshes are untouched."""
+    import gzip
+
+    import numpy as np
+
+    from niivue_component._nifti import array_to_nifti
+
+    volume = array_to_nifti(np.zeros((4, 4, 4), np.uint8))
+    mesh = gzip.compress(b'\xAA' * 30)
+    niivue_viewer(
+        nifti_data=gzip.compress(volume),
+        meshes=[{'data': mesh, 'name': 'lh.pial'}],
+        codec="raw",
+        key="test_codec_raw",
+    )
+    args = captured_args[0]
+    assert args["blob_0"] == volume
+    assert args["blob_1"] is mesh
+
+
+def test_niivue_viewer_codec_deflates_arrays_for_remote(captured_args, monkeypatch):
+    """codec='auto' deflates large uncompressed volumes for remote browsers."""
+    import gzip
+
+    import numpy as np
+
+    monkeypatch.setenv("NIIVUE_DEPLOYMENT", "remote")
+    volume = np.zeros((64, 64, 64), np.int16)
+    niivue_viewer(nifti_data=volume, codec="auto", key="test_codec_auto")
+    sent = captured_args[0]["blob_0"]
+    assert len(sent) < volume.nbytes // 10
+    assert gzip.decompress(sent)[352:] == volume.tobytes()
+
+
+def test_niivue_viewer_invalid_codec():
+    with pytest.raises(ValueError, match="codec must be one of"):
+        niivue_viewer(nifti_data=b'\x00' * 10, codec="zstd")
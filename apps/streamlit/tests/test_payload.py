@@ -0,0 +1,88 @@
+"""Unit tests for the bounded base64 payload cache and mapped payloads."""
+
+import base64
+
+import pytest
+
+from niivue_component._payload import PayloadCache, PayloadPacker, is_mapped, map_file
+from niivue_component._store import MIN_SHARED_BYTES, VolumeStore
+
+
+def test_payload_cache_hits_same_and_identical_objects():
+    """The same object and a fresh identical copy both hit the cache."""
+    cache = PayloadCache(max_bytes=1024 ** 2)
+    data = b"\x01\x02\x03" * 100
+    assert cache.encode(data) == base64.b64encode(data).decode()
+    cache.encode(data)
+    cache.encode(bytes(memoryview(data)))
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_payload_cache_distinguishes_content():
+    """Same length but different content is a miss, never a stale hit."""
+    cache = PayloadCache(max_bytes=1024 ** 2)
+    a, b = b"a" * 64, b"b" * 64
+    assert base64.b64decode(cache.encode(a)) == a
+    assert base64.b64decode(cache.encode(b)) == b
+    assert cache.stats()["misses"] == 2
+
+
+def test_payload_cache_evicts_least_recently_used():
+    """Entries beyond the budget are evicted oldest first."""
+    # Each 300-byte payload costs 300 + 400 bytes (source + encoding)
+    cache = PayloadCache(max_bytes=1500)
+    first, second, third = (bytes([i]) * 300 for i in range(3))
+    cache.encode(first)
+    cache.encode(second)
+    cache.encode(first)  # now most recently used
+    cache.encode(third)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    assert stats["nbytes"] <= 1500
+    cache.encode(first)
+    assert cache.stats()["misses"] == 3  # second was evicted, first was kept
+
+
+@pytest.mark.parametrize("wrap", [bytearray, memoryview])
+def test_payload_cache_does_not_keep_mutable_buffers(wrap):
+    """Mutable buffers are encoded by content and never stored."""
+    cache = PayloadCache(max_bytes=1024 ** 2)
+    buffer = bytearray(b"\x00" * 32)
+    assert cache.encode(wrap(buffer)) == base64.b64encode(buffer).decode()
+    buffer[0] = 1
+    assert cache.encode(wrap(buffer)) == base64.b64encode(buffer).decode()
+    assert cache.stats()["entries"] == 0
+
+
+def test_map_file_maps_read_only(tmp_path):
+    """Files are mapped read-only, except empty ones, which cannot be mapped."""
+    path = tmp_path / "scan.nii"
+    path.write_bytes(b"\x01\x02\x03")
+    view = map_file(path)
+    assert is_mapped(view) and view.readonly and view == b"\x01\x02\x03"
+    empty = tmp_path / "empty.nii"
+    empty.write_bytes(b"")
+    assert map_file(empty) == b"" and not is_mapped(map_file(empty))
+
+
+def test_payload_cache_keeps_mapped_files(tmp_path):
+    """A read-only mapping is kept like bytes, so re-encoding it is a hit."""
+    path = tmp_path / "scan.nii"
+    path.write_bytes(b"\x07" * 300)
+    view = map_file(path)
+    cache = PayloadCache(max_bytes=1024 ** 2)
+    assert cache.encode(view) == base64.b64encode(b"\x07" * 300).decode()
+    cache.encode(view)
+    assert cache.stats()["entries"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_packer_sends_mapped_files_without_interning(tmp_path):
+    """Mapped payloads bypass the store: the page cache already shares them."""
+    path = tmp_path / "scan.nii"
+    path.write_bytes(b"\x05" * MIN_SHARED_BYTES)
+    store = VolumeStore(max_bytes=10 * MIN_SHARED_BYTES)
+    packer = PayloadPacker("binary", store=store)
+    packed = packer.pack(map_file(path))
+    assert packer.blobs[packed["blob"]] == b"\x05" * MIN_SHARED_BYTES
+    assert not packer.store_keys and store.stats()["entries"] == 0
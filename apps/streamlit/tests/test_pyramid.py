@@ -0,0 +1,57 @@
+"""Unit tests for progressive-loading pyramids."""
+
+import numpy as np
+import pytest
+
+from niivue_component._nifti import array_to_nifti, nifti_to_array
+from niivue_component._pyramid import build_levels, downsample
+
+
+def test_downsample_block_mean_and_affine():
+    """Each output voxel is the mean of its block; the affine follows."""
+    data = np.arange(4 * 4 * 2, dtype=np.float32).reshape(4, 4, 2)
+    affine = np.diag([0.5, 0.5, 0.5, 1.0])
+    out, out_affine = downsample(data, affine, 2)
+    assert out.shape == (2, 2, 1)
+    assert out[0, 0, 0] == data[:2, :2, :2].mean()
+    # Block (0, 0, 0) is centred between original voxels 0 and 1
+    np.testing.assert_allclose(out_affine @ [0, 0, 0, 1], affine @ [0.5, 0.5, 0.5, 1])
+    np.testing.assert_allclose(np.diag(out_affine)[:3], [1.0, 1.0, 1.0])
+
+
+def test_downsample_pads_odd_shapes_and_keeps_time():
+    """Odd spatial sizes are edge-padded and extra axes are kept."""
+    data = np.ones((5, 6, 7, 3), dtype=np.int16)
+    out, _ = downsample(data, np.eye(4), 2)
+    assert out.shape == (3, 3, 4, 3)
+    assert np.all(out == 1)
+
+
+def test_build_levels_coarsest_first():
+    """Levels are NIfTI bytes ordered from coarsest to finest."""
+    data = np.random.default_rng(0).random((64, 64, 64)).astype(np.float32)
+    levels = build_levels(data, np.eye(4), (2, 4))
+    shapes = [nifti_to_array(level)[0].shape for level in levels]
+    assert shapes == [(16, 16, 16), (32, 32, 32)]
+
+
+def test_build_levels_from_nifti_bytes():
+    """NIfTI bytes are parsed and keep their affine."""
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    nifti = array_to_nifti(np.zeros((64, 64, 64), dtype=np.uint8), affine)
+    coarse, coarse_affine = nifti_to_array(build_levels(nifti, None, (4,))[0])
+    assert coarse.shape == (16, 16, 16)
+    np.testing.assert_allclose(np.diag(coarse_affine)[:3], [8.0, 8.0, 8.0])
+
+
+def test_build_levels_skips_small_volumes():
+    """Small volumes are not worth a pyramid."""
+    assert build_levels(np.zeros((8, 8, 8)), None, (2,)) == []
+
+
+def test_build_levels_misses_after_in_place_edit():
+    """Levels are cached by content, so a masked volume gets new levels."""
+    volume = np.ones((64, 64, 64), dtype=np.float32)
+    before = build_levels(volume, np.eye(4))
+    volume[40:44, 10:12, 20:22] = 0  # missed by a sparse sample of the voxels
+    assert build_levels(volume, np.eye(4)) != before
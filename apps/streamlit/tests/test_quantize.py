@@ -0,0 +1,74 @@
+"""Unit tests for intensity quantization."""
+
+import numpy as np
+import pytest
+
+from niivue_component._nifti import array_to_nifti, nifti_to_array
+from niivue_component._quantize import quantize, quantize_volume, resolve_quantize
+
+
+def test_quantize_float_range():
+    """Codes span the full range and decode to within half a step."""
+    data = np.random.default_rng(0).random((10, 10, 10))
+    codes, slope, inter = quantize(data, "uint8")
+    assert codes.dtype == np.uint8
+    assert codes.min() == 0 and codes.max() == 255
+    np.testing.assert_allclose(codes * slope + inter, data, atol=slope / 2 + 1e-6)
+
+
+def test_quantize_keeps_zero_exact():
+    """A range spanning zero gives zero its own code; NaNs map to it."""
+    data = np.array([-2.0, 0.0, 3.0, np.nan, np.inf], dtype=np.float32)
+    codes, slope, inter = quantize(data, "uint8")
+    decoded = codes * slope + inter
+    assert decoded[1] == pytest.approx(0.0, abs=1e-9)
+    assert decoded[3] == decoded[1] and decoded[4] == decoded[1]
+    assert decoded[0] == pytest.approx(-2.0, abs=slope / 2)
+    assert decoded[2] == pytest.approx(3.0, abs=slope / 2)
+
+
+def test_quantize_integers():
+    """Narrow integers pass through; wide ones that fit are stored exactly."""
+    small = np.arange(10, dtype=np.int8)
+    assert quantize(small, "uint8")[0] is small
+    wide = np.array([-100, 0, 1000], dtype=np.int32)
+    codes, slope, inter = quantize(wide, "uint16")
+    assert codes.dtype == np.uint16 and slope == 1.0
+    np.testing.assert_array_equal(codes + inter, wide)
+
+
+def test_quantize_constant_and_empty():
+    """Constant and all-NaN inputs do not divide by zero."""
+    codes, slope, inter = quantize(np.full(5, 7.5), "uint16")
+    np.testing.assert_array_equal(codes * slope + inter, 7.5)
+    codes, _, _ = quantize(np.full(3, np.nan), "uint8")
+    np.testing.assert_array_equal(codes, 0)
+
+
+def test_quantize_volume_roundtrip():
+    """NIfTI input keeps its affine and values survive scl_slope/scl_inter."""
+    data = np.random.default_rng(1).normal(size=(6, 7, 8)).astype(np.float32)
+    affine = np.diag([2.0, 2.0, 3.0, 1.0])
+    nifti = quantize_volume(array_to_nifti(data, affine), dtype="uint16")
+    assert len(nifti) == 352 + data.size * 2
+    decoded, decoded_affine = nifti_to_array(nifti)
+    np.testing.assert_allclose(decoded, data, atol=1e-3)
+    np.testing.assert_allclose(decoded_affine, affine)
+
+
+def test_resolve_quantize():
+    """True means uint16 and falsy values disable quantization."""
+    assert resolve_quantize(True) == np.uint16
+    assert resolve_quantize("uint8") == np.uint8
+    assert resolve_quantize(None) is None and resolve_quantize(False) is None
+    with pytest.raises(ValueError, match="quantize must be one of"):
+        resolve_quantize("int4")
+
+
+def test_quantize_volume_misses_after_in_place_edit():
+    """Editing an array in place yields a new result, not the cached one."""
+    volume = np.asfortranarray(np.random.default_rng(1).random((8, 8, 8), dtype=np.float32))
+    before = quantize_volume(volume, np.eye(4), "uint8")
+    assert quantize_volume(volume.copy(order="F"), np.eye(4), "uint8") == before
+    volume[volume > 0.5] = 0
+    assert quantize_volume(volume, np.eye(4), "uint8") != before
@@ -0,0 +1,151 @@
+"""Unit tests for the process-wide shared volume store."""
+
+import gc
+from types import SimpleNamespace
+
+import pytest
+
+from niivue_component import _store
+from niivue_component._payload import PayloadPacker
+from niivue_component._store import MIN_SHARED_BYTES, VolumeStore
+
+SIZE = MIN_SHARED_BYTES
+
+
+def payload(fill):
+    return bytes([fill]) * SIZE
+
+
+def test_store_interns_identical_copies():
+    """Fresh identical copies, mutable ones included, share one canonical object."""
+    store = VolumeStore(max_bytes=10 * SIZE)
+    first = payload(1)
+    key, canonical = store.intern(first)
+    assert canonical is first
+    assert store.intern(payload(1)) == (key, first)
+    assert store.intern(bytearray(first))[1] is first
+    assert store.stats()["hits"] == 2 and store.stats()["entries"] == 1
+
+
+def test_store_passes_small_payloads_and_disabled_store_through():
+    """Small payloads, and all payloads when disabled, are not stored."""
+    small = bytearray(b"\x00" * 16)
+    assert VolumeStore(max_bytes=10 * SIZE).intern(small) == (None, small)
+    data = payload(1)
+    assert VolumeStore(max_bytes=0).intern(data) == (None, data)
+
+
+def test_store_evicts_only_unreferenced_entries():
+    """Over the cap the oldest unreferenced entry goes; held ones stay."""
+    store = VolumeStore(max_bytes=2 * SIZE)
+    held_key, _ = store.intern(payload(1))
+    store.hold("session", [held_key])
+    store.intern(payload(2))
+    store.intern(payload(3))  # evicts 2, keeps the held 1
+    stats = store.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2
+    assert stats["nbytes"] <= 2 * SIZE
+    assert store.intern(payload(1))[1] is not None and store.stats()["hits"] == 1
+
+
+def test_store_copies_outside_its_lock(monkeypatch):
+    """Other sessions are not blocked by a copy; a racing intern wins."""
+    store = VolumeStore(max_bytes=10 * SIZE)
+    first = payload(1)
+    copies = []
+
+    def as_bytes(data):
+        assert not store._lock.locked()
+        copies.append(data)
+        if len(copies) == 1:  # another session interns the same content meanwhile
+            store.intern(first)
+        return bytes(data)
+
+    monkeypatch.setattr(_store, "as_bytes", as_bytes)
+    key, canonical = store.intern(bytearray(first))
+    assert canonical is store.intern(first)[1]
+    assert store.stats()["entries"] == 1 and store.stats()["nbytes"] == SIZE
+
+
+def test_store_passes_payloads_through_when_full_of_held_entries():
+    """A payload that does not fit is sent unstored: the cap is never exceeded."""
+    store = VolumeStore(max_bytes=SIZE)
+    key, _ = store.intern(payload(1))
+    store.hold("session", [key])
+    data = payload(2)
+    assert store.intern(data) == (None, data)
+    assert store.stats()["nbytes"] == SIZE
+
+
+def test_store_hold_replaces_or_accumulates_and_release_drops():
+    """Owners replace or extend their references; release drops them all."""
+    store = VolumeStore(max_bytes=10 * SIZE)
+    a, _ = store.intern(payload(1))
+    b, _ = store.intern(payload(2))
+    store.hold(("s1", "viewer"), [a])
+    store.hold(("s1", "viewer"), [b])
+    store.hold(("s1", None), [a], replace=False)
+    store.hold(("s1", None), [b], replace=False)
+    store.hold(("s2", "viewer"), [b])
+    assert store.stats()["referenced"] == 2 and store.stats()["owners"] == 3
+    store.release(lambda owner: owner[0] == "s1")
+    assert store.stats()["referenced"] == 1 and store.stats()["owners"] == 1
+
+
+@pytest.mark.parametrize("transport", ["binary", "base64"])
+def test_packers_share_interned_arrays(transport):
+    """Two sessions packing the same array send the same canonical payload."""
+    np = pytest.importorskip("numpy")
+    store = VolumeStore(max_bytes=10 * SIZE)
+    volume = np.arange(SIZE, dtype=np.uint8).reshape(64, 32, -1)
+    sent = []
+    for _ in range(2):
+        packer = PayloadPacker(transport, store=store)
+        packed = packer.pack(volume.copy())
+        sent.append(packer.blobs[packed["blob"]] if transport == "binary" else packed)
+        assert len(packer.store_keys) == 1
+    assert sent[0] is sent[1]
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Fake runtime: ``run(session_id)`` enters a script run of that session."""
+    store = VolumeStore(max_bytes=10 * SIZE)
+    monkeypatch.setattr(_store, "volume_store", store)
+    active = set()
+    fake_runtime = SimpleNamespace(is_active_session=lambda session_id: session_id in active)
+    monkeypatch.setattr(_store.runtime, "exists", lambda: True)
+    monkeypatch.setattr(_store.runtime, "get_instance", lambda: fake_runtime)
+
+    def run(session_id):
+        active.add(session_id)
+        # Streamlit wraps the session state anew for every script run
+        ctx = SimpleNamespace(session_id=session_id, session_state=object())
+        monkeypatch.setattr(_store, "get_script_run_ctx", lambda suppress_warning: ctx)
+
+    return store, active, run
+
+
+def test_session_references_survive_reruns(sessions):
+    """References of a live session are kept from one run to the next."""
+    store, _, run = sessions
+    key, _ = store.intern(payload(1))
+    run("session-1")
+    _store.hold_payloads(_store.session_owner("viewer"), [key])
+    for _ in range(2):
+        run("session-1")
+        gc.collect()
+        _store.hold_payloads(_store.session_owner("other"), [])
+        assert store.stats()["referenced"] == 1
+
+
+def test_session_references_are_released_when_session_ends(sessions):
+    """References of a session that has ended are dropped by the next call."""
+    store, active, run = sessions
+    key, _ = store.intern(payload(1))
+    run("session-1")
+    _store.hold_payloads(_store.session_owner("viewer"), [key])
+    active.discard("session-1")
+    run("session-2")
+    _store.session_owner("viewer")
+    assert store.stats()["referenced"] == 0 and store.stats()["owners"] == 0
@@ -58,6 +58,17 @@ export async function handleMessage(message: any, appProps: AppProps) {
         }
       }
       break
+    case 'replaceVolumes':
+      {
+        // Swap the data of a loaded canvas, keeping its view (slice, zoom,
+        // crosshair); used by hosts that update an image in place.
+        const index = body.index >= 0 ? body.index : nvArray.value.length - 1
+        if (index >= 0 && index < nvArray.value.length) {
+          await replaceVolumes(nvArray.value[index], body.volumes, settings.value)
+          notifyImageLoaded()
+        }
+      }
+      break
     case 'addImage':
       {
         const nv = getUnitinializedNvInstance(nvArray)
@@ -307,6 +318,32 @@ async function addOverlay(nv: NiiVue, item: any, settings: NiiVueSettings) {
   }
 }
 
+/**
+ * Replace every volume of `nv` with `items` ({ data, uri, colormap, opacity }),
+ * the first as the background. The new volumes are loaded before the old ones
+ * are dropped, so the canvas never shows an empty scene. The background keeps
+ * its colormap unless the item names one.
+ */
+async function replaceVolumes(nv: NiiVue, items: any[], settings: NiiVueSettings) {
+  const previous = [...nv.volumes]
+  for (const [i, item] of items.entries()) {
+    await nv.addVolume({
+      url: new File([toBlobPart(item.data)], item.uri),
+      name: item.uri,
+      colormap:
+        item.colormap ||
+        (i === 0
+          ? previous[0]?.colormap || settings?.defaultVolumeColormap || 'gray'
+          : settings?.defaultOverlayColormap || 'redyell'),
+      opacity: item.opacity ?? (i === 0 ? 1 : (settings?.defaultOverlayOpacity ?? 0.5)),
+    })
+  }
+  for (const volume of previous) {
+    nv.model.removeVolume(nv.volumes.indexOf(volume))
+  }
+  nv.updateGLVolume()
+}
+
 // niivue's File/Blob wrapping needs a real BlobPart. ArrayBuffers and TypedArray
 // views pass through; a plain number[] (some postMessage bridges serialize
 // buffers this way) is repacked into a Uint8Array.
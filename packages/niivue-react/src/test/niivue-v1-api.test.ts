@@ -191,3 +191,40 @@ describe('(c) ExtendedNiivue v1 constructor options + no mouseMoveListener', ()
     expect((inst as any).mouseMoveListener).toBeUndefined()
   })
 })
+
+describe('replaceVolumes swaps the volumes of a canvas in place', () => {
+  it('adds the new volumes, then drops the old ones, keeping the background colormap', async () => {
+    const old = [{ colormap: 'viridis' }, { colormap: 'red' }]
+    const nv = {
+      ...makeMeshNv(),
+      volumes: [...old] as any[],
+      model: { removeVolume: vi.fn() },
+    }
+    nv.addVolume.mockImplementation(async (opts: any) => {
+      nv.volumes.push(opts)
+    })
+    nv.model.removeVolume.mockImplementation((index: number) => {
+      nv.volumes.splice(index, 1)
+    })
+    const data = new Uint8Array([1, 2]).buffer
+    await handleMessage(
+      {
+        type: 'replaceVolumes',
+        body: {
+          index: 0,
+          volumes: [
+            { data, uri: 'array.nii' },
+            { data, uri: 'mask.nii', colormap: 'blue', opacity: 0.3 },
+          ],
+        },
+      },
+      makeAppProps(nv),
+    )
+
+    expect(nv.volumes.map((volume: any) => volume.name)).toEqual(['array.nii', 'mask.nii'])
+    expect(nv.volumes[0]).toMatchObject({ colormap: 'viridis', opacity: 1 })
+    expect(nv.volumes[1]).toMatchObject({ colormap: 'blue', opacity: 0.3 })
+    expect(nv.volumes[0].url).toBeInstanceOf(File)
+    expect(nv.updateGLVolume).toHaveBeenCalled()
+  })
+})
@@ -21,6 +21,7 @@ describe('isImageType', () => {
     ['data.dcm', '.dcm'],
     ['image.mha', '.mha'],
     ['image.mhd', '.mhd'],
+    ['image.hdr', '.hdr'],
     ['image.nhdr', '.nhdr'],
     ['image.nrrd', '.nrrd'],
     ['image.mgh', '.mgh'],
@@ -174,6 +174,7 @@ export function isImageType(item: string) {
     '.dcm',
     '.mha',
     '.mhd',
+    '.hdr',
     '.nhdr',
     '.nrrd',
     '.mgh',